@@ -40,8 +40,15 @@ export default function DashboardPage({ className = "" }) {
 
   const fetchFiles = async () => {
     try {
-      const { data } = await api.get("/agenticai/files/");
-      setFiles(data);
+      // The listing is paginated; follow `next` until the last page.
+      const allFiles = [];
+      let url = "/agenticai/files/";
+      while (url) {
+        const { data } = await api.get(url);
+        allFiles.push(...data.results);
+        url = data.next;
+      }
+      setFiles(allFiles);
     } catch (err) {
       console.error("Error fetching files:", err);
     }
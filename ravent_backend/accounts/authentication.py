@@ -0,0 +1,178 @@
+# accounts/authentication.py
+"""
+JWT authentication without a user query on every request.
+
+`CachedJWTAuthentication` resolves the token's user from a per-process LRU
+keyed by user id and the token's issue time (`iat`), and only queries the
+database on a miss. Keying on the issue time means a token issued after a
+change to the user (a new password, a deactivation) never reads a row cached
+before it, even in a worker process the change's signal did not reach. The
+checks simplejwt makes against the row (is_active, and the password-hash
+claim when CHECK_REVOKE_TOKEN is on) still run against the cached row on
+every request. All entries of a user are dropped by the user save/delete
+signals in accounts/signals.py, and each expires after a TTL, which bounds
+how stale another worker process can be for tokens issued before a change.
+
+`StatelessJWTAuthentication` answers from the token claims alone for tokens
+issued with the profile claims (see ProfileTokenObtainPairSerializer), and
+falls back to the cached lookup for older tokens.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+PROFILE_CLAIMS = ("username", "email")
+
+
+class UserCache:
+    """
+    Thread-safe LRU of user rows with a per-entry TTL, keyed by
+    (user id, token issue time).
+    """
+
+    def __init__(self, max_entries=4096, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # user id -> keys of its entries, so discard() need not scan.
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, user_id, issued_at=None):
+        if not self.enabled:
+            return None
+        key = (user_id, issued_at)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Each request gets its own instance, so changes made while handling
+        # one request never leak into another.
+        return copy.copy(entry[0])
+
+    def set(self, user_id, user, issued_at=None):
+        if not self.enabled:
+            return
+        key = (user_id, issued_at)
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (copy.copy(user), time.monotonic() + self.ttl)
+            self._keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._pop(next(iter(self._entries)))
+
+    def discard(self, user_id):
+        """
+        Drop every entry of a user, whichever token it was cached for.
+        """
+        with self._lock:
+            for key in self._keys.pop(user_id, ()):
+                self._entries.pop(key, None)
+
+    def _pop(self, key):
+        if self._entries.pop(key, None) is None:
+            return
+        keys = self._keys[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._keys[key[0]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_user_cache = None
+_user_cache_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _user_cache
+    with _user_cache_lock:
+        if _user_cache is None:
+            from django.conf import settings
+
+            _user_cache = UserCache(
+                max_entries=settings.JWT_USER_CACHE_MAX_ENTRIES,
+                ttl=settings.JWT_USER_CACHE_TTL,
+            )
+        return _user_cache
+
+
+class _CachedUserModel:
+    """
+    Stands in for `self.user_model` inside JWTAuthentication.get_user, so the
+    lookup goes through the cache while simplejwt keeps making its own checks.
+    Bound to the issue time of the token being authenticated.
+    """
+
+    def __init__(self, user_model, issued_at=None):
+        self.DoesNotExist = user_model.DoesNotExist
+        self._user_model = user_model
+        self._issued_at = issued_at
+        self.objects = self
+
+    def get(self, **lookup):
+        (user_id,) = lookup.values()
+        cache = get_user_cache()
+        user = cache.get(user_id, self._issued_at)
+        if user is None:
+            user = self._user_model.objects.get(**lookup)
+            cache.set(user_id, user, self._issued_at)
+        return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves users through the process-wide UserCache.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._user_model = self.user_model
+
+    def get_user(self, validated_token):
+        # DRF builds authenticators per request, so rebinding per token is safe.
+        self.user_model = _CachedUserModel(self._user_model, validated_token.get("iat"))
+        return super().get_user(validated_token)
+
+
+class StatelessJWTAuthentication(CachedJWTAuthentication):
+    """
+    Returns a TokenUser built from the token claims, without touching the
+    cache or the database. For views that only need what the token carries;
+    the claims reflect the user as of login, until the token is reissued.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM in validated_token and all(
+            claim in validated_token for claim in PROFILE_CLAIMS
+        ):
+            return api_settings.TOKEN_USER_CLASS(validated_token)
+        return super().get_user(validated_token)
@@ -0,0 +1,40 @@
+# accounts/hashing.py
+"""
+Password hashing off the request path.
+
+PBKDF2 is deliberately slow (about half a second per password with Django's
+default iterations). `ahash_password` runs it in a bounded pool of threads
+shared by the process, so an ASGI event loop, and the single thread ASGI
+uses for sync views, never wait on it. hashlib's pbkdf2_hmac releases the
+GIL, so the pool hashes up to PASSWORD_HASHING_WORKERS passwords in parallel;
+excess registrations queue for a worker instead of for the whole server.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from django.conf import settings
+
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS,
+                thread_name_prefix="password-hashing",
+            )
+        return _pool
+
+
+async def ahash_password(raw_password):
+    """
+    Return the encoded password (as stored in User.password) for `raw_password`.
+    """
+    return await asyncio.wrap_future(get_hashing_pool().submit(make_password, raw_password))
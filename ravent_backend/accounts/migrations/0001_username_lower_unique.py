@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Case-insensitive unique usernames, enforced by a functional index on
+    auth_user. auth.User belongs to django.contrib.auth, so the index is
+    created with SQL (valid on SQLite and PostgreSQL) rather than as a model
+    constraint. Fails if existing usernames already collide ignoring case.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE UNIQUE INDEX accounts_user_username_lower_uniq ON auth_user (LOWER(username));',
+            reverse_sql='DROP INDEX accounts_user_username_lower_uniq;',
+        ),
+    ]
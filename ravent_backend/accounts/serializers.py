@@ -1,7 +1,12 @@
 # accounts/serializers.py
 
 from django.contrib.auth.models import User
+from django.db.models import Value
+from django.db.models.functions import Lower
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from .signals import token_obtained
 
 class RegisterSerializer(serializers.ModelSerializer):
     """
@@ -28,16 +33,19 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def validate_username(self, value):
         """
-        Check that the username is not already taken.
+        Check that the username is not already taken, ignoring case. Compares
+        Lower(username) so the lookup uses the accounts_user_username_lower_uniq index.
         """
-        if User.objects.filter(username__iexact=value).exists():
+        taken = User.objects.alias(username_lower=Lower("username")).filter(username_lower=Lower(Value(value)))
+        if taken.exists():
             raise serializers.ValidationError("A user with that username already exists.")
         return value
 
     def create(self, validated_data):
         """
         Create and return a new User instance, with a hashed password. 
-        If email was provided, save it too.
+        If email was provided, save it too. Pass `encoded_password` to save()
+        to store a password hashed beforehand (see accounts/hashing.py).
         """
         username = validated_data["username"]
         password = validated_data["password"]
@@ -46,6 +54,30 @@ class RegisterSerializer(serializers.ModelSerializer):
         user = User(username=username)
         if email:
             user.email = email
-        user.set_password(password)
+        if validated_data.get("encoded_password"):
+            user.password = validated_data["encoded_password"]
+        else:
+            user.set_password(password)
         user.save()
         return user
+
+
+class ProfileTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Issues token pairs that also carry the profile claims (username, email),
+    so ProfileView can answer from the access token alone. Access tokens
+    obtained by refreshing copy these claims from the refresh token.
+    Sends `token_obtained` on each successful login.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        token_obtained.send(sender=self.__class__, user=self.user)
+        return data
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["username"] = user.get_username()
+        token["email"] = user.email or ""
+        return token
@@ -0,0 +1,27 @@
+# accounts/signals.py
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .authentication import get_user_cache
+
+# Sent with `user` after a login issued a token pair (ProfileTokenObtainPairSerializer).
+token_obtained = Signal()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_on_save(sender, instance, **kwargs):
+    """
+    A saved user (new password, deactivation, profile edit) must be reloaded
+    by the next authenticated request.
+    """
+    get_user_cache().discard(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user_on_delete(sender, instance, **kwargs):
+    """
+    A deleted user must stop authenticating immediately in this process.
+    """
+    get_user_cache().discard(instance.pk)
@@ -1,3 +1,161 @@
-from django.test import TestCase
+# accounts/tests.py
 
-# Create your tests here.
+import json
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ravent_backend import schema
+
+from .authentication import UserCache, get_user_cache
+
+REGISTER_URL = "/api/accounts/register/"
+LOGIN_URL = "/api/accounts/login/"
+PROFILE_URL = "/api/accounts/profile/"
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class RegisterViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_registers_from_json(self):
+        response = self.client.post(
+            REGISTER_URL, {"username": "alice", "password": "s3cret-pass", "email": "a@example.com"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"detail": "User registered successfully."})
+        user = User.objects.get(username="alice")
+        self.assertTrue(user.check_password("s3cret-pass"))
+        self.assertEqual(user.email, "a@example.com")
+
+    def test_registers_from_form_and_multipart(self):
+        response = self.client.post(REGISTER_URL, {"username": "bob", "password": "s3cret-pass"}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(
+            REGISTER_URL, "username=carol&password=s3cret-pass", content_type="application/x-www-form-urlencoded"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set(User.objects.values_list("username", flat=True)), {"bob", "carol"})
+
+    def test_rejects_username_taken_ignoring_case(self):
+        User.objects.create_user("Alice", password="s3cret-pass")
+        response = self.client.post(REGISTER_URL, {"username": "alice", "password": "s3cret-pass"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"username": ["A user with that username already exists."]})
+
+    def test_validation_errors_use_drf_format(self):
+        response = self.client.post(REGISTER_URL, {"username": "dave", "password": "short"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json())
+        response = self.client.post(REGISTER_URL, "{not json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("detail", response.json())
+        self.assertFalse(User.objects.filter(username="dave").exists())
+
+    def test_listed_in_openapi_schema(self):
+        document = json.loads(schema.generate()[".json"])
+        operation = document["paths"]["/accounts/register/"]["post"]
+        self.assertEqual(operation["summary"], "Register a new user")
+        self.assertIn("201", operation["responses"])
+
+
+class UserCacheTests(SimpleTestCase):
+    def test_entries_are_per_token_issue_time(self):
+        cache = UserCache()
+        cache.set(1, "row", issued_at=100)
+        self.assertEqual(cache.get(1, 100), "row")
+        self.assertIsNone(cache.get(1, 200))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_discard_drops_every_entry_of_a_user(self):
+        cache = UserCache()
+        cache.set(1, "first", issued_at=100)
+        cache.set(1, "second", issued_at=200)
+        cache.set(2, "other", issued_at=100)
+        cache.discard(1)
+        self.assertEqual((cache.get(1, 100), cache.get(1, 200), cache.get(2, 100)), (None, None, "other"))
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_least_recently_used_entry_is_dropped_over_the_limit(self):
+        cache = UserCache(max_entries=2)
+        cache.set(1, "a")
+        cache.set(2, "b")
+        cache.get(1)
+        cache.set(3, "c")
+        self.assertEqual((cache.get(1), cache.get(2), cache.get(3)), ("a", None, "c"))
+        cache.discard(2)  # already evicted: nothing left to drop
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = UserCache(ttl=60)
+        cache.set(1, "row")
+        with mock.patch("accounts.authentication.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get(1))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class JWTAuthenticationTests(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        self.addCleanup(get_user_cache().clear)
+        self.user = User.objects.create_user("alice", email="alice@example.com", password="s3cret-pass")
+        self.client = APIClient()
+
+    def profile(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return self.client.get(PROFILE_URL)
+
+    def test_saved_user_is_reloaded(self):
+        # Without the profile claims ProfileView resolves the user through the cache.
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.profile(token).json()["email"], "alice@example.com")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.profile(token).status_code, 200)
+        self.user.email = "alice@example.org"
+        self.user.save()
+        self.assertEqual(self.profile(token).json()["email"], "alice@example.org")
+
+    def test_deactivated_or_deleted_user_stops_authenticating(self):
+        token = AccessToken.for_user(self.user)
+        self.assertEqual(self.profile(token).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.profile(token).status_code, 401)
+
+        bob = User.objects.create_user("bob", password="s3cret-pass")
+        token = AccessToken.for_user(bob)
+        self.assertEqual(self.profile(token).status_code, 200)
+        bob.delete()
+        self.assertEqual(self.profile(token).status_code, 401)
+
+    def test_newer_token_does_not_reuse_a_row_cached_for_an_older_one(self):
+        token = AccessToken.for_user(self.user)
+        token.set_iat(at_time=timezone.now() - timedelta(seconds=10))
+        self.assertEqual(self.profile(token).status_code, 200)
+        # Deactivated by another process: no signal reaches this one's cache.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.profile(token).status_code, 200)
+        self.assertEqual(self.profile(AccessToken.for_user(self.user)).status_code, 401)
+
+    def test_profile_answers_from_the_token_claims(self):
+        response = self.client.post(LOGIN_URL, {"username": "alice", "password": "s3cret-pass"}, format="json")
+        access = response.json()["access"]
+        User.objects.filter(pk=self.user.pk).update(email="alice@example.org")
+        with self.assertNumQueries(0):
+            response = self.profile(access)
+        # As of login, until the token is reissued.
+        self.assertEqual(response.json(), {"id": self.user.pk, "username": "alice", "email": "alice@example.com"})
+        # Tokens issued without the claims fall back to the user row.
+        self.assertEqual(self.profile(AccessToken.for_user(self.user)).json()["email"], "alice@example.org")
+
+    def test_profile_requires_a_valid_token(self):
+        self.assertEqual(self.client.get(PROFILE_URL).status_code, 401)
+        self.assertEqual(self.profile("not-a-token").status_code, 401)
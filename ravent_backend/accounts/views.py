@@ -1,24 +1,33 @@
 # accounts/views.py
 
-from django.contrib.auth.models import User
-from rest_framework import generics, permissions, status
+from adrf.views import APIView as AsyncAPIView
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from ravent_backend.db import ReadReplicaMixin
+
+from .authentication import StatelessJWTAuthentication
+from .hashing import ahash_password
 from .serializers import RegisterSerializer
 
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(AsyncAPIView):
     """
     post:
     Register a new user by providing a unique username (and optional email)
     along with a password (minimum 8 characters).
     Returns a success message on creation.
+    Async: the password is hashed in the bounded pool of accounts/hashing.py,
+    so slow hashing never holds the event loop or a sync worker thread.
+    Usernames are unique ignoring case; the functional index on
+    LOWER(username) also rejects a concurrent duplicate that passed validation.
     """
-    queryset = User.objects.all()
-    serializer_class = RegisterSerializer
     permission_classes = (permissions.AllowAny,)
 
     @swagger_auto_schema(
@@ -32,25 +41,31 @@ class RegisterView(generics.CreateAPIView):
             400: "Bad request (e.g., username already exists, invalid data)."
         }
     )
-    def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+    async def post(self, request, *args, **kwargs):
+        serializer = RegisterSerializer(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        encoded_password = await ahash_password(serializer.validated_data["password"])
+        try:
+            await sync_to_async(serializer.save)(encoded_password=encoded_password)
+        except IntegrityError:
+            raise ValidationError({"username": ["A user with that username already exists."]})
         return Response(
             {"detail": "User registered successfully."},
             status=status.HTTP_201_CREATED
         )
 
 
-class ProfileView(APIView):
+class ProfileView(ReadReplicaMixin, APIView):
     """
     get:
     Retrieve the authenticated user's basic profile information:
     - id
     - username
     - email
-    This endpoint requires a valid JWT access token.
+    This endpoint requires a valid JWT access token, and answers from its
+    claims without a database query when the token carries them.
     """
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(
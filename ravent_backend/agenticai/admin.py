@@ -1,10 +1,28 @@
 # agenticai/admin.py
 
 from django.contrib import admin
-from .models import FileUpload
+from .models import Conversation, FileUpload, StorageTombstone, StoredBlob
 
 @admin.register(FileUpload)
 class FileUploadAdmin(admin.ModelAdmin):
-    list_display = ("id", "owner", "file", "uploaded_at")
-    list_filter = ("owner", "uploaded_at")
-    search_fields = ("owner__username", "file")
+    list_display = ("id", "owner", "filename", "uploaded_at", "status", "chunk_count")
+    list_filter = ("owner", "uploaded_at", "status")
+    search_fields = ("owner__username", "filename", "file")
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ("id", "sha256", "size", "ref_count", "created_at")
+    search_fields = ("sha256",)
+
+
+@admin.register(StorageTombstone)
+class StorageTombstoneAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "artifact", "created_at", "attempts", "next_attempt_at")
+    search_fields = ("name", "artifact")
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ("id", "owner", "title", "turn_count", "summary_through", "updated_at")
+    search_fields = ("owner__username", "title")
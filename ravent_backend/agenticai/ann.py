@@ -0,0 +1,226 @@
+# agenticai/ann.py
+"""
+Inverted-file (IVF) approximate search for owners with many chunks.
+
+A coarse quantiser of `lists` centroids, trained once per embedder with
+`manage.py train_ivf` (spherical k-means over vectors sampled from the chunk
+artifacts), partitions the vector space. Each indexed row is assigned to its
+most similar centroid, and VectorIndex keeps the rows of every partition in
+an inverted list. A query scores only the rows of its `nprobe` most similar
+partitions:
+
+- RAG_IVF_NPROBE trades recall for latency (more partitions, more rows scored);
+- RAG_ANN_MIN_ROWS keeps smaller indexes on exact search, which is fast enough there;
+- the number of lists is fixed at training time (`--lists`, about 4 sqrt(rows)).
+
+Inserts and deletes are incremental: a file's rows are appended to their
+lists when it is added, and removed rows are skipped through the index's
+liveness mask until compaction rebuilds the lists. The centroids and the
+row assignments of every artifact (chunks/ivf/<centroids digest>/<key>.npy,
+written on first load) are kept on disk and memory-mapped, so loading an
+index after a restart does not assign its rows again.
+
+`manage.py benchmark_ann` measures recall@k against queries per second over
+a range of nprobe.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows per step while assigning them to centroids.
+ASSIGN_ROWS = 8192
+
+
+class IVFQuantizer:
+    """
+    `centroids` is an L2-normalised (lists, dimensions) matrix; rows belong to
+    the centroid with the highest inner product.
+    """
+
+    def __init__(self, centroids):
+        self.centroids = centroids
+        self.lists, self.dimensions = centroids.shape
+        self.digest = hashlib.sha256(np.ascontiguousarray(centroids).tobytes()).hexdigest()[:16]
+
+    def assign(self, vectors):
+        return _assign(np.asarray(vectors, dtype=np.float32), self.centroids)
+
+    def probe(self, query_vector, nprobe):
+        """
+        The `nprobe` partitions most similar to the query.
+        """
+        scores = self.centroids @ query_vector
+        if nprobe >= self.lists:
+            return np.arange(self.lists)
+        return np.argpartition(scores, -nprobe)[-nprobe:]
+
+    def assignments_path(self, artifact_path):
+        artifact_path = Path(artifact_path)
+        return artifact_path.parent / "ivf" / self.digest / f"{artifact_path.stem}.npy"
+
+    def load_assignments(self, artifact_path, vectors):
+        """
+        Row assignments of an artifact's vectors, memory-mapped from their
+        sidecar file; computed and written on first use.
+        """
+        if vectors.shape[1] != self.dimensions:
+            return None
+        path = self.assignments_path(artifact_path)
+        try:
+            assignments = np.load(path, mmap_mode="r")
+            if len(assignments) == len(vectors):
+                return assignments
+        except (FileNotFoundError, ValueError):
+            pass
+        assignments = self.assign(vectors)
+        try:
+            _save(path, assignments)
+        except OSError:
+            logger.warning("Could not write IVF assignments to %s", path, exc_info=True)
+        return assignments
+
+    def save(self, path):
+        _save(Path(path), np.asarray(self.centroids, dtype=np.float32))
+
+    @classmethod
+    def load(cls, path):
+        return cls(np.load(path, mmap_mode="r"))
+
+
+def _save(path, array):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as handle:
+        np.save(handle, array)
+    os.replace(temporary, path)
+
+
+def remove_assignments(artifact_path):
+    """
+    Delete the IVF sidecars of an artifact, for every set of centroids.
+    """
+    artifact_path = Path(artifact_path)
+    for path in artifact_path.parent.glob(f"ivf/*/{artifact_path.stem}.npy"):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _assign(vectors, centroids):
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_ROWS):
+        block = vectors[start:start + ASSIGN_ROWS]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_ivf(vectors, lists, iterations=10, seed=0):
+    """
+    Train an IVFQuantizer with spherical k-means on a sample of L2-normalised vectors.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count = len(vectors)
+    if count < lists:
+        raise ValueError(f"Need at least {lists} vectors to train {lists} lists, got {count}.")
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(count, lists, replace=False)].copy()
+    for _ in range(iterations):
+        assigned = _assign(vectors, centroids)
+        order = np.argsort(assigned, kind="stable")
+        sums = np.zeros_like(centroids)
+        # Sum each cluster's members a block of the sorted order at a time.
+        for start in range(0, count, ASSIGN_ROWS):
+            part = order[start:start + ASSIGN_ROWS]
+            groups = assigned[part]
+            heads = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+            sums[groups[heads]] += np.add.reduceat(vectors[part], heads)
+        norms = np.linalg.norm(sums, axis=1)
+        empty = norms == 0
+        centroids[~empty] = sums[~empty] / norms[~empty, None]
+        # Restart empty clusters on random points.
+        centroids[empty] = vectors[rng.choice(count, int(empty.sum()), replace=False)]
+    return IVFQuantizer(centroids)
+
+
+class InvertedLists:
+    """
+    Rows of each partition, in growable int32 arrays. Appends write past the
+    lengths a reader has snapshotted, or into a new array, so searches use a
+    snapshot without holding the index lock.
+    """
+
+    def __init__(self, count):
+        self.rows = [np.zeros(0, dtype=np.int32)] * count
+        self.lengths = np.zeros(count, dtype=np.int64)
+
+    @classmethod
+    def build(cls, assignments, count):
+        lists = cls(count)
+        lists.add(0, assignments)
+        return lists
+
+    @property
+    def nbytes(self):
+        return sum(rows.nbytes for rows in self.rows) + self.lengths.nbytes
+
+    def add(self, first_row, assignments):
+        """
+        Append rows first_row, first_row + 1, ... with the given partitions.
+        """
+        order = np.argsort(assignments, kind="stable")
+        sizes = np.bincount(assignments, minlength=len(self.lengths))
+        stops = np.cumsum(sizes)
+        rows = (order + first_row).astype(np.int32)
+        for partition in np.flatnonzero(sizes).tolist():
+            added = rows[stops[partition] - sizes[partition]:stops[partition]]
+            length, current = int(self.lengths[partition]), self.rows[partition]
+            if length + len(added) > len(current):
+                grown = np.empty(max(2 * len(current), length + len(added), 16), dtype=np.int32)
+                grown[:length] = current[:length]
+                self.rows[partition] = current = grown
+            current[length:length + len(added)] = added
+        self.lengths += sizes
+
+    def snapshot(self):
+        return list(self.rows), self.lengths.copy()
+
+
+def gather(snapshot, partitions):
+    """
+    All rows of the given partitions in a snapshot of InvertedLists.
+    """
+    rows, lengths = snapshot
+    return np.concatenate([rows[partition][:lengths[partition]] for partition in partitions.tolist()])
+
+
+_quantizers = {}
+
+
+def get_ann():
+    """
+    The process-wide IVFQuantizer when settings.RAG_ANN_INDEX is "ivf", else
+    None. Without trained centroids indexes stay exact.
+    """
+    from django.conf import settings
+
+    name = settings.RAG_ANN_INDEX
+    if name == "exact":
+        return None
+    if name != "ivf":
+        raise ValueError(f"Unknown RAG_ANN_INDEX {name!r}; use exact or ivf.")
+    if name not in _quantizers:
+        try:
+            _quantizers[name] = IVFQuantizer.load(settings.RAG_IVF_CENTROIDS)
+        except FileNotFoundError:
+            logger.warning(
+                "No IVF centroids at %s (run `manage.py train_ivf`); using exact search.", settings.RAG_IVF_CENTROIDS
+            )
+            _quantizers[name] = None
+    return _quantizers[name]
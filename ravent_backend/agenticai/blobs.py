@@ -0,0 +1,167 @@
+# agenticai/blobs.py
+"""
+Content-addressed, reference-counted storage for uploaded files.
+
+Uploads are hashed with SHA-256 by the upload handlers below while
+MultiPartParser streams them in, so no second read pass is needed. Each
+distinct content is stored once under blobs/<aa>/<sha256><ext> and shared by
+every FileUpload that references it; when the last reference goes away the
+row is deleted and the content (with its chunk artifact) is handed to the
+storage sweeper in agenticai/sweeper.py.
+"""
+
+import hashlib
+import os
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import sweeper
+from .ingestion import artifact_name
+from .models import StoredBlob
+
+
+class Sha256UploadMixin:
+    """
+    Hashes the chunks an upload handler consumes and attaches the hex digest
+    to the uploaded file as `sha256`.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        remaining = super().receive_data_chunk(raw_data, start)
+        if remaining is None:
+            self.hasher.update(raw_data)
+        return remaining
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(Sha256UploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(Sha256UploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def digest_of(uploaded_file):
+    """
+    Return the SHA-256 of an uploaded file, using the digest computed while
+    streaming when available and hashing the file otherwise.
+    """
+    digest = getattr(uploaded_file, "sha256", None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_key(digest, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f"blobs/{digest[:2]}/{digest}{ext}"
+
+
+def _store(blob, digest, uploaded_file):
+    """
+    Point a new blob at its content, writing it to storage unless an identical
+    file is already there. A file awaiting deletion by the sweeper is never
+    reused; the storage then saves the content under an alternative name.
+    """
+    key = blob_key(digest, uploaded_file.name)
+    if blob.file.storage.exists(key) and not sweeper.is_buried(key):
+        # Left behind without a row (e.g. an interrupted upload); the content is identical.
+        blob.file.name = key
+    else:
+        blob.file.save(key, uploaded_file, save=False)
+
+
+def acquire(uploaded_file):
+    """
+    Return the StoredBlob for an uploaded file with one more reference taken.
+    Content that is already stored is not written again.
+    """
+    digest = digest_of(uploaded_file)
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                blob = StoredBlob.objects.select_for_update().filter(sha256=digest).first()
+                if blob is not None:
+                    StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+                    blob.refresh_from_db(fields=["ref_count"])
+                    return blob
+                blob = StoredBlob(sha256=digest, size=uploaded_file.size, ref_count=1)
+                _store(blob, digest, uploaded_file)
+                blob.save()
+                return blob
+        except IntegrityError:
+            # A concurrent request stored the same content first; take a reference to it.
+            if attempt:
+                raise
+
+
+def acquire_many(uploaded_files):
+    """
+    Batch version of `acquire`: return one StoredBlob per uploaded file, in
+    order, with one reference taken for each. Existing blobs are locked and
+    incremented with one UPDATE per blob, and new content is written once
+    per digest and inserted with a single bulk_create. Must run inside a
+    transaction.
+    """
+    digests = [digest_of(uploaded_file) for uploaded_file in uploaded_files]
+    wanted = {}
+    for digest in digests:
+        wanted[digest] = wanted.get(digest, 0) + 1
+
+    try:
+        with transaction.atomic():
+            existing = {
+                blob.sha256: blob
+                for blob in StoredBlob.objects.select_for_update().filter(sha256__in=wanted)
+            }
+            for digest, blob in existing.items():
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + wanted[digest])
+                blob.ref_count += wanted[digest]
+
+            new_blobs = []
+            for digest, uploaded_file in zip(digests, uploaded_files):
+                if digest in existing:
+                    continue
+                blob = StoredBlob(sha256=digest, size=uploaded_file.size, ref_count=wanted[digest])
+                _store(blob, digest, uploaded_file)
+                existing[digest] = blob
+                new_blobs.append(blob)
+            StoredBlob.objects.bulk_create(new_blobs)
+    except IntegrityError:
+        # A concurrent request stored some of the same content first; fall back
+        # to taking references one file at a time.
+        return [acquire(uploaded_file) for uploaded_file in uploaded_files]
+    return [existing[digest] for digest in digests]
+
+
+def release(blob_id):
+    """
+    Drop one reference to a blob. Once no FileUpload refers to it, the row is
+    deleted and its content and chunk artifact are queued for the sweeper.
+    """
+    with transaction.atomic():
+        blob = StoredBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - 1)
+            return
+        blob.delete()
+        # Storage is cleaned up by the background sweeper, not on this request.
+        sweeper.bury(blob.file.name, artifact_name(blob.sha256))
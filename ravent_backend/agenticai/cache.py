@@ -0,0 +1,165 @@
+# agenticai/cache.py
+"""
+Owner-scoped cache of chat answers.
+
+Answers are keyed by (owner, normalised query, document-set version). The
+version is a counter row per owner in the database (DocumentSetVersion),
+incremented whenever the owner's uploads change, so every worker stops
+serving answers computed against an older document set as soon as the bump
+commits, whatever the CACHES backend. Entries live in a per-process LRU
+bounded by entry count and approximate size, and expire after a TTL.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.db.models.functions import Now
+
+
+def normalise_query(query):
+    return " ".join(query.casefold().split())
+
+
+def docset_version(owner_id):
+    """
+    Return the current document-set version of an owner (one query).
+    """
+    from .models import DocumentSetVersion
+
+    # The row is created on first read, before any answer is cached against it.
+    record, _ = DocumentSetVersion.objects.get_or_create(owner_id=owner_id)
+    return record.version
+
+
+def docset_state(owner_id):
+    """
+    Return (version, changed_at) of an owner's document set, read from the
+    primary database so validators built from it are never behind a bump.
+    """
+    from .models import DocumentSetVersion
+
+    # Creating the row here means every later change of the set moves changed_at.
+    record, _ = DocumentSetVersion.objects.using(DEFAULT_DB_ALIAS).get_or_create(owner_id=owner_id)
+    return record.version, record.changed_at
+
+
+def bump_docset_version(owner_id):
+    """
+    Invalidate every cached answer of an owner, in every worker, and record
+    when their document set changed.
+    """
+    from .models import DocumentSetVersion
+
+    # Without a row nothing has been cached or listed yet; never insert one here,
+    # as this also runs while the owner's uploads are deleted along with the owner.
+    DocumentSetVersion.objects.filter(owner_id=owner_id).update(version=F("version") + 1, changed_at=Now())
+
+
+class AnswerCache:
+    """
+    Thread-safe LRU with per-entry TTL and a memory bound.
+    Records hits, misses and the compute time saved by hits.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    def key(self, owner_id, query):
+        return (owner_id, normalise_query(query), docset_version(owner_id))
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size, cost = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += cost
+            return value
+
+    def set(self, key, value, cost):
+        """
+        Store `value`, which took `cost` seconds to compute.
+        """
+        if not self.enabled:
+            return
+        size = len(json.dumps(value, ensure_ascii=False).encode("utf-8")) + len(key[1])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, size, cost)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_ms": round(self.saved_seconds * 1000, 2),
+            }
+
+
+def _build_answer_cache():
+    from django.conf import settings
+
+    return AnswerCache(
+        max_entries=settings.RAG_ANSWER_CACHE_MAX_ENTRIES,
+        max_bytes=settings.RAG_ANSWER_CACHE_MAX_BYTES,
+        ttl=settings.RAG_ANSWER_CACHE_TTL,
+    )
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = _build_answer_cache()
+        return _answer_cache
@@ -0,0 +1,106 @@
+# agenticai/chat.py
+"""
+Chat orchestration shared by the JSON and streaming chat endpoints:
+gather evidence from the owner's documents, or the web when they do not
+answer the question (agenticai/fanout.py), then generate a grounded answer.
+Standalone answers are cached per owner and document-set version
+(agenticai/cache.py). Turns of a conversation are answered with its bounded
+history and recorded in it (agenticai/memory.py); they bypass the cache,
+since the same question can mean something else later in a conversation.
+"""
+
+import time
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from ravent_backend import metrics
+
+from . import fanout, memory, retrieval
+from .cache import get_answer_cache
+from .fanout import RAG_TYPE
+from .generation import get_generator
+from .tools import get_search_tool
+
+NO_MATCH_ANSWER = "I could not find anything relevant to your question in your uploaded files."
+
+
+def _sources(hits):
+    return list(dict.fromkeys(hit.filename for hit in hits))
+
+
+def _evidence(owner_id, query):
+    # The event loop is only worth starting when there is a search to race.
+    if get_search_tool() is None:
+        return fanout.Evidence(RAG_TYPE, retrieval.retrieve(owner_id, query))
+    return async_to_sync(fanout.gather_evidence)(owner_id, query)
+
+
+def answer(owner_id, query, context=None):
+    """
+    Answer a query in the ChatContentSerializer shape; with a memory.Context,
+    as the next turn of that conversation.
+    """
+    if context is not None:
+        kind, hits = _evidence(owner_id, query)
+        with metrics.span("generation"):
+            text = get_generator().complete(query, hits, memory.render_history(context)) if hits else NO_MATCH_ANSWER
+        return _record(context, query, {"answer": text, "type": kind, "sources": _sources(hits)})
+
+    answer_cache = get_answer_cache()
+    key = answer_cache.key(owner_id, query)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return {"query": query, **cached}
+
+    started = time.perf_counter()
+    kind, hits = _evidence(owner_id, query)
+    with metrics.span("generation"):
+        text = get_generator().complete(query, hits) if hits else NO_MATCH_ANSWER
+    result = {"answer": text, "type": kind, "sources": _sources(hits)}
+    answer_cache.set(key, result, time.perf_counter() - started)
+    return {"query": query, **result}
+
+
+def _record(context, query, result):
+    turn = memory.record_turn(context, query, result["answer"], result["sources"])
+    return {"query": query, **result, "conversation": context.conversation_id, "turn": turn}
+
+
+async def stream_answer(owner_id, query, context=None):
+    """
+    Asynchronously yield ("token", text) events followed by one
+    ("done", content) event whose content matches ChatContentSerializer.
+    A cached answer is sent as a single token. With a memory.Context the
+    turn is recorded in the conversation once the stream completes.
+    """
+    history = ""
+    if context is None:
+        answer_cache = get_answer_cache()
+        key = await sync_to_async(answer_cache.key)(owner_id, query)
+        cached = answer_cache.get(key)
+        if cached is not None:
+            yield "token", cached["answer"]
+            yield "done", {"query": query, **cached}
+            return
+    else:
+        history = memory.render_history(context)
+
+    started = time.perf_counter()
+    kind, hits = await fanout.gather_evidence(owner_id, query)
+    parts = []
+    if hits:
+        # Includes time the client takes to read tokens, since the stream is paced by it.
+        with metrics.span("generation"):
+            async for token in get_generator().stream(query, hits, history):
+                parts.append(token)
+                yield "token", token
+    else:
+        parts.append(NO_MATCH_ANSWER)
+        yield "token", NO_MATCH_ANSWER
+    result = {"answer": "".join(parts), "type": kind, "sources": _sources(hits)}
+    # Only completed streams reach this point, so partial answers are never cached or recorded.
+    if context is not None:
+        yield "done", await sync_to_async(_record)(context, query, result)
+        return
+    answer_cache.set(key, result, time.perf_counter() - started)
+    yield "done", {"query": query, **result}
@@ -0,0 +1,288 @@
+# agenticai/chunking.py
+"""
+Token-budgeted chunking of extracted text.
+
+`TokenChunker` splits a stream of text pieces into chunks of at most
+`max_tokens` tokens with up to `overlap_tokens` tokens of overlap, cutting at
+the strongest structural boundary in the second half of its reach: a blank
+line (paragraph or heading), then a line break, then the end of a sentence,
+then any space. Each chunk is reported with its [start, end) UTF-8 byte
+offsets into the concatenated text.
+
+Text is handled as UTF-8 bytes, a batch at a time. Each batch gets one
+vectorised pass with NumPy that gives every byte a token weight and keeps
+the running sum, so the bytes a budget reaches from any start are found by
+a searchsorted, and the boundary within them by bytes.rfind. Only the
+unfinished chunk is carried into the next batch, so the whole pass is
+linear in the text and never re-slices what has been chunked.
+
+Token counts are those of the embedding model's tokenizer: tiktoken's
+`encoding` (cl100k_base, used by OpenAI's embedding models, by default). A
+batch is encoded once and each token's weight is put on its last byte, so
+the running sum counts the tokens a span ends. A chunk re-encoded on its own
+can differ from that by a token where it was cut.
+
+When tiktoken or its vocabulary file is unavailable (or `encoding` is None)
+counts are estimated instead, erring high so chunks fit the embedder's
+limit: every punctuation mark and every non-ASCII character counts as one
+token, and a run of ASCII letters and digits as one token per
+`chars_per_token` characters (rounded up). BPE vocabularies such as cl100k
+average about four characters per English token.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE, _WORD, _PUNCTUATION, _LEAD, _CONTINUATION = range(5)
+
+_CLASSES = np.full(256, _PUNCTUATION, dtype=np.uint8)
+# Control characters (PDF text extraction leaves NULs and the like) count as whitespace.
+_CLASSES[:0x21] = _WHITESPACE
+_CLASSES[0x7F] = _WHITESPACE
+_CLASSES[list(b"0123456789_ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz")] = _WORD
+_CLASSES[0x80:0xC0] = _CONTINUATION
+_CLASSES[0xC0:] = _LEAD
+
+_IS_WORD = _CLASSES == _WORD
+
+_SPACES = frozenset(byte for byte in range(256) if _CLASSES[byte] == _WHITESPACE)
+
+# Cut points by strength: (separator, bytes of it kept at the end of the chunk).
+BOUNDARIES = (
+    ((b"\n\n", 0),),
+    ((b"\n", 0),),
+    ((b". ", 1), (b"? ", 1), (b"! ", 1)),
+    ((b" ", 0), (b"\t", 0)),
+)
+
+
+# Seconds before loading an unavailable encoding is tried again.
+RETRY_UNAVAILABLE_AFTER = 300
+
+_unavailable = {}
+_unavailable_lock = threading.Lock()
+
+
+def load_encoding(name):
+    """
+    (tiktoken encoding, byte length of each token id) for `name`, or None
+    when tiktoken or the encoding's vocabulary file cannot be loaded. A
+    failure is logged once and is not cached for good: loading is tried
+    again once RETRY_UNAVAILABLE_AFTER seconds have passed, so a
+    vocabulary download that failed for a moment does not leave a long-running
+    worker estimating token counts until it restarts.
+    """
+    with _unavailable_lock:
+        failed_at = _unavailable.get(name)
+        if failed_at is not None and time.monotonic() - failed_at < RETRY_UNAVAILABLE_AFTER:
+            return None
+    try:
+        loaded = _load_encoding(name)
+    except Exception as exc:
+        with _unavailable_lock:
+            if name not in _unavailable:
+                logger.warning("Tokenizer %r is unavailable (%s); estimating chunk token counts instead.", name, exc)
+            _unavailable[name] = time.monotonic()
+        return None
+    with _unavailable_lock:
+        if _unavailable.pop(name, None) is not None:
+            logger.info("Tokenizer %r is available again.", name)
+    return loaded
+
+
+@functools.lru_cache(maxsize=None)
+def _load_encoding(name):
+    # lru_cache does not cache exceptions, so only successful loads are kept.
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(name)
+    lengths = np.zeros(encoding.n_vocab, dtype=np.int64)
+    for token in range(encoding.n_vocab):
+        try:
+            lengths[token] = len(encoding.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return encoding, lengths
+
+
+class TokenChunker:
+    """
+    Splits text into token-budgeted chunks; see the module docstring.
+    """
+
+    def __init__(self, max_tokens=256, overlap_tokens=32, chars_per_token=4, batch_bytes=1 << 20,
+                 encoding="cl100k_base"):
+        if max_tokens < 1:
+            raise ValueError("max_tokens must be at least 1.")
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("overlap_tokens must be at least 0 and less than max_tokens.")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.chars_per_token = chars_per_token
+        self.batch_bytes = batch_bytes
+        self.tokenizer = load_encoding(encoding) if encoding else None
+        # Budgets are in weight units: tokens with a tokenizer, else 1/chars_per_token of a token.
+        self._unit = 1 if self.tokenizer is not None else chars_per_token
+        # Weights are in 1/chars_per_token of a token so sums stay integers. The
+        # first byte of a word run carries the rounding up, which keeps the sum
+        # over any span at least the per-run estimate.
+        self._weights = np.zeros(256, dtype=np.int32)
+        self._weights[_CLASSES == _WORD] = 1
+        self._weights[(_CLASSES == _PUNCTUATION) | (_CLASSES == _LEAD)] = chars_per_token
+
+    def count_tokens(self, text):
+        """
+        Token count of `text` (estimated without a tokenizer), as used for the budget.
+        """
+        if self.tokenizer is not None:
+            return len(self.tokenizer[0].encode_ordinary(text))
+        data = text.encode("utf-8")
+        if not data:
+            return 0
+        units = int(self._running_weight(data, len(data))[-1])
+        return -(-units // self.chars_per_token)
+
+    def split_text(self, text):
+        """
+        Split a whole text; returns (start, end, chunk) tuples with byte offsets.
+        """
+        return list(self.split([text]))
+
+    def split(self, pieces):
+        """
+        Split a stream of text pieces; yields (start, end, chunk) tuples whose
+        offsets are UTF-8 byte offsets into the concatenated pieces. About
+        `batch_bytes` plus one chunk is buffered.
+        """
+        carry, base, continued = b"", 0, False
+        batch, size = [], 0
+        for piece in pieces:
+            encoded = piece.encode("utf-8")
+            batch.append(encoded)
+            size += len(encoded)
+            if size >= self.batch_bytes:
+                data = carry + b"".join(batch)
+                batch, size = [], 0
+                consumed = yield from self._split_batch(data, base, continued, final=False)
+                if consumed:
+                    # A chunk cut inside a long word resumes it without a new word's rounding.
+                    continued = _CLASSES[data[consumed - 1]] == _WORD
+                carry, base = data[consumed:], base + consumed
+        data = carry + b"".join(batch)
+        if data:
+            yield from self._split_batch(data, base, continued, final=True)
+
+    def _running_weight(self, data, length, continued=False):
+        """
+        Running token weight before each of the first `length` bytes of
+        `data`, and after the last. `continued` means data starts mid-word.
+        """
+        if self.tokenizer is not None:
+            return self._running_tokens(data, length)
+        array = np.frombuffer(data, dtype=np.uint8, count=length)
+        weights = self._weights.take(array)
+        word = _IS_WORD.take(array)
+        weights[1:] += (word[1:] & ~word[:-1]).view(np.uint8) * np.int32(self.chars_per_token - 1)
+        if word[0] and not continued:
+            weights[0] += self.chars_per_token - 1
+        running = np.zeros(length + 1, dtype=np.int32)
+        np.cumsum(weights, out=running[1:])
+        return running
+
+    def _running_tokens(self, data, length):
+        """
+        `_running_weight` from the tokenizer: each token counts on its last byte.
+        """
+        encoding, token_lengths = self.tokenizer
+        tokens = np.asarray(encoding.encode_ordinary(data[:length].decode("utf-8")), dtype=np.int64)
+        running = np.zeros(length + 1, dtype=np.int32)
+        running[np.cumsum(token_lengths[tokens])] = 1
+        np.cumsum(running, out=running)
+        return running
+
+    def _split_batch(self, data, base, continued, final):
+        """
+        Yield the chunks of `data` that are complete; returns how many bytes
+        were consumed (the rest is the start of the next chunk). Unless
+        `final`, the batch ends at its last whitespace so no word is cut.
+        """
+        length = len(data)
+        if not final:
+            length = max(data.rfind(space) for space in (b" ", b"\n", b"\t", b"\r", b"\f", b"\v"))
+            if length <= 0:
+                return 0
+        running = self._running_weight(data, length, continued)
+        budget = self.max_tokens * self._unit
+        overlap = self.overlap_tokens * self._unit
+        start = _skip_spaces(data, 0, length)
+        while start < length:
+            # The furthest end within budget; bytes past it would exceed it.
+            reach = int(running.searchsorted(running[start] + budget, side="right")) - 1
+            if reach >= length:
+                if not final:
+                    return start
+                end = following = length
+            else:
+                end, following = _last_boundary(data, (start + reach + 1) // 2, reach)
+                if end < 0:
+                    # No boundary in reach (a very long word): cut between characters.
+                    end = max(reach, start + 1)
+                    while end < length and 0x80 <= data[end] < 0xC0:
+                        end += 1
+                    following = end
+            stop = end
+            while stop > start and data[stop - 1] in _SPACES:
+                stop -= 1
+            if stop > start:
+                yield base + start, base + stop, data[start:stop].decode("utf-8")
+            if following >= length:
+                break
+            if overlap:
+                earliest = max(int(running.searchsorted(running[end] - overlap)), start + 1)
+                following = _first_boundary(data, earliest, end, following)
+            start = _skip_spaces(data, following, length)
+        return length
+
+
+def _skip_spaces(data, position, length):
+    while position < length and data[position] in _SPACES:
+        position += 1
+    return position
+
+
+def _last_boundary(data, lowest, reach):
+    """
+    The latest cut in data[lowest:reach] at the strongest boundary present:
+    (chunk end, start of what follows), or (-1, -1).
+    """
+    for separators in BOUNDARIES:
+        best = (-1, -1)
+        for separator, keep in separators:
+            found = data.rfind(separator, lowest - keep, reach - keep + len(separator))
+            if found >= 0 and found + keep > best[0]:
+                best = (found + keep, found + len(separator))
+        if best[0] >= lowest:
+            return best
+    return -1, -1
+
+
+def _first_boundary(data, earliest, end, fallback):
+    """
+    Where the overlap of the next chunk starts: just after the earliest
+    strongest boundary in data[earliest:end], or `fallback` (no overlap).
+    """
+    for separators in BOUNDARIES:
+        best = fallback
+        for separator, _ in separators:
+            found = data.find(separator, earliest, end)
+            if found >= 0:
+                best = min(best, found + len(separator))
+        if best < end:
+            return best
+    return fallback
@@ -0,0 +1,246 @@
+# agenticai/embeddings.py
+"""
+Embedding providers and the process-wide query embedder.
+
+Providers subclass `Embedder`: OpenAIEmbedder calls the API, HashingEmbedder
+works offline, and SimulatedAPIEmbedder adds API-like latency for benchmarks.
+Ingestion workers load their own provider with `load_embedder`; request
+handlers share the one returned by `get_embedder`.
+
+`get_embedder` wraps the provider in a `BatchingEmbedder`, so concurrent
+queries cost one provider call instead of one each. Its collector thread
+takes the first pending request and keeps gathering until
+RAG_EMBEDDING_MAX_BATCH texts are waiting (`max_batch_size`) or
+RAG_EMBEDDING_MAX_WAIT_MS has passed (`max_wait`). It then sends the batch
+and gives each caller its own rows. The wait is added latency for a lone
+query, so keep it to a few milliseconds; 0 turns batching off.
+RAG_EMBEDDING_CONCURRENCY bounds the batches in flight, and requests arriving
+meanwhile form the next batch.
+"""
+
+import asyncio
+import hashlib
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.utils.module_loading import import_string
+
+
+class Embedder:
+    """
+    Base class for embedding providers.
+    Subclasses return L2-normalised float32 matrices of shape (len(texts), dimensions).
+    """
+    dimensions = None
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        return await sync_to_async(self.embed_documents, thread_sensitive=False)(texts)
+
+    async def aembed_query(self, text):
+        return (await self.aembed_documents([text]))[0]
+
+
+class OpenAIEmbedder(Embedder):
+    """
+    Embeds text with the OpenAI embeddings API (same model as the BaseRAG notebook).
+    The client is created lazily so worker processes only connect when they embed.
+    """
+
+    def __init__(self, model="text-embedding-3-large", batch_size=64, dimensions=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.dimensions = dimensions
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI()
+        return self._client
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            kwargs = {"model": self.model, "input": texts[start:start + self.batch_size]}
+            if self.dimensions:
+                kwargs["dimensions"] = self.dimensions
+            response = self.client.embeddings.create(**kwargs)
+            vectors.extend(item.embedding for item in response.data)
+        return _normalise(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic, dependency-free embedder based on feature hashing of word tokens.
+    Intended for tests and offline development in place of OpenAIEmbedder.
+    """
+    token_pattern = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts):
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self.token_pattern.findall(text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+                sign = 1.0 if digest[4] & 1 else -1.0
+                matrix[row, bucket] += sign
+        return _normalise(matrix)
+
+
+class SimulatedAPIEmbedder(HashingEmbedder):
+    """
+    HashingEmbedder that sleeps like a remote API: a fixed cost per call plus
+    a small cost per text, with at most `max_concurrent_calls` calls served at
+    once (connection pool / rate limit). A local stand-in for measuring
+    batching throughput.
+    """
+
+    def __init__(self, dimensions=256, call_latency=0.05, text_latency=0.0005, max_concurrent_calls=4):
+        super().__init__(dimensions)
+        self.call_latency = call_latency
+        self.text_latency = text_latency
+        self.calls = 0
+        self._connections = threading.Semaphore(max_concurrent_calls)
+
+    def embed_documents(self, texts):
+        with self._connections:
+            self.calls += 1
+            time.sleep(self.call_latency + self.text_latency * len(texts))
+        return super().embed_documents(texts)
+
+
+class _Request(NamedTuple):
+    texts: list
+    future: Future
+
+
+class BatchingEmbedder(Embedder):
+    """
+    Coalesces concurrent embedding requests into batched provider calls.
+
+    Callers on any thread (sync views) or event loop (async views) submit
+    texts and get a Future; a collector thread gathers pending requests until
+    `max_batch_size` texts are waiting or `max_wait` seconds have passed since
+    the first one, sends one call to the wrapped embedder, and hands each caller
+    its own rows. At most `concurrency` batches are in flight; while they are,
+    new requests keep accumulating into the next batch.
+    """
+
+    def __init__(self, inner, max_batch_size=64, max_wait=0.005, concurrency=4):
+        self.inner = inner
+        self.dimensions = inner.dimensions
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending = queue.Queue()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding-batch")
+        self._collector = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, texts):
+        future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, self.dimensions or 0), dtype=np.float32))
+            return future
+        if self._collector is None:
+            with self._start_lock:
+                if self._collector is None:
+                    self._collector = threading.Thread(
+                        target=self._collect, name="embedding-collector", daemon=True
+                    )
+                    self._collector.start()
+        self._pending.put(_Request(list(texts), future))
+        return future
+
+    def embed_documents(self, texts):
+        return self.submit(texts).result()
+
+    async def aembed_documents(self, texts):
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _collect(self):
+        while True:
+            batch = [self._pending.get()]
+            self._slots.acquire()
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    batch.append(self._pending.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+                size += len(batch[-1].texts)
+            self._pool.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        try:
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = self.inner.embed_documents(texts)
+            except Exception as exc:
+                for request in batch:
+                    request.future.set_exception(exc)
+                return
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+        finally:
+            self._slots.release()
+
+
+def load_embedder(path, options=None):
+    """
+    Instantiate an embedder from its dotted import path, e.g. settings.RAG_EMBEDDER.
+    """
+    return import_string(path)(**(options or {}))
+
+
+_embedders = {}
+
+
+def get_embedder():
+    """
+    Return the process-wide embedder configured by settings.RAG_EMBEDDER,
+    wrapped in a BatchingEmbedder unless RAG_EMBEDDING_MAX_WAIT_MS is 0.
+    """
+    from django.conf import settings
+
+    embedder = _embedders.get(settings.RAG_EMBEDDER)
+    if embedder is None:
+        embedder = load_embedder(settings.RAG_EMBEDDER, settings.RAG_EMBEDDER_OPTIONS)
+        if settings.RAG_EMBEDDING_MAX_WAIT_MS > 0:
+            embedder = BatchingEmbedder(
+                embedder,
+                max_batch_size=settings.RAG_EMBEDDING_MAX_BATCH,
+                max_wait=settings.RAG_EMBEDDING_MAX_WAIT_MS / 1000,
+                concurrency=settings.RAG_EMBEDDING_CONCURRENCY,
+            )
+        _embedders[settings.RAG_EMBEDDER] = embedder
+    return embedder
+
+
+def _normalise(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,153 @@
+# agenticai/fanout.py
+"""
+Evidence for a chat answer: the owner's documents first, the web as fallback.
+
+The notebook agent searched the web only after the knowledge base came up
+empty, so a fallback answer cost both latencies in sequence. Here retrieval
+and the search tool (agenticai/tools.py) start together on the event loop:
+
+- a confident retrieval wins and the search is cancelled, usually before it
+  reaches the network. Vector hits are judged by cosine similarity against
+  RAG_CONFIDENT_SCORE and BM25 hits by their query-relative score against
+  RAG_CONFIDENT_LEXICAL_SCORE, so each retrieval mode has a threshold on a
+  fixed scale;
+- otherwise the search, which has been running all along, supplies the
+  evidence; when it finds nothing, whatever retrieval found is used.
+
+Every stage has a deadline (RAG_RETRIEVAL_DEADLINE, RAG_SEARCH_DEADLINE). A
+search that has not answered after RAG_SEARCH_HEDGE_AFTER seconds, or that
+failed, is hedged with another attempt, up to RAG_SEARCH_ATTEMPTS in flight;
+the first answer wins and the others are cancelled. This trims the tail the
+provider's slowest calls would otherwise add to fallback answers.
+
+Without a search tool there is nothing to fall back on, so retrieval runs to
+completion as before. `manage.py benchmark_fanout` compares the sequential,
+concurrent and hedged pipelines against a stub provider.
+"""
+
+import asyncio
+import logging
+import math
+from typing import NamedTuple
+
+from ravent_backend import metrics
+
+from . import retrieval
+from .tools import get_search_tool
+
+logger = logging.getLogger(__name__)
+
+RAG_TYPE = "Knowledge/RAG"
+WEB_TYPE = "Web Search"
+
+
+class Evidence(NamedTuple):
+    type: str
+    hits: list  # retrieval.Hit
+
+
+def confident(hits):
+    """
+    Whether retrieved hits are good enough to answer without the web: any
+    hit reaching the threshold of the scale its score is on.
+    """
+    from django.conf import settings
+
+    thresholds = {"vector": settings.RAG_CONFIDENT_SCORE, "lexical": settings.RAG_CONFIDENT_LEXICAL_SCORE}
+    return any(hit.score >= thresholds.get(hit.source, math.inf) for hit in hits)
+
+
+async def hedged(call, attempts, hedge_after):
+    """
+    Await `call()`, starting another attempt whenever those in flight have
+    gone `hedge_after` seconds without an answer or one of them failed, up to
+    `attempts` in all. Returns the first answer and cancels the other
+    attempts; raises the last error when every attempt failed.
+    """
+    pending, launched, error = set(), 0, None
+
+    def launch():
+        nonlocal launched
+        if launched:
+            metrics.registry.inc("ravent_search_hedges_total", ())
+        launched += 1
+        pending.add(asyncio.ensure_future(call()))
+
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending, timeout=hedge_after if launched < attempts else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if launched < attempts:
+                launch()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def web_search(tool, query, k):
+    """
+    Search results as Hits (the URL in place of a filename), or [] when the
+    search failed or missed its deadline.
+    """
+    from django.conf import settings
+
+    with metrics.span("web_search"):
+        try:
+            results = await asyncio.wait_for(
+                hedged(lambda: tool.search(query, k), settings.RAG_SEARCH_ATTEMPTS, settings.RAG_SEARCH_HEDGE_AFTER),
+                settings.RAG_SEARCH_DEADLINE,
+            )
+        except asyncio.CancelledError:
+            metrics.registry.inc("ravent_search_requests_total", ("cancelled",))
+            raise
+        except asyncio.TimeoutError:
+            logger.warning("Web search for %r missed its %.1f s deadline", query, settings.RAG_SEARCH_DEADLINE)
+            metrics.registry.inc("ravent_search_requests_total", ("timeout",))
+            return []
+        except Exception:
+            logger.warning("Web search for %r failed", query, exc_info=True)
+            metrics.registry.inc("ravent_search_requests_total", ("error",))
+            return []
+    metrics.registry.inc("ravent_search_requests_total", ("ok",))
+    return [
+        retrieval.Hit(0, rank, result.url, f"{result.title}\n{result.snippet}", 0.0)
+        for rank, result in enumerate(results)
+    ]
+
+
+async def gather_evidence(owner_id, query, k=None, tool=None):
+    """
+    Race retrieval against `tool` (by default the configured search tool);
+    see the module docstring.
+    """
+    from django.conf import settings
+
+    k = k or settings.RAG_TOP_K
+    tool = tool or get_search_tool()
+    if tool is None:
+        return Evidence(RAG_TYPE, await retrieval.aretrieve(owner_id, query, k))
+
+    search = asyncio.ensure_future(web_search(tool, query, k))
+    try:
+        try:
+            hits = await asyncio.wait_for(retrieval.aretrieve(owner_id, query, k), settings.RAG_RETRIEVAL_DEADLINE)
+        except asyncio.TimeoutError:
+            logger.warning("Retrieval for owner %s missed its %.1f s deadline", owner_id, settings.RAG_RETRIEVAL_DEADLINE)
+            hits = []
+        if confident(hits):
+            evidence = Evidence(RAG_TYPE, hits)
+        else:
+            web_hits = await search
+            evidence = Evidence(WEB_TYPE, web_hits) if web_hits else Evidence(RAG_TYPE, hits)
+    finally:
+        search.cancel()
+    metrics.registry.inc("ravent_chat_evidence_total", ("web" if evidence.type == WEB_TYPE else "rag",))
+    return evidence
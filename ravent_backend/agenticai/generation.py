@@ -0,0 +1,149 @@
+# agenticai/generation.py
+"""
+Answer generators. Each generator streams answer tokens for a query and its
+retrieved chunks; `complete` returns the whole answer for non-streaming callers.
+`history` is the rendered conversation so far (agenticai/memory.py), empty for
+a standalone question. The active generator is chosen with settings.RAG_GENERATOR.
+"""
+
+import asyncio
+import re
+
+from asgiref.sync import async_to_sync
+from django.utils.module_loading import import_string
+
+# Same instructions as LangChain's "stuff" RetrievalQA chain used in the notebooks.
+PROMPT_TEMPLATE = (
+    "Use the following pieces of context to answer the question at the end. "
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n\n"
+    "{context}\n\n"
+    "Question: {question}\n"
+    "Helpful Answer:"
+)
+
+_token_pattern = re.compile(r"\S+\s*|\s+")
+
+
+def build_prompt(query, hits, history=""):
+    prompt = PROMPT_TEMPLATE.format(
+        context="\n\n".join(hit.text for hit in hits),
+        question=query,
+    )
+    return f"Conversation so far:\n{history}\n\n{prompt}" if history else prompt
+
+
+class Generator:
+    """
+    Base class for answer generators.
+    """
+
+    async def stream(self, query, hits, history=""):
+        """
+        Asynchronously yield answer tokens.
+        """
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    def complete(self, query, hits, history=""):
+        async def collect():
+            return "".join([token async for token in self.stream(query, hits, history)])
+        return async_to_sync(collect)()
+
+
+class ExtractiveGenerator(Generator):
+    """
+    Answers with the retrieved passages themselves, word by word. Needs no model.
+    """
+
+    def answer_text(self, hits):
+        return "\n\n".join(hit.text for hit in hits)
+
+    async def stream(self, query, hits, history=""):
+        for position, token in enumerate(_token_pattern.findall(self.answer_text(hits))):
+            if position % 64 == 0:
+                await asyncio.sleep(0)
+            yield token
+
+    def complete(self, query, hits, history=""):
+        return self.answer_text(hits)
+
+
+class FakeTokenGenerator(Generator):
+    """
+    Emits `count` numbered tokens `delay` seconds apart. Used to exercise
+    streaming, time-to-first-byte and cancellation without a model.
+    """
+
+    def __init__(self, count=20, delay=0.05):
+        self.count = count
+        self.delay = delay
+        self.emitted = 0
+
+    async def stream(self, query, hits, history=""):
+        for position in range(self.count):
+            await asyncio.sleep(self.delay)
+            self.emitted += 1
+            yield f"token{position} "
+
+
+class OpenAIChatGenerator(Generator):
+    """
+    Streams a grounded answer from an OpenAI chat model.
+    """
+
+    def __init__(self, model="gpt-4o-mini", temperature=0, timeout=60.0):
+        self.model = model
+        self.temperature = temperature
+        # Deadline of the generation stage, per request to the API.
+        self.timeout = timeout
+
+    def _messages(self, query, hits, history):
+        messages = [{"role": "user", "content": build_prompt(query, hits)}]
+        if history:
+            messages.insert(0, {"role": "system", "content": f"The conversation so far:\n{history}"})
+        return messages
+
+    async def stream(self, query, hits, history=""):
+        from openai import AsyncOpenAI
+
+        client = AsyncOpenAI(timeout=self.timeout)
+        response = await client.chat.completions.create(
+            model=self.model,
+            temperature=self.temperature,
+            messages=self._messages(query, hits, history),
+            stream=True,
+        )
+        try:
+            async for event in response:
+                if event.choices and event.choices[0].delta.content:
+                    yield event.choices[0].delta.content
+        finally:
+            # Closing the response stops generation when the client goes away.
+            await response.close()
+
+    def complete(self, query, hits, history=""):
+        from openai import OpenAI
+
+        response = OpenAI(timeout=self.timeout).chat.completions.create(
+            model=self.model,
+            temperature=self.temperature,
+            messages=self._messages(query, hits, history),
+        )
+        return response.choices[0].message.content or ""
+
+
+_generators = {}
+
+
+def get_generator():
+    """
+    Return the process-wide generator configured by settings.RAG_GENERATOR.
+    """
+    from django.conf import settings
+
+    generator = _generators.get(settings.RAG_GENERATOR)
+    if generator is None:
+        generator = _generators[settings.RAG_GENERATOR] = import_string(settings.RAG_GENERATOR)(
+            **settings.RAG_GENERATOR_OPTIONS
+        )
+    return generator
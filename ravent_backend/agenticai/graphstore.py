@@ -0,0 +1,323 @@
+# agenticai/graphstore.py
+"""
+Graph-RAG storage: an entity-relation graph over document chunks, kept as
+memory-mapped arrays and indexed key-value files (agenticai/kvstore.py),
+replacing LightRAG's JSON and GraphML files, which were parsed and rewritten
+whole on every load or update.
+
+A store is a directory holding:
+
+- entities.kv, relations.kv, chunks.kv, full_docs.kv, doc_status.kv: records
+  by entity name, relation id, chunk id and document id;
+- adjacency_*.npy: the undirected relation graph in CSR form. The neighbours
+  of entity i are neighbours[indptr[i]:indptr[i + 1]], heaviest edge first,
+  with each edge's relation id and weight alongside;
+- entity_chunks_*.npy and chunk_entities_*.npy: which chunks mention which
+  entities, and the reverse, also in CSR form;
+- entity_names.npy and chunk_keys.npy (UTF-8 buffers with offsets): id to key;
+- vectors.npy: the L2-normalised chunk embeddings, one row per chunk.
+
+Opening a store maps the arrays and opens the key-value files; nothing is
+parsed. Expanding a neighbourhood reads only the CSR rows of the entities it
+visits, at most `fanout` heaviest edges each and at most `max_nodes` entities
+per hop, so its cost is bounded by the query, not by the size of the graph.
+Records are read only for what a query returns.
+
+Documents, chunks and their statuses are appended or updated in place through
+their key-value files. The graph and the vectors are written whole by `build`
+(used by `manage.py import_lightrag`).
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from .kvstore import KVStore, write_store
+from .shards import ChunkTexts
+
+FORMAT = 1
+KV_STORES = ("entities", "relations", "chunks", "full_docs", "doc_status")
+# Chunk rows scored per step of a vector search.
+SEARCH_ROWS = 8192
+
+
+class GraphContext(NamedTuple):
+    entities: list  # entity records, each with "name" and "hops" from the query's chunks
+    relations: list  # relation records among those entities, heaviest first
+    chunks: list  # chunk records with "id", vector hits first
+
+
+class GraphStore:
+    def __init__(self, root):
+        self.root = root = Path(root)
+        meta = json.loads((root / "meta.json").read_text())
+        if meta.get("format") != FORMAT:
+            raise ValueError(f"{root} holds graph store format {meta.get('format')}, not {FORMAT}.")
+        self.meta = meta
+
+        def load(name):
+            return np.load(root / f"{name}.npy", mmap_mode="r")
+
+        self.indptr, self.neighbours = load("adjacency_indptr"), load("adjacency_neighbours")
+        self.edge_ids, self.weights = load("adjacency_relations"), load("adjacency_weights")
+        self.entity_chunks = load("entity_chunks_indptr"), load("entity_chunks_indices")
+        self.chunk_entities = load("chunk_entities_indptr"), load("chunk_entities_indices")
+        self.entity_names = ChunkTexts(buffer=load("entity_names"), offsets=load("entity_name_offsets"))
+        self.chunk_keys = ChunkTexts(buffer=load("chunk_keys"), offsets=load("chunk_key_offsets"))
+        self.vectors = load("vectors")
+        self.entities, self.relations, self.chunks, self.full_docs, self.doc_status = (
+            KVStore(root / f"{name}.kv") for name in KV_STORES
+        )
+
+    def close(self):
+        for store in (self.entities, self.relations, self.chunks, self.full_docs, self.doc_status):
+            store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def entity_count(self):
+        return len(self.indptr) - 1
+
+    @property
+    def chunk_count(self):
+        return len(self.vectors)
+
+    def entity_id(self, name):
+        record = self.entities.get(name)
+        return None if record is None else record["id"]
+
+    def expand(self, seeds, hops=2, fanout=16, max_nodes=1000):
+        """
+        Entities within `hops` relations of the seed entity ids, following at
+        most `fanout` heaviest edges out of each entity and keeping at most
+        `max_nodes` new entities per hop. Returns (ids, hop counts), seeds first.
+        """
+        frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+        ids, distances = [frontier], [np.zeros(len(frontier), dtype=np.int8)]
+        visited = frontier
+        for hop in range(1, hops + 1):
+            if not len(frontier):
+                break
+            slots = _slots(self.indptr, frontier, fanout)
+            reached, weights = np.asarray(self.neighbours[slots], dtype=np.int64), self.weights[slots]
+            fresh = ~np.isin(reached, visited)
+            reached, weights = reached[fresh], weights[fresh]
+            reached, inverse = np.unique(reached, return_inverse=True)
+            if len(reached) > max_nodes:
+                # Keep the entities with the most total edge weight from the frontier.
+                totals = np.bincount(inverse, weights=weights)
+                reached = np.sort(reached[np.argpartition(-totals, max_nodes - 1)[:max_nodes]])
+            ids.append(reached)
+            distances.append(np.full(len(reached), hop, dtype=np.int8))
+            visited = np.union1d(visited, reached)
+            frontier = reached
+        return np.concatenate(ids), np.concatenate(distances)
+
+    def relations_among(self, ids, fanout=16, limit=50):
+        """
+        Ids of the heaviest relations, among each entity's `fanout` heaviest,
+        whose two ends are both in `ids`.
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        slots = _slots(self.indptr, ids, fanout)
+        inside = np.isin(np.asarray(self.neighbours[slots], dtype=np.int64), ids)
+        relations, weights = np.asarray(self.edge_ids[slots][inside]), np.asarray(self.weights[slots][inside])
+        relations, first = np.unique(relations, return_index=True)
+        return relations[np.argsort(-weights[first], kind="stable")][:limit]
+
+    def chunks_of(self, ids, hops=None, limit=20):
+        """
+        Rows of the chunks that mention the most of the given entities
+        (closer entities count more when their hop counts are given).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        slots = _slots(self.entity_chunks[0], ids, None)
+        if not len(slots):
+            return np.zeros(0, dtype=np.int64)
+        rows = np.asarray(self.entity_chunks[1][slots], dtype=np.int64)
+        lengths = self.entity_chunks[0][ids + 1] - self.entity_chunks[0][ids]
+        weight = np.ones(len(ids)) if hops is None else 1.0 / (1.0 + np.asarray(hops, dtype=np.float64))
+        rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.repeat(weight, lengths))
+        return rows[np.argsort(-scores, kind="stable")][:limit]
+
+    def search_chunks(self, query_vector, k):
+        """
+        (rows, cosine scores) of the `k` chunks most similar to an L2-normalised query.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        scores = np.empty(self.chunk_count, dtype=np.float32)
+        for start in range(0, self.chunk_count, SEARCH_ROWS):
+            scores[start:start + SEARCH_ROWS] = self.vectors[start:start + SEARCH_ROWS] @ query_vector
+        k = min(k, len(scores))
+        rows = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+        rows = rows[np.argsort(-scores[rows])]
+        return rows, scores[rows]
+
+    def query(self, query_vector, k=5, hops=2, fanout=16, max_nodes=1000, max_entities=20, max_relations=20,
+              max_chunks=10):
+        """
+        Graph context of a query: its `k` nearest chunks, the entities they
+        mention and those within `hops` relations, the relations among the
+        closest entities, and the chunks that mention the most of them.
+        """
+        rows, _ = self.search_chunks(query_vector, k)
+        seeds = np.asarray(self.chunk_entities[1][_slots(self.chunk_entities[0], rows, None)], dtype=np.int64)
+        ids, distances = self.expand(seeds, hops, fanout, max_nodes)
+        ids, distances = ids[:max_entities], distances[:max_entities]
+        relation_ids = self.relations_among(ids, fanout, max_relations)
+        graph_rows = self.chunks_of(ids, distances, max_chunks)
+        chunk_rows = list(dict.fromkeys(rows.tolist() + graph_rows.tolist()))[:max_chunks]
+
+        entities = []
+        for entity_id, distance in zip(ids.tolist(), distances.tolist()):
+            name = self.entity_names[entity_id]
+            entities.append({**self.entities.get(name, {}), "name": name, "hops": distance})
+        relations = [self.relations.get(str(relation_id), {}) for relation_id in relation_ids.tolist()]
+        chunks = []
+        for row in chunk_rows:
+            key = self.chunk_keys[row]
+            chunks.append({**self.chunks.get(key, {}), "id": key})
+        return GraphContext(entities, relations, chunks)
+
+
+def _slots(indptr, rows, limit):
+    """
+    Positions of the first `limit` (or all) entries of the given CSR rows.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    starts = np.asarray(indptr[rows], dtype=np.int64)
+    lengths = np.asarray(indptr[rows + 1], dtype=np.int64) - starts
+    if limit is not None:
+        lengths = np.minimum(lengths, limit)
+    total = int(lengths.sum())
+    # starts[i], starts[i] + 1, ... for each row, without a Python loop.
+    return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+
+def _csr(rows, columns, count, *values):
+    """
+    indptr and the columns (and parallel values) grouped by row, in the given order within a row.
+    """
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=indptr[1:])
+    return (indptr, columns[order], *(value[order] for value in values))
+
+
+def _strings(texts):
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def build(root, entities, relations, chunks, vectors, full_docs=(), doc_status=()):
+    """
+    Write a graph store to `root`, replacing any there.
+
+    entities: (name, record) pairs; record["source_id"] lists the keys of
+    the chunks mentioning the entity. relations: (source name, target name,
+    record) triples with a numeric record["weight"]. chunks: (key, record)
+    pairs, in the order of the rows of `vectors`. full_docs, doc_status:
+    (key, record) pairs.
+    """
+    root = Path(root)
+    staging = root.with_name(f"{root.name}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    entities, chunks = list(entities), list(chunks)
+    names = [name for name, _ in entities]
+    entity_ids = {name: number for number, name in enumerate(names)}
+    chunk_rows = {key: row for row, (key, _) in enumerate(chunks)}
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+
+    sources, targets, weights, relation_records = [], [], [], []
+    for source, target, record in relations:
+        if source not in entity_ids or target not in entity_ids:
+            continue
+        sources.append(entity_ids[source])
+        targets.append(entity_ids[target])
+        weights.append(float(record.get("weight", 1.0)))
+        relation_records.append({**record, "source": source, "target": target})
+    sources, targets = np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+    weights, relation_ids = np.array(weights, dtype=np.float32), np.arange(len(sources), dtype=np.int32)
+    loops = sources == targets
+    # Both directions of each relation, once for a self-loop; heaviest first within a row.
+    rows = np.concatenate([sources, targets[~loops]])
+    columns = np.concatenate([targets, sources[~loops]])
+    slot_weights = np.concatenate([weights, weights[~loops]])
+    slot_relations = np.concatenate([relation_ids, relation_ids[~loops]])
+    order = np.lexsort((-slot_weights, rows))
+    indptr, neighbours, slot_relations, slot_weights = _csr(
+        rows[order], columns[order].astype(np.int32), len(names), slot_relations[order], slot_weights[order]
+    )
+
+    mention_entities, mention_chunks = [], []
+    for number, (_, record) in enumerate(entities):
+        for key in record.get("source_id", ()):
+            if key in chunk_rows:
+                mention_entities.append(number)
+                mention_chunks.append(chunk_rows[key])
+    mention_entities = np.array(mention_entities, dtype=np.int64)
+    mention_chunks = np.array(mention_chunks, dtype=np.int64)
+    entity_chunks = _csr(mention_entities, mention_chunks.astype(np.int32), len(names))
+    chunk_entities = _csr(mention_chunks, mention_entities.astype(np.int32), len(chunks))
+
+    arrays = {
+        "adjacency_indptr": indptr, "adjacency_neighbours": neighbours,
+        "adjacency_relations": slot_relations, "adjacency_weights": slot_weights,
+        "entity_chunks_indptr": entity_chunks[0], "entity_chunks_indices": entity_chunks[1],
+        "chunk_entities_indptr": chunk_entities[0], "chunk_entities_indices": chunk_entities[1],
+        "vectors": vectors,
+    }
+    arrays["entity_names"], arrays["entity_name_offsets"] = _strings(names)
+    arrays["chunk_keys"], arrays["chunk_key_offsets"] = _strings(key for key, _ in chunks)
+    for name, array in arrays.items():
+        np.save(staging / f"{name}.npy", array)
+
+    write_store(staging / "entities.kv", (
+        (name, {**record, "id": number}) for number, (name, record) in enumerate(entities)
+    ))
+    write_store(staging / "relations.kv", ((str(number), record) for number, record in enumerate(relation_records)))
+    write_store(staging / "chunks.kv", ((key, {**record, "row": row}) for row, (key, record) in enumerate(chunks)))
+    write_store(staging / "full_docs.kv", full_docs)
+    write_store(staging / "doc_status.kv", doc_status)
+    (staging / "meta.json").write_text(json.dumps({
+        "format": FORMAT, "entities": len(names), "relations": len(relation_records),
+        "chunks": len(chunks), "dimensions": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+    }))
+
+    previous = root.with_name(f"{root.name}.{os.getpid()}.old")
+    if root.exists():
+        os.replace(root, previous)
+    os.replace(staging, root)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+_stores = {}
+
+
+def get_graph_store():
+    """
+    The process-wide GraphStore at settings.RAG_GRAPH_ROOT, or None when
+    there is none (see `manage.py import_lightrag`).
+    """
+    from django.conf import settings
+
+    root = Path(settings.RAG_GRAPH_ROOT)
+    if root not in _stores:
+        _stores[root] = GraphStore(root) if (root / "meta.json").exists() else None
+    return _stores[root]
@@ -0,0 +1,787 @@
+# agenticai/ingestion.py
+"""
+Background ingestion of uploaded files.
+
+Each new FileUpload is queued here and handed to a pool of worker processes that
+extract, chunk and embed the document (the same steps as the BaseRAG notebook).
+The results are written to a per-file artifact under settings.RAG_STORE_ROOT and
+the job state is recorded on the FileUpload row.
+
+The worker entry point (`ingest_document`) and its helpers never touch the ORM,
+so they run unchanged in spawned processes that have not called django.setup().
+"""
+
+import atexit
+import collections
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+import time
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import NamedTuple
+from xml.etree import ElementTree
+
+import numpy as np
+
+from .chunking import TokenChunker
+from .embeddings import load_embedder
+from .lexical import LexicalSegment, build_segment
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Worker-side pipeline (runs in the process pool; no ORM access)
+# ---------------------------------------------------------------------------
+
+_worker_embedders = {}
+
+
+def iter_text(path, pool=None, page_batch=32, prefetch=4):
+    """
+    Yield the plain text of a PDF, DOCX or TXT file piece by piece (a batch
+    of PDF pages, a DOCX paragraph or a block of a TXT file), so no more than
+    one piece is held in memory. The pieces concatenate to the full text, with
+    a blank line between pages and paragraphs.
+
+    PDF page batches are extracted by `pool` (a process pool) when given,
+    at most `prefetch` batches ahead of the consumer.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        pieces = _iter_pdf(path, pool, page_batch, prefetch)
+    elif ext == ".docx":
+        pieces = _iter_docx(path)
+    elif ext == ".txt":
+        pieces = _iter_txt(path)
+    else:
+        raise ValueError(f"Unsupported file extension '{ext}'.")
+    first = True
+    for piece, separated in pieces:
+        if separated and not first:
+            yield "\n\n"
+        first = False
+        yield piece
+
+
+def extract_text(path):
+    """
+    Return the plain text of a PDF, DOCX or TXT file.
+    """
+    return "".join(iter_text(path))
+
+
+def _pdf_page_count(path):
+    from pypdf import PdfReader
+
+    # Passing an open file (not a path) keeps pypdf from reading the whole file into memory.
+    with open(path, "rb") as handle:
+        return len(PdfReader(handle).pages)
+
+
+def extract_pdf_pages(path, start, stop):
+    """
+    Return the text of pages [start, stop) of a PDF, each page's text
+    separated by a blank line. A fresh reader per batch keeps pypdf's object
+    cache from growing with the document.
+    """
+    from pypdf import PdfReader
+
+    with open(path, "rb") as handle:
+        reader = PdfReader(handle)
+        return "\n\n".join(reader.pages[number].extract_text() or "" for number in range(start, stop))
+
+
+def _iter_pdf(path, pool, page_batch, prefetch):
+    count = _pdf_page_count(path)
+    ranges = [(start, min(start + page_batch, count)) for start in range(0, count, page_batch)]
+    if pool is None:
+        for start, stop in ranges:
+            yield extract_pdf_pages(path, start, stop), True
+        return
+    pending = collections.deque()
+    try:
+        for start, stop in ranges:
+            pending.append(pool.submit(extract_pdf_pages, path, start, stop))
+            if len(pending) >= prefetch:
+                yield pending.popleft().result(), True
+        while pending:
+            yield pending.popleft().result(), True
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _iter_docx(path):
+    """
+    Stream the paragraphs of a DOCX body with iterparse, dropping each
+    top-level element once read, instead of loading the whole XML tree.
+    """
+    namespace = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+    paragraph, body = f"{namespace}p", f"{namespace}body"
+    runs = {f"{namespace}t": None, f"{namespace}tab": "\t", f"{namespace}br": "\n", f"{namespace}cr": "\n"}
+
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        stack = []
+        for event, element in ElementTree.iterparse(xml, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            if element.tag == paragraph and not any(parent.tag == paragraph for parent in stack):
+                yield "".join(
+                    (node.text or "") if runs[node.tag] is None else runs[node.tag]
+                    for node in element.iter() if node.tag in runs
+                ), True
+            if stack and stack[-1].tag == body:
+                stack[-1].remove(element)
+
+
+def _iter_txt(path, block_size=1024 * 1024):
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        while True:
+            block = handle.read(block_size)
+            if not block:
+                return
+            yield block, False
+
+
+def _timed(iterable, total):
+    """
+    Iterate `iterable`, adding the seconds spent producing items to total[0].
+    """
+    iterator = iter(iterable)
+    while True:
+        began = time.perf_counter()
+        item = next(iterator, None)
+        total[0] += time.perf_counter() - began
+        if item is None:
+            return
+        yield item
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class ChunkArtifact(NamedTuple):
+    """
+    Chunks of one document: texts, embeddings, UTF-8 byte offsets into the
+    extracted text and content hashes, all in chunk order, plus the BM25 segment.
+    """
+    texts: list
+    vectors: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    hashes: list
+    lexical: LexicalSegment
+
+
+def write_artifact(artifact_path, artifact):
+    """
+    Atomically write a ChunkArtifact to an .npz file.
+    """
+    artifact_path = Path(artifact_path)
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = artifact_path.with_name(artifact_path.name + ".tmp")
+    with open(tmp_path, "wb") as handle:
+        np.savez(
+            handle,
+            vectors=artifact.vectors,
+            texts=np.array(artifact.texts, dtype=str),
+            starts=np.asarray(artifact.starts, dtype=np.int64),
+            ends=np.asarray(artifact.ends, dtype=np.int64),
+            hashes=np.array(artifact.hashes, dtype=str),
+            **{f"lex_{field}": value for field, value in artifact.lexical._asdict().items()},
+        )
+    os.replace(tmp_path, artifact_path)
+
+
+def read_artifact(artifact_path):
+    """
+    Load a ChunkArtifact written by `write_artifact`. Fields missing from
+    older artifacts are rebuilt from the texts (offsets become -1).
+    """
+    with np.load(artifact_path) as data:
+        texts = data["texts"].tolist()
+        vectors = data["vectors"].astype(np.float32, copy=False)
+        if "hashes" in data:
+            starts, ends, hashes = data["starts"], data["ends"], data["hashes"].tolist()
+        else:
+            starts = np.full(len(texts), -1, dtype=np.int64)
+            ends, hashes = starts.copy(), [chunk_hash(text) for text in texts]
+        if "lex_vocab" in data:
+            lexical = LexicalSegment(*(data[f"lex_{field}"] for field in LexicalSegment._fields))
+        else:
+            lexical = build_segment(texts)
+    return ChunkArtifact(texts, vectors, starts, ends, hashes, lexical)
+
+
+def map_vectors(artifact_path):
+    """
+    Memory-map the float32 vectors of an artifact, read-only, without loading them.
+    """
+    return map_members(artifact_path, ["vectors"])["vectors"]
+
+
+def map_members(archive_path, names=None):
+    """
+    Memory-map arrays of an .npz file, read-only: np.savez stores members
+    uncompressed, so the .npy data of each "<name>.npy" sits at a fixed offset
+    in the file. Returns {name: array} for `names` (default: every member);
+    compressed members are loaded instead.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        infos = {info.filename[:-4]: info for info in archive.infolist() if info.filename.endswith(".npy")}
+    arrays = {}
+    with open(archive_path, "rb") as handle:
+        for name in infos if names is None else names:
+            info = infos[name]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with np.load(archive_path) as data:
+                    arrays[name] = data[name]
+                continue
+            handle.seek(info.header_offset)
+            local_header = handle.read(30)
+            name_length = int.from_bytes(local_header[26:28], "little")
+            extra_length = int.from_bytes(local_header[28:30], "little")
+            handle.seek(info.header_offset + 30 + name_length + extra_length)
+            if np.lib.format.read_magic(handle) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(handle)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(handle)
+            if not shape or not shape[0]:
+                arrays[name] = np.zeros(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(archive_path, dtype=dtype, mode="r", offset=handle.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+def build_manifest(artifact, key):
+    """
+    Per-file chunk manifest stored on FileUpload.chunk_manifest: chunk ids,
+    [start, end) UTF-8 byte offsets into the extracted text, and content hashes.
+    """
+    return {
+        "ids": [f"{key}:{position}" for position in range(len(artifact.texts))],
+        "offsets": [[int(start), int(end)] for start, end in zip(artifact.starts, artifact.ends)],
+        "hashes": list(artifact.hashes),
+    }
+
+
+def _previous_vectors(artifact_path):
+    """
+    Content hash -> row of a previous artifact, and its memory-mapped vectors.
+    """
+    if not artifact_path or not os.path.exists(artifact_path):
+        return {}, None
+    with np.load(artifact_path) as data:
+        if "hashes" in data:
+            hashes = data["hashes"].tolist()
+        else:
+            hashes = [chunk_hash(text) for text in data["texts"].tolist()]
+    return {digest: row for row, digest in enumerate(hashes)}, map_vectors(artifact_path)
+
+
+def _embed_batch(texts, hashes, known, previous_vectors, embedder_path, embedder_options):
+    """
+    Vectors for one batch of chunks: reused from the previous artifact by hash,
+    embedded otherwise. Returns (vectors, number of chunks embedded).
+    """
+    missing = [row for row, digest in enumerate(hashes) if digest not in known]
+    if not missing:
+        return np.asarray(previous_vectors[[known[digest] for digest in hashes]], dtype=np.float32), 0
+    embedder = _worker_embedders.get(embedder_path)
+    if embedder is None:
+        embedder = _worker_embedders[embedder_path] = load_embedder(embedder_path, embedder_options)
+    fresh = embedder.embed_documents([texts[row] for row in missing])
+    vectors = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+    vectors[missing] = fresh
+    for row, digest in enumerate(hashes):
+        if digest in known:
+            vectors[row] = previous_vectors[known[digest]]
+    return vectors, len(missing)
+
+
+def ingest_document(path, artifact_path, chunk_tokens, chunk_overlap_tokens, embedder_path, embedder_options=None,
+                    previous_artifact_path=None, extraction_workers=0, page_batch=32, parallel_min_bytes=0,
+                    chunk_encoding="cl100k_base", batch_size=256):
+    """
+    Extract, chunk and embed one document, build its BM25 segment and write its artifact.
+
+    Text is streamed from the file into the chunker (agenticai/chunking.py),
+    which cuts chunks of at most `chunk_tokens` tokens of `chunk_encoding`. PDFs of
+    at least `parallel_min_bytes` are extracted `page_batch` pages at a time by a
+    pool of `extraction_workers` processes.
+
+    Chunks are embedded `batch_size` at a time as the chunker produces them and
+    their vectors appended to a scratch file next to the artifact, so a large
+    document is never embedded in one call nor its vectors held in memory; only
+    the chunk texts, offsets and hashes are kept until the artifact is written.
+
+    When `previous_artifact_path` points at the artifact of the content this
+    document replaces, chunks whose hash is unchanged reuse their old vectors
+    and only new or edited chunks are embedded.
+
+    Returns the chunk count, the chunk manifest and per-stage timings in milliseconds.
+    """
+    started = time.perf_counter()
+    artifact_path = Path(artifact_path)
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    vectors_path = artifact_path.with_name(artifact_path.name + ".vectors.tmp")
+    known, previous_vectors = _previous_vectors(previous_artifact_path)
+    dimensions = previous_vectors.shape[1] if previous_vectors is not None else 0
+    texts, hashes, starts, ends = [], [], array("q"), array("q")
+    embedded_chunks = 0
+    extract_seconds, embed_seconds = [0.0], 0.0
+
+    pool = None
+    if extraction_workers and path.lower().endswith(".pdf") and os.path.getsize(path) >= parallel_min_bytes:
+        pool = ProcessPoolExecutor(max_workers=extraction_workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        with open(vectors_path, "wb") as vectors_file:
+            pieces = _timed(iter_text(path, pool, page_batch, prefetch=2 * extraction_workers), extract_seconds)
+            chunks = TokenChunker(chunk_tokens, chunk_overlap_tokens, encoding=chunk_encoding).split(pieces)
+            for batch in iter(lambda: list(itertools.islice(chunks, batch_size)), []):
+                began = time.perf_counter()
+                batch_texts = [chunk for _, _, chunk in batch]
+                batch_hashes = [chunk_hash(chunk) for chunk in batch_texts]
+                vectors, embedded = _embed_batch(batch_texts, batch_hashes, known, previous_vectors,
+                                                 embedder_path, embedder_options)
+                if texts and vectors.shape[1] != dimensions:
+                    raise ValueError(f"Embedding size changed from {dimensions} to {vectors.shape[1]} mid-document")
+                dimensions = vectors.shape[1]
+                vectors_file.write(vectors.tobytes())
+                embed_seconds += time.perf_counter() - began
+                embedded_chunks += embedded
+                texts.extend(batch_texts)
+                hashes.extend(batch_hashes)
+                starts.extend(start for start, _, _ in batch)
+                ends.extend(end for _, end, _ in batch)
+        chunked = time.perf_counter()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+            pool = None
+
+        if texts:
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(len(texts), dimensions))
+        else:
+            vectors = np.empty((0, dimensions), dtype=np.float32)
+        artifact = ChunkArtifact(
+            texts=texts,
+            vectors=vectors,
+            starts=np.frombuffer(starts, dtype=np.int64),
+            ends=np.frombuffer(ends, dtype=np.int64),
+            hashes=hashes,
+            lexical=build_segment(texts),
+        )
+        write_artifact(artifact_path, artifact)
+        manifest = build_manifest(artifact, artifact_path.stem)
+        del vectors, artifact
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        _unlink(vectors_path)
+    finished = time.perf_counter()
+
+    return {
+        "chunk_count": len(texts),
+        "manifest": manifest,
+        "timings": {
+            "extract_ms": round(extract_seconds[0] * 1000, 2),
+            "chunk_ms": round((chunked - started - extract_seconds[0] - embed_seconds) * 1000, 2),
+            "embed_ms": round(embed_seconds * 1000, 2),
+            "write_ms": round((finished - chunked) * 1000, 2),
+            "total_ms": round((finished - started) * 1000, 2),
+            "embedded_chunks": embedded_chunks,
+            "reused_chunks": len(texts) - embedded_chunks,
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Web-process side: job queue, dispatcher and status bookkeeping
+# ---------------------------------------------------------------------------
+
+def artifact_name(key):
+    """
+    Path of a chunk artifact relative to settings.RAG_STORE_ROOT.
+    """
+    return f"chunks/{key}.npz"
+
+
+def artifact_path_for(upload):
+    """
+    Artifacts are keyed by blob digest so identical uploads share one; uploads
+    stored before content addressing fall back to their primary key.
+    """
+    from django.conf import settings
+    key = upload.blob.sha256 if upload.blob_id else upload.pk
+    return Path(settings.RAG_STORE_ROOT) / artifact_name(key)
+
+
+def _unlink(path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def previous_artifact_path_for(upload):
+    from django.conf import settings
+    return Path(settings.RAG_STORE_ROOT) / "chunks" / "previous" / f"{upload.pk}.npz"
+
+
+def stash_previous_artifact(upload):
+    """
+    Keep the current artifact of an upload that is about to be replaced, so the
+    next ingestion can reuse the vectors of unchanged chunks. Must be called
+    before the old blob is released.
+    """
+    source = artifact_path_for(upload)
+    if not source.exists():
+        return
+    target = previous_artifact_path_for(upload)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    _unlink(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _job_arguments(upload):
+    from django.conf import settings
+    previous = previous_artifact_path_for(upload)
+    return (
+        upload.file.path,
+        str(artifact_path_for(upload)),
+        settings.RAG_CHUNK_TOKENS,
+        settings.RAG_CHUNK_OVERLAP_TOKENS,
+        settings.RAG_EMBEDDER,
+        settings.RAG_EMBEDDER_OPTIONS,
+        str(previous) if previous.exists() else None,
+        settings.RAG_EXTRACTION_WORKERS,
+        settings.RAG_EXTRACTION_PAGE_BATCH,
+        settings.RAG_EXTRACTION_PARALLEL_MIN_BYTES,
+        settings.RAG_CHUNK_ENCODING,
+        settings.RAG_INGESTION_BATCH_CHUNKS,
+    )
+
+
+def _start_job(upload_id):
+    """
+    Move a queued upload to PROCESSING; returns the instance, or None if it is
+    gone or its content was already indexed for another upload.
+    """
+    from django.utils import timezone
+    from .models import FileUpload
+
+    claimed = FileUpload.objects.filter(
+        pk=upload_id, status=FileUpload.Status.QUEUED
+    ).update(status=FileUpload.Status.PROCESSING, ingest_started_at=timezone.now(), updated_at=timezone.now())
+    if not claimed:
+        return None
+    upload = FileUpload.objects.select_related("blob").get(pk=upload_id)
+    if _reuse_indexed_blob(upload):
+        return None
+    return upload
+
+
+def _reuse_indexed_blob(upload):
+    """
+    Mark an upload INDEXED straight away when another upload with the same
+    content already produced the artifact.
+    """
+    from .models import FileUpload
+
+    if not upload.blob_id or not artifact_path_for(upload).exists():
+        return False
+    sibling = FileUpload.objects.filter(
+        blob_id=upload.blob_id, status=FileUpload.Status.INDEXED
+    ).exclude(pk=upload.pk).values("chunk_count", "chunk_manifest").first()
+    if sibling is None:
+        return False
+    _finish_job(upload, result={
+        "chunk_count": sibling["chunk_count"],
+        "manifest": sibling["chunk_manifest"],
+        "timings": {"deduplicated": True},
+    })
+    return True
+
+
+def _finish_job(upload, result=None, error=None):
+    from django.utils import timezone
+    from .cache import bump_docset_version
+    from .models import FileUpload
+
+    now = timezone.now()
+    if error is not None:
+        logger.warning("Ingestion of FileUpload %s failed: %s", upload.pk, error)
+        FileUpload.objects.filter(pk=upload.pk).update(
+            status=FileUpload.Status.FAILED,
+            error=str(error)[:2000],
+            indexed_at=None,
+            updated_at=now,
+        )
+        return
+    timings = dict(result["timings"])
+    timings["queue_ms"] = round((upload.ingest_started_at - upload.uploaded_at).total_seconds() * 1000, 2)
+    FileUpload.objects.filter(pk=upload.pk).update(
+        status=FileUpload.Status.INDEXED,
+        chunk_count=result["chunk_count"],
+        chunk_manifest=result["manifest"],
+        timings=timings,
+        error="",
+        indexed_at=now,
+        updated_at=now,
+    )
+    _unlink(previous_artifact_path_for(upload))
+    # Newly searchable chunks can change answers computed while this file was queued.
+    bump_docset_version(upload.owner_id)
+
+
+def run_job(upload_id):
+    """
+    Ingest one upload synchronously in the current process.
+    """
+    upload = _start_job(upload_id)
+    if upload is None:
+        return
+    try:
+        result = ingest_document(*_job_arguments(upload))
+    except Exception as exc:
+        _finish_job(upload, error=exc)
+    else:
+        _finish_job(upload, result=result)
+
+
+class IngestionQueue:
+    """
+    FIFO job queue drained by a dispatcher thread into a process pool.
+    At most two jobs per worker are in flight so the pool's own queue stays short.
+
+    A worker that dies (e.g. killed for running out of memory on a large PDF)
+    breaks the whole ProcessPoolExecutor. The pool is then replaced, and the
+    jobs that were in flight are queued again, up to `max_attempts` runs each,
+    so a file that keeps killing its worker ends up FAILED instead of taking
+    every later upload down with it.
+
+    On start the queue first picks up uploads left behind by processes that
+    stopped: every QUEUED upload, and PROCESSING ones that started more than
+    RAG_INGESTION_STALE_AFTER seconds ago (see `recover_stale`).
+    """
+    max_attempts = 2
+
+    def __init__(self, workers, job=ingest_document):
+        self.workers = workers
+        self.job = job
+        self._jobs = queue.Queue()
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool()
+        self._attempts = collections.Counter()
+        self._jobs.put(_RECOVER)
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="ingestion-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _replace_pool(self, broken):
+        """
+        Swap in a fresh pool for `broken`, unless another thread already did.
+        """
+        with self._pool_lock:
+            if self._pool is broken:
+                logger.warning("Ingestion worker pool broke; starting a new one")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._new_pool()
+            return self._pool
+
+    def submit(self, upload_id):
+        self._jobs.put(upload_id)
+
+    def submit_many(self, upload_ids):
+        for upload_id in upload_ids:
+            self._jobs.put(upload_id)
+
+    def shutdown(self):
+        self._jobs.put(None)
+        with self._pool_lock:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _dispatch(self):
+        from django.db import close_old_connections
+
+        while True:
+            upload_id = self._jobs.get()
+            if upload_id is None:
+                return
+            if upload_id is _RECOVER:
+                try:
+                    self.submit_many(recover_stale())
+                except Exception:
+                    logger.exception("Could not recover pending ingestion jobs")
+                finally:
+                    close_old_connections()
+                continue
+            self._slots.acquire()
+            upload = None
+            try:
+                upload = _start_job(upload_id)
+                if upload is None:
+                    self._slots.release()
+                    continue
+                arguments = _job_arguments(upload)
+                pool = self._pool
+                try:
+                    future = pool.submit(self.job, *arguments)
+                except BrokenProcessPool:
+                    pool = self._replace_pool(pool)
+                    future = pool.submit(self.job, *arguments)
+            except Exception as exc:
+                logger.exception("Could not dispatch ingestion of FileUpload %s", upload_id)
+                if upload is not None:
+                    _finish_job(upload, error=exc)
+                self._slots.release()
+                continue
+            finally:
+                close_old_connections()
+            self._attempts[upload.pk] += 1
+            future.add_done_callback(lambda f, upload=upload, pool=pool: self._complete(upload, pool, f))
+
+    def _complete(self, upload, pool, future):
+        from django.db import close_old_connections
+
+        try:
+            if future.cancelled():
+                return
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                self._replace_pool(pool)
+                if self._attempts[upload.pk] < self.max_attempts and _requeue(upload):
+                    self._jobs.put(upload.pk)
+                    return
+                error = RuntimeError("The ingestion worker process died while processing this file.")
+            self._attempts.pop(upload.pk, None)
+            if error is not None:
+                _finish_job(upload, error=error)
+            else:
+                _finish_job(upload, result=future.result())
+        except Exception:
+            logger.exception("Could not record ingestion result of FileUpload %s", upload.pk)
+        finally:
+            close_old_connections()
+            self._slots.release()
+
+
+# Queued first by every IngestionQueue: pick up jobs left behind by stopped processes.
+_RECOVER = object()
+
+
+def _requeue(upload):
+    """
+    Put a PROCESSING upload back to QUEUED; returns whether it still was PROCESSING.
+    """
+    from django.utils import timezone
+    from .models import FileUpload
+
+    return bool(FileUpload.objects.filter(pk=upload.pk, status=FileUpload.Status.PROCESSING).update(
+        status=FileUpload.Status.QUEUED, ingest_started_at=None, updated_at=timezone.now()
+    ))
+
+
+def recover_stale():
+    """
+    Return the ids of uploads waiting for ingestion that no running process
+    holds in memory: every QUEUED upload, plus PROCESSING uploads that started
+    more than settings.RAG_INGESTION_STALE_AFTER seconds ago, which are put
+    back to QUEUED. Claiming a job is atomic (see `_start_job`), so several
+    processes recovering the same uploads still ingest each of them once.
+    """
+    from datetime import timedelta
+    from django.conf import settings
+    from django.utils import timezone
+    from .models import FileUpload
+
+    now = timezone.now()
+    FileUpload.objects.filter(
+        status=FileUpload.Status.PROCESSING,
+        ingest_started_at__lt=now - timedelta(seconds=settings.RAG_INGESTION_STALE_AFTER),
+    ).update(status=FileUpload.Status.QUEUED, ingest_started_at=None, updated_at=now)
+    return list(
+        FileUpload.objects.filter(status=FileUpload.Status.QUEUED).order_by("uploaded_at", "id")
+        .values_list("pk", flat=True)
+    )
+
+
+_queue = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """
+    Return the process-wide IngestionQueue, starting it on first use. A
+    process forked from one that had a queue (e.g. a preloading server's
+    workers) starts its own, as threads do not survive the fork.
+    """
+    global _queue, _queue_pid
+    from django.conf import settings
+
+    with _queue_lock:
+        if _queue is None or _queue_pid != os.getpid():
+            _queue, _queue_pid = IngestionQueue(settings.RAG_INGESTION_WORKERS), os.getpid()
+            atexit.register(_queue.shutdown)
+        return _queue
+
+
+def start():
+    """
+    Start this server process's ingestion queue right away rather than on the
+    first upload, so uploads left waiting by stopped processes are picked up
+    (see IngestionQueue). Called from the WSGI and ASGI entry points; does
+    nothing with RAG_INGESTION_WORKERS = 0.
+    """
+    from django.conf import settings
+
+    if settings.RAG_INGESTION_WORKERS > 0:
+        get_queue()
+
+
+def enqueue(upload_id):
+    """
+    Schedule ingestion of a FileUpload. With RAG_INGESTION_WORKERS = 0 the job
+    runs inline, which is what tests and management commands usually want.
+    """
+    from django.conf import settings
+
+    if settings.RAG_INGESTION_WORKERS <= 0:
+        run_job(upload_id)
+    else:
+        get_queue().submit(upload_id)
+
+
+def enqueue_many(upload_ids):
+    """
+    Schedule ingestion of several FileUploads at once, e.g. after a bulk upload.
+    """
+    from django.conf import settings
+
+    if settings.RAG_INGESTION_WORKERS <= 0:
+        for upload_id in upload_ids:
+            run_job(upload_id)
+    else:
+        get_queue().submit_many(upload_ids)
@@ -0,0 +1,287 @@
+# agenticai/kvstore.py
+"""
+Indexed key-value file for JSON records: point reads and appends without
+loading or rewriting the whole store.
+
+A store is two files:
+
+- <name>.kv: append-only records, each `key length, value length, CRC32`
+  followed by the UTF-8 key and the JSON value. Writing a key again appends
+  a newer version; deleting appends a tombstone.
+- <name>.kvi: the index, a header (magic, length of the data file it covers,
+  number of keys) then the keys' 64-bit hashes in sorted order and their
+  records' offsets. It is memory-mapped, so a lookup is a binary search
+  touching a few pages and one pread of the record.
+
+Records appended after the index was written are found by scanning the data
+file from the covered length on open and kept in a small in-memory table; the
+index is rewritten once that table holds INDEX_EVERY keys, so opening stays
+cheap however large the store. A torn record at the end of the file (a crash
+mid-append) fails its checksum and is truncated. `compact` drops superseded
+versions and tombstones. One process writes a store at a time.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"RVKV\x00\x00\x00\x01"
+HEADER = struct.Struct("<IIII")  # key length, value length, CRC32 of key + value, reserved
+INDEX_HEADER = struct.Struct("<8sQQ")  # magic, covered data length, keys
+TOMBSTONE = 0xFFFFFFFF
+# Keys appended since the index was written before it is rewritten.
+INDEX_EVERY = 4096
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class KVStore:
+    def __init__(self, path, index_every=INDEX_EVERY):
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix(".kvi")
+        self.index_every = index_every
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._load_index()
+        self._recover_tail()
+
+    def close(self):
+        # Idempotent: closing the descriptor twice could close another file that reused it.
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _load_index(self):
+        self._hashes, self._offsets, self._covered = np.zeros(0, "<u8"), np.zeros(0, "<u8"), 0
+        try:
+            with open(self.index_path, "rb") as handle:
+                magic, covered, count = INDEX_HEADER.unpack(handle.read(INDEX_HEADER.size))
+        except (FileNotFoundError, struct.error):
+            return
+        expected = INDEX_HEADER.size + 16 * count
+        if magic != MAGIC or covered > os.fstat(self._fd).st_size or os.path.getsize(self.index_path) != expected:
+            return
+        if count:
+            self._hashes = np.memmap(self.index_path, dtype="<u8", mode="r", offset=INDEX_HEADER.size, shape=(count,))
+            self._offsets = np.memmap(self.index_path, dtype="<u8", mode="r",
+                                      offset=INDEX_HEADER.size + 8 * count, shape=(count,))
+        self._covered = covered
+
+    def _recover_tail(self):
+        """
+        Index the records appended after the covered part of the data file.
+        """
+        self._tail = {}
+        size, offset = os.fstat(self._fd).st_size, self._covered
+        while offset < size:
+            record = self._read(offset, size - offset)
+            if record is None:
+                # Torn or corrupt append: drop it and everything after it.
+                os.ftruncate(self._fd, offset)
+                break
+            self._tail[record[0]] = offset
+            offset += record[2]
+        self._end = offset
+
+    def _read(self, offset, available=None):
+        """
+        (key, value bytes or None for a tombstone, record length) at `offset`,
+        or None when the record there is incomplete or fails its checksum.
+        """
+        header = os.pread(self._fd, HEADER.size, offset)
+        if len(header) < HEADER.size:
+            return None
+        key_length, value_length, checksum, _ = HEADER.unpack(header)
+        body_length = key_length + (0 if value_length == TOMBSTONE else value_length)
+        if available is not None and HEADER.size + body_length > available:
+            return None
+        body = os.pread(self._fd, body_length, offset + HEADER.size)
+        if len(body) < body_length or zlib.crc32(body) != checksum:
+            return None
+        value = None if value_length == TOMBSTONE else body[key_length:]
+        return body[:key_length], value, HEADER.size + body_length
+
+    def _lookup(self, key):
+        """
+        The latest record of `key` as returned by `_read`, or None.
+        """
+        offset = self._tail.get(key)
+        if offset is not None:
+            return self._read(offset)
+        wanted = key_hash(key)
+        hashes, offsets = self._hashes, self._offsets
+        position = int(np.searchsorted(hashes, np.uint64(wanted)))
+        while position < len(hashes) and int(hashes[position]) == wanted:
+            record = self._read(int(offsets[position]))
+            if record is not None and record[0] == key:
+                return record
+            position += 1
+        return None
+
+    def get(self, key, default=None):
+        """
+        The latest value stored under `key`, or `default`.
+        """
+        record = self._lookup(key.encode("utf-8"))
+        if record is None or record[1] is None:
+            return default
+        return json.loads(record[1])
+
+    def get_many(self, keys):
+        """
+        {key: value} for the keys that are present.
+        """
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def delete(self, key):
+        self.put_many([(key, None)])
+
+    def put_many(self, items):
+        """
+        Append (key, value) records in one write; a value of None deletes the key.
+        """
+        chunks = []
+        for key, value in items:
+            key = key.encode("utf-8")
+            body = key if value is None else key + json.dumps(value, ensure_ascii=False).encode("utf-8")
+            value_length = TOMBSTONE if value is None else len(body) - len(key)
+            chunks.append((key, HEADER.pack(len(key), value_length, zlib.crc32(body), 0) + body))
+        if not chunks:
+            return
+        with self._lock:
+            offset = self._end
+            os.pwrite(self._fd, b"".join(record for _, record in chunks), offset)
+            for key, record in chunks:
+                self._tail[key] = offset
+                offset += len(record)
+            self._end = offset
+            if len(self._tail) >= self.index_every:
+                self._write_index()
+
+    def flush(self):
+        """
+        Make appended records durable and index them.
+        """
+        with self._lock:
+            os.fsync(self._fd)
+            if self._tail:
+                self._write_index()
+
+    def _live(self):
+        """
+        (hashes, offsets) of the latest record of every key, tombstones included.
+        """
+        keep = np.ones(len(self._hashes), dtype=bool)
+        if self._tail:
+            tail_hashes = np.fromiter((key_hash(key) for key in self._tail), dtype="<u8", count=len(self._tail))
+            for position in np.flatnonzero(np.isin(self._hashes, tail_hashes)).tolist():
+                record = self._read(int(self._offsets[position]))
+                if record is not None and record[0] in self._tail:
+                    keep[position] = False
+        else:
+            tail_hashes = np.zeros(0, "<u8")
+        hashes = np.concatenate([self._hashes[keep], tail_hashes])
+        offsets = np.concatenate([self._offsets[keep], np.fromiter(self._tail.values(), dtype="<u8")])
+        return hashes, offsets
+
+    def _save_index(self, hashes, offsets):
+        order = np.argsort(hashes, kind="stable")
+        temporary = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        with open(temporary, "wb") as handle:
+            handle.write(INDEX_HEADER.pack(MAGIC, self._end, len(hashes)))
+            handle.write(hashes[order].astype("<u8").tobytes())
+            handle.write(offsets[order].astype("<u8").tobytes())
+        os.replace(temporary, self.index_path)
+        self._load_index()
+        self._tail = {}
+
+    def _write_index(self):
+        self._save_index(*self._live())
+
+    def keys(self):
+        """
+        Every live key, in no particular order. Reads the whole store.
+        """
+        with self._lock:
+            offsets = self._live()[1].tolist()
+        for offset in offsets:
+            record = self._read(offset)
+            if record is not None and record[1] is not None:
+                yield record[0].decode("utf-8")
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+    def compact(self):
+        """
+        Rewrite the data file with only the latest value of each live key.
+        Run it with no concurrent readers (e.g. from a management command).
+        """
+        with self._lock:
+            hashes, offsets = self._live()
+            kept_hashes, kept_offsets, position = [], [], 0
+            temporary = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(temporary, "wb") as handle:
+                for row in np.argsort(offsets).tolist():
+                    record = self._read(int(offsets[row]))
+                    if record is None or record[1] is None:
+                        continue
+                    handle.write(os.pread(self._fd, record[2], int(offsets[row])))
+                    kept_hashes.append(int(hashes[row]))
+                    kept_offsets.append(position)
+                    position += record[2]
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temporary, self.path)
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_RDWR)
+            self._end = position
+            self._save_index(np.array(kept_hashes, dtype="<u8"), np.array(kept_offsets, dtype="<u8"))
+
+
+def write_store(path, items):
+    """
+    Create (or replace) a store holding `items` ((key, value) pairs), indexed.
+    """
+    path = Path(path)
+    for stale in (path, path.with_suffix(".kvi")):
+        if stale.exists():
+            stale.unlink()
+    store = KVStore(path, index_every=float("inf"))
+    try:
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == 1024:
+                store.put_many(batch)
+                batch = []
+        store.put_many(batch)
+        store.flush()
+    finally:
+        store.close()
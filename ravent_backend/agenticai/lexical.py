@@ -0,0 +1,187 @@
+# agenticai/lexical.py
+"""
+BM25 keyword retrieval over chunk text.
+
+Each indexed file contributes one immutable LexicalSegment, built by the
+ingestion worker and stored in the file's artifact. A segment is an inverted
+index in CSR form: a sorted vocabulary, and for term i the postings
+rows[indptr[i]:indptr[i + 1]] (chunk positions within the file) with their
+term frequencies in tfs[...], all typed NumPy arrays. An owner's LexicalIndex
+is the set of their files' segments, so adding or dropping a file is O(1) and
+corpus statistics are kept as running totals.
+"""
+
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import NamedTuple
+
+import numpy as np
+
+_token_pattern = re.compile(r"\w+", re.UNICODE)
+
+# Standard Okapi BM25 parameters.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """
+    Lower-cased word tokens; underscores and digits are kept so identifiers
+    such as course codes ("CSE_1") survive as single terms.
+    """
+    return _token_pattern.findall(text.casefold())
+
+
+class LexicalSegment(NamedTuple):
+    vocab: np.ndarray    # sorted unique terms (str)
+    indptr: np.ndarray   # int64, len(vocab) + 1
+    rows: np.ndarray     # int32 chunk positions, grouped by term
+    tfs: np.ndarray      # int32 term frequencies, aligned with rows
+    lengths: np.ndarray  # int32 token count per chunk
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def postings(self, term):
+        """
+        Return (rows, tfs) for a term, or None if the segment lacks it.
+        """
+        i = int(np.searchsorted(self.vocab, term))
+        if i == len(self.vocab) or self.vocab[i] != term:
+            return None
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return self.rows[start:stop], self.tfs[start:stop]
+
+
+def build_segment(texts):
+    """
+    Build a LexicalSegment for the chunks of one file. Postings are gathered
+    chunk by chunk into typed arrays, so memory stays proportional to the
+    number of (term, chunk) pairs rather than to per-chunk Counters.
+    """
+    term_ids = {}
+    pair_terms, pair_rows, pair_tfs, lengths = array("q"), array("i"), array("i"), array("i")
+    for row, text in enumerate(texts):
+        count = Counter(tokenize(text))
+        lengths.append(sum(count.values()))
+        for term, tf in count.items():
+            pair_terms.append(term_ids.setdefault(term, len(term_ids)))
+            pair_rows.append(row)
+            pair_tfs.append(tf)
+
+    # Term ids were assigned in order of appearance; renumber them in vocabulary order.
+    vocab = np.array(list(term_ids), dtype=str)
+    vocab_order = np.argsort(vocab, kind="stable")
+    rank = np.empty(len(vocab), dtype=np.int64)
+    rank[vocab_order] = np.arange(len(vocab))
+    pair_terms = rank[np.asarray(pair_terms, dtype=np.int64)]
+    order = np.argsort(pair_terms, kind="stable")
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_terms, minlength=len(vocab)), out=indptr[1:])
+    return LexicalSegment(
+        vocab=vocab[vocab_order],
+        indptr=indptr,
+        rows=np.asarray(pair_rows, dtype=np.int32)[order],
+        tfs=np.asarray(pair_tfs, dtype=np.int32)[order],
+        lengths=np.asarray(lengths, dtype=np.int32),
+    )
+
+
+class LexicalIndex:
+    """
+    BM25 index over one owner's files, one segment per upload.
+    """
+
+    def __init__(self):
+        self.segments = {}
+        self.total_chunks = 0
+        self.total_tokens = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.total_chunks
+
+    def add_file(self, upload_id, segment):
+        with self._lock:
+            self._remove(upload_id)
+            self.segments[upload_id] = segment
+            self.total_chunks += len(segment)
+            self.total_tokens += int(segment.lengths.sum())
+
+    def remove_file(self, upload_id):
+        with self._lock:
+            self._remove(upload_id)
+
+    def _remove(self, upload_id):
+        segment = self.segments.pop(upload_id, None)
+        if segment is not None:
+            self.total_chunks -= len(segment)
+            self.total_tokens -= int(segment.lengths.sum())
+
+    def search(self, terms, k):
+        """
+        Return up to `k` (upload_id, position, score) tuples by BM25 score, best
+        first. Scores are relative to the query: 1.0 is what a chunk of average
+        length holding each query term once would score, so thresholds on them
+        mean the same whatever the query's length or the corpus' statistics.
+        """
+        with self._lock:
+            segments = dict(self.segments)
+            total_chunks, total_tokens = self.total_chunks, self.total_tokens
+        terms = list(dict.fromkeys(terms))
+        if not total_chunks or not terms or k <= 0:
+            return []
+        average_length = total_tokens / total_chunks
+
+        matches = {}
+        document_frequency = dict.fromkeys(terms, 0)
+        for upload_id, segment in segments.items():
+            for term in terms:
+                postings = segment.postings(term)
+                if postings is not None:
+                    matches.setdefault(upload_id, []).append((term, postings))
+                    document_frequency[term] += len(postings[0])
+
+        idf = {
+            term: math.log(1 + (total_chunks - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+        # BM25 of a chunk of average length with every query term once.
+        ceiling = sum(idf.values())
+        candidate_ids, candidate_rows, candidate_scores = [], [], []
+        for upload_id, found in matches.items():
+            segment = segments[upload_id]
+            norms = BM25_K1 * (1 - BM25_B + BM25_B * segment.lengths / average_length)
+            scores = np.zeros(len(segment), dtype=np.float32)
+            for term, (rows, tfs) in found:
+                scores[rows] += idf[term] * tfs * (BM25_K1 + 1) / (tfs + norms[rows])
+            rows = np.flatnonzero(scores)
+            candidate_ids.append(np.full(len(rows), upload_id, dtype=np.int64))
+            candidate_rows.append(rows)
+            candidate_scores.append(scores[rows])
+        if not candidate_scores:
+            return []
+
+        ids = np.concatenate(candidate_ids)
+        rows = np.concatenate(candidate_rows)
+        scores = np.concatenate(candidate_scores)
+        if k < len(scores):
+            best = np.argpartition(scores, -k)[-k:]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best])]
+        return [(int(ids[i]), int(rows[i]), float(scores[i] / ceiling)) for i in best]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse ranked lists of hashable keys; returns keys ordered by fused score.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
@@ -0,0 +1,81 @@
+# agenticai/management/commands/benchmark_ann.py
+
+import math
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from agenticai.ann import train_ivf
+from agenticai.quantization import Float32Codec, Int8Codec
+from agenticai.retrieval import VectorIndex
+
+from .benchmark_quantization import synthetic_corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Recall@k and queries per second of IVF search for a range of nprobe, against "
+        "exact search over the same index, on a synthetic clustered corpus. Also times "
+        "building the index file by file (incremental inserts)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100000)
+        parser.add_argument("--dimensions", type=int, default=768)
+        parser.add_argument("--clusters", type=int, default=100, help="Topics in the synthetic corpus.")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--lists", type=int, default=0, help="IVF partitions (default: 4 sqrt(rows)).")
+        parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+        parser.add_argument("--codec", choices=["float32", "int8"], default="float32")
+        parser.add_argument("--sample", type=int, default=65536, help="Vectors to train the centroids on.")
+        parser.add_argument("--file-rows", type=int, default=500, help="Chunks per simulated file.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        k, file_rows = options["k"], options["file_rows"]
+        corpus = synthetic_corpus(options["rows"] + options["queries"], options["dimensions"],
+                                  options["clusters"], options["seed"])
+        corpus, queries = corpus[options["queries"]:], corpus[:options["queries"]]
+        truth = [set(np.argpartition(corpus @ query, -k)[-k:].tolist()) for query in queries]
+        lists = options["lists"] or int(4 * math.sqrt(len(corpus)))
+        self.stdout.write(
+            f"{len(corpus)} vectors x {corpus.shape[1]} dimensions, {len(queries)} queries, "
+            f"{options['codec']} codes, recall@{k}:"
+        )
+
+        started = time.perf_counter()
+        quantizer = train_ivf(corpus[:options["sample"]], lists, seed=options["seed"])
+        self.stdout.write(f"  (trained {lists} lists in {time.perf_counter() - started:.1f} s)")
+        codec = Int8Codec() if options["codec"] == "int8" else Float32Codec()
+        index = VectorIndex(codec, ann=quantizer)
+        started = time.perf_counter()
+        for number, start in enumerate(range(0, len(corpus), file_rows)):
+            texts = [""] * len(corpus[start:start + file_rows])
+            index.add_file(number, f"file-{number}", 0, texts, corpus[start:start + file_rows])
+        self.stdout.write(
+            f"  (built file by file in {time.perf_counter() - started:.1f} s, {index.nbytes / len(corpus):.0f} B/row)"
+        )
+
+        index.ann_min_rows = len(corpus) + 1
+        exact_latency = self._report("exact", index, queries, truth, k, file_rows, None)
+        index.ann_min_rows = 0
+        for nprobe in options["nprobe"]:
+            index.nprobe = nprobe
+            self._report(f"ivf nprobe={nprobe}", index, queries, truth, k, file_rows, exact_latency)
+
+    def _report(self, label, index, queries, truth, k, file_rows, exact_latency):
+        found, elapsed = 0, 0.0
+        for query, expected in zip(queries, truth):
+            began = time.perf_counter()
+            results = index.search(query, k)
+            elapsed += time.perf_counter() - began
+            found += len(expected & {upload_id * file_rows + position for upload_id, position, *_ in results})
+        latency = elapsed / len(queries)
+        speedup = f"  {exact_latency / latency:5.1f}x exact" if exact_latency else ""
+        self.stdout.write(
+            f"  {label:<16} recall {found / (k * len(queries)):.3f}  {1 / latency:8.0f} QPS  "
+            f"{latency * 1000:6.2f} ms/query{speedup}"
+        )
+        return latency
@@ -0,0 +1,151 @@
+# agenticai/management/commands/benchmark_api.py
+
+import json
+import os
+import random
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from ravent_backend import loadtest
+from ravent_backend.loadtest import Call
+
+from ..scratch import scratch_database
+
+DRIVERS = {"wsgi": loadtest.WSGIDriver, "asgi": loadtest.ASGIDriver}
+
+WORDS = (
+    "ingestion retrieval embedding vector lexical index chunk upload answer query "
+    "storage sweeper registry owner token stream segment cache latency batch"
+).split()
+
+
+def session(tag, document, questions, stream):
+    """
+    One virtual user: register, log in, refresh, read the profile, upload a
+    file, list files, chat (and stream a chat under ASGI), ask a question in a
+    new conversation, then delete the file.
+    """
+    username, password = f"benchmark-api-{tag}", "benchmark-password"
+    yield Call.json("register", "POST", "/api/accounts/register/",
+                    {"username": username, "password": password}, expect=201)
+    reply = yield Call.json("login", "POST", "/api/accounts/login/", {"username": username, "password": password})
+    if reply.status != 200:
+        return
+    tokens = reply.json()
+    reply = yield Call.json("refresh", "POST", "/api/accounts/token/refresh/", {"refresh": tokens["refresh"]})
+    access = reply.json()["access"] if reply.status == 200 else tokens["access"]
+    yield Call("profile", "GET", "/api/accounts/profile/", token=access)
+    reply = yield Call.multipart("upload", "/api/agenticai/files/",
+                                 {"file": SimpleUploadedFile(f"{tag}.txt", document)}, token=access, expect=201)
+    upload_id = reply.json()["id"] if reply.status == 201 else None
+    yield Call("list", "GET", "/api/agenticai/files/", token=access)
+    for question in questions:
+        yield Call.json("chat", "POST", "/api/agenticai/chat/", {"query": question}, token=access)
+    if stream and questions:
+        yield Call.json("chat_stream", "POST", "/api/agenticai/chat/stream/", {"query": questions[0]}, token=access)
+    reply = yield Call.json("conversation", "POST", "/api/agenticai/conversations/", {}, token=access, expect=201)
+    if reply.status == 201 and questions:
+        yield Call.json("chat_turn", "POST", "/api/agenticai/chat/",
+                        {"query": questions[0], "conversation": reply.json()["id"]}, token=access)
+    if upload_id is not None:
+        yield Call("delete", "DELETE", f"/api/agenticai/files/{upload_id}/", token=access, expect=204)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load benchmark of the API through the real URLconf, in-process, under WSGI "
+        "(thread pool) and ASGI (event loop). Concurrent virtual users run the scripted "
+        "register / login / upload / list / chat / delete scenario against a scratch "
+        "SQLite database and temporary storage. Reports p50/p95/p99 latency, throughput "
+        "and SQL queries per request; --save writes the results as JSON and --baseline "
+        "compares against a saved run, exiting non-zero on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=16, help="Virtual users (scenario runs) per interface.")
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--chats", type=int, default=3, help="Chat requests per user.")
+        parser.add_argument("--file-kb", type=int, default=16, help="Size of each uploaded .txt file.")
+        parser.add_argument("--interface", choices=sorted(DRIVERS), action="append",
+                            help="Interface to drive (repeatable; default: both).")
+        parser.add_argument("--embedder", default="agenticai.embeddings.HashingEmbedder",
+                            help="RAG_EMBEDDER for the run; the default needs no network.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--save", help="Write the results to this JSON file.")
+        parser.add_argument("--baseline", help="Compare against results saved with --save.")
+        parser.add_argument("--tolerance", type=float, default=0.25,
+                            help="Allowed relative p95 and throughput change before it counts as a regression.")
+
+    def handle(self, *args, **options):
+        interfaces = options["interface"] or ["wsgi", "asgi"]
+        config = {key: options[key] for key in ("users", "concurrency", "chats", "file_kb", "embedder", "seed")}
+        baseline = None
+        if options["baseline"]:
+            baseline = json.loads(Path(options["baseline"]).read_text())
+            if baseline.get("config") != config:
+                self.stderr.write(f"Baseline was recorded with {baseline.get('config')}, not {config}.")
+
+        results = {}
+        with scratch_database("benchmark-api-") as directory, override_settings(
+            DEBUG=False,
+            ALLOWED_HOSTS=["*"],
+            MEDIA_ROOT=str(directory / "media"),
+            RAG_STORE_ROOT=directory / "rag_store",
+            RAG_EMBEDDER=options["embedder"],
+            # Ingest inline so every chat sees its document; no background sweeps.
+            RAG_INGESTION_WORKERS=0,
+            STORAGE_GC_INTERVAL=0,
+        ):
+            loadtest.start_counting_queries()
+            try:
+                for name in interfaces:
+                    results[name] = self._run(DRIVERS[name](options["concurrency"]), options)
+            finally:
+                loadtest.stop_counting_queries()
+
+        for name, result in results.items():
+            self._report(name, result, options)
+        if options["save"]:
+            Path(options["save"]).write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+            self.stdout.write(f"Saved results to {options['save']}")
+        if baseline is not None:
+            regressions = loadtest.compare(results, baseline["results"], tolerance=options["tolerance"])
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {regression}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['baseline']}"))
+
+    def _run(self, driver, options):
+        # Distinct documents per interface, so one run never deduplicates against another's uploads.
+        rng = random.Random(f"{options['seed']}-{driver.name}")
+        words_per_file = options["file_kb"] * 1024 // 8
+
+        def scenarios(label, count):
+            for number in range(count):
+                document = " ".join(rng.choice(WORDS) for _ in range(words_per_file)).encode("utf-8")
+                questions = [" ".join(rng.sample(WORDS, 3)) for _ in range(options["chats"])]
+                yield session(f"{os.getpid()}-{driver.name}-{label}-{number}", document, questions,
+                              stream=driver.name == "asgi")
+
+        # One unmeasured user first: imports, connections and cold caches.
+        driver.run(scenarios("warmup", 1))
+        samples, seconds = driver.run(list(scenarios("run", options["users"])))
+        return loadtest.summarise(samples, seconds)
+
+    def _report(self, name, result, options):
+        self.stdout.write(
+            f"{name}: {options['users']} users, {options['concurrency']} concurrent, "
+            f"{result['requests']} requests in {result['seconds']:.2f} s, {result['requests_per_second']:.1f} req/s"
+        )
+        self.stdout.write(
+            f"  {'endpoint':<12} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}"
+        )
+        for endpoint, stats in result["endpoints"].items():
+            self.stdout.write(
+                f"  {endpoint:<12} {stats['count']:>6} {stats['errors']:>6} {stats['p50_ms']:>9.1f} "
+                f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['queries']:>8.2f}"
+            )
@@ -0,0 +1,105 @@
+# agenticai/management/commands/benchmark_chunking.py
+
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agenticai.chunking import TokenChunker
+from agenticai.ingestion import extract_text
+
+DEFAULT_DATA = Path(settings.BASE_DIR).parent / "notebooks" / "data"
+
+
+def load_pages(path):
+    """
+    (text, metadata) per page of a PDF, as LangChain's PyPDFLoader returns
+    them to the notebooks; other files are one page.
+    """
+    if path.suffix.lower() != ".pdf":
+        return [(extract_text(str(path)), {"source": path.name})]
+    from pypdf import PdfReader
+
+    reader = PdfReader(str(path))
+    info = {key.lstrip("/").lower(): str(value) for key, value in (reader.metadata or {}).items()}
+    return [
+        (page.extract_text() or "", {**info, "source": path.name, "total_pages": len(reader.pages),
+                                     "page": number, "page_label": str(number + 1)})
+        for number, page in enumerate(reader.pages)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Chunking throughput on sample documents (default: the PDFs in notebooks/data). "
+        "Pages are extracted once, repeated --copies times, then chunked --repeat times by "
+        "TokenChunker and, when langchain-text-splitters is installed, by the notebooks' "
+        "RecursiveCharacterTextSplitter(1000, 100).split_documents. Reports throughput and "
+        "the chunks over the token budget for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="*", help="Files or directories (default: notebooks/data).")
+        parser.add_argument("--tokens", type=int, default=settings.RAG_CHUNK_TOKENS)
+        parser.add_argument("--overlap", type=int, default=settings.RAG_CHUNK_OVERLAP_TOKENS)
+        parser.add_argument("--encoding", default=settings.RAG_CHUNK_ENCODING,
+                            help="tiktoken encoding to count tokens with (empty: estimate).")
+        parser.add_argument("--copies", type=int, default=8, help="Repeat the documents to time a larger corpus.")
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def handle(self, *args, **options):
+        paths = []
+        for name in options["paths"] or [DEFAULT_DATA]:
+            path = Path(name)
+            paths.extend(sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path])
+        if not paths:
+            raise CommandError("No documents to chunk.")
+
+        started = time.perf_counter()
+        pages = [page for path in paths for page in load_pages(path)] * options["copies"]
+        megabytes = sum(len(text.encode("utf-8")) for text, _ in pages) / 1e6
+        self.stdout.write(
+            f"Extracted {len(paths)} file(s) in {time.perf_counter() - started:.2f} s; "
+            f"chunking {len(pages)} pages, {megabytes:.2f} MB of text, best of {options['repeat']}:"
+        )
+
+        chunker = TokenChunker(options["tokens"], options["overlap"], encoding=options["encoding"])
+        if options["encoding"] and chunker.tokenizer is None:
+            self.stdout.write(f"  ({options['encoding']} is unavailable; token counts are estimated)")
+        splitters = {
+            f"TokenChunker ({options['tokens']} tokens, {options['overlap']} overlap)":
+                lambda: [chunk for _, _, chunk in chunker.split(_joined(pages))],
+        }
+        try:
+            from langchain_core.documents import Document
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        except ImportError:
+            self.stdout.write("  (langchain-text-splitters is not installed; skipping RecursiveCharacterTextSplitter)")
+        else:
+            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+            documents = [Document(page_content=text, metadata=metadata) for text, metadata in pages]
+            splitters["RecursiveCharacterTextSplitter (1000 chars, 100 overlap)"] = (
+                lambda: [document.page_content for document in splitter.split_documents(documents)]
+            )
+
+        for name, split in splitters.items():
+            best = float("inf")
+            for _ in range(options["repeat"]):
+                began = time.perf_counter()
+                chunks = split()
+                best = min(best, time.perf_counter() - began)
+            tokens = [chunker.count_tokens(chunk) for chunk in chunks]
+            over = sum(count > options["tokens"] for count in tokens)
+            self.stdout.write(
+                f"  {name}: {best * 1000:.0f} ms, {megabytes / best:.1f} MB/s, {len(chunks)} chunks, "
+                f"max {max(tokens, default=0)} tokens, {over} over budget"
+            )
+
+
+def _joined(pages):
+    # The same stream ingestion feeds the chunker: pages separated by a blank line.
+    for number, (text, _) in enumerate(pages):
+        if number:
+            yield "\n\n"
+        yield text
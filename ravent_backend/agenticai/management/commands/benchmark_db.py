@@ -0,0 +1,120 @@
+# agenticai/management/commands/benchmark_db.py
+
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.test.utils import override_settings
+
+ALIAS = "benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the SQLite profile: writer threads run read-then-write "
+        "transactions (like an upload) while reader threads query, first with Django's "
+        "default SQLite setup and then with the tuned profile from settings. Reports "
+        "throughput, latency and 'database is locked' errors. Uses a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=3.0)
+        parser.add_argument(
+            "--hold-ms", type=float, default=2.0,
+            help="Work done inside each write transaction (e.g. a storage write).",
+        )
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        directory = Path(tempfile.mkdtemp(prefix="benchmark-db-"))
+        tuned_options = settings.DATABASES["default"].get("OPTIONS", {}) if settings.DB_PROFILE == "sqlite" else {}
+        profiles = [
+            ("django default", {}, {}),
+            ("tuned", tuned_options, settings.SQLITE_PRAGMAS),
+        ]
+        try:
+            for label, db_options, pragmas in profiles:
+                name = directory / f"{label.replace(' ', '-')}.sqlite3"
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    self._configure(name, db_options)
+                    result = self._run(options)
+                    connections[ALIAS].close()
+                    del connections[ALIAS]
+                self._report(label, result, options["seconds"])
+        finally:
+            connections.settings.pop(ALIAS, None)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _configure(self, name, db_options):
+        configured = connections.configure_settings({
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": str(name), "OPTIONS": dict(db_options)}
+        })
+        connections.settings[ALIAS] = configured["default"]
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute("CREATE TABLE bench (id INTEGER PRIMARY KEY, owner INTEGER, payload TEXT)")
+            cursor.execute("CREATE INDEX bench_owner ON bench (owner)")
+
+    def _run(self, options):
+        deadline = time.monotonic() + options["seconds"]
+        hold = options["hold_ms"] / 1000
+        lock = threading.Lock()
+        result = {"writes": [], "reads": 0, "errors": 0}
+
+        def writer(owner):
+            latencies, errors = [], 0
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=ALIAS):
+                        with connections[ALIAS].cursor() as cursor:
+                            cursor.execute("SELECT COUNT(*) FROM bench WHERE owner = %s", [owner])
+                            time.sleep(hold)
+                            cursor.execute("INSERT INTO bench (owner, payload) VALUES (%s, %s)", [owner, "x" * 200])
+                except OperationalError:
+                    errors += 1
+                else:
+                    latencies.append(time.perf_counter() - started)
+            connections[ALIAS].close()
+            with lock:
+                result["writes"].extend(latencies)
+                result["errors"] += errors
+
+        def reader():
+            reads = 0
+            while time.monotonic() < deadline:
+                try:
+                    with connections[ALIAS].cursor() as cursor:
+                        cursor.execute("SELECT id, payload FROM bench ORDER BY id DESC LIMIT 50")
+                        cursor.fetchall()
+                    reads += 1
+                except OperationalError:
+                    with lock:
+                        result["errors"] += 1
+            connections[ALIAS].close()
+            with lock:
+                result["reads"] += reads
+
+        threads = [threading.Thread(target=writer, args=(owner,)) for owner in range(options["writers"])]
+        threads += [threading.Thread(target=reader) for _ in range(options["readers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def _report(self, label, result, seconds):
+        writes = sorted(result["writes"])
+        p50 = statistics.median(writes) * 1000 if writes else 0.0
+        p95 = writes[int(0.95 * (len(writes) - 1))] * 1000 if writes else 0.0
+        self.stdout.write(
+            f"{label:<15} writes {len(writes) / seconds:8.1f}/s  reads {result['reads'] / seconds:8.1f}/s  "
+            f"write p50 {p50:6.1f} ms  p95 {p95:7.1f} ms  'database is locked' errors {result['errors']}"
+        )
@@ -0,0 +1,76 @@
+# agenticai/management/commands/benchmark_embeddings.py
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from agenticai.embeddings import BatchingEmbedder, SimulatedAPIEmbedder
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare one-call-per-query embedding with micro-batching under concurrent "
+        "callers, using SimulatedAPIEmbedder as a stand-in for the provider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=400)
+        parser.add_argument("--callers", type=int, default=32, help="Concurrent callers.")
+        parser.add_argument("--call-latency-ms", type=float, default=50.0)
+        parser.add_argument(
+            "--provider-connections", type=int, default=4,
+            help="Calls the simulated provider serves at once, for both paths.",
+        )
+        parser.add_argument("--max-batch", type=int, default=64)
+        parser.add_argument("--max-wait-ms", type=float, default=5.0)
+        parser.add_argument("--concurrency", type=int, default=4, help="Provider calls in flight.")
+
+    def handle(self, *args, **options):
+        queries = [f"what is covered in lecture {i} of course CSE_{i % 7}" for i in range(options["queries"])]
+        provider = {
+            "call_latency": options["call_latency_ms"] / 1000,
+            "max_concurrent_calls": options["provider_connections"],
+        }
+
+        naive = SimulatedAPIEmbedder(**provider)
+        elapsed = self._threaded(naive, queries, options["callers"])
+        self._report("naive (threads)", len(queries), elapsed, naive.calls)
+
+        for mode in ("threads", "asyncio"):
+            inner = SimulatedAPIEmbedder(**provider)
+            batching = BatchingEmbedder(
+                inner,
+                max_batch_size=options["max_batch"],
+                max_wait=options["max_wait_ms"] / 1000,
+                concurrency=options["concurrency"],
+            )
+            if mode == "threads":
+                elapsed = self._threaded(batching, queries, options["callers"])
+            else:
+                elapsed = asyncio.run(self._async(batching, queries, options["callers"]))
+            self._report(f"batched ({mode})", len(queries), elapsed, inner.calls)
+
+    def _threaded(self, embedder, queries, callers):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=callers) as pool:
+            list(pool.map(embedder.embed_query, queries))
+        return time.perf_counter() - started
+
+    async def _async(self, embedder, queries, callers):
+        limit = asyncio.Semaphore(callers)
+
+        async def one(query):
+            async with limit:
+                return await embedder.aembed_query(query)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(query) for query in queries))
+        return time.perf_counter() - started
+
+    def _report(self, label, count, elapsed, calls):
+        self.stdout.write(
+            f"{label:<18} {count / elapsed:8.1f} queries/s  {elapsed * 1000:8.1f} ms  "
+            f"{calls} provider calls (avg batch {count / max(calls, 1):.1f})"
+        )
@@ -0,0 +1,135 @@
+# agenticai/management/commands/benchmark_fanout.py
+
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from agenticai import blobs, fanout, ingestion, retrieval
+from agenticai.models import FileUpload
+from agenticai.tools import StubSearchTool
+
+from ..scratch import scratch_database
+from .benchmark_api import WORDS
+
+# Words the document never contains, so these questions need the web.
+OFF_TOPIC = "weather forecast football election recipe holiday flight museum concert volcano".split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of chat evidence gathering when the documents do not answer the "
+        "question: retrieval then web search in sequence (the notebook agent), both "
+        "started together, and together with hedged search attempts. Uses a local stub "
+        "search provider with a slow tail, a simulated remote embedder, a scratch "
+        "SQLite database and temporary storage. Also reports how many searches are "
+        "cancelled when retrieval is confident."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--search-ms", type=float, default=120.0, help="Typical search latency.")
+        parser.add_argument("--slow-ms", type=float, default=1500.0, help="Latency of the slow tail.")
+        parser.add_argument("--slow-rate", type=float, default=0.05, help="Share of slow search calls.")
+        parser.add_argument("--failure-rate", type=float, default=0.02)
+        parser.add_argument("--embed-ms", type=float, default=80.0, help="Query embedding latency.")
+        parser.add_argument("--hedge-after-ms", type=float, default=300.0)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        # The stub's failures and deadline misses are expected; keep their warnings out of the report.
+        fanout_logger = logging.getLogger(fanout.__name__)
+        saved_level = fanout_logger.level
+        fanout_logger.setLevel(logging.ERROR)
+        try:
+            with scratch_database("benchmark-fanout-") as directory, override_settings(
+                MEDIA_ROOT=str(directory / "media"),
+                RAG_STORE_ROOT=directory / "rag_store",
+                RAG_EMBEDDER="agenticai.embeddings.SimulatedAPIEmbedder",
+                RAG_EMBEDDER_OPTIONS={"call_latency": options["embed_ms"] / 1000, "max_concurrent_calls": 64},
+                RAG_RETRIEVAL_MODE="hybrid",
+                RAG_INGESTION_WORKERS=0,
+                RAG_INDEX_PREWARM=False,
+                RAG_SEARCH_HEDGE_AFTER=options["hedge_after_ms"] / 1000,
+            ):
+                owner_id = self._index_document(options["seed"])
+                try:
+                    self._run(owner_id, options)
+                finally:
+                    retrieval.registry.wait()
+                    retrieval.registry.clear()
+        finally:
+            fanout_logger.setLevel(saved_level)
+
+    def _index_document(self, seed):
+        rng = random.Random(seed)
+        owner = User.objects.create_user("benchmark-fanout")
+        document = " ".join(rng.choice(WORDS) for _ in range(4000)).encode("utf-8")
+        blob = blobs.acquire(SimpleUploadedFile("document.txt", document))
+        upload = FileUpload.objects.create(owner=owner, file=blob.file.name, filename="document.txt", blob=blob)
+        ingestion.enqueue(upload.pk)
+        retrieval.registry.get(owner.id)
+        return owner.id
+
+    def _run(self, owner_id, options):
+        rng = random.Random(options["seed"])
+        off_topic = [" ".join(rng.sample(OFF_TOPIC, 4)) for _ in range(options["queries"])]
+        self.stdout.write(
+            f"{options['queries']} off-topic queries, {options['concurrency']} concurrent; search "
+            f"{options['search_ms']:.0f} ms, {options['slow_rate']:.0%} at {options['slow_ms']:.0f} ms, "
+            f"{options['failure_rate']:.0%} failing; embedding {options['embed_ms']:.0f} ms"
+        )
+        self.stdout.write(
+            f"  {'pipeline':<12} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'web':>6} {'calls/q':>8}"
+        )
+        for label, attempts in (("sequential", 1), ("concurrent", 1), ("hedged", 2)):
+            tool = self._tool(options)
+            with override_settings(RAG_SEARCH_ATTEMPTS=attempts):
+                latencies, kinds = asyncio.run(self._measure(label, tool, owner_id, off_topic, options["concurrency"]))
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            self.stdout.write(
+                f"  {label:<12} {quantiles[49]:>8.1f} {quantiles[94]:>8.1f} {quantiles[98]:>8.1f} "
+                f"{max(latencies):>8.1f} {kinds.count(fanout.WEB_TYPE) / len(kinds):>6.0%} "
+                f"{tool.calls / len(kinds):>8.2f}"
+            )
+
+        on_topic = [" ".join(rng.sample(WORDS, 4)) for _ in range(min(options["queries"], 100))]
+        tool = self._tool(options)
+        latencies, kinds = asyncio.run(self._measure("concurrent", tool, owner_id, on_topic, options["concurrency"]))
+        self.stdout.write(
+            f"{len(on_topic)} on-topic queries: {kinds.count(fanout.RAG_TYPE) / len(kinds):.0%} answered from the "
+            f"documents, p50 {statistics.median(latencies):.1f} ms; {tool.calls} searches started, "
+            f"{tool.cancelled} cancelled in flight"
+        )
+
+    def _tool(self, options):
+        return StubSearchTool(
+            latency=options["search_ms"] / 1000, slow_latency=options["slow_ms"] / 1000,
+            slow_rate=options["slow_rate"], failure_rate=options["failure_rate"], seed=options["seed"],
+        )
+
+    async def _measure(self, label, tool, owner_id, queries, concurrency):
+        from django.conf import settings
+
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(query):
+            async with gate:
+                started = time.perf_counter()
+                if label == "sequential":
+                    hits = await retrieval.aretrieve(owner_id, query)
+                    web_hits = [] if fanout.confident(hits) else await fanout.web_search(tool, query, settings.RAG_TOP_K)
+                    kind = fanout.WEB_TYPE if web_hits else fanout.RAG_TYPE
+                else:
+                    kind, _ = await fanout.gather_evidence(owner_id, query, tool=tool)
+                return (time.perf_counter() - started) * 1000, kind
+
+        results = await asyncio.gather(*(one(query) for query in queries))
+        return [latency for latency, _ in results], [kind for _, kind in results]
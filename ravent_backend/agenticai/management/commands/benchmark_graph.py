@@ -0,0 +1,114 @@
+# agenticai/management/commands/benchmark_graph.py
+
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from agenticai.graphstore import GraphStore, build
+
+
+class Command(BaseCommand):
+    help = (
+        "Latency of graph store operations on synthetic entity graphs of growing size: "
+        "opening the store, multi-hop expansion from a few seed entities, a full graph "
+        "query (vector seeds, expansion, relations, chunks and their records) and point "
+        "reads of entity records. Expansion should stay flat as the graph grows. Uses "
+        "temporary storage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--entities", default="10000,100000,500000",
+                            help="Comma-separated graph sizes (entities).")
+        parser.add_argument("--degree", type=int, default=8, help="Average relations per entity.")
+        parser.add_argument("--dimensions", type=int, default=64)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seeds", type=int, default=5, help="Seed entities per expansion.")
+        parser.add_argument("--hops", type=int, default=2)
+        parser.add_argument("--fanout", type=int, default=16, help="Heaviest edges followed out of each entity.")
+        parser.add_argument("--max-nodes", type=int, default=1000, help="New entities kept per hop.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        directory = Path(tempfile.mkdtemp(prefix="benchmark-graph-"))
+        try:
+            self.stdout.write(
+                f"{options['hops']}-hop expansion from {options['seeds']} seeds, fanout {options['fanout']}, "
+                f"at most {options['max_nodes']} entities per hop, "
+                f"average degree {options['degree']}; {options['queries']} queries per size"
+            )
+            self.stdout.write(
+                f"  {'entities':>9} {'build s':>8} {'open ms':>8} {'expand p50':>11} {'expand p99':>11} "
+                f"{'reached':>8} {'query p50':>10} {'read us':>8}"
+            )
+            for size in (int(value) for value in options["entities"].split(",")):
+                self._measure(directory / str(size), size, options)
+                shutil.rmtree(directory / str(size), ignore_errors=True)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _measure(self, root, size, options):
+        rng = np.random.default_rng(options["seed"])
+        started = time.perf_counter()
+        self._build(root, size, options, rng)
+        built = time.perf_counter() - started
+
+        started = time.perf_counter()
+        store = GraphStore(root)
+        opened = (time.perf_counter() - started) * 1000
+        with store:
+            expansions, reached = [], []
+            for _ in range(options["queries"]):
+                seeds = rng.integers(0, size, options["seeds"])
+                started = time.perf_counter()
+                ids, _ = store.expand(seeds, options["hops"], options["fanout"], options["max_nodes"])
+                expansions.append((time.perf_counter() - started) * 1000)
+                reached.append(len(ids))
+
+            queries = []
+            for _ in range(min(options["queries"], 50)):
+                vector = rng.standard_normal(options["dimensions"]).astype(np.float32)
+                started = time.perf_counter()
+                store.query(vector / np.linalg.norm(vector), hops=options["hops"], fanout=options["fanout"],
+                            max_nodes=options["max_nodes"])
+                queries.append((time.perf_counter() - started) * 1000)
+
+            names = [store.entity_names[int(number)] for number in rng.integers(0, size, 1000)]
+            started = time.perf_counter()
+            for name in names:
+                store.entities.get(name)
+            read = (time.perf_counter() - started) / len(names) * 1e6
+
+        quantiles = statistics.quantiles(expansions, n=100, method="inclusive")
+        self.stdout.write(
+            f"  {size:>9} {built:>8.1f} {opened:>8.1f} {quantiles[49]:>8.2f} ms {quantiles[98]:>8.2f} ms "
+            f"{statistics.median(reached):>8.0f} {statistics.median(queries):>7.2f} ms {read:>8.1f}"
+        )
+
+    def _build(self, root, size, options, rng):
+        """
+        A graph with a skewed degree distribution (a few hub entities), one
+        chunk per four entities and each entity mentioned in one or two chunks.
+        """
+        relations = size * options["degree"] // 2
+        sources = rng.integers(0, size, relations)
+        targets = np.minimum((rng.pareto(1.2, relations) * size / 50).astype(np.int64), size - 1)
+        weights = rng.integers(1, 10, relations)
+        chunk_count = max(1, size // 4)
+        mentions = rng.integers(0, chunk_count, (size, 2))
+        keys = [f"chunk-{row}" for row in range(chunk_count)]
+        vectors = rng.standard_normal((chunk_count, options["dimensions"])).astype(np.float32)
+        build(
+            root,
+            ((f"entity-{number}", {"entity_type": "concept", "description": f"Entity {number}.",
+                                   "source_id": [keys[row] for row in set(mentions[number].tolist())]})
+             for number in range(size)),
+            ((f"entity-{source}", f"entity-{target}", {"weight": int(weight), "description": "related"})
+             for source, target, weight in zip(sources.tolist(), targets.tolist(), weights.tolist())),
+            ((key, {"content": f"Chunk {row}.", "tokens": 3}) for row, key in enumerate(keys)),
+            vectors,
+        )
@@ -0,0 +1,74 @@
+# agenticai/management/commands/benchmark_memory.py
+
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from agenticai import memory
+from agenticai.generation import build_prompt
+from agenticai.models import Conversation, ConversationMessage
+
+from ..scratch import scratch_database
+from .benchmark_api import WORDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Cost of conversation memory as a conversation grows: SQL queries, prompt size "
+        "and time per turn (load the context, render the prompt, record the turn, and "
+        "summarise when due), next to what replaying the whole history would cost. "
+        "Summaries run inline. Uses a scratch SQLite database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--turns", type=int, default=500)
+        parser.add_argument("--report-every", type=int, default=100)
+        parser.add_argument("--answer-words", type=int, default=120, help="Words per generated answer.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        with scratch_database("benchmark-memory-"), override_settings(CHAT_COMPACTION_WORKERS=0):
+            self._run(options)
+
+    def _run(self, options):
+        rng = random.Random(options["seed"])
+        owner = User.objects.create_user("benchmark-memory", password="benchmark-password")
+        conversation = Conversation.objects.create(owner=owner)
+        self.stdout.write(
+            f"  {'turns':>7} {'queries/turn':>13} {'prompt chars':>13} {'ms/turn':>8} "
+            f"{'full-history chars':>19} {'full-history ms':>16}"
+        )
+        queries = chars = elapsed = 0
+        for number in range(1, options["turns"] + 1):
+            query = " ".join(rng.sample(WORDS, 6)) + "?"
+            answer = " ".join(rng.choice(WORDS) for _ in range(options["answer_words"])) + "."
+            began = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                context = memory.load_context(owner.id, conversation.id)
+                prompt = build_prompt(query, [], memory.render_history(context))
+                memory.record_turn(context, query, answer)
+            elapsed += time.perf_counter() - began
+            queries += len(captured)
+            chars += len(prompt)
+            if number % options["report_every"] == 0:
+                count = options["report_every"]
+                full_chars, full_seconds = self._full_history(conversation.id, query)
+                self.stdout.write(
+                    f"  {number:>7} {queries / count:>13.1f} {chars / count:>13.0f} {elapsed * 1000 / count:>8.2f} "
+                    f"{full_chars:>19} {full_seconds * 1000:>16.2f}"
+                )
+                queries = chars = elapsed = 0
+
+    def _full_history(self, conversation_id, query):
+        """
+        Prompt size and load time of replaying every message of the conversation.
+        """
+        began = time.perf_counter()
+        messages = ConversationMessage.objects.filter(conversation_id=conversation_id).order_by("turn", "role")
+        history = "\n".join(f"{message.role}: {message.content}" for message in messages)
+        prompt = build_prompt(query, [], history)
+        return len(prompt), time.perf_counter() - began
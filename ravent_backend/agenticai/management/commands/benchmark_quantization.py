@@ -0,0 +1,104 @@
+# agenticai/management/commands/benchmark_quantization.py
+
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from agenticai.quantization import Float32Codec, Int8Codec, train_product_quantizer
+from agenticai.retrieval import VectorIndex
+
+from .train_pq import sample_store_vectors
+
+
+def synthetic_corpus(rows, dimensions, clusters, seed):
+    """
+    L2-normalised vectors around `clusters` random topics, with per-dimension
+    variances spread over two orders of magnitude like real embeddings.
+    """
+    rng = np.random.default_rng(seed)
+    spread = np.geomspace(1.0, 0.01, dimensions).astype(np.float32)
+    centres = rng.standard_normal((clusters, dimensions), dtype=np.float32) * spread
+    vectors = centres[rng.integers(clusters, size=rows)]
+    vectors += 0.5 * rng.standard_normal((rows, dimensions), dtype=np.float32) * spread
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Resident memory, latency and recall@k of the float32, int8 and PQ vector codecs "
+        "against exact float32 search, with and without re-scoring candidates against the "
+        "full-precision vectors (memory-mapped from disk, as in the artifacts). Uses a "
+        "synthetic clustered corpus, or the vectors in RAG_STORE_ROOT with --from-store."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from-store", action="store_true", help="Benchmark on the stored chunk vectors.")
+        parser.add_argument("--rows", type=int, default=50000)
+        parser.add_argument("--dimensions", type=int, default=768)
+        parser.add_argument("--clusters", type=int, default=200)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--rescore", type=int, nargs="+", default=[1, 2, 4, 8],
+                            help="Re-scoring factors to try (candidates = factor x k).")
+        parser.add_argument("--file-rows", type=int, default=500, help="Chunks per simulated file.")
+        parser.add_argument("--subspace-dimensions", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        seed, k = options["seed"], options["k"]
+        if options["from_store"]:
+            corpus = sample_store_vectors(options["rows"] + options["queries"], seed)
+            if len(corpus) <= options["queries"] + 256:
+                raise CommandError(f"Only {len(corpus)} vectors in the store.")
+            corpus, queries = corpus[options["queries"]:], corpus[:options["queries"]]
+        else:
+            corpus = synthetic_corpus(options["rows"] + options["queries"], options["dimensions"],
+                                      options["clusters"], seed)
+            corpus, queries = corpus[options["queries"]:], corpus[:options["queries"]]
+        rows, dimensions = corpus.shape
+        truth = [set(np.argpartition(corpus @ query, -k)[-k:].tolist()) for query in queries]
+        self.stdout.write(f"{rows} vectors x {dimensions} dimensions, {len(queries)} queries, recall@{k}:")
+
+        directory = Path(tempfile.mkdtemp(prefix="benchmark-quantization-"))
+        try:
+            np.save(directory / "vectors.npy", corpus)
+            on_disk = np.load(directory / "vectors.npy", mmap_mode="r")
+            started = time.perf_counter()
+            pq = train_product_quantizer(corpus[:65536], options["subspace_dimensions"], seed=seed)
+            self.stdout.write(f"  (PQ codebook trained in {time.perf_counter() - started:.1f} s)")
+            baseline = None
+            for codec in (Float32Codec(), Int8Codec(), pq):
+                index = self._build(codec, corpus, on_disk, options["file_rows"])
+                baseline = baseline or index.nbytes
+                factors = [1] if codec.exact else options["rescore"]
+                for factor in factors:
+                    index.rescore_factor = factor
+                    recall, latency = self._measure(index, queries, truth, k, options["file_rows"])
+                    label = codec.name if codec.exact else f"{codec.name}, rescore x{factor}"
+                    self.stdout.write(
+                        f"  {label:<20} {index.nbytes / rows:>8.0f} B/row  {baseline / index.nbytes:>5.1f}x smaller  "
+                        f"recall {recall:.3f}  {latency * 1000:.2f} ms/query"
+                    )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _build(self, codec, corpus, on_disk, file_rows):
+        index = VectorIndex(codec)
+        for number, start in enumerate(range(0, len(corpus), file_rows)):
+            stop = min(start + file_rows, len(corpus))
+            index.add_file(number, f"file-{number}", 0, [""] * (stop - start), corpus[start:stop],
+                           full=on_disk[start:stop])
+        return index
+
+    def _measure(self, index, queries, truth, k, file_rows):
+        found, elapsed = 0, 0.0
+        for query, expected in zip(queries, truth):
+            began = time.perf_counter()
+            results = index.search(query, k)
+            elapsed += time.perf_counter() - began
+            found += len(expected & {upload_id * file_rows + position for upload_id, position, *_ in results})
+        return found / (k * len(queries)), elapsed / len(queries)
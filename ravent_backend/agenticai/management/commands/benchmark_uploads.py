@@ -0,0 +1,70 @@
+# agenticai/management/commands/benchmark_uploads.py
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare upload throughput of N single-file requests against one bulk request, "
+        "through the real URLconf with JWT auth. Runs in a rolled-back transaction with "
+        "a temporary MEDIA_ROOT, so nothing is kept and no ingestion is queued."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--files", type=int, default=50)
+        parser.add_argument("--size-kb", type=int, default=64, help="Size of each generated .txt file.")
+        parser.add_argument("--rounds", type=int, default=3)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp(prefix="benchmark-uploads-")
+        try:
+            with override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=["*"]):
+                for name in ("single", "bulk"):
+                    best = min(self._round(name, options, number) for number in range(options["rounds"]))
+                    self.stdout.write(
+                        f"{name:<7} {options['files']} files x {options['size_kb']} KB: "
+                        f"{best * 1000:8.1f} ms  {options['files'] / best:8.1f} files/s"
+                    )
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def _round(self, name, options, number):
+        elapsed = 0.0
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(f"benchmark-uploads-{os.getpid()}-{name}-{number}")
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+                files = [
+                    # Distinct content per file and round, so every upload is stored.
+                    SimpleUploadedFile(f"{name}-{number}-{i}.txt", os.urandom(options["size_kb"] * 512).hex().encode())
+                    for i in range(options["files"])
+                ]
+                started = time.perf_counter()
+                if name == "single":
+                    for uploaded_file in files:
+                        response = client.post("/api/agenticai/files/", {"file": uploaded_file}, format="multipart")
+                        assert response.status_code == 201, response.content
+                else:
+                    response = client.post("/api/agenticai/files/bulk/", {"files": files}, format="multipart")
+                    assert response.status_code == 201, response.content
+                elapsed = time.perf_counter() - started
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed
@@ -0,0 +1,43 @@
+# agenticai/management/commands/generate_schema.py
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ravent_backend import schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the OpenAPI schema (openapi.json and openapi.yaml) served at /swagger.json "
+        "and /swagger.yaml. Run at build or deploy time, after code changes. With --check, "
+        "only verify that the existing files are up to date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output-dir",
+            default=None,
+            help="Directory to write to (default OPENAPI_SCHEMA_DIR).",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with an error if the files are missing or differ from a fresh schema.",
+        )
+
+    def handle(self, *args, **options):
+        directory = Path(options["output_dir"] or settings.OPENAPI_SCHEMA_DIR)
+        if options["check"]:
+            stale = []
+            for fmt, body in schema.generate().items():
+                path = directory / schema.FORMATS[fmt][0]
+                if not path.exists() or path.read_bytes() != body:
+                    stale.append(path.name)
+            if stale:
+                raise CommandError(f"Out of date in {directory}: {', '.join(stale)}. Run generate_schema.")
+            self.stdout.write(f"Schema in {directory} is up to date.")
+            return
+        for path in schema.write(directory):
+            self.stdout.write(f"Wrote {path} ({path.stat().st_size} bytes)")
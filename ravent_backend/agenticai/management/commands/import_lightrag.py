@@ -0,0 +1,114 @@
+# agenticai/management/commands/import_lightrag.py
+
+import base64
+import json
+import time
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agenticai.graphstore import GraphStore, build
+
+GRAPHML = "{http://graphml.graphdrawing.org/xmlns}"
+SEP = "<SEP>"
+
+
+def read_graphml(path):
+    """
+    (nodes, edges) of a LightRAG GraphML file: [(name, attributes)] and
+    [(source, target, attributes)], attributes keyed by their attr.name.
+    """
+    names, nodes, edges = {}, [], []
+    for _, element in ElementTree.iterparse(path):
+        if element.tag == f"{GRAPHML}key":
+            names[element.get("id")] = element.get("attr.name")
+        elif element.tag in (f"{GRAPHML}node", f"{GRAPHML}edge"):
+            attributes = {names.get(data.get("key"), data.get("key")): data.text or "" for data in element}
+            if element.tag == f"{GRAPHML}node":
+                nodes.append((element.get("id"), attributes))
+            else:
+                edges.append((element.get("source"), element.get("target"), attributes))
+            element.clear()
+    return nodes, edges
+
+
+def _split(value):
+    return [part for part in value.split(SEP) if part]
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert a LightRAG working directory (GraphML graph, kv_store_*.json and "
+        "vdb_chunks.json) into a graph store at RAG_GRAPH_ROOT: CSR adjacency, indexed "
+        "key-value files and a memory-mapped vector matrix. Run once per corpus; the "
+        "source files are left untouched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", default=str(settings.BASE_DIR.parent / "notebooks" / "light_rag_storage"))
+        parser.add_argument("--output", default=str(settings.RAG_GRAPH_ROOT))
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        graphml = source / "graph_chunk_entity_relation.graphml"
+        if not graphml.exists():
+            raise CommandError(f"No LightRAG graph at {graphml}.")
+
+        started = time.perf_counter()
+        nodes, edges = read_graphml(graphml)
+        kv = {}
+        for name in ("full_docs", "text_chunks", "doc_status"):
+            path = source / f"kv_store_{name}.json"
+            kv[name] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+        chunks = list(kv["text_chunks"].items())
+        vectors = self._vectors(source / "vdb_chunks.json", [key for key, _ in chunks])
+        parsed = time.perf_counter() - started
+
+        entities = [
+            (name, {**attributes, "source_id": _split(attributes.get("source_id", ""))})
+            for name, attributes in nodes
+        ]
+        relations = []
+        for source_name, target_name, attributes in edges:
+            record = {**attributes, "source_id": _split(attributes.get("source_id", ""))}
+            record["weight"] = float(attributes.get("weight") or 1.0)
+            relations.append((source_name, target_name, record))
+        build(options["output"], entities, relations, chunks, vectors,
+              kv["full_docs"].items(), kv["doc_status"].items())
+
+        started = time.perf_counter()
+        with GraphStore(options["output"]) as store:
+            opened = time.perf_counter() - started
+            meta = store.meta
+        self.stdout.write(
+            f"Imported {meta['entities']} entities, {meta['relations']} relations and {meta['chunks']} "
+            f"{meta['dimensions']}-dimensional chunks into {options['output']}"
+        )
+        self.stdout.write(
+            f"Loading the LightRAG files took {parsed * 1000:.0f} ms; opening the graph store takes "
+            f"{opened * 1000:.1f} ms"
+        )
+
+    def _vectors(self, path, keys):
+        """
+        The chunk embeddings in the order of `keys`; chunks without one get a zero row.
+        """
+        if not path.exists():
+            return np.zeros((len(keys), 0), dtype=np.float32)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        dimensions = data["embedding_dim"]
+        matrix = np.frombuffer(base64.b64decode(data["matrix"]), dtype=np.float32).reshape(-1, dimensions)
+        rows = {entry["__id__"]: row for row, entry in enumerate(data["data"])}
+        vectors = np.zeros((len(keys), dimensions), dtype=np.float32)
+        missing = 0
+        for position, key in enumerate(keys):
+            if key in rows:
+                vectors[position] = matrix[rows[key]]
+            else:
+                missing += 1
+        if missing:
+            self.stderr.write(f"{missing} chunk(s) have no embedding in {path.name}; they will not match vector search.")
+        return vectors
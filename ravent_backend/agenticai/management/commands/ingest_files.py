@@ -0,0 +1,36 @@
+# agenticai/management/commands/ingest_files.py
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from agenticai import ingestion
+from agenticai.models import FileUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Run ingestion for uploads that are queued or failed, e.g. after a restart "
+        "or for files uploaded before background ingestion existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--include-processing",
+            action="store_true",
+            help="Also retry uploads stuck in 'processing' (only safe when no server is running).",
+        )
+
+    def handle(self, *args, **options):
+        statuses = [FileUpload.Status.QUEUED, FileUpload.Status.FAILED]
+        if options["include_processing"]:
+            statuses.append(FileUpload.Status.PROCESSING)
+
+        pending = list(FileUpload.objects.filter(status__in=statuses).values_list("pk", flat=True))
+        FileUpload.objects.filter(pk__in=pending).update(status=FileUpload.Status.QUEUED, updated_at=timezone.now())
+
+        for upload_id in pending:
+            ingestion.run_job(upload_id)
+            upload = FileUpload.objects.get(pk=upload_id)
+            self.stdout.write(f"{upload.file.name}: {upload.status} ({upload.chunk_count} chunks)")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(pending)} upload(s)."))
@@ -0,0 +1,51 @@
+# agenticai/management/commands/sweep_storage.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from agenticai import sweeper
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored files and chunk artifacts queued for deletion. With --orphans, "
+        "first queue files that no upload references (e.g. left by a crash)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--orphans",
+            action="store_true",
+            help="Also look for unreferenced files in media storage and RAG_STORE_ROOT.",
+        )
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=None,
+            help="Only treat files older than this many seconds as orphans (default STORAGE_GC_ORPHAN_GRACE).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List orphans without queueing or deleting anything.",
+        )
+
+    def handle(self, *args, **options):
+        if options["orphans"]:
+            names, artifacts = sweeper.find_orphans(options["grace"])
+            for name in names:
+                self.stdout.write(f"orphan file: {name}")
+            for artifact in artifacts:
+                self.stdout.write(f"orphan artifact: {artifact}")
+            if options["dry_run"]:
+                return
+            with transaction.atomic():
+                for name in names:
+                    sweeper.bury(name=name)
+                for artifact in artifacts:
+                    sweeper.bury(artifact=artifact)
+        elif options["dry_run"]:
+            return
+
+        deleted, failed = sweeper.sweep_all()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} item(s); {failed} failed and will be retried."))
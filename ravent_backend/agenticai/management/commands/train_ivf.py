@@ -0,0 +1,45 @@
+# agenticai/management/commands/train_ivf.py
+
+import math
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agenticai.ann import train_ivf
+
+from .train_pq import sample_store_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the IVF centroids used when RAG_ANN_INDEX=ivf, from vectors sampled across "
+        "the chunk artifacts in RAG_STORE_ROOT, and delete the row assignments made with "
+        "earlier centroids. Retrain after changing RAG_EMBEDDER, then restart the workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=str(settings.RAG_IVF_CENTROIDS))
+        parser.add_argument("--sample", type=int, default=65536, help="Vectors to train on.")
+        parser.add_argument("--lists", type=int, default=0,
+                            help="Partitions (default: 4 x the square root of the sample size).")
+        parser.add_argument("--iterations", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        vectors = sample_store_vectors(options["sample"], options["seed"])
+        lists = options["lists"] or max(1, int(4 * math.sqrt(len(vectors))))
+        try:
+            quantizer = train_ivf(vectors, lists, options["iterations"], options["seed"])
+        except ValueError as exc:
+            raise CommandError(f"{exc} (found in {settings.RAG_STORE_ROOT})")
+        quantizer.save(options["output"])
+        stale = Path(settings.RAG_STORE_ROOT) / "chunks" / "ivf"
+        for directory in stale.iterdir() if stale.is_dir() else ():
+            if directory.name != quantizer.digest:
+                shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(
+            f"Trained {quantizer.lists} lists on {len(vectors)} {quantizer.dimensions}-dimensional "
+            f"vectors; wrote {options['output']}"
+        )
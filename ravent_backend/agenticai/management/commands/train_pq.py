@@ -0,0 +1,64 @@
+# agenticai/management/commands/train_pq.py
+
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from agenticai.ingestion import map_vectors
+from agenticai.quantization import train_product_quantizer
+
+
+def sample_store_vectors(limit, seed=0):
+    """
+    Up to `limit` vectors sampled uniformly from the chunk artifacts in
+    settings.RAG_STORE_ROOT, read through memory maps.
+    """
+    maps = [map_vectors(path) for path in sorted((Path(settings.RAG_STORE_ROOT) / "chunks").glob("*.npz"))]
+    maps = [vectors for vectors in maps if len(vectors)]
+    if not maps:
+        return np.zeros((0, 0), dtype=np.float32)
+    dimensions = maps[0].shape[1]
+    maps = [vectors for vectors in maps if vectors.shape[1] == dimensions]
+    offsets = np.cumsum([0] + [len(vectors) for vectors in maps])
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(offsets[-1], min(limit, offsets[-1]), replace=False))
+    sample = np.empty((len(rows), dimensions), dtype=np.float32)
+    owners = np.searchsorted(offsets, rows, side="right") - 1
+    for number, vectors in enumerate(maps):
+        selected = owners == number
+        sample[selected] = vectors[rows[selected] - offsets[number]]
+    return sample
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the product-quantisation codebook used when RAG_VECTOR_CODEC=pq, from "
+        "vectors sampled across the chunk artifacts in RAG_STORE_ROOT. Retrain after "
+        "changing RAG_EMBEDDER, then restart the workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=str(settings.RAG_PQ_CODEBOOK))
+        parser.add_argument("--sample", type=int, default=65536, help="Vectors to train on.")
+        parser.add_argument("--subspace-dimensions", type=int, default=4,
+                            help="Dimensions per one-byte code; 4 gives 16x smaller vectors than float32.")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        vectors = sample_store_vectors(options["sample"], options["seed"])
+        if len(vectors) < 256:
+            raise CommandError(f"Found {len(vectors)} vectors in {settings.RAG_STORE_ROOT}; need at least 256.")
+        try:
+            codec = train_product_quantizer(
+                vectors, options["subspace_dimensions"], iterations=options["iterations"], seed=options["seed"]
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        codec.save(options["output"])
+        self.stdout.write(
+            f"Trained {codec.subspaces} subspaces x {codec.clusters} centroids on {len(vectors)} "
+            f"{codec.dimensions}-dimensional vectors; wrote {options['output']}"
+        )
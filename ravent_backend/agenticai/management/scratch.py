@@ -0,0 +1,59 @@
+# agenticai/management/scratch.py
+"""
+Throwaway database for benchmark commands, so they never write to the
+configured one.
+"""
+
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import connections
+
+
+def drop_connections():
+    """
+    Close every open connection and forget it, so the next use connects
+    with the current connections.settings.
+    """
+    connections.close_all()
+    for connection in connections.all(initialized_only=True):
+        del connections[connection.alias]
+
+
+@contextmanager
+def scratch_database(prefix):
+    """
+    Point the default alias at a migrated SQLite database in a new temporary
+    directory, which is yielded for other scratch files (media, rag_store).
+    On exit the original database settings are restored and the directory is
+    removed. Only the scratch database is configured, so no replica alias is
+    left for the router to send reads to.
+    """
+    from django.conf import settings
+
+    directory = Path(tempfile.mkdtemp(prefix=prefix))
+    saved_databases = dict(connections.settings)
+    try:
+        drop_connections()
+        # Keep the SQLite tuning of the sqlite profile (WAL, busy timeout) so timings stay comparable.
+        db_options = settings.DATABASES["default"].get("OPTIONS", {}) if settings.DB_PROFILE == "sqlite" else {}
+        configured = connections.configure_settings({
+            "default": {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": str(directory / "db.sqlite3"),
+                "OPTIONS": dict(db_options),
+                "CONN_MAX_AGE": settings.DB_CONN_MAX_AGE,
+            }
+        })
+        connections.settings.clear()
+        connections.settings.update(configured)
+        call_command("migrate", verbosity=0, interactive=False)
+        yield directory
+    finally:
+        drop_connections()
+        connections.settings.clear()
+        connections.settings.update(saved_databases)
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,285 @@
+# agenticai/memory.py
+"""
+Bounded conversation memory for the chat endpoints.
+
+A Conversation's messages are an append-only log, one user and one
+assistant message per turn. The context of a new turn is the conversation's
+rolling summary plus its most recent turns, read with two indexed queries
+whatever the length of the conversation. Once CHAT_COMPACT_BATCH turns have
+fallen out of the last CHAT_HISTORY_TURNS, a background compactor folds them
+into the summary, which the summarizer keeps under CHAT_SUMMARY_MAX_CHARS.
+Until then they stay in the context, so no turn is ever missing from it and
+prompts are bounded by the summary plus CHAT_HISTORY_TURNS +
+CHAT_COMPACT_BATCH turns, each message clipped to CHAT_HISTORY_MESSAGE_CHARS.
+
+The summarizer is chosen with settings.CHAT_SUMMARIZER, like the answer
+generator; the default needs no model.
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Conversation, ConversationMessage
+
+logger = logging.getLogger(__name__)
+
+# Turns folded into the summary per step of a compaction.
+COMPACT_STEP = 64
+
+_sentence_end = re.compile(r"(?<=[.!?])\s")
+
+
+class Turn(NamedTuple):
+    number: int
+    query: str
+    answer: str
+
+
+class Context(NamedTuple):
+    """
+    What a new turn of a conversation knows about the previous ones.
+    """
+    conversation_id: int
+    summary: str
+    turns: list  # Turn, oldest first
+    turn_count: int
+
+
+def load_context(owner_id, conversation_id):
+    """
+    Summary and unsummarised recent turns of one of the owner's conversations.
+    Raises Conversation.DoesNotExist for a missing or foreign conversation.
+    """
+    from django.conf import settings
+
+    conversation = Conversation.objects.only("summary", "summary_through", "turn_count").get(
+        pk=conversation_id, owner_id=owner_id
+    )
+    window = settings.CHAT_HISTORY_TURNS + settings.CHAT_COMPACT_BATCH
+    first = max(conversation.summary_through, conversation.turn_count - window) + 1
+    return Context(
+        conversation_id, conversation.summary, _turns(conversation_id, first, conversation.turn_count),
+        conversation.turn_count,
+    )
+
+
+def _turns(conversation_id, first, last):
+    messages = (
+        ConversationMessage.objects.filter(conversation_id=conversation_id, turn__gte=first, turn__lte=last)
+        .order_by("turn", "role")
+        .values_list("turn", "role", "content")
+    )
+    turns = {}
+    for number, role, content in messages:
+        query, answer = turns.get(number, ("", ""))
+        turns[number] = (content, answer) if role == ConversationMessage.Role.USER else (query, content)
+    return [Turn(number, query, answer) for number, (query, answer) in turns.items()]
+
+
+def render_history(context):
+    """
+    The conversation so far as prompt text: the summary, then the recent
+    turns with every message clipped to settings.CHAT_HISTORY_MESSAGE_CHARS.
+    """
+    from django.conf import settings
+
+    limit = settings.CHAT_HISTORY_MESSAGE_CHARS
+    parts = [f"Summary of earlier turns:\n{context.summary}"] if context.summary else []
+    for turn in context.turns:
+        parts.append(f"User: {_clip(turn.query, limit)}\nAssistant: {_clip(turn.answer, limit)}")
+    return "\n\n".join(parts)
+
+
+def _clip(text, limit):
+    return text if len(text) <= limit else text[:limit].rstrip() + " ..."
+
+
+def record_turn(context, query, answer, sources=()):
+    """
+    Append a turn to the conversation. Returns its number, or None if the
+    conversation was deleted meanwhile. Schedules a compaction once enough
+    turns wait to be summarised.
+    """
+    from django.conf import settings
+
+    conversation_id = context.conversation_id
+    with transaction.atomic():
+        updated = Conversation.objects.filter(pk=conversation_id).update(
+            turn_count=F("turn_count") + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            return None
+        number, summary_through, title = (
+            Conversation.objects.filter(pk=conversation_id).values_list("turn_count", "summary_through", "title").get()
+        )
+        ConversationMessage.objects.bulk_create([
+            ConversationMessage(conversation_id=conversation_id, turn=number, role=ConversationMessage.Role.USER,
+                                content=query),
+            ConversationMessage(conversation_id=conversation_id, turn=number, role=ConversationMessage.Role.ASSISTANT,
+                                content=answer, sources=list(sources)),
+        ])
+        if not title:
+            Conversation.objects.filter(pk=conversation_id, title="").update(title=_clip(query, 80))
+    if number - summary_through - settings.CHAT_HISTORY_TURNS >= settings.CHAT_COMPACT_BATCH:
+        transaction.on_commit(lambda: get_compactor().submit(conversation_id))
+    return number
+
+
+def compact(conversation_id):
+    """
+    Fold every turn before the last settings.CHAT_HISTORY_TURNS into the
+    conversation's summary, COMPACT_STEP turns at a time. Safe to run
+    concurrently: a step only applies if no other one did in between.
+    """
+    from django.conf import settings
+
+    summarizer = get_summarizer()
+    while True:
+        state = Conversation.objects.filter(pk=conversation_id).values_list(
+            "summary", "summary_through", "turn_count"
+        ).first()
+        if state is None:
+            return
+        summary, through, count = state
+        stop = min(count - settings.CHAT_HISTORY_TURNS, through + COMPACT_STEP)
+        if stop <= through:
+            return
+        summary = summarizer.summarize(summary, _turns(conversation_id, through + 1, stop))
+        Conversation.objects.filter(pk=conversation_id, summary_through=through).update(
+            summary=summary, summary_through=stop
+        )
+
+
+class Compactor:
+    """
+    Runs `compact` on background threads, at most once at a time per
+    conversation; with no workers it runs inline.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-compactor") if workers else None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, conversation_id):
+        if self._executor is None:
+            compact(conversation_id)
+            return
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+        self._executor.submit(self._run, conversation_id)
+
+    def _run(self, conversation_id):
+        with self._lock:
+            self._pending.discard(conversation_id)
+        close_old_connections()
+        try:
+            compact(conversation_id)
+        except Exception:
+            logger.exception("Compacting conversation %s failed", conversation_id)
+        finally:
+            close_old_connections()
+
+
+class Summarizer:
+    """
+    Base class for conversation summarizers.
+    """
+
+    def __init__(self, max_chars=None):
+        from django.conf import settings
+
+        self.max_chars = max_chars or settings.CHAT_SUMMARY_MAX_CHARS
+
+    def summarize(self, summary, turns):
+        """
+        Return `summary` updated with `turns`, at most max_chars long.
+        """
+        raise NotImplementedError
+
+
+class ExtractiveSummarizer(Summarizer):
+    """
+    One line per turn: the question and the first sentence of its answer.
+    The oldest lines are dropped beyond max_chars. Needs no model.
+    """
+
+    def summarize(self, summary, turns):
+        lines = [summary] if summary else []
+        for turn in turns:
+            answer = _sentence_end.split(turn.answer.strip(), 1)[0]
+            lines.append(f"- Q: {_clip(' '.join(turn.query.split()), 200)} A: {_clip(' '.join(answer.split()), 200)}")
+        text = "\n".join(lines)
+        if len(text) > self.max_chars:
+            text = text[-self.max_chars:]
+            text = text[text.find("\n") + 1:] if "\n" in text else text
+        return text
+
+
+class OpenAISummarizer(Summarizer):
+    """
+    Asks an OpenAI chat model to fold the turns into the running summary.
+    """
+
+    def __init__(self, model="gpt-4o-mini", max_chars=None):
+        super().__init__(max_chars)
+        self.model = model
+
+    def summarize(self, summary, turns):
+        from openai import OpenAI
+
+        transcript = "\n\n".join(f"User: {turn.query}\nAssistant: {turn.answer}" for turn in turns)
+        response = OpenAI().chat.completions.create(
+            model=self.model,
+            temperature=0,
+            messages=[{
+                "role": "user",
+                "content": (
+                    f"Update the running summary of a conversation with the new turns below. Keep the facts, "
+                    f"names and open questions a later turn may refer to. Answer with the summary only, in at "
+                    f"most {self.max_chars} characters.\n\nSummary so far:\n{summary or '(none)'}\n\n"
+                    f"New turns:\n{transcript}"
+                ),
+            }],
+        )
+        return (response.choices[0].message.content or "")[:self.max_chars]
+
+
+_summarizers = {}
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+def get_summarizer():
+    """
+    Return the process-wide summarizer configured by settings.CHAT_SUMMARIZER.
+    """
+    from django.conf import settings
+
+    summarizer = _summarizers.get(settings.CHAT_SUMMARIZER)
+    if summarizer is None:
+        summarizer = _summarizers[settings.CHAT_SUMMARIZER] = import_string(settings.CHAT_SUMMARIZER)(
+            **settings.CHAT_SUMMARIZER_OPTIONS
+        )
+    return summarizer
+
+
+def get_compactor():
+    from django.conf import settings
+
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None or _compactor.workers != settings.CHAT_COMPACTION_WORKERS:
+            _compactor = Compactor(settings.CHAT_COMPACTION_WORKERS)
+        return _compactor
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:24
+
+import os
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_filenames(apps, schema_editor):
+    FileUpload = apps.get_model("agenticai", "FileUpload")
+    for upload in FileUpload.objects.filter(filename="").only("id", "file"):
+        upload.filename = os.path.basename(upload.file.name)
+        upload.save(update_fields=["filename"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenticai', '0002_fileupload_ingestion_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(max_length=255, upload_to='')),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='filename',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='fileupload',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='uploads/'),
+        ),
+        migrations.AddField(
+            model_name='fileupload',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='uploads', to='agenticai.storedblob'),
+        ),
+        migrations.RunPython(backfill_filenames, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenticai', '0003_content_addressed_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='chunk_manifest',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenticai', '0004_fileupload_chunk_manifest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileupload',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='fileupload',
+            index=models.Index(fields=['owner', '-uploaded_at', '-id'], name='fileupload_owner_keyset'),
+        ),
+        migrations.AddIndex(
+            model_name='fileupload',
+            index=models.Index(fields=['owner', 'updated_at'], name='fileupload_owner_updated'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agenticai', '0008_docset_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentsetversion',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
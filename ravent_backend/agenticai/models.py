@@ -1,25 +1,175 @@
 # agenticai/models.py
 
+import os
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class StoredBlob(models.Model):
+    """
+    One stored copy of an uploaded file's content, addressed by its SHA-256
+    and shared by every FileUpload with identical bytes (see agenticai/blobs.py).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class StorageTombstone(models.Model):
+    """
+    Stored content whose last reference is gone, waiting for the background
+    sweeper (agenticai/sweeper.py) to remove it from media storage together
+    with its chunk artifact.
+    """
+    # Storage name of the file to delete; empty when only an artifact is left.
+    name = models.CharField(max_length=255, blank=True, default="", db_index=True)
+    # Chunk artifact path relative to settings.RAG_STORE_ROOT.
+    artifact = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(db_index=True)
+    last_error = models.TextField(blank=True, default="")
+
+    def __str__(self):
+        return self.name or self.artifact
+
 
 class FileUpload(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        PROCESSING = "processing", "Processing"
+        INDEXED = "indexed", "Indexed"
+        FAILED = "failed", "Failed"
+
     owner = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name="uploaded_files"
     )
-    file = models.FileField(upload_to="uploads/")
+    file = models.FileField(upload_to="uploads/", max_length=255)
+    # Original client-side filename; `file` points at the shared blob.
+    filename = models.CharField(max_length=255, blank=True, default="")
+    blob = models.ForeignKey(
+        StoredBlob,
+        on_delete=models.PROTECT,
+        related_name="uploads",
+        null=True,
+        blank=True
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Ingestion job state (see agenticai/ingestion.py)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.QUEUED,
+        db_index=True
+    )
+    chunk_count = models.PositiveIntegerField(default=0)
+    # Chunk ids, [start, end) byte offsets and content hashes of the indexed chunks.
+    chunk_manifest = models.JSONField(default=dict, blank=True)
+    timings = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default="")
+    ingest_started_at = models.DateTimeField(null=True, blank=True)
+    indexed_at = models.DateTimeField(null=True, blank=True)
+    # Bumped on every change, including queryset .update() calls, for conditional GETs.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of an owner's files, newest first.
+            models.Index(fields=["owner", "-uploaded_at", "-id"], name="fileupload_owner_keyset"),
+            # Latest change of an owner's files (ETag / Last-Modified).
+            models.Index(fields=["owner", "updated_at"], name="fileupload_owner_updated"),
+        ]
+
     def __str__(self):
-        return f"{self.file.name} (by {self.owner.username})"
+        return f"{self.display_name} (by {self.owner.username})"
+
+    @property
+    def display_name(self):
+        return self.filename or os.path.basename(self.file.name)
 
-    def delete(self, using=None, keep_parents=False):
-        # First delete the file from storage
-        storage = self.file.storage
-        if self.file and storage.exists(self.file.name):
-            storage.delete(self.file.name)
 
-        # Then delete the model record
-        return super().delete(using=using, keep_parents=keep_parents)
+class Conversation(models.Model):
+    """
+    A chat session of one user. Its messages are an append-only log; the
+    turns before the recent window are folded into `summary` in the
+    background (see agenticai/memory.py), so building the context of a turn
+    reads this row and a bounded number of messages.
+    """
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="conversations"
+    )
+    title = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of the last turn recorded.
+    turn_count = models.PositiveIntegerField(default=0)
+    # Rolling summary of turns 1..summary_through.
+    summary = models.TextField(blank=True, default="")
+    summary_through = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # An owner's conversations, most recently active first.
+            models.Index(fields=["owner", "-updated_at"], name="conversation_owner_recent"),
+        ]
+
+    def __str__(self):
+        return self.title or f"Conversation {self.pk}"
+
+
+class ConversationMessage(models.Model):
+    class Role(models.TextChoices):
+        USER = "user", "User"
+        ASSISTANT = "assistant", "Assistant"
+
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name="messages"
+    )
+    # Turn number within the conversation; a turn is a user message and its answer.
+    turn = models.PositiveIntegerField()
+    role = models.CharField(max_length=16, choices=Role.choices)
+    content = models.TextField()
+    sources = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Also the index that reads the latest turns of a conversation.
+            models.UniqueConstraint(fields=["conversation", "turn", "role"], name="conversationmessage_turn_role"),
+        ]
+
+    def __str__(self):
+        return f"{self.conversation_id}#{self.turn} {self.role}"
+
+
+class DocumentSetVersion(models.Model):
+    """
+    Counter bumped whenever an owner's uploads change, with the time of the
+    last bump. The version is part of every cached answer's key
+    (agenticai/cache.py) and the time is the file listing's Last-Modified; both
+    live in the database so all workers see a bump at once.
+    """
+    owner = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="docset_version"
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.owner_id}: v{self.version}"
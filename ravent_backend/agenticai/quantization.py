@@ -0,0 +1,217 @@
+# agenticai/quantization.py
+"""
+Compact encodings for the resident vectors of an owner's VectorIndex.
+
+settings.RAG_VECTOR_CODEC selects one of:
+
+- "float32": the embeddings as they are (exact; 4 bytes per dimension).
+- "int8": scalar quantisation, one signed byte per dimension plus a float32
+  scale per row (about 4x smaller).
+- "pq": product quantisation. Vectors are cut into subspaces of a few
+  dimensions and each subspace is stored as the id of its nearest centroid,
+  one byte each (16x smaller with the default 4 dimensions per subspace).
+  The codebook is trained once per embedder with `manage.py train_pq` and
+  read from settings.RAG_PQ_CODEBOOK.
+
+Quantised codes only rank candidates: VectorIndex re-scores the best
+RAG_RESCORE_FACTOR x k of them against the float32 vectors memory-mapped
+from the chunk artifacts on disk, so returned scores are exact and recall is
+lost only when a true top-k row falls outside the candidates
+(`manage.py benchmark_quantization` measures it).
+
+Scoring works through the codes in blocks so the float32 temporaries stay
+small whatever the size of the index.
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows decoded per step while scoring: small enough for the float32 block to
+# stay in cache, which makes int8 scoring faster than a float32 matvec.
+BLOCK_ROWS = 256
+# Points per step while assigning centroids.
+ASSIGN_ROWS = 8192
+
+
+class Float32Codec:
+    name = key = "float32"
+    exact = True
+    dtype = np.float32
+
+    def width(self, dimensions):
+        return dimensions
+
+    def encode(self, vectors):
+        return np.asarray(vectors, dtype=np.float32)
+
+    def scores(self, codes, query):
+        return codes @ query
+
+
+class Int8Codec:
+    """
+    Each row is scaled so its largest component maps to +-127. A code row holds
+    the int8 values followed by the row's float32 scale, as raw bytes.
+    """
+    name = key = "int8"
+    exact = False
+    dtype = np.uint8
+
+    def width(self, dimensions):
+        return dimensions + 4
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        count, dimensions = vectors.shape
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        codes = np.empty((count, dimensions + 4), dtype=np.uint8)
+        codes[:, :dimensions] = np.rint(vectors / scales[:, None]).astype(np.int8).view(np.uint8)
+        codes[:, dimensions:] = scales.astype(np.float32)[:, None].view(np.uint8)
+        return codes
+
+    def scores(self, codes, query):
+        dimensions = codes.shape[1] - 4
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            values = block[:, :dimensions].view(np.int8).astype(np.float32) @ query
+            scales = np.ascontiguousarray(block[:, dimensions:]).view(np.float32)[:, 0]
+            scores[start:start + len(block)] = values * scales
+        return scores
+
+
+class ProductQuantizationCodec:
+    """
+    `centroids` has shape (subspaces, 256, dimensions // subspaces). Scores
+    are asymmetric: the float32 query is dotted with every centroid once,
+    then each row's score is the sum of its subspaces' table entries.
+    """
+    name = "pq"
+    exact = False
+    dtype = np.uint8
+
+    def __init__(self, centroids):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.subspaces, self.clusters, self.subspace_dimensions = self.centroids.shape
+        self.dimensions = self.subspaces * self.subspace_dimensions
+        self._offsets = np.arange(self.subspaces, dtype=np.intp) * self.clusters
+        # Identifies the codebook, e.g. in saved index segments.
+        self.key = "pq-" + hashlib.sha256(self.centroids.tobytes()).hexdigest()[:16]
+
+    def width(self, dimensions):
+        return self.subspaces
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        parts = vectors.reshape(len(vectors), self.subspaces, self.subspace_dimensions)
+        for subspace in range(self.subspaces):
+            codes[:, subspace] = _nearest(parts[:, subspace], self.centroids[subspace])
+        return codes
+
+    def scores(self, codes, query):
+        table = np.einsum(
+            "scd,sd->sc", self.centroids, np.asarray(query, dtype=np.float32).reshape(self.subspaces, -1)
+        ).ravel()
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            block = codes[start:start + BLOCK_ROWS]
+            scores[start:start + len(block)] = table.take(block + self._offsets).sum(axis=1)
+        return scores
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(path.name + ".tmp")
+        with open(temporary, "wb") as handle:
+            np.savez(handle, centroids=self.centroids)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["centroids"])
+
+
+def _nearest(points, centroids):
+    """
+    Index of the nearest centroid (squared L2) for each point, in blocks.
+    """
+    # argmin |p - c|^2 == argmax p.c - |c|^2 / 2
+    half_norms = (centroids * centroids).sum(axis=1) / 2
+    transposed = np.ascontiguousarray(centroids.T)
+    nearest = np.empty(len(points), dtype=np.intp)
+    for start in range(0, len(points), ASSIGN_ROWS):
+        products = points[start:start + ASSIGN_ROWS] @ transposed
+        products -= half_norms
+        nearest[start:start + len(products)] = np.argmax(products, axis=1)
+    return nearest
+
+
+def train_product_quantizer(vectors, subspace_dimensions=4, clusters=256, iterations=20, seed=0):
+    """
+    Train a ProductQuantizationCodec on a sample of vectors with k-means per subspace.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    count, dimensions = vectors.shape
+    if dimensions % subspace_dimensions:
+        raise ValueError(f"{dimensions} dimensions do not split into subspaces of {subspace_dimensions}.")
+    if count < clusters:
+        raise ValueError(f"Need at least {clusters} vectors to train, got {count}.")
+    rng = np.random.default_rng(seed)
+    subspaces = dimensions // subspace_dimensions
+    parts = vectors.reshape(count, subspaces, subspace_dimensions)
+    centroids = np.empty((subspaces, clusters, subspace_dimensions), dtype=np.float32)
+    for subspace in range(subspaces):
+        points = np.ascontiguousarray(parts[:, subspace])
+        centres = points[rng.choice(count, clusters, replace=False)].copy()
+        for _ in range(iterations):
+            assigned = _nearest(points, centres)
+            sizes = np.bincount(assigned, minlength=clusters)
+            sums = np.stack(
+                [np.bincount(assigned, points[:, column], clusters) for column in range(subspace_dimensions)], axis=1
+            )
+            empty = sizes == 0
+            centres[~empty] = sums[~empty] / sizes[~empty, None]
+            # Restart empty clusters on random points.
+            centres[empty] = points[rng.choice(count, int(empty.sum()), replace=False)]
+        centroids[subspace] = centres
+    return ProductQuantizationCodec(centroids)
+
+
+_codecs = {}
+
+
+def get_codec():
+    """
+    The process-wide codec selected by settings.RAG_VECTOR_CODEC. Without a
+    trained codebook "pq" falls back to "int8".
+    """
+    from django.conf import settings
+
+    name = settings.RAG_VECTOR_CODEC
+    codec = _codecs.get(name)
+    if codec is None:
+        if name == "float32":
+            codec = Float32Codec()
+        elif name == "int8":
+            codec = Int8Codec()
+        elif name == "pq":
+            try:
+                codec = ProductQuantizationCodec.load(settings.RAG_PQ_CODEBOOK)
+            except FileNotFoundError:
+                logger.warning(
+                    "No PQ codebook at %s (run `manage.py train_pq`); using int8 vectors.", settings.RAG_PQ_CODEBOOK
+                )
+                codec = Int8Codec()
+        else:
+            raise ValueError(f"Unknown RAG_VECTOR_CODEC {name!r}; use float32, int8 or pq.")
+        _codecs[name] = codec
+    return codec
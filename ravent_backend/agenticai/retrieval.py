@@ -0,0 +1,655 @@
+# agenticai/retrieval.py
+"""
+In-process vector retrieval over each owner's indexed uploads.
+
+Every owner gets a VectorIndex: one contiguous matrix holding the
+L2-normalised chunk embeddings of all their INDEXED FileUploads, loaded file by
+file from the artifacts written by agenticai/ingestion.py. Cosine top-k is a
+single matrix-vector product followed by `np.argpartition`. With a quantised
+RAG_VECTOR_CODEC (agenticai/quantization.py) the matrix holds compact codes,
+and the best candidates are re-scored against the float32 vectors
+memory-mapped from the artifacts. Owners with many chunks can search
+inverted lists instead of every row (RAG_ANN_INDEX, agenticai/ann.py).
+
+IndexRegistry holds the indexes of recently active owners under a memory
+budget and memory-maps the others back from their saved segments
+(agenticai/shards.py) when they return.
+"""
+
+import logging
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from dataclasses import dataclass
+
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from ravent_backend import metrics
+
+from .ann import InvertedLists, gather, get_ann
+from . import shards
+from .embeddings import get_embedder
+from .ingestion import artifact_path_for, map_vectors, read_artifact
+from .lexical import LexicalIndex, reciprocal_rank_fusion, tokenize
+from .quantization import Float32Codec, get_codec
+
+logger = logging.getLogger(__name__)
+
+# Candidates taken from each ranking before fusion, as a multiple of k.
+FUSION_DEPTH = 4
+
+
+@dataclass
+class Hit:
+    upload_id: int
+    position: int
+    filename: str
+    text: str
+    score: float
+    # What `score` measures: "vector" (cosine similarity) or "lexical" (BM25
+    # relative to the query, see LexicalIndex.search).
+    source: str = "vector"
+
+    @property
+    def key(self):
+        return (self.upload_id, self.position)
+
+
+class VectorIndex:
+    """
+    Search index over one owner's chunk embeddings, maintained file by file.
+
+    Rows live in one contiguous matrix of `codec` codes with spare capacity.
+    Each file occupies a contiguous row range, so removing it only flags those
+    rows dead (O(chunks of the file)); dead rows are compacted away once they
+    make up half of the matrix. Searches work on a snapshot and never block on
+    writers. The same files' BM25 segments are kept alongside in `lexical`.
+
+    When the codec is not exact, each file's float32 vectors are kept as given
+    to `add_file` (normally a read-only memory map of its artifact) and a
+    search re-scores its best `rescore_factor` x k candidates with them.
+
+    With an IVFQuantizer as `ann`, every row's partition is kept in
+    `assignments` and `lists`, and once at least `ann_min_rows` rows are live
+    a search scores only the rows of its `nprobe` nearest partitions.
+    """
+
+    def __init__(self, codec=None, rescore_factor=4, ann=None, nprobe=16, ann_min_rows=0):
+        self.codec = codec or Float32Codec()
+        self.rescore_factor = rescore_factor
+        self.ann = ann
+        self.nprobe = nprobe
+        self.ann_min_rows = ann_min_rows
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.lists = InvertedLists(ann.lists) if ann is not None else None
+        self.codes = np.zeros((0, 0), dtype=self.codec.dtype)
+        self.full = {}
+        self.artifacts = {}
+        self._dimensions = 0
+        self.upload_ids = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.texts = shards.ChunkTexts()
+        self.size = 0
+        self.dead = 0
+        self.ranges = {}
+        self.versions = {}
+        self.filenames = {}
+        self.lexical = LexicalIndex()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.size - self.dead
+
+    @property
+    def dimensions(self):
+        return self._dimensions
+
+    @property
+    def nbytes(self):
+        """
+        Resident bytes of the row arrays (codes, owners, liveness, inverted
+        lists), excluding texts.
+        """
+        nbytes = self.codes.nbytes + self.upload_ids.nbytes + self.alive.nbytes
+        if self.lists is not None:
+            nbytes += self.assignments.nbytes + self.lists.nbytes
+        return nbytes
+
+    def add_file(self, upload_id, filename, version, texts, vectors, segment=None, full=None, assignments=None,
+                 artifact=None):
+        """
+        Append a file's chunks, replacing any rows it had before. `full` holds
+        the file's float32 vectors for re-scoring (default: `vectors`), and
+        `assignments` their IVF partitions (default: computed). `artifact` is
+        the path they were read from, recorded in saved segments.
+
+        Returns False when the file's embedding size does not fit the index or
+        the PQ codebook: its old rows are dropped and nothing of it is kept, so
+        it is not taken for indexed and the next sync tries it again.
+        """
+        with self._lock:
+            self._remove(upload_id)
+            count = len(texts)
+            if count:
+                width = vectors.shape[1]
+                codec_dimensions = getattr(self.codec, "dimensions", None)
+                if codec_dimensions is not None and width != codec_dimensions:
+                    logger.warning(
+                        "Skipping FileUpload %s: embedding size %s != the PQ codebook's %s; retrain it with "
+                        "`manage.py train_pq` after changing RAG_EMBEDDER.",
+                        upload_id, width, codec_dimensions,
+                    )
+                    return False
+                if self.size and width != self._dimensions:
+                    logger.warning(
+                        "Skipping FileUpload %s: embedding size %s != %s; re-ingest files after changing "
+                        "RAG_EMBEDDER.",
+                        upload_id, width, self._dimensions,
+                    )
+                    return False
+                if width != self._dimensions:
+                    self._dimensions = width
+                    self.codes = np.zeros((0, self.codec.width(width)), dtype=self.codec.dtype)
+                    self.upload_ids = np.zeros(0, dtype=np.int64)
+                    self.alive = np.zeros(0, dtype=bool)
+                    self.assignments = np.zeros(0, dtype=np.int32)
+                    if self.ann is not None and self.ann.dimensions != width:
+                        logger.warning(
+                            "Embedding size %s != the IVF centroids' %s; using exact search. Retrain them with "
+                            "`manage.py train_ivf` after changing RAG_EMBEDDER.",
+                            width, self.ann.dimensions,
+                        )
+                        self.ann = self.lists = None
+                    elif self.ann is not None:
+                        self.lists = InvertedLists(self.ann.lists)
+            # Only a file whose vectors are accepted is registered.
+            if segment is not None and count:
+                self.lexical.add_file(upload_id, segment)
+            self.filenames[upload_id] = filename
+            self.versions[upload_id] = version
+            if artifact is not None:
+                self.artifacts[upload_id] = artifact
+            if not count:
+                self.ranges[upload_id] = (self.size, self.size)
+                return True
+            self._reserve(self.size + count)
+            start, stop = self.size, self.size + count
+            self.codes[start:stop] = self.codec.encode(vectors)
+            if not self.codec.exact:
+                self.full[upload_id] = vectors if full is None else full
+            self.upload_ids[start:stop] = upload_id
+            self.alive[start:stop] = True
+            if self.lists is not None:
+                if assignments is None:
+                    assignments = self.ann.assign(vectors)
+                self.assignments[start:stop] = assignments
+                self.lists.add(start, self.assignments[start:stop])
+            self.texts.extend(texts)
+            self.ranges[upload_id] = (start, stop)
+            self.size = stop
+            return True
+
+    def remove_file(self, upload_id):
+        with self._lock:
+            self._remove(upload_id)
+            if self.dead and self.dead * 2 >= self.size:
+                self._compact()
+
+    def _remove(self, upload_id):
+        self.lexical.remove_file(upload_id)
+        self.versions.pop(upload_id, None)
+        self.filenames.pop(upload_id, None)
+        self.full.pop(upload_id, None)
+        self.artifacts.pop(upload_id, None)
+        bounds = self.ranges.pop(upload_id, None)
+        if bounds is None:
+            return
+        start, stop = bounds
+        self.alive[start:stop] = False
+        self.dead += stop - start
+
+    def _reserve(self, capacity):
+        if capacity <= len(self.alive):
+            return
+        capacity = max(capacity, 2 * len(self.alive), 1024)
+        codes = np.zeros((capacity, self.codes.shape[1]), dtype=self.codec.dtype)
+        codes[:self.size] = self.codes[:self.size]
+        upload_ids = np.zeros(capacity, dtype=np.int64)
+        upload_ids[:self.size] = self.upload_ids[:self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        if self.lists is not None:
+            assignments = np.zeros(capacity, dtype=np.int32)
+            assignments[:self.size] = self.assignments[:self.size]
+            self.assignments = assignments
+        # Swap in new arrays instead of resizing so running searches keep a valid snapshot.
+        self.codes, self.upload_ids, self.alive = codes, upload_ids, alive
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive[:self.size])
+        self.codes = np.ascontiguousarray(self.codes[keep])
+        self.upload_ids = self.upload_ids[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        if self.lists is not None:
+            self.assignments = self.assignments[keep]
+            self.lists = InvertedLists.build(self.assignments, self.ann.lists)
+        self.texts = shards.ChunkTexts(self.texts[row] for row in keep.tolist())
+        self.ranges = {}
+        for row, upload_id in enumerate(self.upload_ids.tolist()):
+            start, _ = self.ranges.get(upload_id, (row, row))
+            self.ranges[upload_id] = (start, row + 1)
+        for upload_id in self.versions:
+            self.ranges.setdefault(upload_id, (0, 0))
+        self.size = len(keep)
+        self.dead = 0
+
+    def search(self, query_vector, k):
+        """
+        Return the `k` live rows most similar to `query_vector` as
+        (upload_id, position, filename, text, score) tuples, best first.
+        The query is expected to be L2-normalised.
+        """
+        with self._lock:
+            size, codes, alive = self.size, self.codes, self.alive
+            upload_ids, texts, filenames = self.upload_ids, self.texts, self.filenames
+            ranges = self.ranges
+            full = dict(self.full) if not self.codec.exact else None
+            has_dead = self.dead > 0
+            lists = None
+            if self.lists is not None and self.size - self.dead >= self.ann_min_rows:
+                lists = self.lists.snapshot()
+        if not size or k <= 0:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if query_vector.shape[0] != self.dimensions:
+            logger.warning(
+                "Query has %s dimensions but the index has %s; re-ingest files after changing RAG_EMBEDDER.",
+                query_vector.shape[0], self.dimensions,
+            )
+            return []
+        if lists is not None:
+            candidates = gather(lists, self.ann.probe(query_vector, self.nprobe))
+            if has_dead:
+                candidates = candidates[alive[candidates]]
+            scores = self.codec.scores(codes[candidates], query_vector)
+        else:
+            candidates = None
+            scores = self.codec.scores(codes[:size], query_vector)
+            if has_dead:
+                scores[~alive[:size]] = -np.inf
+        order = _top(scores, k if full is None else k * self.rescore_factor)
+        rows, scores = (order if candidates is None else candidates[order]), scores[order]
+        if full is not None:
+            finite = np.isfinite(scores)
+            rows, scores = rows[finite], _rescore(rows[finite], scores[finite], query_vector, upload_ids, ranges, full)
+            order = np.argsort(-scores)[:k]
+            rows, scores = rows[order], scores[order]
+        results = []
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            if not math.isfinite(score):
+                break
+            upload_id = int(upload_ids[row])
+            position = row - ranges.get(upload_id, (row, row))[0]
+            results.append((upload_id, position, filenames.get(upload_id, ""), texts[row], score))
+        return results
+
+    def hits(self, query_vector, k):
+        """
+        Top-k vector Hits with duplicate passages (the same content uploaded twice) collapsed.
+        """
+        return _distinct(
+            (Hit(upload_id, position, filename, text, score)
+             for upload_id, position, filename, text, score in self.search(query_vector, 2 * k)),
+            k,
+        )
+
+    def lexical_hits(self, terms, k):
+        """
+        Top-k BM25 Hits for already tokenised query terms; no embedding needed.
+        """
+        with self._lock:
+            texts, ranges, filenames = self.texts, self.ranges, self.filenames
+            results = []
+            for upload_id, position, score in self.lexical.search(terms, 2 * k):
+                if upload_id in ranges:
+                    text = texts[ranges[upload_id][0] + position]
+                    results.append(Hit(upload_id, position, filenames.get(upload_id, ""), text, score, "lexical"))
+        return _distinct(results, k)
+
+
+def _top(scores, k):
+    """
+    Rows of the `k` highest scores, best first.
+    """
+    if k < len(scores):
+        rows = np.argpartition(scores, -k)[-k:]
+    else:
+        rows = np.arange(len(scores))
+    return rows[np.argsort(-scores[rows])]
+
+
+def _rescore(rows, scores, query_vector, upload_ids, ranges, full):
+    """
+    Exact scores of `rows` from each file's float32 vectors; rows of files
+    without them keep their approximate score from `scores`.
+    """
+    scores = scores.copy()
+    owners = upload_ids[rows]
+    for upload_id in np.unique(owners).tolist():
+        vectors, bounds = full.get(upload_id), ranges.get(upload_id)
+        if vectors is None or bounds is None:
+            continue
+        selected = owners == upload_id
+        positions = rows[selected] - bounds[0]
+        scores[selected] = np.asarray(vectors[positions], dtype=np.float32) @ query_vector
+    return scores
+
+
+def _distinct(hits, k):
+    distinct, seen = [], set()
+    for hit in hits:
+        if hit.text in seen:
+            continue
+        seen.add(hit.text)
+        distinct.append(hit)
+        if len(distinct) == k:
+            break
+    return distinct
+
+
+def load_file(index, upload):
+    """
+    Add one INDEXED FileUpload (with `blob` selected) to an index from its
+    artifact; returns whether it was added.
+    """
+    path = artifact_path_for(upload)
+    try:
+        artifact = read_artifact(path)
+    except FileNotFoundError:
+        logger.warning("Missing chunk artifact for FileUpload %s at %s", upload.pk, path)
+        return False
+    full = None if index.codec.exact or not len(artifact.texts) else map_vectors(path)
+    ann = index.ann
+    assignments = None if ann is None or not len(artifact.texts) else ann.load_assignments(path, artifact.vectors)
+    return index.add_file(
+        upload.pk, upload.display_name, upload.indexed_at,
+        artifact.texts, artifact.vectors, artifact.lexical, full, assignments, path,
+    )
+
+
+class IndexRegistry:
+    """
+    Per-process shard manager of owner indexes.
+
+    An owner's index is loaded on first use, memory-mapped from its saved
+    segment when there is one, else built from the chunk artifacts. On each
+    lookup the owner's indexed uploads (id and indexed_at) are compared with
+    what the index holds, only the files that were added, re-indexed or
+    removed are applied, and the segment is then rewritten in the background.
+
+    Indexes are kept in LRU order. When their estimated footprint exceeds
+    settings.RAG_INDEX_MEMORY_BUDGET the least recently used ones are dropped,
+    except the owners in settings.RAG_INDEX_PINNED_OWNERS or pinned with
+    `pin`, so memory follows the active owners rather than all of them.
+    `prewarm` loads an index in the background, e.g. right after login.
+    """
+
+    def __init__(self):
+        self._indexes = OrderedDict()
+        self._footprints = {}
+        self._owner_locks = {}
+        self._pinned = set()
+        self._pending_saves = set()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def get(self, owner_id):
+        from .models import FileUpload
+
+        current = dict(
+            FileUpload.objects.filter(owner_id=owner_id, status=FileUpload.Status.INDEXED)
+            .values_list("id", "indexed_at")
+        )
+        with self._owner_lock(owner_id):
+            with self._lock:
+                index = self._indexes.get(owner_id)
+                if index is not None:
+                    self._indexes.move_to_end(owner_id)
+            if index is None:
+                index = self._load(owner_id)
+                with self._lock:
+                    self._indexes[owner_id] = index
+            if self._sync(index, current):
+                self._save_later(owner_id, index)
+        with self._lock:
+            self._footprints[owner_id] = _footprint(index)
+            self._evict(owner_id)
+        return index
+
+    def _owner_lock(self, owner_id):
+        with self._lock:
+            return self._owner_locks.setdefault(owner_id, threading.Lock())
+
+    def _load(self, owner_id):
+        from django.conf import settings
+
+        index = VectorIndex(
+            get_codec(), settings.RAG_RESCORE_FACTOR,
+            get_ann(), settings.RAG_IVF_NPROBE, settings.RAG_ANN_MIN_ROWS,
+        )
+        restored = shards.restore(index, segment_path(owner_id))
+        metrics.registry.inc("ravent_index_shard_loads_total", ("segment" if restored else "artifacts",))
+        return index
+
+    def _sync(self, index, current):
+        """
+        Apply the uploads that changed since the index was loaded; True if
+        that changed the index. Uploads that could not be added are tried
+        again on the next sync.
+        """
+        from .models import FileUpload
+
+        stale = [upload_id for upload_id in index.versions if upload_id not in current]
+        changed = [
+            upload_id for upload_id, version in current.items()
+            if index.versions.get(upload_id, None) != version
+        ]
+        for upload_id in stale:
+            index.remove_file(upload_id)
+        modified = bool(stale)
+        if changed:
+            uploads = FileUpload.objects.filter(pk__in=changed).select_related("blob").order_by("id")
+            for upload in uploads:
+                had_rows = upload.pk in index.versions
+                modified = load_file(index, upload) or had_rows or modified
+        return modified
+
+    def _evict(self, keep):
+        from django.conf import settings
+
+        budget = settings.RAG_INDEX_MEMORY_BUDGET
+        if budget <= 0:
+            return
+        pinned = self._pinned.union(settings.RAG_INDEX_PINNED_OWNERS)
+        total = sum(self._footprints.values())
+        for owner_id in list(self._indexes):
+            if total <= budget:
+                break
+            if owner_id == keep or owner_id in pinned:
+                continue
+            del self._indexes[owner_id]
+            total -= self._footprints.pop(owner_id, 0)
+            lock = self._owner_locks.get(owner_id)
+            if lock is not None and not lock.locked():
+                del self._owner_locks[owner_id]
+            metrics.registry.inc("ravent_index_shard_evictions_total", ())
+
+    def pin(self, owner_id):
+        with self._lock:
+            self._pinned.add(owner_id)
+
+    def unpin(self, owner_id):
+        with self._lock:
+            self._pinned.discard(owner_id)
+
+    def prewarm(self, owner_id):
+        """
+        Load an owner's index in the background.
+        """
+        self._submit(self._prewarm, owner_id)
+
+    def _prewarm(self, owner_id):
+        from django.db import close_old_connections
+
+        close_old_connections()
+        try:
+            self.get(owner_id)
+        except Exception:
+            logger.exception("Prewarming the index of owner %s failed", owner_id)
+        finally:
+            close_old_connections()
+
+    def _save_later(self, owner_id, index):
+        # The path is resolved now: settings may differ by the time the task runs.
+        path = segment_path(owner_id)
+        with self._lock:
+            if owner_id in self._pending_saves:
+                return
+            self._pending_saves.add(owner_id)
+        self._submit(self._save, owner_id, index, path)
+
+    def _save(self, owner_id, index, path):
+        with self._lock:
+            self._pending_saves.discard(owner_id)
+        try:
+            if index.versions:
+                shards.save(index, path)
+            else:
+                path.unlink(missing_ok=True)
+        except Exception:
+            logger.exception("Saving the index segment of owner %s failed", owner_id)
+
+    def _submit(self, function, *args):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-shards")
+            executor = self._executor
+        executor.submit(function, *args)
+
+    def wait(self):
+        """
+        Block until the background loads and saves submitted so far are done.
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+    def discard(self, owner_id, upload_id):
+        """
+        Drop one upload's rows from an owner's index, e.g. right after it is deleted.
+        """
+        index = self._indexes.get(owner_id)
+        if index is not None:
+            index.remove_file(upload_id)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+            self._footprints.clear()
+
+
+def segment_path(owner_id):
+    from django.conf import settings
+
+    return Path(settings.RAG_STORE_ROOT) / "indexes" / f"{owner_id}.npz"
+
+
+def _footprint(index):
+    """
+    Estimated resident bytes of an index: row arrays, texts and BM25 segments.
+    """
+    lexical = sum(
+        sum(array.nbytes for array in segment) for segment in list(index.lexical.segments.values())
+    )
+    return index.nbytes + index.texts.nbytes + lexical
+
+
+registry = IndexRegistry()
+
+
+def _keyword_stage(index, query, k):
+    """
+    Run the BM25 side of a query. Returns (hits, keyword_hits): `hits` is the
+    final answer when no embedding is needed, otherwise None.
+    """
+    from django.conf import settings
+
+    mode = settings.RAG_RETRIEVAL_MODE
+    terms = tokenize(query)
+    if mode == "lexical":
+        return index.lexical_hits(terms, k), []
+    if mode != "hybrid":
+        return None, []
+    keyword_hits = index.lexical_hits(terms, k * FUSION_DEPTH)
+    if keyword_hits and len(terms) <= settings.RAG_KEYWORD_QUERY_MAX_TERMS:
+        return keyword_hits[:k], keyword_hits
+    return None, keyword_hits
+
+
+def _vector_stage(index, query_vector, keyword_hits, k):
+    vector_hits = index.hits(query_vector, k * FUSION_DEPTH)
+    if not keyword_hits:
+        return vector_hits[:k]
+    by_key = {hit.key: hit for hit in keyword_hits}
+    by_key.update((hit.key, hit) for hit in vector_hits)
+    fused = reciprocal_rank_fusion([[hit.key for hit in vector_hits], [hit.key for hit in keyword_hits]])
+    return [by_key[key] for key in fused[:k]]
+
+
+def retrieve(owner_id, query, k=None):
+    """
+    Return the top-k chunks of the owner's documents for a query.
+
+    settings.RAG_RETRIEVAL_MODE selects "vector", "lexical" (BM25 only) or
+    "hybrid". In hybrid mode short keyword queries that BM25 can answer skip
+    the embedder entirely; otherwise vector and BM25 rankings are combined
+    with reciprocal-rank fusion.
+    """
+    from django.conf import settings
+
+    with metrics.span("retrieval"):
+        index = registry.get(owner_id)
+        if not len(index):
+            return []
+        k = k or settings.RAG_TOP_K
+        hits, keyword_hits = _keyword_stage(index, query, k)
+        if hits is not None:
+            return hits
+        with metrics.span("embedding"):
+            query_vector = get_embedder().embed_query(query)
+        return _vector_stage(index, query_vector, keyword_hits, k)
+
+
+async def aretrieve(owner_id, query, k=None):
+    """
+    Async variant of `retrieve`. The query embedding is awaited on the event
+    loop rather than in the shared sync thread, so concurrent streaming
+    requests reach the embedder together and can be batched.
+    """
+    from django.conf import settings
+
+    with metrics.span("retrieval"):
+        index = await sync_to_async(registry.get)(owner_id)
+        if not len(index):
+            return []
+        k = k or settings.RAG_TOP_K
+        hits, keyword_hits = _keyword_stage(index, query, k)
+        if hits is not None:
+            return hits
+        with metrics.span("embedding"):
+            query_vector = await get_embedder().aembed_query(query)
+        return _vector_stage(index, query_vector, keyword_hits, k)
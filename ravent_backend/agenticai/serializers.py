@@ -1,7 +1,7 @@
 # agenticai/serializers.py
 
 from rest_framework import serializers
-from .models import FileUpload
+from .models import Conversation, ConversationMessage, FileUpload
 import os
 
 
@@ -13,15 +13,40 @@ class FileUploadSerializer(serializers.ModelSerializer):
     file = serializers.FileField(
         help_text="Upload a PDF, DOCX, or TXT file. Server‐enforced size limits apply."
     )
+    filename = serializers.CharField(
+        read_only=True,
+        help_text="Original name of the uploaded file."
+    )
     uploaded_at = serializers.DateTimeField(
         read_only=True,
         help_text="Timestamp when the file was uploaded."
     )
+    status = serializers.ChoiceField(
+        choices=FileUpload.Status.choices,
+        read_only=True,
+        help_text="Ingestion state: queued, processing, indexed or failed."
+    )
+    chunk_count = serializers.IntegerField(
+        read_only=True,
+        help_text="Number of chunks embedded for this file."
+    )
+    timings = serializers.JSONField(
+        read_only=True,
+        help_text="Per-stage ingestion timings in milliseconds."
+    )
+    indexed_at = serializers.DateTimeField(
+        read_only=True,
+        help_text="Timestamp when ingestion finished, if it has."
+    )
+    error = serializers.CharField(
+        read_only=True,
+        help_text="Reason for a failed ingestion, empty otherwise."
+    )
 
     class Meta:
         model = FileUpload
-        fields = ("id", "file", "uploaded_at")
-        read_only_fields = ("id", "uploaded_at")
+        fields = ("id", "file", "filename", "uploaded_at", "status", "chunk_count", "timings", "indexed_at", "error")
+        read_only_fields = ("id", "filename", "uploaded_at", "status", "chunk_count", "timings", "indexed_at", "error")
 
     def validate_file(self, value):
         """
@@ -37,6 +62,29 @@ class FileUploadSerializer(serializers.ModelSerializer):
         return value
 
 
+class FileUploadPageSerializer(serializers.Serializer):
+    """
+    One page of the file listing (documentation only; see agenticai/pagination.py).
+    """
+    next = serializers.URLField(
+        allow_null=True,
+        help_text="URL of the next (older) page, or null on the last page."
+    )
+    results = FileUploadSerializer(many=True)
+
+
+class FileUploadBulkDeleteSerializer(serializers.Serializer):
+    """
+    Request body of the bulk delete endpoint.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=1000,
+        help_text="IDs of the files to delete."
+    )
+
+
 class ChatRequestSerializer(serializers.Serializer):
     """
     Serializer for the chat request body.
@@ -44,6 +92,11 @@ class ChatRequestSerializer(serializers.Serializer):
     query = serializers.CharField(
         help_text="The user's question in plain text."
     )
+    conversation = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text="ID of one of your conversations to answer in; omit for a standalone question."
+    )
 
 
 class ChatContentSerializer(serializers.Serializer):
@@ -54,14 +107,23 @@ class ChatContentSerializer(serializers.Serializer):
         help_text="Echoed‐back user query."
     )
     answer = serializers.CharField(
-        help_text="The (dummy) answer to the query."
+        help_text="The answer to the query, grounded in the user's documents."
     )
     type = serializers.CharField(
-        help_text="Category of the response (e.g., Knowledge/RAG)."
+        help_text="Source of the answer: Knowledge/RAG or Web Search."
     )
     sources = serializers.ListField(
-        child=serializers.CharField(help_text="Filename of a source document."),
-        help_text="List of source filenames used to generate the answer."
+        child=serializers.CharField(help_text="Filename of a source document, or URL of a web result."),
+        help_text="List of sources used to generate the answer."
+    )
+    conversation = serializers.IntegerField(
+        required=False,
+        help_text="Conversation the turn was recorded in (only when one was given)."
+    )
+    turn = serializers.IntegerField(
+        required=False,
+        allow_null=True,
+        help_text="Number of the turn within the conversation."
     )
 
 
@@ -70,3 +132,21 @@ class ChatResponseSerializer(serializers.Serializer):
     Wrapper serializer for chat response, nesting ChatContentSerializer under 'content'.
     """
     content = ChatContentSerializer()
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """
+    A chat session. `summary` covers the turns that fell out of the recent
+    window (see agenticai/memory.py).
+    """
+    class Meta:
+        model = Conversation
+        fields = ["id", "title", "turn_count", "summary", "created_at", "updated_at"]
+        read_only_fields = ["id", "turn_count", "summary", "created_at", "updated_at"]
+
+
+class ConversationMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConversationMessage
+        fields = ["turn", "role", "content", "sources", "created_at"]
+        read_only_fields = fields
@@ -0,0 +1,175 @@
+# agenticai/shards.py
+"""
+On-disk segments of owner indexes.
+
+Each owner's VectorIndex is saved as one uncompressed .npz under
+RAG_STORE_ROOT/indexes/ holding its live rows only: the codes, IVF
+assignments, chunk texts as one UTF-8 buffer with offsets, the BM25 segment
+of every file, and a JSON table of the files (row range, indexed_at,
+artifact). Restoring a segment memory-maps every array, so an owner's first
+query after a restart (or after eviction) costs a few page faults instead of
+reading and re-encoding each chunk artifact. Texts are decoded per hit.
+
+A segment records the codec and IVF centroids it was written with and is
+ignored when either changed; the caller then rebuilds the index from the
+artifacts. Segments may lag the database: the registry applies whatever
+changed since, as it does for an index held in memory.
+"""
+
+import json
+import logging
+import os
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from .ann import InvertedLists
+from .ingestion import map_members, map_vectors
+from .lexical import LexicalSegment
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_FORMAT = 1
+
+
+class ChunkTexts:
+    """
+    Chunk texts by row: a read-only UTF-8 buffer with offsets (memory-mapped
+    from a segment), followed by texts appended since as a list.
+    """
+
+    def __init__(self, texts=(), buffer=None, offsets=None):
+        self.buffer = np.zeros(0, dtype=np.uint8) if buffer is None else buffer
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self.base = len(self.offsets) - 1
+        self.appended = list(texts)
+        self._appended_bytes = sum(len(text) for text in self.appended)
+
+    def __len__(self):
+        return self.base + len(self.appended)
+
+    def __getitem__(self, row):
+        if row >= self.base:
+            return self.appended[row - self.base]
+        return bytes(self.buffer[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def extend(self, texts):
+        texts = list(texts)
+        self.appended.extend(texts)
+        self._appended_bytes += sum(len(text) for text in texts)
+
+    @property
+    def nbytes(self):
+        # Appended texts are counted at about a character a byte plus the str header.
+        return self.buffer.nbytes + self.offsets.nbytes + self._appended_bytes + 56 * len(self.appended)
+
+
+def save(index, path):
+    """
+    Atomically write the live rows of a VectorIndex to a segment file.
+    """
+    with index._lock:
+        size, codes, alive = index.size, index.codes, index.alive[:index.size].copy()
+        assignments = index.assignments if index.lists is not None else None
+        texts, ranges = index.texts, dict(index.ranges)
+        versions, filenames = dict(index.versions), dict(index.filenames)
+        lexical = dict(index.lexical.segments)
+        artifacts = dict(index.artifacts)
+        codec_key, ann = index.codec.key, index.ann
+        dimensions = index.dimensions
+
+    files, arrays, encoded, keep = [], {}, [], []
+    for upload_id, version in versions.items():
+        start, stop = ranges.get(upload_id, (0, 0))
+        if stop > start and not alive[start]:
+            continue
+        keep.append(np.arange(start, stop))
+        encoded.extend(texts[position].encode("utf-8") for position in range(start, stop))
+        files.append({
+            "upload_id": upload_id, "filename": filenames.get(upload_id, ""),
+            "version": version.isoformat() if version else None,
+            "rows": stop - start, "artifact": str(artifacts.get(upload_id, "")),
+        })
+        segment = lexical.get(upload_id)
+        if segment is not None:
+            arrays.update((f"lex_{upload_id}_{field}", value) for field, value in segment._asdict().items())
+    rows = np.concatenate(keep) if keep else np.zeros(0, dtype=np.intp)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    meta = {
+        "format": SEGMENT_FORMAT, "codec": codec_key, "ann": ann.digest if assignments is not None else None,
+        "dimensions": dimensions, "files": files,
+    }
+    arrays.update(
+        meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+        codes=codes[:size][rows],
+        text_buffer=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        text_offsets=offsets,
+    )
+    if assignments is not None:
+        arrays["assignments"] = assignments[:size][rows]
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary, "wb") as handle:
+        np.savez(handle, **arrays)
+    os.replace(temporary, path)
+
+
+def restore(index, path):
+    """
+    Fill an empty VectorIndex from a segment file, memory-mapped. Returns
+    False (leaving the index empty) when the file is missing or was written
+    with another codec or other IVF centroids.
+    """
+    try:
+        arrays = map_members(path)
+        meta = json.loads(bytes(arrays["meta"]).decode("utf-8"))
+    except (FileNotFoundError, KeyError, ValueError, zipfile.BadZipFile):
+        return False
+    ann_digest = index.ann.digest if index.ann is not None else None
+    if meta.get("format") != SEGMENT_FORMAT or meta["codec"] != index.codec.key or meta["ann"] != ann_digest:
+        return False
+
+    ranges, versions, filenames, artifacts, upload_ids = {}, {}, {}, {}, []
+    start = 0
+    for entry in meta["files"]:
+        upload_id, stop = entry["upload_id"], start + entry["rows"]
+        ranges[upload_id] = (start, stop)
+        versions[upload_id] = datetime.fromisoformat(entry["version"]) if entry["version"] else None
+        filenames[upload_id] = entry["filename"]
+        if entry["artifact"]:
+            artifacts[upload_id] = Path(entry["artifact"])
+        upload_ids.append(np.full(stop - start, upload_id, dtype=np.int64))
+        start = stop
+    lexical = {
+        upload_id: LexicalSegment(*(arrays[f"lex_{upload_id}_{field}"] for field in LexicalSegment._fields))
+        for upload_id in ranges if f"lex_{upload_id}_vocab" in arrays
+    }
+
+    with index._lock:
+        index._dimensions = meta["dimensions"]
+        index.codes = arrays["codes"]
+        index.upload_ids = np.concatenate(upload_ids) if upload_ids else np.zeros(0, dtype=np.int64)
+        index.alive = np.ones(start, dtype=bool)
+        index.texts = ChunkTexts(buffer=arrays["text_buffer"], offsets=arrays["text_offsets"])
+        index.size, index.dead = start, 0
+        index.ranges, index.versions, index.filenames, index.artifacts = ranges, versions, filenames, artifacts
+        if index.lists is not None:
+            index.assignments = arrays["assignments"]
+            index.lists = InvertedLists.build(index.assignments, index.ann.lists)
+        if not index.codec.exact:
+            index.full = {
+                upload_id: map_vectors(artifact) for upload_id, artifact in artifacts.items()
+                if ranges[upload_id][1] > ranges[upload_id][0] and artifact.exists()
+            }
+    for upload_id, segment in lexical.items():
+        index.lexical.add_file(upload_id, segment)
+    return True
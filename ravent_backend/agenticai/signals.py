@@ -1,17 +1,51 @@
 # agenticai/signals.py
 
 import os
-from django.db.models.signals import post_delete
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+
+from accounts.signals import token_obtained
+from . import blobs, retrieval, sweeper
+from .cache import bump_docset_version
+from .ingestion import artifact_name
 from .models import FileUpload
 
+@receiver(post_save, sender=FileUpload)
+def invalidate_answers_on_upload(sender, instance, created, **kwargs):
+    """
+    A new or replaced upload changes the owner's document set; drop their cached answers.
+    """
+    bump_docset_version(instance.owner_id)
+
+
+@receiver(post_delete, sender=FileUpload)
+def invalidate_answers_on_delete(sender, instance, **kwargs):
+    """
+    A deleted upload changes the owner's document set; drop their cached answers
+    and its rows from this process's index.
+    """
+    bump_docset_version(instance.owner_id)
+    retrieval.registry.discard(instance.owner_id, instance.pk)
+
+
 @receiver(post_delete, sender=FileUpload)
 def delete_file_from_storage(sender, instance, **kwargs):
     """
-    After a FileUpload instance is deleted, remove its file from disk.
+    After a FileUpload instance is deleted, release its shared blob. Uploads
+    stored before content addressing own their file, which is queued for the
+    storage sweeper directly. Nothing is removed from storage on this thread.
+    """
+    if instance.blob_id:
+        blobs.release(instance.blob_id)
+        return
+    sweeper.bury(instance.file.name, artifact_name(instance.pk))
+
+
+@receiver(token_obtained)
+def prewarm_index_on_login(sender, user, **kwargs):
+    """
+    A user who just logged in is about to chat; load their index in the background.
     """
-    if instance.file:
-        storage = instance.file.storage
-        name = instance.file.name
-        if storage.exists(name):
-            storage.delete(name)
+    if settings.RAG_INDEX_PREWARM:
+        retrieval.registry.prewarm(user.pk)
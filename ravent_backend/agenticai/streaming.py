@@ -0,0 +1,55 @@
+# agenticai/streaming.py
+"""
+Server-sent event helpers for streaming responses under ASGI.
+"""
+
+import asyncio
+import json
+
+_END = object()
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def buffered(source, maxsize):
+    """
+    Run the async iterator `source` in its own task and re-yield its items
+    through a queue of at most `maxsize` items.
+
+    A slow client fills the queue and pauses the producer (backpressure). When
+    the consumer stops early (client disconnect cancels the response task, or
+    the iterator is closed), the producer task is cancelled so no further
+    tokens are generated.
+    """
+    items = asyncio.Queue(maxsize=maxsize)
+
+    async def produce():
+        try:
+            async for item in source:
+                await items.put(item)
+        finally:
+            await source.aclose()
+        await items.put(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            getter = asyncio.ensure_future(items.get())
+            done, _ = await asyncio.wait({getter, producer}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                # The producer finished without queuing _END, i.e. it raised.
+                getter.cancel()
+                producer.result()
+            item = getter.result()
+            if item is _END:
+                return
+            yield item
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,252 @@
+# agenticai/sweeper.py
+"""
+Deferred deletion of stored files.
+
+Deleting an upload never touches media storage on the request thread. When
+a blob loses its last reference (or a legacy upload is deleted) its storage
+name and chunk artifact are recorded as a StorageTombstone in the same
+transaction that removes the row. A background thread sweeps due tombstones
+in batches: it leases a batch, then for each tombstone locks its row,
+checks again that nothing refers to its files, deletes them and drops the
+tombstone in one short transaction, and reschedules failures with
+exponential backoff. `find_orphans` finds files that no row references, e.g.
+after a crash between a storage write and its commit.
+
+A stored file named by a tombstone is never reused for new content: blobs.acquire
+writes the content again under a fresh name instead (see `is_buried`). Chunk
+artifacts are keyed by digest, so the sweeper keeps an artifact whose blob has
+been created again in the meantime. `is_buried` locks the tombstones it finds,
+so an upload of the same content waits for a sweep in progress to finish (and
+the sweep, for the upload's transaction) instead of racing it between the
+check and the unlink.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import transaction
+
+from .ann import remove_assignments
+
+logger = logging.getLogger(__name__)
+
+# A leased batch is retried by another sweeper if not settled within this time.
+LEASE = timedelta(minutes=10)
+MAX_BACKOFF = timedelta(hours=1)
+
+
+def bury(name="", artifact=""):
+    """
+    Record a storage name and/or chunk artifact for deletion once the current
+    transaction commits.
+    """
+    from django.utils import timezone
+    from .models import StorageTombstone
+
+    if not name and not artifact:
+        return
+    StorageTombstone.objects.create(name=name, artifact=artifact, next_attempt_at=timezone.now())
+    transaction.on_commit(wake)
+
+
+def is_buried(name):
+    """
+    Whether a storage name awaits deletion. Locks the tombstones found until
+    the current transaction ends, so it must run inside one.
+    """
+    from .models import StorageTombstone
+
+    return StorageTombstone.objects.select_for_update().filter(name=name).exists()
+
+
+def _delete(storage, tombstone_id):
+    """
+    Delete the files of a tombstone that nothing refers to again, and the
+    tombstone. Returns False when another sweeper already settled it.
+    """
+    from django.conf import settings
+    from .models import FileUpload, StorageTombstone, StoredBlob
+
+    with transaction.atomic():
+        tombstone = StorageTombstone.objects.select_for_update().filter(pk=tombstone_id).first()
+        if tombstone is None:
+            return False
+        # Checked under the tombstone's lock rather than once per batch: content
+        # uploaded again since the release may be stored and indexed by now.
+        name = tombstone.name
+        if name and (StoredBlob.objects.filter(file=name).exists() or FileUpload.objects.filter(file=name).exists()):
+            name = ""
+        if name:
+            # Storage backends treat deleting a missing name as a no-op, so no exists() round trip.
+            storage.delete(name)
+        # Identical content uploaded again since the release shares the artifact path; keep it.
+        if tombstone.artifact and not StoredBlob.objects.filter(sha256=Path(tombstone.artifact).stem).exists():
+            path = Path(settings.RAG_STORE_ROOT) / tombstone.artifact
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            remove_assignments(path)
+        tombstone.delete()
+    return True
+
+
+def sweep(batch_size=None):
+    """
+    Delete one batch of due tombstones. Returns (deleted, failed).
+    """
+    from django.conf import settings
+    from django.core.files.storage import default_storage
+    from django.utils import timezone
+    from .models import StorageTombstone
+
+    batch_size = batch_size or settings.STORAGE_GC_BATCH_SIZE
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            StorageTombstone.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now).order_by("next_attempt_at", "id")[:batch_size]
+        )
+        StorageTombstone.objects.filter(pk__in=[tombstone.pk for tombstone in batch]).update(
+            next_attempt_at=now + LEASE
+        )
+
+    deleted = failed = 0
+    for tombstone in batch:
+        try:
+            deleted += _delete(default_storage, tombstone.pk)
+        except Exception as exc:
+            failed += 1
+            attempts = tombstone.attempts + 1
+            delay = min(timedelta(seconds=settings.STORAGE_GC_RETRY_DELAY * 2 ** (attempts - 1)), MAX_BACKOFF)
+            logger.warning("Could not delete %s (attempt %s): %s", tombstone, attempts, exc)
+            StorageTombstone.objects.filter(pk=tombstone.pk).update(
+                attempts=attempts, last_error=str(exc)[:2000], next_attempt_at=timezone.now() + delay
+            )
+    return deleted, failed
+
+
+def sweep_all(batch_size=None):
+    """
+    Sweep batches until no tombstone is due. Returns (deleted, failed).
+    """
+    deleted = failed = 0
+    while True:
+        batch_deleted, batch_failed = sweep(batch_size)
+        deleted += batch_deleted
+        failed += batch_failed
+        if not batch_deleted:
+            # Nothing due, or everything due failed and is backing off.
+            return deleted, failed
+
+
+def find_orphans(grace=None):
+    """
+    Return (storage names, artifact paths) that no row references and that
+    are older than `grace` seconds (settings.STORAGE_GC_ORPHAN_GRACE), so
+    files of uploads still in flight are left alone.
+    """
+    from django.conf import settings
+    from django.core.files.storage import default_storage
+    from django.utils import timezone
+    from .models import FileUpload, StorageTombstone, StoredBlob
+
+    grace = settings.STORAGE_GC_ORPHAN_GRACE if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+
+    referenced = set(StoredBlob.objects.values_list("file", flat=True))
+    referenced.update(FileUpload.objects.values_list("file", flat=True))
+    referenced.update(StorageTombstone.objects.exclude(name="").values_list("name", flat=True))
+    names = []
+    for root in ("blobs", "uploads"):
+        for name in _walk(default_storage, root):
+            if name not in referenced and default_storage.get_modified_time(name) < cutoff:
+                names.append(name)
+
+    upload_keys = {str(pk) for pk in FileUpload.objects.values_list("pk", flat=True)}
+    keys = set(StoredBlob.objects.values_list("sha256", flat=True))
+    keys.update(str(pk) for pk in FileUpload.objects.filter(blob__isnull=True).values_list("pk", flat=True))
+    buried = set(StorageTombstone.objects.exclude(artifact="").values_list("artifact", flat=True))
+    artifacts = []
+    store = Path(settings.RAG_STORE_ROOT)
+    # Current artifacts are keyed by digest (or legacy pk), like their IVF assignments
+    # under ivf/<centroids>/; stashed ones under previous/ by upload pk.
+    directories = [("chunks", keys), ("chunks/previous", upload_keys)]
+    if (store / "chunks" / "ivf").is_dir():
+        directories.extend((f"chunks/ivf/{path.name}", keys) for path in (store / "chunks" / "ivf").iterdir())
+    for directory, live in directories:
+        if not (store / directory).is_dir():
+            continue
+        for path in (store / directory).iterdir():
+            relative = f"{directory}/{path.name}"
+            if not path.is_file() or path.name.split(".", 1)[0] in live or relative in buried:
+                continue
+            if path.stat().st_mtime < cutoff.timestamp():
+                artifacts.append(relative)
+    return names, artifacts
+
+
+def _walk(storage, root):
+    try:
+        directories, files = storage.listdir(root)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield f"{root}/{name}"
+    for directory in directories:
+        yield from _walk(storage, f"{root}/{directory}")
+
+
+class Sweeper:
+    """
+    Background thread that sweeps every `interval` seconds, and shortly after
+    `wake()` so deletions are coalesced into batches.
+    """
+
+    def __init__(self, interval, debounce=1.0):
+        self.interval = interval
+        self.debounce = min(debounce, interval)
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="storage-sweeper", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while True:
+            if self._wakeup.wait(self.interval):
+                time.sleep(self.debounce)
+            self._wakeup.clear()
+            try:
+                sweep_all()
+            except Exception:
+                logger.exception("Storage sweep failed")
+            finally:
+                close_old_connections()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def wake():
+    """
+    Ask the process-wide sweeper to run soon, starting it on first use.
+    With STORAGE_GC_INTERVAL = 0 nothing runs in-process and
+    `manage.py sweep_storage` is expected to run periodically instead.
+    """
+    global _sweeper
+    from django.conf import settings
+
+    if settings.STORAGE_GC_INTERVAL <= 0:
+        return
+    with _sweeper_lock:
+        if _sweeper is None:
+            _sweeper = Sweeper(settings.STORAGE_GC_INTERVAL)
+    _sweeper.wake()
@@ -0,0 +1,85 @@
+# agenticai/tests/base.py
+"""
+Shared setup for the agenticai tests: temporary media and index storage, the
+HashingEmbedder without query batching, inline ingestion, no background
+storage sweeps, estimated token counts and no web search, so nothing leaves
+the process.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.authentication import get_user_cache
+from agenticai import retrieval
+from agenticai.cache import get_answer_cache
+
+
+def rag_settings(directory):
+    """
+    Settings for tests that ingest and retrieve, with storage under `directory`.
+    """
+    return override_settings(
+        MEDIA_ROOT=str(directory / "media"),
+        RAG_STORE_ROOT=directory / "rag_store",
+        RAG_EMBEDDER="agenticai.embeddings.HashingEmbedder",
+        RAG_EMBEDDER_OPTIONS={},
+        RAG_EMBEDDING_MAX_WAIT_MS=0,
+        RAG_INGESTION_WORKERS=0,
+        RAG_EXTRACTION_WORKERS=0,
+        RAG_INDEX_PREWARM=False,
+        RAG_CHUNK_ENCODING="",
+        RAG_GENERATOR="agenticai.generation.ExtractiveGenerator",
+        RAG_SEARCH_TOOL="",
+        CHAT_COMPACTION_WORKERS=0,
+        STORAGE_GC_INTERVAL=0,
+        PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    )
+
+
+class RAGTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._directory = Path(tempfile.mkdtemp(prefix="agenticai-tests-"))
+        cls._settings = rag_settings(cls._directory)
+        cls._settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        retrieval.registry.wait()
+        retrieval.registry.clear()
+        cls._settings.disable()
+        shutil.rmtree(cls._directory, ignore_errors=True)
+
+    def setUp(self):
+        # Rolled-back tests reuse primary keys; drop per-process state keyed by them.
+        retrieval.registry.wait()
+        retrieval.registry.clear()
+        get_answer_cache().clear()
+        get_user_cache().clear()
+
+    def login(self, username):
+        """
+        A new user and an APIClient sending their access token.
+        """
+        user = User.objects.create_user(username, password="s3cret-pass")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        return user, client
+
+    def upload(self, client, name, content):
+        """
+        Upload a text file and run its ingestion; returns the response.
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post("/api/agenticai/files/", {"file": SimpleUploadedFile(name, content)}, format="multipart")
@@ -0,0 +1,26 @@
+# agenticai/tests/jobs.py
+"""
+Ingestion jobs for IngestionQueue tests. They run in spawned worker
+processes, so this module imports nothing that needs django.setup().
+"""
+
+import os
+from pathlib import Path
+
+from agenticai.ingestion import ingest_document
+
+
+def crash_once(*arguments):
+    """
+    Kill the worker process on the first run for an artifact, ingest normally after.
+    """
+    marker = Path(arguments[1] + ".crashed")
+    if not marker.exists():
+        marker.parent.mkdir(parents=True, exist_ok=True)
+        marker.touch()
+        os._exit(1)
+    return ingest_document(*arguments)
+
+
+def crash_always(*arguments):
+    os._exit(1)
@@ -0,0 +1,111 @@
+# agenticai/tests/test_cache.py
+
+import time
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase
+
+from agenticai.cache import AnswerCache, bump_docset_version, docset_version, get_answer_cache
+from agenticai.models import DocumentSetVersion
+
+from .base import RAGTestCase
+
+CHAT_URL = "/api/agenticai/chat/"
+FILES_URL = "/api/agenticai/files/"
+QUESTION = "Where does photosynthesis happen?"
+
+
+class AnswerCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted_over_the_entry_limit(self):
+        cache = AnswerCache(max_entries=2)
+        for name in "abc":
+            cache.set((1, name, 0), {"answer": name}, 0.5)
+            if name == "b":
+                cache.get((1, "a", 0))
+        self.assertIsNone(cache.get((1, "b", 0)))
+        self.assertEqual(cache.get((1, "a", 0)), {"answer": "a"})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_byte_bound(self):
+        cache = AnswerCache(max_bytes=60)
+        cache.set((1, "a", 0), {"answer": "x" * 30}, 0.0)
+        cache.set((1, "b", 0), {"answer": "y" * 30}, 0.0)
+        self.assertEqual(cache.stats()["entries"], 1)
+        self.assertLessEqual(cache.stats()["bytes"], 60)
+        # Larger than the whole cache: not stored, nothing evicted for it.
+        cache.set((1, "c", 0), {"answer": "z" * 100}, 0.0)
+        self.assertIsNone(cache.get((1, "c", 0)))
+        self.assertIsNotNone(cache.get((1, "b", 0)))
+
+    def test_entries_expire_and_hits_record_the_time_saved(self):
+        cache = AnswerCache(ttl=60)
+        cache.set((1, "a", 0), {"answer": "a"}, 0.25)
+        cache.get((1, "a", 0))
+        with mock.patch("agenticai.cache.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get((1, "a", 0)))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"], stats["saved_ms"]), (0, 1, 1, 250.0))
+
+
+class AnswerInvalidationTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice_user, self.alice = self.login("alice")
+        _, self.bob = self.login("bob")
+        self.upload(self.alice, "biology.txt", "Photosynthesis happens in the chloroplasts of plant cells.")
+
+    def ask(self, client, query=QUESTION):
+        response = client.post(CHAT_URL, {"query": query}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["content"]
+
+    def assertServedFromCache(self, client, cached):
+        hits = get_answer_cache().stats()["hits"]
+        content = self.ask(client)
+        self.assertEqual(get_answer_cache().stats()["hits"], hits + cached)
+        return content
+
+    def test_repeated_question_is_answered_from_the_cache(self):
+        first = self.assertServedFromCache(self.alice, False)
+        hits = get_answer_cache().stats()["hits"]
+        self.assertEqual(self.ask(self.alice, "  where DOES photosynthesis happen? "),
+                         {**first, "query": "where DOES photosynthesis happen?"})
+        self.assertEqual(get_answer_cache().stats()["hits"], hits + 1)
+
+    def test_upload_or_delete_drops_cached_answers(self):
+        self.ask(self.alice)
+        self.upload(self.alice, "botany.txt", "Photosynthesis also happens in algae.")
+        content = self.assertServedFromCache(self.alice, False)
+        self.assertIn("botany.txt", content["sources"])
+        self.assertServedFromCache(self.alice, True)
+
+        upload_id = self.alice.get(FILES_URL).json()["results"][0]["id"]
+        self.assertEqual(self.alice.delete(f"{FILES_URL}{upload_id}/").status_code, 204)
+        self.assertNotIn("botany.txt", self.assertServedFromCache(self.alice, False)["sources"])
+
+    def test_bulk_upload_bumps_the_version_before_ingestion(self):
+        self.ask(self.alice)
+        version = docset_version(self.alice_user.pk)
+        # On-commit ingestion is not run here: the bump comes from the bulk insert itself.
+        files = [SimpleUploadedFile("algae.txt", b"Algae photosynthesise too.")]
+        self.assertEqual(self.alice.post(f"{FILES_URL}bulk/", {"files": files}, format="multipart").status_code, 201)
+        self.assertEqual(docset_version(self.alice_user.pk), version + 1)
+        self.assertServedFromCache(self.alice, False)
+
+    def test_bump_from_another_worker_invalidates(self):
+        self.ask(self.alice)
+        # What another process does after changing the set: only the row moves.
+        bump_docset_version(self.alice_user.pk)
+        self.assertServedFromCache(self.alice, False)
+
+    def test_other_owners_changes_keep_answers(self):
+        self.ask(self.alice)
+        self.upload(self.bob, "biology.txt", "Photosynthesis needs light.")
+        self.assertServedFromCache(self.alice, True)
+
+    def test_bump_never_creates_the_version_row(self):
+        user, _ = self.login("carol")
+        bump_docset_version(user.pk)
+        self.assertFalse(DocumentSetVersion.objects.filter(owner_id=user.pk).exists())
+        self.assertEqual(docset_version(user.pk), 0)
@@ -0,0 +1,44 @@
+# agenticai/tests/test_chat.py
+
+from agenticai.chat import NO_MATCH_ANSWER
+
+from .base import RAGTestCase
+
+CHAT_URL = "/api/agenticai/chat/"
+
+
+class ChatAPITests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.alice = self.login("alice")
+        _, self.bob = self.login("bob")
+        self.upload(self.alice, "biology.txt", "Photosynthesis turns light into chemical energy in chloroplasts.")
+        self.upload(self.alice, "history.txt", "The printing press spread books across Europe.")
+
+    def ask(self, client, query):
+        response = client.post(CHAT_URL, {"query": query}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["content"]
+
+    def test_answers_from_the_owners_files(self):
+        with self.settings(RAG_RETRIEVAL_MODE="vector"):
+            content = self.ask(self.alice, "Photosynthesis turns light into chemical energy in chloroplasts.")
+        self.assertEqual(content["sources"][0], "biology.txt")
+        self.assertIn("chloroplasts", content["answer"])
+
+    def test_other_owners_files_are_not_searched(self):
+        with self.settings(RAG_RETRIEVAL_MODE="vector"):
+            self.assertEqual(self.ask(self.bob, "photosynthesis")["answer"], NO_MATCH_ANSWER)
+            self.upload(self.bob, "chemistry.txt", "Chloroplasts are green.")
+            content = self.ask(self.bob, "Photosynthesis turns light into chemical energy in chloroplasts.")
+        self.assertEqual(content["sources"], ["chemistry.txt"])
+
+    def test_deleted_files_leave_the_index(self):
+        upload_id = self.alice.get("/api/agenticai/files/").json()["results"][1]["id"]
+        self.assertEqual(self.alice.delete(f"/api/agenticai/files/{upload_id}/").status_code, 204)
+        with self.settings(RAG_RETRIEVAL_MODE="vector"):
+            content = self.ask(self.alice, "Photosynthesis turns light into chemical energy in chloroplasts.")
+        self.assertNotIn("biology.txt", content["sources"])
+
+    def test_requires_a_query(self):
+        self.assertEqual(self.alice.post(CHAT_URL, {}, format="json").status_code, 400)
@@ -0,0 +1,158 @@
+# agenticai/tests/test_chunking.py
+
+import random
+from unittest import mock
+
+import tiktoken
+from django.test import SimpleTestCase
+
+from agenticai import chunking
+from agenticai.chunking import TokenChunker
+
+
+def byte_encoding():
+    """
+    A small offline tiktoken encoding: one token per byte, plus a few merges
+    so some tokens span several bytes.
+    """
+    ranks = {bytes([byte]): byte for byte in range(256)}
+    for word in (b"th", b"the", b" the", b"in", b"ing", b"ce", b"cel", b"cell", b" cell"):
+        ranks[word] = len(ranks)
+    return tiktoken.Encoding("test-bytes", pat_str=r""" ?\w+| ?[^\s\w]+|\s+""", mergeable_ranks=ranks,
+                             special_tokens={})
+
+
+def sample_text(seed=7, paragraphs=40):
+    generator = random.Random(seed)
+    words = ["the", "cell", "membrane", "protein", "energy", "mitochondria", "naïve", "café", "日本語", "ATP,",
+             "(glucose)", "x" * 90]
+    text = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(generator.randint(1, 5)):
+            sentences.append(" ".join(generator.choice(words) for _ in range(generator.randint(3, 25))) + ".")
+        text.append(" ".join(sentences) if generator.random() < 0.7 else "\n".join(sentences))
+    return "\n\n".join(text)
+
+
+class TokenChunkerTests(SimpleTestCase):
+    def setUp(self):
+        self.text = sample_text()
+        self.data = self.text.encode("utf-8")
+
+    def estimating(self, **options):
+        return TokenChunker(encoding=None, **options)
+
+    def tokenizing(self, **options):
+        with mock.patch("tiktoken.get_encoding", return_value=byte_encoding()):
+            chunking._load_encoding.cache_clear()
+            self.addCleanup(chunking._load_encoding.cache_clear)
+            return TokenChunker(encoding="test-bytes", **options)
+
+    def chunkers(self, **options):
+        return [self.estimating(**options), self.tokenizing(**options)]
+
+    def test_offsets_are_utf8_byte_offsets_of_each_chunk(self):
+        for chunker in self.chunkers(max_tokens=40, overlap_tokens=8):
+            chunks = chunker.split_text(self.text)
+            self.assertGreater(len(chunks), 10)
+            for start, end, chunk in chunks:
+                self.assertEqual(self.data[start:end].decode("utf-8"), chunk)
+                self.assertEqual(chunk, chunk.strip())
+
+    def test_chunks_cover_all_text_in_order(self):
+        for chunker in self.chunkers(max_tokens=40, overlap_tokens=0):
+            chunks = chunker.split_text(self.text)
+            covered = bytearray(len(self.data))
+            previous_end = 0
+            for start, end, _ in chunks:
+                self.assertGreaterEqual(start, previous_end)
+                covered[start:end] = b"\x01" * (end - start)
+                previous_end = end
+            missed = [byte for byte, hit in zip(self.data, covered) if not hit and not chr(byte).isspace()]
+            self.assertEqual(missed, [])
+
+    def test_streamed_pieces_chunk_like_the_whole_text(self):
+        pieces = [self.text[index:index + 97] for index in range(0, len(self.text), 97)]
+        for make in (self.estimating, self.tokenizing):
+            streamed = make(max_tokens=40, overlap_tokens=8, batch_bytes=512).split(pieces)
+            whole = make(max_tokens=40, overlap_tokens=8).split_text(self.text)
+            self.assertEqual(list(streamed), whole)
+
+    def test_chunks_fit_the_token_budget(self):
+        chunker = self.tokenizing(max_tokens=30, overlap_tokens=6)
+        for _, _, chunk in chunker.split_text(self.text):
+            self.assertLessEqual(chunker.count_tokens(chunk), 30)
+
+    def test_estimated_budget_overshoots_by_one_only_where_a_word_was_cut(self):
+        chunker = self.estimating(max_tokens=30, overlap_tokens=0)
+        overshoots = 0
+        for start, _, chunk in chunker.split_text(self.text):
+            count = chunker.count_tokens(chunk)
+            cut_word = start > 0 and chr(self.data[start - 1]).isalnum()
+            # A chunk resuming a word counts that word's rounding up again on its own.
+            self.assertLessEqual(count, 31 if cut_word else 30)
+            overshoots += count == 31
+        self.assertGreater(overshoots, 0)
+
+    def test_long_words_are_cut_between_characters(self):
+        chunker = self.estimating(max_tokens=8, overlap_tokens=0)
+        text = "日本語" * 40
+        chunks = chunker.split_text(text)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunk for _, _, chunk in chunks), text)
+
+    def test_cuts_prefer_paragraphs_to_sentences_to_spaces(self):
+        chunker = self.estimating(max_tokens=14, overlap_tokens=0)
+        text = "one two three. four five six\n\nseven eight nine. ten eleven twelve"
+        self.assertEqual([chunk for _, _, chunk in chunker.split_text(text)],
+                         ["one two three. four five six", "seven eight nine. ten eleven twelve"])
+        text = "alpha beta gamma delta epsilon. zeta eta theta iota kappa"
+        self.assertEqual(chunker.split_text(text)[0][2], "alpha beta gamma delta epsilon.")
+
+    def test_overlap_repeats_at_most_overlap_tokens(self):
+        for chunker in self.chunkers(max_tokens=40, overlap_tokens=10):
+            chunks = chunker.split_text(self.text)
+            overlapping = 0
+            for (_, previous_end, _), (start, _, _) in zip(chunks, chunks[1:]):
+                self.assertGreater(start, chunks[0][0])
+                if start < previous_end:
+                    overlapping += 1
+                    repeated = self.data[start:previous_end].decode("utf-8")
+                    self.assertLessEqual(chunker.count_tokens(repeated), 10 + (chunker.tokenizer is None))
+            self.assertGreater(overlapping, len(chunks) // 2)
+
+    def test_no_overlap_without_overlap_tokens(self):
+        chunks = self.estimating(max_tokens=40, overlap_tokens=0).split_text(self.text)
+        for (_, previous_end, _), (start, _, _) in zip(chunks, chunks[1:]):
+            self.assertGreaterEqual(start, previous_end)
+
+    def test_rejects_an_overlap_not_below_the_budget(self):
+        with self.assertRaises(ValueError):
+            TokenChunker(max_tokens=10, overlap_tokens=10, encoding=None)
+
+
+class LoadEncodingTests(SimpleTestCase):
+    def setUp(self):
+        chunking._load_encoding.cache_clear()
+        chunking._unavailable.clear()
+        self.addCleanup(chunking._load_encoding.cache_clear)
+        self.addCleanup(chunking._unavailable.clear)
+
+    def test_failure_is_logged_once_and_retried_later(self):
+        with mock.patch("tiktoken.get_encoding", side_effect=OSError("offline")) as get_encoding, \
+                self.assertLogs("agenticai.chunking", "WARNING") as logs:
+            self.assertIsNone(chunking.load_encoding("test-bytes"))
+            self.assertIsNone(chunking.load_encoding("test-bytes"))
+            self.assertEqual(get_encoding.call_count, 1)
+            with mock.patch("time.monotonic", return_value=chunking._unavailable["test-bytes"] + 301):
+                self.assertIsNone(chunking.load_encoding("test-bytes"))
+            self.assertEqual(get_encoding.call_count, 2)
+        self.assertEqual(len(logs.records), 1)
+
+        with mock.patch("tiktoken.get_encoding", return_value=byte_encoding()), \
+                mock.patch("time.monotonic", return_value=chunking._unavailable["test-bytes"] + 301):
+            encoding, lengths = chunking.load_encoding("test-bytes")
+        self.assertEqual(encoding.name, "test-bytes")
+        self.assertEqual(lengths[encoding.encode_single_token(b" cell")], 5)
+        self.assertNotIn("test-bytes", chunking._unavailable)
@@ -0,0 +1,73 @@
+# agenticai/tests/test_embeddings.py
+
+import asyncio
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from agenticai.embeddings import BatchingEmbedder, HashingEmbedder
+
+
+class RecordingEmbedder(HashingEmbedder):
+    """
+    HashingEmbedder that records the size of every call, or fails them all.
+    """
+
+    def __init__(self, fail=False):
+        super().__init__(dimensions=32)
+        self.fail = fail
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(len(texts))
+        if self.fail:
+            raise ConnectionError("Embedding provider failure")
+        return super().embed_documents(texts)
+
+
+class BatchingEmbedderTests(SimpleTestCase):
+    def batching(self, inner, **options):
+        options.setdefault("max_wait", 0.2)
+        return BatchingEmbedder(inner, **options)
+
+    def test_concurrent_requests_share_one_call(self):
+        inner = RecordingEmbedder()
+        embedder = self.batching(inner)
+        requests = [[f"query {number}"] for number in range(6)] + [["first of two", "second of two"]]
+        futures = [embedder.submit(texts) for texts in requests]
+        for texts, future in zip(requests, futures):
+            np.testing.assert_allclose(future.result(timeout=5), inner.embed_documents(texts))
+        self.assertEqual(inner.calls[0], 8)
+        self.assertEqual((embedder.batches, embedder.texts), (1, 8))
+
+    def test_batches_close_at_the_size_limit(self):
+        inner = RecordingEmbedder()
+        embedder = self.batching(inner, max_batch_size=3, max_wait=1)
+        futures = [embedder.submit([f"query {number}"]) for number in range(7)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(inner.calls, [3, 3, 1])
+
+    def test_async_callers_are_coalesced(self):
+        inner = RecordingEmbedder()
+        embedder = self.batching(inner)
+
+        async def ask():
+            return await asyncio.gather(*(embedder.aembed_query(f"query {number}") for number in range(4)))
+
+        vectors = asyncio.run(ask())
+        self.assertEqual([vector.shape for vector in vectors], [(32,)] * 4)
+        self.assertEqual(inner.calls, [4])
+
+    def test_a_failed_call_fails_every_request_in_it(self):
+        embedder = self.batching(RecordingEmbedder(fail=True))
+        futures = [embedder.submit([f"query {number}"]) for number in range(3)]
+        for future in futures:
+            with self.assertRaises(ConnectionError):
+                future.result(timeout=5)
+        self.assertEqual(embedder.batches, 0)
+
+    def test_empty_request_needs_no_call(self):
+        inner = RecordingEmbedder()
+        self.assertEqual(self.batching(inner).embed_documents([]).shape, (0, 32))
+        self.assertEqual(inner.calls, [])
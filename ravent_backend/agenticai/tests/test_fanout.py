@@ -0,0 +1,113 @@
+# agenticai/tests/test_fanout.py
+
+import asyncio
+
+from django.test import SimpleTestCase
+
+from agenticai import fanout
+from agenticai.retrieval import Hit
+from agenticai.tools import StubSearchTool
+
+from .base import RAGTestCase
+
+
+async def settle():
+    """
+    Let cancelled tasks run to their CancelledError.
+    """
+    await asyncio.sleep(0.01)
+
+
+class ConfidenceTests(SimpleTestCase):
+    def hit(self, score, source):
+        return Hit(1, 0, "notes.txt", "text", score, source)
+
+    def test_each_source_has_its_own_threshold(self):
+        with self.settings(RAG_CONFIDENT_SCORE=0.3, RAG_CONFIDENT_LEXICAL_SCORE=0.6):
+            self.assertTrue(fanout.confident([self.hit(0.35, "vector")]))
+            self.assertFalse(fanout.confident([self.hit(0.35, "lexical")]))
+            self.assertTrue(fanout.confident([self.hit(0.1, "vector"), self.hit(0.7, "lexical")]))
+            self.assertFalse(fanout.confident([self.hit(5.0, "web")]))
+            self.assertFalse(fanout.confident([]))
+
+
+class HedgedTests(SimpleTestCase):
+    async def test_slow_attempt_is_hedged_and_cancelled(self):
+        tool = StubSearchTool(latency=0.01, slow_latency=5, slow_rate=1)
+        call_latencies = iter([5, 0.01])
+
+        async def call():
+            tool.latency = tool.slow_latency = next(call_latencies)
+            return await tool.search("query", 1)
+
+        results = await asyncio.wait_for(fanout.hedged(call, attempts=2, hedge_after=0.05), 1)
+        self.assertEqual(len(results), 1)
+        await settle()
+        self.assertEqual((tool.calls, tool.cancelled), (2, 1))
+
+    async def test_failure_is_hedged_without_waiting(self):
+        outcomes = iter([ConnectionError("down"), ["answer"]])
+
+        async def call():
+            outcome = next(outcomes)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(await asyncio.wait_for(fanout.hedged(call, attempts=2, hedge_after=60), 1), ["answer"])
+
+    async def test_raises_when_every_attempt_fails(self):
+        tool = StubSearchTool(latency=0, failure_rate=1)
+        with self.assertRaises(ConnectionError):
+            await fanout.hedged(lambda: tool.search("query", 1), attempts=3, hedge_after=0.01)
+        self.assertEqual(tool.calls, 3)
+
+    async def test_attempts_are_capped(self):
+        tool = StubSearchTool(latency=0.2)
+        await fanout.hedged(lambda: tool.search("query", 1), attempts=3, hedge_after=0.01)
+        await settle()
+        self.assertEqual((tool.calls, tool.cancelled), (3, 2))
+
+
+class GatherEvidenceTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, client = self.login("alice")
+        self.upload(client, "biology.txt", "Photosynthesis turns light into chemical energy in chloroplasts.")
+
+    async def gather(self, query, tool):
+        return await asyncio.wait_for(fanout.gather_evidence(self.user.pk, query, 3, tool), 5)
+
+    async def test_confident_retrieval_cancels_the_search(self):
+        tool = StubSearchTool(latency=5)
+        evidence = await self.gather("photosynthesis", tool)
+        self.assertEqual(evidence.type, fanout.RAG_TYPE)
+        self.assertEqual(evidence.hits[0].filename, "biology.txt")
+        await settle()
+        self.assertEqual(tool.cancelled, tool.calls)
+
+    async def test_weak_retrieval_falls_back_to_the_search(self):
+        tool = StubSearchTool(latency=0.01)
+        evidence = await self.gather("volcanic eruptions in iceland", tool)
+        self.assertEqual(evidence.type, fanout.WEB_TYPE)
+        self.assertEqual(evidence.hits[0].filename, "https://search.invalid/1")
+
+    async def test_empty_search_keeps_the_retrieved_hits(self):
+        evidence = await self.gather("volcanic eruptions in iceland", StubSearchTool(latency=0, empty=True))
+        self.assertEqual(evidence.type, fanout.RAG_TYPE)
+        self.assertEqual([hit.filename for hit in evidence.hits], ["biology.txt"])
+
+    async def test_missed_retrieval_deadline_uses_the_search(self):
+        with self.settings(RAG_RETRIEVAL_DEADLINE=0), self.assertLogs("agenticai.fanout", "WARNING"):
+            evidence = await self.gather("photosynthesis", StubSearchTool(latency=0))
+        self.assertEqual(evidence.type, fanout.WEB_TYPE)
+
+    async def test_search_deadline_bounds_the_fallback(self):
+        tool = StubSearchTool(latency=5)
+        started = asyncio.get_running_loop().time()
+        with self.settings(RAG_SEARCH_DEADLINE=0.1), self.assertLogs("agenticai.fanout", "WARNING"):
+            evidence = await self.gather("volcanic eruptions in iceland", tool)
+        self.assertLess(asyncio.get_running_loop().time() - started, 1)
+        self.assertEqual(evidence.type, fanout.RAG_TYPE)
+        await settle()
+        self.assertEqual(tool.cancelled, tool.calls)
@@ -0,0 +1,237 @@
+# agenticai/tests/test_graph.py
+
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from agenticai.graphstore import GraphStore, build
+from agenticai.kvstore import KVStore, write_store
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "lightrag"
+
+
+class TemporaryDirectoryMixin:
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+
+class KVStoreTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def open(self, **options):
+        store = KVStore(self.directory / "records.kv", **options)
+        self.addCleanup(store.close)
+        return store
+
+    def test_put_overwrite_and_delete(self):
+        store = self.open()
+        store.put("a", {"n": 1})
+        store.put_many([("b", [1, 2]), ("ü", "unicode")])
+        store.put("a", {"n": 2})
+        store.delete("b")
+        store.delete("missing")
+        self.assertEqual(store.get("a"), {"n": 2})
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("b", "default"), "default")
+        self.assertEqual(store.get_many(["a", "b", "ü"]), {"a": {"n": 2}, "ü": "unicode"})
+        self.assertNotIn("b", store)
+        self.assertEqual(sorted(store.keys()), ["a", "ü"])
+
+    def test_records_survive_reopening_with_and_without_an_index(self):
+        store = self.open()
+        store.put_many([("a", 1), ("b", 2)])
+        store.close()
+        # Not flushed: found by scanning the tail of the data file.
+        store = self.open()
+        self.assertEqual(store.get_many(["a", "b"]), {"a": 1, "b": 2})
+        store.flush()
+        store.put("b", 3)
+        store.close()
+
+        store = self.open()
+        # Two keys come from the index, the record appended after the flush from the tail.
+        self.assertEqual((len(store._hashes), list(store._tail)), (2, [b"b"]))
+        # The newer version in the tail wins over the indexed one.
+        self.assertEqual(store.get_many(["a", "b"]), {"a": 1, "b": 3})
+
+    def test_index_is_rewritten_every_index_every_keys(self):
+        store = self.open(index_every=3)
+        store.put_many([("a", 1), ("b", 2)])
+        self.assertFalse((self.directory / "records.kvi").exists())
+        store.put("c", 3)
+        self.assertEqual((len(store._hashes), store._tail), (3, {}))
+        store.put("a", 10)
+        store.delete("b")
+        store.put("d", 4)
+        # Superseded and deleted keys are indexed once, at their latest record.
+        self.assertEqual(len(store._hashes), 4)
+        self.assertEqual(store.get_many(["a", "b", "c", "d"]), {"a": 10, "c": 3, "d": 4})
+        self.assertEqual(len(store), 3)
+
+    def test_torn_tail_is_truncated_on_open(self):
+        store = self.open()
+        store.put_many([("a", 1), ("b", 2)])
+        store.flush()
+        store.put("c", 3)
+        intact = store._end
+        store.close()
+        with open(self.directory / "records.kv", "ab") as handle:
+            # A crash halfway through appending a record.
+            handle.write(b"\x01\x00\x00\x00\x40\x00\x00\x00\xde\xad")
+
+        store = self.open()
+        self.assertEqual(os.path.getsize(self.directory / "records.kv"), intact)
+        self.assertEqual(store.get_many(["a", "b", "c"]), {"a": 1, "b": 2, "c": 3})
+        store.put("d", 4)
+        store.close()
+        self.assertEqual(self.open().get("d"), 4)
+
+    def test_corrupt_tail_record_fails_its_checksum(self):
+        store = self.open()
+        store.put("a", "first")
+        store.flush()
+        store.put("b", "second")
+        store.close()
+        with open(self.directory / "records.kv", "r+b") as handle:
+            handle.seek(-2, os.SEEK_END)
+            handle.write(b"XX")
+
+        store = self.open()
+        self.assertEqual(store.get("a"), "first")
+        self.assertIsNone(store.get("b"))
+
+    def test_compact_keeps_only_live_values(self):
+        store = self.open(index_every=4)
+        for version in range(5):
+            store.put_many([(f"key-{number}", {"version": version}) for number in range(6)])
+        store.delete("key-0")
+        store.delete("key-1")
+        before = os.path.getsize(self.directory / "records.kv")
+        store.compact()
+        self.assertLess(os.path.getsize(self.directory / "records.kv"), before / 4)
+        expected = {f"key-{number}": {"version": 4} for number in range(2, 6)}
+        self.assertEqual(store.get_many([f"key-{number}" for number in range(6)]), expected)
+        store.put("key-0", "again")
+        store.close()
+
+        store = self.open()
+        self.assertEqual(store.get("key-0"), "again")
+        self.assertEqual(sorted(store.keys()), ["key-0", "key-2", "key-3", "key-4", "key-5"])
+
+    def test_write_store_replaces_an_existing_store(self):
+        store = self.open()
+        store.put("stale", 1)
+        store.close()
+        write_store(self.directory / "records.kv", [("fresh", 2)])
+        store = self.open()
+        self.assertEqual(dict((key, store.get(key)) for key in store.keys()), {"fresh": 2})
+        self.assertEqual(store._tail, {})
+
+
+class GraphStoreTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def build(self, relations, entities=None, chunks=(("c0", set()),), vectors=None):
+        """
+        A store over entities "e0".."eN"; relations are (source, target, weight) index triples.
+        """
+        count = entities or 1 + max(max(source, target) for source, target, _ in relations)
+        chunks = list(chunks)
+        build(
+            self.directory / "graph",
+            ((f"e{number}", {"source_id": [key for key, mentioned in chunks if number in mentioned]})
+             for number in range(count)),
+            ((f"e{source}", f"e{target}", {"weight": weight}) for source, target, weight in relations),
+            [(key, {"content": key}) for key, _ in chunks],
+            np.zeros((len(chunks), 2)) if vectors is None else vectors,
+        )
+        store = GraphStore(self.directory / "graph")
+        self.addCleanup(store.close)
+        return store
+
+    def test_expand_follows_hops_from_the_seeds(self):
+        # A chain e0 - e1 - e2 - e3 - e4.
+        store = self.build([(number, number + 1, 1) for number in range(4)])
+        ids, hops = store.expand([2], hops=1)
+        self.assertEqual((ids.tolist(), hops.tolist()), ([2, 1, 3], [0, 1, 1]))
+        ids, hops = store.expand([0], hops=3)
+        self.assertEqual((ids.tolist(), hops.tolist()), ([0, 1, 2, 3], [0, 1, 2, 3]))
+        # Nothing is visited twice, and an exhausted frontier stops early.
+        ids, hops = store.expand([0, 4], hops=10)
+        self.assertEqual((ids.tolist(), hops.tolist()), ([0, 4, 1, 3, 2], [0, 0, 1, 1, 2]))
+
+    def test_expand_follows_only_the_heaviest_edges_up_to_fanout(self):
+        # A star around e0 with edge weights 1..6 to e1..e6.
+        store = self.build([(0, number, number) for number in range(1, 7)])
+        ids, _ = store.expand([0], hops=1, fanout=2)
+        self.assertEqual(ids.tolist(), [0, 5, 6])
+        ids, _ = store.expand([0], hops=1, fanout=100)
+        self.assertEqual(ids.tolist(), [0, 1, 2, 3, 4, 5, 6])
+
+    def test_expand_keeps_at_most_max_nodes_per_hop_by_total_weight(self):
+        # Seeds e0 and e1 both reach e2 (1 + 1) and e3 (3 + 0); e4, e5 only once with weight 1.
+        store = self.build([(0, 2, 1), (1, 2, 1), (0, 3, 3), (0, 4, 1), (1, 5, 1), (2, 6, 5), (3, 7, 1)])
+        ids, hops = store.expand([0, 1], hops=1, max_nodes=2)
+        self.assertEqual((ids.tolist(), hops.tolist()), ([0, 1, 2, 3], [0, 0, 1, 1]))
+        ids, hops = store.expand([0, 1], hops=2, max_nodes=2)
+        self.assertEqual((ids.tolist(), hops.tolist()), ([0, 1, 2, 3, 6, 7], [0, 0, 1, 1, 2, 2]))
+
+    def test_max_nodes_counts_an_entity_reached_twice_once(self):
+        # e2 is reached from both seeds: two candidates, not three, so no cut is needed.
+        store = self.build([(0, 2, 1), (1, 2, 1), (0, 3, 1)])
+        ids, _ = store.expand([0, 1], hops=1, max_nodes=2)
+        self.assertEqual(ids.tolist(), [0, 1, 2, 3])
+
+    def test_query_returns_nearest_chunks_their_entities_and_relations(self):
+        chunks = [("c0", {0, 1}), ("c1", {2}), ("c2", {3})]
+        vectors = np.array([[1, 0], [0, 1], [-1, 0]], dtype=np.float32)
+        store = self.build([(0, 1, 2), (1, 2, 1), (3, 3, 1)], chunks=chunks, vectors=vectors)
+        context = store.query(np.array([1, 0], dtype=np.float32), k=1, hops=1)
+        self.assertEqual([entity["name"] for entity in context.entities], ["e0", "e1", "e2"])
+        self.assertEqual([entity["hops"] for entity in context.entities], [0, 0, 1])
+        self.assertEqual([(relation["source"], relation["target"]) for relation in context.relations],
+                         [("e0", "e1"), ("e1", "e2")])
+        self.assertEqual([chunk["id"] for chunk in context.chunks], ["c0", "c1"])
+
+
+class ImportLightRAGTests(TemporaryDirectoryMixin, SimpleTestCase):
+    def test_imports_graph_records_and_vectors(self):
+        output, errors = io.StringIO(), io.StringIO()
+        call_command("import_lightrag", source=str(FIXTURES), output=str(self.directory / "graph"),
+                     stdout=output, stderr=errors)
+        self.assertIn("Imported 4 entities, 3 relations and 3 4-dimensional chunks", output.getvalue())
+        self.assertIn("1 chunk(s) have no embedding", errors.getvalue())
+
+        with GraphStore(self.directory / "graph") as store:
+            photosynthesis = store.entities.get('"PHOTOSYNTHESIS"')
+            self.assertEqual(photosynthesis["source_id"], ["chunk-1", "chunk-2"])
+            self.assertEqual(photosynthesis["entity_type"], '"PROCESS"')
+            # Edges without a weight count as 1.
+            self.assertEqual(sorted(store.relations.get(str(number))["weight"] for number in range(3)), [1.0, 7.0, 9.0])
+            self.assertEqual(store.chunks.get("chunk-3")["full_doc_id"], "doc-2")
+            self.assertEqual(store.full_docs.get("doc-2")["content"], "Mitochondria break glucose down to release energy.")
+            self.assertEqual(store.doc_status.get("doc-1")["chunks_count"], 2)
+            np.testing.assert_allclose(store.vectors[:2], [[1, 0, 0, 0], [0.6, 0.8, 0, 0]], atol=1e-6)
+            np.testing.assert_array_equal(store.vectors[2], np.zeros(4))
+
+            ids, hops = store.expand([store.entity_id('"MITOCHONDRIA"')], hops=2)
+            self.assertEqual([store.entity_names[number] for number in ids.tolist()],
+                             ['"MITOCHONDRIA"', '"GLUCOSE"', '"PHOTOSYNTHESIS"'])
+            context = store.query(np.array([0, 1, 0, 0], dtype=np.float32), k=1, hops=1)
+            self.assertEqual(context.chunks[0]["id"], "chunk-2")
+
+    def test_reimporting_replaces_the_store(self):
+        build(self.directory / "graph", [("OLD", {})], [], [("old", {})], np.zeros((1, 4)))
+        call_command("import_lightrag", source=str(FIXTURES), output=str(self.directory / "graph"),
+                     stdout=io.StringIO(), stderr=io.StringIO())
+        with GraphStore(self.directory / "graph") as store:
+            self.assertIsNone(store.entities.get("OLD"))
+            self.assertEqual(store.entity_count, 4)
+        self.assertEqual([path.name for path in self.directory.iterdir()], ["graph"])
+
+    def test_missing_graph_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command("import_lightrag", source=str(self.directory), output=str(self.directory / "graph"))
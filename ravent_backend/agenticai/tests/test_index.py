@@ -0,0 +1,325 @@
+# agenticai/tests/test_index.py
+
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from agenticai import shards
+from agenticai.ann import InvertedLists, gather, train_ivf
+from agenticai.lexical import build_segment, tokenize
+from agenticai.quantization import Int8Codec, ProductQuantizationCodec, train_product_quantizer
+from agenticai.retrieval import IndexRegistry, VectorIndex, _footprint, segment_path
+
+from .base import RAGTestCase
+
+
+def _vectors(count, dimensions, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((count, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class VectorIndexAddFileTests(SimpleTestCase):
+    def add(self, index, upload_id, texts, dimensions, seed=0):
+        return index.add_file(upload_id, f"file-{upload_id}.txt", f"v{upload_id}", texts,
+                              _vectors(len(texts), dimensions, seed), build_segment(texts))
+
+    def test_file_with_another_embedding_size_is_not_registered(self):
+        index = VectorIndex()
+        self.assertTrue(self.add(index, 1, ["apples grow on trees", "pears are sweet"], 8))
+        with self.assertLogs("agenticai.retrieval", "WARNING"):
+            self.assertFalse(self.add(index, 2, ["bananas are yellow"], 16, seed=1))
+
+        self.assertEqual(set(index.versions), {1})
+        self.assertEqual(set(index.filenames), {1})
+        self.assertEqual(set(index.lexical.segments), {1})
+        self.assertNotIn(2, index.ranges)
+        self.assertEqual(index.lexical_hits(tokenize("bananas"), 5), [])
+
+    def test_rejected_reingest_drops_the_old_rows(self):
+        index = VectorIndex()
+        self.add(index, 1, ["apples grow on trees"], 8)
+        self.add(index, 2, ["pears are sweet"], 8, seed=1)
+        with self.assertLogs("agenticai.retrieval", "WARNING"):
+            self.assertFalse(self.add(index, 2, ["pears are sweeter now"], 16, seed=2))
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.lexical_hits(tokenize("pears"), 5), [])
+
+    def test_lexical_hits_keep_their_text_after_compaction(self):
+        index = VectorIndex()
+        self.add(index, 1, ["alpha one", "alpha two", "alpha three"], 8)
+        with self.assertLogs("agenticai.retrieval", "WARNING"):
+            self.add(index, 2, ["beta one"], 16, seed=1)
+        self.add(index, 3, ["gamma one", "gamma three"], 8, seed=2)
+        index.remove_file(1)  # most rows dead: compacts
+        self.assertEqual(index.dead, 0)
+        hits = index.lexical_hits(tokenize("gamma three"), 1)
+        self.assertEqual((hits[0].upload_id, hits[0].position, hits[0].text), (3, 1, "gamma three"))
+
+
+class VectorIndexSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.index = VectorIndex()
+        self.vectors = _vectors(6, 16)
+        texts = [f"chunk {row}" for row in range(6)]
+        self.index.add_file(1, "a.txt", "v1", texts[:3], self.vectors[:3], build_segment(texts[:3]))
+        self.index.add_file(2, "b.txt", "v2", texts[3:], self.vectors[3:], build_segment(texts[3:]))
+
+    def test_nearest_rows_come_first_with_their_file_position(self):
+        results = self.index.search(self.vectors[4], 3)
+        self.assertEqual(results[0][:4], (2, 1, "b.txt", "chunk 4"))
+        self.assertAlmostEqual(results[0][4], 1.0, places=5)
+        self.assertEqual(len(results), 3)
+        self.assertEqual([score for *_, score in results], sorted((score for *_, score in results), reverse=True))
+
+    def test_removed_files_are_never_returned(self):
+        self.index.remove_file(1)  # half the rows dead: compacts
+        self.index.add_file(3, "c.txt", "v3", ["chunk 0 again"], self.vectors[:1], build_segment(["chunk 0 again"]))
+        self.index.remove_file(3)  # one dead row: stays flagged
+        self.assertEqual(self.index.dead, 1)
+        self.assertEqual({upload_id for upload_id, *_ in self.index.search(self.vectors[0], 6)}, {2})
+
+    def test_hits_collapse_duplicate_passages(self):
+        self.index.add_file(3, "copy.txt", "v3", ["chunk 4"], self.vectors[4:5], build_segment(["chunk 4"]))
+        hits = self.index.hits(self.vectors[4], 2)
+        self.assertEqual([hit.text for hit in hits].count("chunk 4"), 1)
+        self.assertEqual(len(hits), 2)
+
+
+class QuantizedSearchTests(SimpleTestCase):
+    """
+    Quantised codes only pick candidates; re-scoring against the float32
+    vectors must give back the exact top k with exact scores.
+    """
+
+    def setUp(self):
+        self.vectors = _vectors(2000, 32, seed=3)
+        rng = np.random.default_rng(4)
+        # Queries near stored rows, plus random ones.
+        near = self.vectors[rng.choice(len(self.vectors), 10, replace=False)] + 0.3 * _vectors(10, 32, seed=5)
+        self.queries = np.concatenate([near / np.linalg.norm(near, axis=1, keepdims=True), _vectors(10, 32, seed=6)])
+
+    def index(self, codec, rescore_factor):
+        index = VectorIndex(codec=codec, rescore_factor=rescore_factor)
+        # Several files, so re-scoring maps rows back to the right file's vectors.
+        for upload_id, start in enumerate(range(0, len(self.vectors), 500), start=1):
+            part = self.vectors[start:start + 500]
+            texts = [f"row {start + row}" for row in range(len(part))]
+            index.add_file(upload_id, f"{upload_id}.txt", f"v{upload_id}", texts, part)
+        return index
+
+    def assert_exact_top_k(self, index, k=10):
+        for query in self.queries:
+            exact = self.vectors @ query
+            expected = np.argsort(-exact)[:k]
+            results = index.search(query, k)
+            rows = [int(text.split()[1]) for _, _, _, text, _ in results]
+            self.assertEqual(rows, expected.tolist())
+            np.testing.assert_allclose([score for *_, score in results], exact[expected], rtol=1e-5, atol=1e-6)
+
+    def test_int8_rescored_top_k_is_the_exact_top_k(self):
+        self.assert_exact_top_k(self.index(Int8Codec(), rescore_factor=4))
+
+    def test_pq_rescored_top_k_is_the_exact_top_k(self):
+        codec = train_product_quantizer(self.vectors, subspace_dimensions=4, clusters=256, iterations=10, seed=0)
+        self.assert_exact_top_k(self.index(codec, rescore_factor=20))
+
+    def test_int8_codes_are_a_quarter_of_float32(self):
+        codes = Int8Codec().encode(self.vectors)
+        self.assertEqual(codes.shape, (2000, 36))
+        approximate = Int8Codec().scores(codes, self.queries[0])
+        np.testing.assert_allclose(approximate, self.vectors @ self.queries[0], atol=0.02)
+
+    def test_pq_codebook_round_trips_through_a_file(self):
+        codec = train_product_quantizer(self.vectors, subspace_dimensions=8, clusters=256, iterations=2, seed=0)
+        with tempfile.TemporaryDirectory() as directory:
+            codec.save(Path(directory) / "pq.npz")
+            loaded = ProductQuantizationCodec.load(Path(directory) / "pq.npz")
+        self.assertEqual(loaded.key, codec.key)
+        np.testing.assert_array_equal(loaded.encode(self.vectors), codec.encode(self.vectors))
+
+
+class InvertedListsTests(SimpleTestCase):
+    def test_gather_returns_every_row_of_the_partitions_after_appends(self):
+        lists = InvertedLists.build(np.array([2, 0, 2, 1], dtype=np.int32), 4)
+        np.testing.assert_array_equal(gather(lists.snapshot(), np.array([2])), [0, 2])
+        # Enough appends to outgrow the initial arrays.
+        lists.add(4, np.array([2] * 20 + [3], dtype=np.int32))
+        lists.add(25, np.array([0, 2], dtype=np.int32))
+        np.testing.assert_array_equal(lists.lengths, [2, 1, 23, 1])
+        np.testing.assert_array_equal(gather(lists.snapshot(), np.array([2])), [0, 2, *range(4, 24), 26])
+        np.testing.assert_array_equal(sorted(gather(lists.snapshot(), np.array([0, 1, 3]))), [1, 3, 24, 25])
+
+    def test_snapshot_is_unaffected_by_later_appends(self):
+        lists = InvertedLists.build(np.array([0, 0], dtype=np.int32), 2)
+        snapshot = lists.snapshot()
+        lists.add(2, np.array([0] * 40, dtype=np.int32))
+        np.testing.assert_array_equal(gather(snapshot, np.array([0])), [0, 1])
+        self.assertEqual(len(gather(lists.snapshot(), np.array([0]))), 42)
+
+
+class IVFSearchTests(SimpleTestCase):
+    def setUp(self):
+        self.vectors = _vectors(3000, 16, seed=7)
+        self.ann = train_ivf(self.vectors, 32, seed=0)
+
+    def index(self, **options):
+        index = VectorIndex(ann=self.ann, **options)
+        for upload_id, start in enumerate(range(0, len(self.vectors), 1000), start=1):
+            part = self.vectors[start:start + 1000]
+            texts = [f"row {start + row}" for row in range(1000)]
+            index.add_file(upload_id, f"{upload_id}.txt", f"v{upload_id}", texts, part)
+        return index
+
+    def test_probing_every_list_is_exact(self):
+        index = self.index(nprobe=32)
+        for query in self.vectors[:20]:
+            expected = np.argsort(-(self.vectors @ query))[:5]
+            self.assertEqual([int(text.split()[1]) for *_, text, _ in index.search(query, 5)], expected.tolist())
+
+    def test_probed_lists_hold_the_rows_assigned_to_them(self):
+        index = self.index(nprobe=2)
+        assignments = self.ann.assign(self.vectors)
+        query = self.vectors[0]
+        probed = self.ann.probe(query, 2)
+        candidates = gather(index.lists.snapshot(), probed)
+        np.testing.assert_array_equal(np.sort(candidates), np.flatnonzero(np.isin(assignments, probed)))
+        results = index.search(query, 5)
+        self.assertEqual(results[0][3], "row 0")
+        self.assertTrue(all(assignments[int(text.split()[1])] in probed for *_, text, _ in results))
+
+    def test_removed_and_compacted_rows_leave_the_lists(self):
+        index = self.index(nprobe=32)
+        index.remove_file(1)
+        self.assertNotIn(1, {upload_id for upload_id, *_ in index.search(self.vectors[0], 50)})
+        index.remove_file(2)  # most rows dead: compacts and rebuilds the lists
+        self.assertEqual(index.dead, 0)
+        self.assertEqual(int(index.lists.lengths.sum()), 1000)
+        results = index.search(self.vectors[2500], 1)
+        self.assertEqual((results[0][0], results[0][3]), (3, "row 2500"))
+
+    def test_small_indexes_stay_exact_below_ann_min_rows(self):
+        index = self.index(nprobe=1, ann_min_rows=10000)
+        for query in self.vectors[:20]:
+            expected = np.argsort(-(self.vectors @ query))[:5]
+            self.assertEqual([int(text.split()[1]) for *_, text, _ in index.search(query, 5)], expected.tolist())
+
+
+class SegmentTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "indexes" / "1.npz"
+        self.vectors = _vectors(300, 16, seed=8)
+        self.ann = train_ivf(self.vectors, 8, seed=0)
+
+    def fill(self, index):
+        for upload_id, start in ((1, 0), (2, 100), (3, 200)):
+            texts = [f"passage {start + row} about topic{(start + row) % 5}" for row in range(100)]
+            index.add_file(upload_id, f"{upload_id}.txt", datetime(2026, 1, upload_id, tzinfo=timezone.utc), texts,
+                           self.vectors[start:start + 100], build_segment(texts))
+        index.remove_file(2)  # a third of the rows dead: kept until compaction, not saved
+        return index
+
+    def test_round_trip_keeps_live_rows_texts_and_lexical_segments(self):
+        original = self.fill(VectorIndex(ann=self.ann, nprobe=8))
+        shards.save(original, self.path)
+        restored = VectorIndex(ann=self.ann, nprobe=8)
+        self.assertTrue(shards.restore(restored, self.path))
+
+        self.assertEqual((len(restored), restored.dead), (200, 0))
+        self.assertEqual(restored.versions, original.versions)
+        self.assertEqual(restored.filenames, {1: "1.txt", 3: "3.txt"})
+        self.assertEqual(restored.ranges, {1: (0, 100), 3: (100, 200)})
+        self.assertEqual(int(restored.lists.lengths.sum()), 200)
+        for query in self.vectors[[5, 150, 250]]:
+            self.assertEqual(restored.search(query, 5), original.search(query, 5))
+        terms = tokenize("topic3")
+        self.assertEqual(restored.lexical_hits(terms, 5), original.lexical_hits(terms, 5))
+        self.assertEqual(restored.texts[150], "passage 250 about topic0")
+
+        # A restored index takes new files like any other.
+        restored.add_file(4, "4.txt", None, ["fresh"], self.vectors[100:101], build_segment(["fresh"]))
+        self.assertEqual(restored.search(self.vectors[100], 1)[0][:4], (4, 0, "4.txt", "fresh"))
+
+    def test_segment_of_another_codec_or_other_centroids_is_rejected(self):
+        shards.save(self.fill(VectorIndex(ann=self.ann)), self.path)
+        other_centroids = train_ivf(self.vectors, 8, seed=1)
+        for index in (VectorIndex(Int8Codec(), ann=self.ann), VectorIndex(ann=other_centroids), VectorIndex()):
+            self.assertFalse(shards.restore(index, self.path))
+            self.assertEqual((len(index), index.versions), (0, {}))
+
+    def test_missing_or_damaged_segment_is_rejected(self):
+        self.assertFalse(shards.restore(VectorIndex(), self.path))
+        self.path.parent.mkdir(parents=True)
+        self.path.write_bytes(b"not a zip file")
+        self.assertFalse(shards.restore(VectorIndex(), self.path))
+
+
+@override_settings(RAG_INDEX_PINNED_OWNERS=[])
+class IndexRegistryEvictionTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.registry = IndexRegistry()
+        self.addCleanup(self.registry.wait)
+        self.owners = []
+        for name, topic in (("alice", "apples"), ("bob", "bricks"), ("carol", "comets")):
+            user, client = self.login(name)
+            self.upload(client, f"{topic}.txt", "\n\n".join(f"Note {number} on {topic}." for number in range(40)))
+            self.owners.append(user.pk)
+        with self.settings(RAG_INDEX_MEMORY_BUDGET=0):
+            # Built from artifacts once and saved as segments, which is what later loads map.
+            warm = IndexRegistry()
+            for owner in self.owners:
+                warm.get(owner)
+            warm.wait()
+            footprints = sorted(_footprint(IndexRegistry().get(owner)) for owner in self.owners)
+        # Room for any two of the three indexes.
+        self.budget = footprints[1] + footprints[2]
+
+    def resident(self):
+        return list(self.registry._indexes)
+
+    def test_least_recently_used_index_is_evicted_over_budget(self):
+        alice, bob, carol = self.owners
+        with self.settings(RAG_INDEX_MEMORY_BUDGET=self.budget):
+            self.registry.get(alice)
+            self.registry.get(bob)
+            self.assertEqual(self.resident(), [alice, bob])
+            self.registry.get(carol)
+            self.assertEqual(self.resident(), [bob, carol])
+            self.registry.get(bob)
+            self.registry.get(alice)
+            self.assertEqual(self.resident(), [bob, alice])
+
+    def test_evicted_index_comes_back_from_its_segment(self):
+        alice, bob, carol = self.owners
+        with self.settings(RAG_INDEX_MEMORY_BUDGET=self.budget):
+            first = self.registry.get(alice).search(self.registry.get(alice).codes[0], 3)
+            self.registry.get(bob)
+            self.registry.get(carol)
+            self.registry.wait()
+            self.assertNotIn(alice, self.resident())
+            self.assertTrue(segment_path(alice).exists())
+            index = self.registry.get(alice)
+        self.assertIsInstance(index.codes, np.memmap)
+        self.assertEqual(index.search(index.codes[0], 3), first)
+
+    def test_pinned_owners_are_never_evicted(self):
+        alice, bob, carol = self.owners
+        self.registry.pin(alice)
+        with self.settings(RAG_INDEX_MEMORY_BUDGET=self.budget):
+            for owner in (alice, bob, carol, bob):
+                self.registry.get(owner)
+            self.assertEqual(self.resident(), [alice, bob])
+            self.registry.unpin(alice)
+            self.registry.get(carol)
+            self.assertEqual(self.resident(), [bob, carol])
+
+    def test_no_budget_keeps_every_index(self):
+        with self.settings(RAG_INDEX_MEMORY_BUDGET=0):
+            for owner in self.owners:
+                self.registry.get(owner)
+        self.assertEqual(self.resident(), self.owners)
@@ -0,0 +1,163 @@
+# agenticai/tests/test_ingestion.py
+
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import Future
+from pathlib import Path
+
+import docx
+import numpy as np
+from django.test import SimpleTestCase
+
+from agenticai.ingestion import _iter_txt, extract_text, ingest_document, iter_text, read_artifact
+
+EMBEDDER = "agenticai.embeddings.HashingEmbedder"
+
+
+class IngestDocumentTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.source = self.directory / "notes.txt"
+        self.source.write_text("\n\n".join(f"Paragraph {number} about topic {number % 7}." for number in range(400)))
+
+    def ingest(self, name, batch_size, previous=None):
+        artifact_path = self.directory / f"{name}.npz"
+        result = ingest_document(str(self.source), str(artifact_path), 16, 4, EMBEDDER, {},
+                                 previous_artifact_path=previous, chunk_encoding="", batch_size=batch_size)
+        return result, artifact_path
+
+    def test_batches_write_the_same_artifact_as_one_pass(self):
+        batched, batched_path = self.ingest("batched", 5)
+        whole, whole_path = self.ingest("whole", 100000)
+        self.assertGreater(batched["chunk_count"], 5)
+        self.assertEqual(batched["chunk_count"], whole["chunk_count"])
+        self.assertEqual(batched["manifest"]["offsets"], whole["manifest"]["offsets"])
+        batched, whole = read_artifact(batched_path), read_artifact(whole_path)
+        self.assertEqual(batched.texts, whole.texts)
+        np.testing.assert_array_equal(batched.vectors, whole.vectors)
+        np.testing.assert_array_equal(batched.lexical.rows, whole.lexical.rows)
+        self.assertEqual([path.name for path in self.directory.iterdir() if path.suffix == ".tmp"], [])
+
+    def test_unchanged_chunks_reuse_previous_vectors_across_batches(self):
+        first, previous = self.ingest("first", 5)
+        with open(self.source, "a") as handle:
+            handle.write("\n\nA closing paragraph that was not there before.")
+        second, second_path = self.ingest("second", 5, previous=str(previous))
+        self.assertGreater(second["timings"]["reused_chunks"], first["chunk_count"] - 3)
+        self.assertGreaterEqual(second["timings"]["embedded_chunks"], 1)
+        np.testing.assert_array_equal(read_artifact(second_path).vectors[:first["chunk_count"] - 2],
+                                      read_artifact(previous).vectors[:first["chunk_count"] - 2])
+
+
+def _write_pdf(path, pages):
+    """
+    Write a PDF with one line of Helvetica text per page.
+    """
+    count = len(pages)
+    kids = " ".join(f"{4 + 2 * number} 0 R" for number in range(count))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {count} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for number, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * number} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    body, offsets = b"%PDF-1.4\n", []
+    for number, content in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f"{number} 0 obj\n{content}\nendobj\n".encode("latin-1")
+    xref = f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    xref += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    trailer = f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{len(body)}\n%%EOF\n"
+    Path(path).write_bytes(body + (xref + trailer).encode("latin-1"))
+
+
+class _EagerPool:
+    """
+    Runs submitted calls at once, recording how many were submitted.
+    """
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, function, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+class IterTextTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_txt_is_read_in_blocks_without_separators(self):
+        path = self.directory / "notes.TXT"
+        path.write_bytes("First line.\n\nSecond line, caf\u00e9.".encode("utf-8") + b" \xff end")
+        blocks = [block for block, _ in _iter_txt(path, block_size=5)]
+        self.assertGreater(len(blocks), 5)
+        self.assertEqual(extract_text(str(path)), "".join(blocks))
+        self.assertEqual(extract_text(str(path)), "First line.\n\nSecond line, caf\u00e9. \ufffd end")
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(ValueError):
+            extract_text(str(self.directory / "slides.pptx"))
+
+    def test_docx_paragraphs_are_separated_by_blank_lines(self):
+        document = docx.Document()
+        document.add_paragraph("Introduction")
+        run = document.add_paragraph("Name:").add_run()
+        run.add_tab()
+        run.add_text("Ada")
+        run.add_break()
+        run.add_text("second line")
+        table = document.add_table(rows=1, cols=2)
+        table.cell(0, 0).text = "left cell"
+        table.cell(0, 1).text = "right cell"
+        document.add_paragraph("Closing")
+        path = self.directory / "report.docx"
+        document.save(path)
+        self.assertEqual(extract_text(str(path)),
+                         "Introduction\n\nName:\tAda\nsecond line\n\nleft cell\n\nright cell\n\nClosing")
+
+    def test_docx_text_box_stays_inside_its_paragraph(self):
+        w = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+        xml = (f"<w:document {w}><w:body>"
+               "<w:p><w:r><w:t>Before </w:t></w:r><w:r><w:pict><w:txbxContent>"
+               "<w:p><w:r><w:t>boxed</w:t></w:r></w:p>"
+               "</w:txbxContent></w:pict></w:r><w:r><w:t> after</w:t></w:r></w:p>"
+               "<w:p><w:r><w:t>Next</w:t></w:r></w:p>"
+               "</w:body></w:document>")
+        path = self.directory / "boxed.docx"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr("word/document.xml", xml)
+        self.assertEqual(list(iter_text(str(path))), ["Before boxed after", "\n\n", "Next"])
+
+    def test_pdf_page_batches_join_like_single_pages(self):
+        pages = [f"Page {number} text" for number in range(5)]
+        path = self.directory / "scan.pdf"
+        _write_pdf(path, pages)
+        self.assertEqual(extract_text(str(path)), "\n\n".join(pages))
+        pieces = list(iter_text(str(path), page_batch=2))
+        self.assertEqual(pieces, ["Page 0 text\n\nPage 1 text", "\n\n", "Page 2 text\n\nPage 3 text", "\n\n",
+                                  "Page 4 text"])
+
+    def test_pool_extracts_at_most_prefetch_batches_ahead(self):
+        path = self.directory / "long.pdf"
+        _write_pdf(path, [f"Page {number}" for number in range(7)])
+        pool = _EagerPool()
+        pieces, ahead = [], []
+        for piece in iter_text(str(path), pool=pool, page_batch=1, prefetch=3):
+            pieces.append(piece)
+            if piece != "\n\n":
+                # Batches submitted but not yet handed to the consumer, besides this one.
+                ahead.append(pool.submitted - len(pieces[::2]))
+        self.assertEqual("".join(pieces), extract_text(str(path)))
+        self.assertEqual(pool.submitted, 7)
+        self.assertEqual(max(ahead), 2)
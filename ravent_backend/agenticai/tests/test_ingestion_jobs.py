@@ -0,0 +1,135 @@
+# agenticai/tests/test_ingestion_jobs.py
+
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from agenticai import ingestion
+from agenticai.models import FileUpload
+
+from . import jobs
+from .base import RAGTestCase, rag_settings
+
+Status = FileUpload.Status
+
+
+class RunJobTests(RAGTestCase):
+    def test_upload_moves_from_queued_to_indexed(self):
+        _, client = self.login("alice")
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = self.client_upload(client, "notes.txt", "Mitochondria make energy for the cell.")
+        self.assertEqual(response.json()["status"], Status.QUEUED)
+        for callback in callbacks:
+            callback()
+        upload = FileUpload.objects.get()
+        self.assertEqual(upload.status, Status.INDEXED)
+        self.assertGreater(upload.chunk_count, 0)
+        self.assertIsNotNone(upload.ingest_started_at)
+        self.assertIsNotNone(upload.indexed_at)
+        self.assertEqual(len(upload.chunk_manifest["ids"]), upload.chunk_count)
+        self.assertTrue({"extract_ms", "embed_ms", "queue_ms", "total_ms"} <= set(upload.timings))
+        self.assertEqual(upload.error, "")
+
+    def test_unreadable_file_is_marked_failed(self):
+        _, client = self.login("alice")
+        with self.assertLogs("agenticai.ingestion", "WARNING"):
+            self.upload(client, "broken.pdf", b"%PDF-1.4 this is not really a PDF")
+        upload = FileUpload.objects.get()
+        self.assertEqual(upload.status, Status.FAILED)
+        self.assertNotEqual(upload.error, "")
+        self.assertIsNone(upload.indexed_at)
+
+    def test_only_queued_uploads_are_claimed(self):
+        _, client = self.login("alice")
+        self.upload(client, "notes.txt", "Ribosomes build proteins.")
+        upload = FileUpload.objects.get()
+        self.assertIsNone(ingestion._start_job(upload.pk))
+        self.assertEqual(FileUpload.objects.get().status, Status.INDEXED)
+
+    def test_recover_stale_requeues_abandoned_jobs_only(self):
+        user, _ = self.login("alice")
+        now = timezone.now()
+        queued = FileUpload.objects.create(owner=user, file="uploads/a.txt", status=Status.QUEUED)
+        abandoned = FileUpload.objects.create(owner=user, file="uploads/b.txt", status=Status.PROCESSING,
+                                              ingest_started_at=now - timedelta(hours=2))
+        running = FileUpload.objects.create(owner=user, file="uploads/c.txt", status=Status.PROCESSING,
+                                            ingest_started_at=now - timedelta(minutes=1))
+        with self.settings(RAG_INGESTION_STALE_AFTER=3600):
+            self.assertEqual(ingestion.recover_stale(), [queued.pk, abandoned.pk])
+        self.assertEqual(FileUpload.objects.get(pk=abandoned.pk).status, Status.QUEUED)
+        self.assertEqual(FileUpload.objects.get(pk=running.pk).status, Status.PROCESSING)
+
+    def client_upload(self, client, name, content):
+        return client.post("/api/agenticai/files/", {"file": SimpleUploadedFile(name, content.encode())},
+                           format="multipart")
+
+
+class IngestionQueueTests(TransactionTestCase):
+    """
+    Drives a real IngestionQueue with worker processes whose jobs kill them.
+    """
+
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp(prefix="ingestion-queue-tests-"))
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(rag_settings(directory))
+        self.user = User.objects.create_user("alice")
+
+    def queued_upload(self, content):
+        name = default_storage.save("uploads/notes.txt", ContentFile(content.encode()))
+        return FileUpload.objects.create(owner=self.user, file=name, filename="notes.txt")
+
+    def run_queue(self, job, upload_ids):
+        work = ingestion.IngestionQueue(1, job=job)
+        self.addCleanup(work.shutdown)
+        work.submit_many(upload_ids)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            statuses = set(FileUpload.objects.filter(pk__in=upload_ids).values_list("status", flat=True))
+            if statuses <= {Status.INDEXED, Status.FAILED}:
+                return work
+            time.sleep(0.1)
+        self.fail(f"Uploads still pending: {statuses}")
+
+    def test_job_is_retried_on_a_new_pool_after_its_worker_died(self):
+        upload = self.queued_upload("Chlorophyll absorbs red and blue light.")
+        with self.assertLogs("agenticai.ingestion", "WARNING"):
+            self.run_queue(jobs.crash_once, [upload.pk])
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.error), (Status.INDEXED, ""))
+
+    def test_job_that_keeps_killing_workers_fails_and_the_queue_goes_on(self):
+        upload = self.queued_upload("This one always crashes.")
+        with self.assertLogs("agenticai.ingestion", "WARNING"):
+            work = self.run_queue(jobs.crash_always, [upload.pk])
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, Status.FAILED)
+        self.assertIn("worker process died", upload.error)
+
+        # The next upload runs on a working pool.
+        work.job = jobs.crash_once
+        later = self.queued_upload("Stomata let leaves exchange gases.")
+        work.submit(later.pk)
+        deadline = time.monotonic() + 60
+        while FileUpload.objects.get(pk=later.pk).status not in (Status.INDEXED, Status.FAILED):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.1)
+        self.assertEqual(FileUpload.objects.get(pk=later.pk).status, Status.INDEXED)
+
+    def test_queue_picks_up_uploads_left_queued(self):
+        upload = self.queued_upload("Left behind by a stopped server.")
+        work = ingestion.IngestionQueue(1)
+        self.addCleanup(work.shutdown)
+        deadline = time.monotonic() + 60
+        while FileUpload.objects.get(pk=upload.pk).status != Status.INDEXED:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.1)
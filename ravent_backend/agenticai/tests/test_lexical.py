@@ -0,0 +1,77 @@
+# agenticai/tests/test_lexical.py
+
+from django.test import SimpleTestCase
+
+from agenticai.lexical import LexicalIndex, build_segment, reciprocal_rank_fusion, tokenize
+
+
+def _index(*files):
+    index = LexicalIndex()
+    for upload_id, texts in enumerate(files, start=1):
+        index.add_file(upload_id, build_segment(texts))
+    return index
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_keeps_identifiers_and_folds_case(self):
+        self.assertEqual(tokenize("Week 3: CSE_1 Lab-Report"), ["week", "3", "cse_1", "lab", "report"])
+
+
+class BuildSegmentTests(SimpleTestCase):
+    def test_postings_hold_rows_and_term_frequencies(self):
+        segment = build_segment(["red fish blue fish", "one fish", "no match here"])
+        rows, tfs = segment.postings("fish")
+        self.assertEqual(rows.tolist(), [0, 1])
+        self.assertEqual(tfs.tolist(), [2, 1])
+        self.assertEqual(segment.lengths.tolist(), [4, 2, 3])
+        self.assertEqual(list(segment.vocab), sorted(segment.vocab))
+        self.assertIsNone(segment.postings("whale"))
+
+
+class BM25SearchTests(SimpleTestCase):
+    def test_score_is_relative_to_an_average_chunk_matching_once(self):
+        index = _index(["apple pear", "plum fig", "kiwi lime"])
+        [(upload_id, position, score)] = index.search(["apple"], 5)
+        self.assertEqual((upload_id, position), (1, 0))
+        self.assertAlmostEqual(score, 1.0, places=5)
+
+    def test_rare_terms_outweigh_common_ones(self):
+        index = _index(["exam schedule", "exam rooms", "exam results", "thesis results"])
+        ranked = index.search(["exam", "thesis"], 4)
+        self.assertEqual(ranked[0][:2], (1, 3))
+        self.assertEqual({position for _, position, _ in ranked}, {0, 1, 2, 3})
+
+    def test_shorter_chunks_rank_higher_for_the_same_match(self):
+        index = _index(["grading policy", "grading " + "filler " * 20])
+        self.assertEqual([position for _, position, _ in index.search(["grading"], 2)], [0, 1])
+
+    def test_term_frequency_saturates(self):
+        index = _index(["quiz quiz", "quiz " * 40, "other words", "more words"])
+        scores = {position: score for _, position, score in index.search(["quiz"], 2)}
+        self.assertLess(scores[1] / scores[0], 2)
+
+    def test_statistics_span_files_and_follow_removal(self):
+        index = _index(["apple pie"], ["apple tart", "plum tart"])
+        self.assertEqual((len(index), index.total_tokens), (3, 6))
+        self.assertEqual({upload_id for upload_id, _, _ in index.search(["apple"], 5)}, {1, 2})
+        index.remove_file(1)
+        self.assertEqual((len(index), index.total_tokens), (2, 4))
+        self.assertEqual([hit[:2] for hit in index.search(["apple"], 5)], [(2, 0)])
+
+    def test_limits_and_empty_queries(self):
+        index = _index(["alpha beta", "alpha gamma", "alpha delta"])
+        self.assertEqual(len(index.search(["alpha"], 2)), 2)
+        self.assertEqual(index.search([], 5), [])
+        self.assertEqual(index.search(["omega"], 5), [])
+        self.assertEqual(LexicalIndex().search(["alpha"], 5), [])
+
+
+class ReciprocalRankFusionTests(SimpleTestCase):
+    def test_agreement_beats_a_single_first_place(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+        self.assertEqual(fused[0], "b")
+        self.assertEqual(set(fused[1:3]), {"a", "d"})
+        self.assertEqual(set(fused), {"a", "b", "c", "d", "e"})
+
+    def test_single_ranking_keeps_its_order(self):
+        self.assertEqual(reciprocal_rank_fusion([["x", "y", "z"]]), ["x", "y", "z"])
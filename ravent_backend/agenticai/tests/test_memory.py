@@ -0,0 +1,156 @@
+# agenticai/tests/test_memory.py
+
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from agenticai import memory
+from agenticai.memory import ExtractiveSummarizer, Turn
+from agenticai.models import Conversation, ConversationMessage
+
+from .base import RAGTestCase
+
+CONVERSATIONS_URL = "/api/agenticai/conversations/"
+
+
+@override_settings(CHAT_HISTORY_TURNS=2, CHAT_COMPACT_BATCH=3)
+class ConversationMemoryTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.client = self.login("alice")
+        self.conversation = Conversation.objects.create(owner=self.user)
+
+    def record(self, count, compact=False):
+        for _ in range(count):
+            context = memory.load_context(self.user.pk, self.conversation.pk)
+            number = context.turn_count + 1
+            with self.captureOnCommitCallbacks(execute=compact):
+                memory.record_turn(context, f"Question {number}?", f"Answer {number}. More detail.", [f"{number}.txt"])
+
+    def context_turns(self):
+        return [turn.number for turn in memory.load_context(self.user.pk, self.conversation.pk).turns]
+
+    def test_record_turn_appends_both_messages(self):
+        context = memory.load_context(self.user.pk, self.conversation.pk)
+        self.assertEqual(memory.record_turn(context, "What is ATP? " * 20, "Energy currency.", ["atp.txt"]), 1)
+        self.assertEqual(memory.record_turn(context, "And ADP?", "Its spent form."), 2)
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.turn_count, 2)
+        # The title is the first question, clipped.
+        self.assertTrue(self.conversation.title.startswith("What is ATP?"))
+        self.assertLessEqual(len(self.conversation.title), 84)
+        messages = list(ConversationMessage.objects.order_by("turn", "id").values_list("turn", "role", "sources"))
+        self.assertEqual(messages, [(1, "user", []), (1, "assistant", ["atp.txt"]), (2, "user", []), (2, "assistant", [])])
+
+    def test_record_turn_in_a_deleted_conversation_returns_none(self):
+        context = memory.load_context(self.user.pk, self.conversation.pk)
+        self.conversation.delete()
+        self.assertIsNone(memory.record_turn(context, "Anyone there?", "No."))
+        self.assertFalse(ConversationMessage.objects.exists())
+
+    def test_context_keeps_unsummarised_turns_up_to_the_window(self):
+        self.record(4)
+        # Window is CHAT_HISTORY_TURNS + CHAT_COMPACT_BATCH = 5 turns.
+        self.assertEqual(self.context_turns(), [1, 2, 3, 4])
+        self.record(3)
+        self.assertEqual(self.context_turns(), [3, 4, 5, 6, 7])
+        context = memory.load_context(self.user.pk, self.conversation.pk)
+        self.assertEqual(context.turns[0], Turn(3, "Question 3?", "Answer 3. More detail."))
+
+    def test_context_starts_after_the_summary(self):
+        self.record(4)
+        Conversation.objects.filter(pk=self.conversation.pk).update(summary="Earlier.", summary_through=3)
+        context = memory.load_context(self.user.pk, self.conversation.pk)
+        self.assertEqual(context.summary, "Earlier.")
+        self.assertEqual([turn.number for turn in context.turns], [4])
+        self.assertTrue(memory.render_history(context).startswith("Summary of earlier turns:\nEarlier."))
+
+    def test_context_of_someone_elses_conversation_is_not_found(self):
+        bob, _ = self.login("bob")
+        with self.assertRaises(Conversation.DoesNotExist):
+            memory.load_context(bob.pk, self.conversation.pk)
+
+    def test_compaction_runs_once_a_batch_has_left_the_recent_turns(self):
+        self.record(4, compact=True)
+        self.assertEqual(Conversation.objects.get().summary_through, 0)
+        # Turn 5 leaves turns 1-3 outside the last two: one batch.
+        self.record(1, compact=True)
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.summary_through, 3)
+        self.assertEqual(conversation.summary.splitlines(), [
+            "- Q: Question 1? A: Answer 1.", "- Q: Question 2? A: Answer 2.", "- Q: Question 3? A: Answer 3.",
+        ])
+        self.assertEqual(self.context_turns(), [4, 5])
+
+    def test_compact_folds_everything_before_the_recent_turns_step_by_step(self):
+        self.record(9)
+        with mock.patch.object(memory, "COMPACT_STEP", 2), \
+                mock.patch.object(ExtractiveSummarizer, "summarize", autospec=True,
+                                  side_effect=ExtractiveSummarizer.summarize) as summarize:
+            memory.compact(self.conversation.pk)
+        self.assertEqual([[turn.number for turn in call.args[2]] for call in summarize.call_args_list],
+                         [[1, 2], [3, 4], [5, 6], [7]])
+        conversation = Conversation.objects.get()
+        self.assertEqual(conversation.summary_through, 7)
+        self.assertEqual(len(conversation.summary.splitlines()), 7)
+
+    def test_compact_step_is_dropped_if_another_one_applied_first(self):
+        self.record(6)
+
+        def concurrent_summarize(summarizer, summary, turns):
+            # Another compactor finishes the same step while this one is summarising.
+            Conversation.objects.filter(pk=self.conversation.pk).update(summary="theirs", summary_through=4)
+            return "mine"
+
+        with mock.patch.object(ExtractiveSummarizer, "summarize", autospec=True, side_effect=concurrent_summarize):
+            memory.compact(self.conversation.pk)
+        conversation = Conversation.objects.get()
+        self.assertEqual((conversation.summary, conversation.summary_through), ("theirs", 4))
+
+    def test_messages_are_listed_latest_turn_first_question_before_answer(self):
+        self.record(3)
+        url = f"{CONVERSATIONS_URL}{self.conversation.pk}/messages/"
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual([(message["turn"], message["role"]) for message in body["results"]],
+                         [(3, "user"), (3, "assistant"), (2, "user"), (2, "assistant")])
+        self.assertEqual(body["next_before"], 2)
+
+        body = self.client.get(url, {"before": body["next_before"], "limit": 2}).json()
+        self.assertEqual([(message["turn"], message["role"]) for message in body["results"]],
+                         [(1, "user"), (1, "assistant")])
+        self.assertIsNone(body["next_before"])
+
+    def test_messages_of_someone_elses_conversation_are_not_found(self):
+        _, bob = self.login("bob")
+        self.assertEqual(bob.get(f"{CONVERSATIONS_URL}{self.conversation.pk}/messages/").status_code, 404)
+
+
+class ExtractiveSummarizerTests(SimpleTestCase):
+    def test_one_line_per_turn_with_the_first_sentence_of_the_answer(self):
+        summarizer = ExtractiveSummarizer(max_chars=1000)
+        summary = summarizer.summarize("- Q: Before? A: Yes.", [
+            Turn(2, "What do  mitochondria\ndo?", "They make ATP. They also have DNA!"),
+            Turn(3, "Why?", "Because respiration happens there"),
+        ])
+        self.assertEqual(summary.splitlines(), [
+            "- Q: Before? A: Yes.",
+            "- Q: What do mitochondria do? A: They make ATP.",
+            "- Q: Why? A: Because respiration happens there",
+        ])
+
+    def test_long_questions_and_answers_are_clipped(self):
+        summary = ExtractiveSummarizer(max_chars=1000).summarize("", [Turn(1, "q" * 500, "a" * 500)])
+        self.assertEqual(summary, f"- Q: {'q' * 200} ... A: {'a' * 200} ...")
+
+    def test_oldest_lines_are_dropped_beyond_max_chars(self):
+        summarizer = ExtractiveSummarizer(max_chars=70)
+        turns = [Turn(number, f"Question {number}?", f"Answer {number}.") for number in range(1, 6)]
+        summary = summarizer.summarize("", turns)
+        self.assertLessEqual(len(summary), 70)
+        # Only whole lines are kept, the newest ones.
+        self.assertEqual(summary.splitlines(), [
+            "- Q: Question 4? A: Answer 4.", "- Q: Question 5? A: Answer 5.",
+        ])
@@ -0,0 +1,87 @@
+# agenticai/tests/test_pagination.py
+
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from agenticai.models import DocumentSetVersion, FileUpload
+
+from .base import RAGTestCase
+
+FILES_URL = "/api/agenticai/files/"
+
+
+class FileListPaginationTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.client = self.login("alice")
+        now = timezone.now()
+        # Two rows share a timestamp, so the id must break the tie.
+        stamps = [now - timedelta(minutes=3), now - timedelta(minutes=2), now - timedelta(minutes=2),
+                  now - timedelta(minutes=1), now]
+        self.uploads = []
+        for number, stamp in enumerate(stamps):
+            upload = FileUpload.objects.create(owner=self.user, file=f"uploads/{number}.txt", filename=f"{number}.txt")
+            FileUpload.objects.filter(pk=upload.pk).update(uploaded_at=stamp)
+            self.uploads.append(upload.pk)
+        other, _ = self.login("bob")
+        FileUpload.objects.create(owner=other, file="uploads/other.txt", filename="other.txt")
+
+    def test_pages_walk_every_file_once_newest_first(self):
+        seen, url = [], f"{FILES_URL}?page_size=2"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 2)
+            seen.extend(item["id"] for item in page["results"])
+            url = page["next"]
+        tied = sorted(self.uploads[1:3], reverse=True)
+        self.assertEqual(seen, [self.uploads[4], self.uploads[3], *tied, self.uploads[0]])
+
+    def test_pages_use_no_offset_or_count(self):
+        first = self.client.get(f"{FILES_URL}?page_size=2").json()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first["next"])
+        listing = [query["sql"] for query in queries if '"agenticai_fileupload"."filename"' in query["sql"]]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn("OFFSET", listing[0])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get(f"{FILES_URL}?cursor=not-a-cursor").status_code, 404)
+
+    def test_unchanged_listing_is_not_modified(self):
+        response = self.client.get(FILES_URL)
+        etag = response["ETag"]
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(FILES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('"agenticai_fileupload"."filename"' in query["sql"] for query in queries))
+
+        # Another page of the same listing has its own validator.
+        self.assertNotEqual(self.client.get(f"{FILES_URL}?page_size=2")["ETag"], etag)
+
+    def test_changed_listing_gets_a_new_etag(self):
+        etag = self.client.get(FILES_URL)["ETag"]
+        FileUpload.objects.filter(pk=self.uploads[0]).update(
+            filename="renamed.txt", updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        response = self.client.get(FILES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_deleting_an_older_file_moves_last_modified(self):
+        self.client.get(FILES_URL)
+        # Age every timestamp, so the delete lands in a later second than the listing.
+        FileUpload.objects.update(updated_at=F("updated_at") - timedelta(seconds=5))
+        DocumentSetVersion.objects.update(changed_at=F("changed_at") - timedelta(seconds=5))
+        last_modified = self.client.get(FILES_URL)["Last-Modified"]
+        self.assertEqual(self.client.get(FILES_URL, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.assertEqual(self.client.delete(f"{FILES_URL}{self.uploads[0]}/").status_code, 204)
+        response = self.client.get(FILES_URL, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(self.uploads[0], [item["id"] for item in response.json()["results"]])
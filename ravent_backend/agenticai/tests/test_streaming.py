@@ -0,0 +1,131 @@
+# agenticai/tests/test_streaming.py
+
+import asyncio
+import json
+
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections
+
+from agenticai import generation
+
+from .base import RAGTestCase
+
+STREAM_URL = "/api/agenticai/chat/stream/"
+
+
+class ChatStreamAuthenticationTests(RAGTestCase):
+    def test_requires_a_token(self):
+        _, client = self.login("alice")
+        client.credentials()
+        response = client.post(STREAM_URL, {"query": "hello"}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_resolves_the_user_from_the_jwt_user_cache(self):
+        _, client = self.login("alice")
+        # An invalid body is rejected right after authentication.
+        self.assertEqual(client.post(STREAM_URL, "{", content_type="application/json").status_code, 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(client.post(STREAM_URL, "{", content_type="application/json").status_code, 400)
+
+
+class ChatStreamTests(RAGTestCase):
+    """
+    Streams through the ASGI application, as a server would, so a client
+    disconnect reaches the view the way it does in production.
+    """
+
+    def setUp(self):
+        super().setUp()
+        _, client = self.login("alice")
+        self.authorization = client._credentials["HTTP_AUTHORIZATION"]
+        self.upload(client, "biology.txt", "Photosynthesis turns light into chemical energy in chloroplasts.")
+        self.enterContext(self.settings(RAG_GENERATOR="agenticai.generation.FakeTokenGenerator",
+                                        RAG_GENERATOR_OPTIONS={"count": 200, "delay": 0.01}))
+        generation._generators.pop("agenticai.generation.FakeTokenGenerator", None)
+        self.addCleanup(generation._generators.pop, "agenticai.generation.FakeTokenGenerator", None)
+        # Like the test client: keep the test transaction's connection open across requests.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_started.connect, close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+
+    async def stream(self, query, disconnect_after=None):
+        """
+        POST a query and read the event stream; with `disconnect_after`, the
+        client goes away once that many token events arrived. Returns
+        (status, events) with events as (name, data) pairs.
+        """
+        from ravent_backend.asgi import application
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": STREAM_URL,
+            "raw_path": STREAM_URL.encode("ascii"),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                (b"authorization", self.authorization.encode("latin-1")),
+            ],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        gone = asyncio.Event()
+        sent_request = False
+        status, body = None, []
+
+        async def receive():
+            nonlocal sent_request
+            if not sent_request:
+                sent_request = True
+                return {"type": "http.request", "body": json.dumps({"query": query}).encode(), "more_body": False}
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                body.append(message.get("body", b""))
+                tokens = b"".join(body).count(b"event: token")
+                if not message.get("more_body", False) or (disconnect_after and tokens >= disconnect_after):
+                    gone.set()
+
+        try:
+            await asyncio.wait_for(application(scope, receive, send), 10)
+        finally:
+            gone.set()
+        events = []
+        for block in b"".join(body).decode().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+            if lines:
+                events.append((lines["event"], json.loads(lines["data"])))
+        return status, events
+
+    async def test_streams_tokens_then_the_answer(self):
+        self.enterContext(self.settings(RAG_GENERATOR_OPTIONS={"count": 5, "delay": 0}))
+        status, events = await self.stream("photosynthesis")
+        self.assertEqual(status, 200)
+        self.assertEqual([name for name, _ in events], ["token"] * 5 + ["done"])
+        content = events[-1][1]["content"]
+        self.assertEqual(content["answer"], "".join(data["token"] for _, data in events[:-1]))
+        self.assertEqual(content["sources"], ["biology.txt"])
+
+    async def test_disconnect_stops_generation(self):
+        started = asyncio.get_running_loop().time()
+        status, events = await self.stream("photosynthesis", disconnect_after=3)
+        # The full answer would take two seconds; the request ends with the client.
+        self.assertLess(asyncio.get_running_loop().time() - started, 1)
+        self.assertEqual(status, 200)
+        self.assertNotIn("done", [name for name, _ in events])
+        generator = generation.get_generator()
+        emitted = generator.emitted
+        await asyncio.sleep(0.1)
+        self.assertEqual(generator.emitted, emitted)
+        self.assertLess(emitted, generator.count)
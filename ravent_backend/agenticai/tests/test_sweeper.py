@@ -0,0 +1,136 @@
+# agenticai/tests/test_sweeper.py
+
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from agenticai import sweeper
+from agenticai.ingestion import artifact_name
+from agenticai.models import FileUpload, StorageTombstone, StoredBlob
+
+from .base import RAGTestCase
+
+FILES_URL = "/api/agenticai/files/"
+
+
+class SweeperTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user, self.client = self.login("alice")
+
+    def stored(self, name, content):
+        """
+        Upload and ingest a file; returns (upload id, storage name, artifact path).
+        """
+        upload_id = self.upload(self.client, name, content).json()["id"]
+        blob = FileUpload.objects.get(pk=upload_id).blob
+        return upload_id, blob.file.name, Path(settings.RAG_STORE_ROOT) / artifact_name(blob.sha256)
+
+    def test_sweep_deletes_released_content_and_its_tombstone(self):
+        upload_id, name, artifact = self.stored("notes.txt", "Osmosis moves water across membranes.")
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(artifact.exists())
+
+        self.client.delete(f"{FILES_URL}{upload_id}/")
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(sweeper.sweep_all(), (1, 0))
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(artifact.exists())
+        self.assertFalse(StorageTombstone.objects.exists())
+
+    def test_content_uploaded_again_mid_sweep_keeps_its_artifact(self):
+        first_id, first_name, first_artifact = self.stored("first.txt", "Diffusion spreads solutes out.")
+        second_id, second_name, second_artifact = self.stored("second.txt", "Active transport needs ATP.")
+        self.client.delete(f"{FILES_URL}{first_id}/")
+        self.client.delete(f"{FILES_URL}{second_id}/")
+
+        delete = default_storage.delete
+
+        def upload_second_again(name):
+            # Another request stores the second file's content again while the batch is being swept.
+            if name == first_name:
+                self.stored("again.txt", "Active transport needs ATP.")
+            delete(name)
+
+        with mock.patch.object(default_storage, "delete", side_effect=upload_second_again):
+            self.assertEqual(sweeper.sweep(), (2, 0))
+        self.assertFalse(first_artifact.exists())
+        self.assertTrue(second_artifact.exists())
+        again = StoredBlob.objects.get()
+        # The buried name was not reused, so deleting it did not touch the new copy.
+        self.assertNotEqual(again.file.name, second_name)
+        self.assertTrue(default_storage.exists(again.file.name))
+        self.assertFalse(default_storage.exists(second_name))
+
+    def test_name_referenced_again_is_not_deleted(self):
+        upload_id, name, _ = self.stored("notes.txt", "Turgor pressure keeps plants upright.")
+        StorageTombstone.objects.create(name=name, next_attempt_at=timezone.now())
+        self.assertEqual(sweeper.sweep(), (1, 0))
+        self.assertTrue(default_storage.exists(name))
+        self.assertEqual(FileUpload.objects.get(pk=upload_id).status, FileUpload.Status.INDEXED)
+
+    def test_failed_deletes_back_off_exponentially(self):
+        tombstone = StorageTombstone.objects.create(name="blobs/ab/missing.txt", next_attempt_at=timezone.now())
+        with self.settings(STORAGE_GC_RETRY_DELAY=30), \
+                mock.patch.object(default_storage, "delete", side_effect=OSError("storage is down")), \
+                self.assertLogs("agenticai.sweeper", "WARNING"):
+            for attempt, delay in ((1, 30), (2, 60), (3, 120)):
+                before = timezone.now()
+                self.assertEqual(sweeper.sweep_all(), (0, 1))
+                tombstone.refresh_from_db()
+                self.assertEqual(tombstone.attempts, attempt)
+                self.assertEqual(tombstone.last_error, "storage is down")
+                self.assertGreaterEqual(tombstone.next_attempt_at, before + timedelta(seconds=delay))
+                self.assertLess(tombstone.next_attempt_at, before + timedelta(seconds=delay + 5))
+                # Not due yet: nothing is retried.
+                self.assertEqual(sweeper.sweep(), (0, 0))
+                StorageTombstone.objects.filter(pk=tombstone.pk).update(next_attempt_at=timezone.now())
+
+            StorageTombstone.objects.filter(pk=tombstone.pk).update(attempts=20)
+            before = timezone.now()
+            sweeper.sweep()
+            tombstone.refresh_from_db()
+            self.assertLess(tombstone.next_attempt_at, before + sweeper.MAX_BACKOFF + timedelta(seconds=5))
+
+        self.assertEqual(sweeper.sweep(), (0, 0))
+        StorageTombstone.objects.filter(pk=tombstone.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(sweeper.sweep(), (1, 0))
+        self.assertFalse(StorageTombstone.objects.exists())
+
+    def test_leased_tombstones_are_not_swept_twice(self):
+        StorageTombstone.objects.create(name="blobs/ab/gone.txt", next_attempt_at=timezone.now())
+
+        def sweep_concurrently(name):
+            self.assertEqual(sweeper.sweep(), (0, 0))
+
+        with mock.patch.object(default_storage, "delete", side_effect=sweep_concurrently):
+            self.assertEqual(sweeper.sweep(), (1, 0))
+
+
+class BulkDeleteTests(RAGTestCase):
+    def test_deletes_own_files_and_reports_the_rest(self):
+        _, alice = self.login("alice")
+        _, bob = self.login("bob")
+        ids = [self.upload(alice, f"{index}.txt", text).json()["id"]
+               for index, text in enumerate(["Xylem carries water.", "Phloem carries sugar.", "Xylem carries water."])]
+        bobs = self.upload(bob, "bob.txt", "Phloem carries sugar.").json()["id"]
+        shared = FileUpload.objects.get(pk=ids[0]).file.name
+
+        response = alice.post(f"{FILES_URL}bulk/delete/", {"ids": [ids[0], bobs, 999, ids[0], ids[2]]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"deleted": [ids[0], ids[2]], "not_found": [bobs, 999]})
+        self.assertEqual(sorted(FileUpload.objects.values_list("pk", flat=True)), sorted([ids[1], bobs]))
+        # Both references to the shared content went in one request; it is buried once.
+        self.assertEqual(StorageTombstone.objects.count(), 1)
+        self.assertEqual(StoredBlob.objects.get(sha256__in=FileUpload.objects.values("blob__sha256")).ref_count, 2)
+        self.assertEqual(sweeper.sweep_all(), (1, 0))
+        self.assertFalse(default_storage.exists(shared))
+        self.assertTrue(default_storage.exists(FileUpload.objects.get(pk=bobs).file.name))
+
+    def test_rejects_a_missing_id_list(self):
+        _, alice = self.login("alice")
+        self.assertEqual(alice.post(f"{FILES_URL}bulk/delete/", {}, format="json").status_code, 400)
@@ -0,0 +1,121 @@
+# agenticai/tests/test_uploads.py
+
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from agenticai.models import FileUpload, StorageTombstone, StoredBlob
+
+from .base import RAGTestCase
+
+FILES_URL = "/api/agenticai/files/"
+
+
+class ContentAddressedUploadTests(RAGTestCase):
+    def test_identical_content_is_stored_once(self):
+        _, alice = self.login("alice")
+        _, bob = self.login("bob")
+        self.assertEqual(self.upload(alice, "notes.txt", "Shared lecture notes.").status_code, 201)
+        self.assertEqual(self.upload(bob, "copy.txt", "Shared lecture notes.").status_code, 201)
+
+        blob = StoredBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(set(FileUpload.objects.values_list("blob_id", flat=True)), {blob.pk})
+        self.assertEqual(sorted(FileUpload.objects.values_list("filename", flat=True)), ["copy.txt", "notes.txt"])
+        stored = os.listdir(os.path.join(settings.MEDIA_ROOT, os.path.dirname(blob.file.name)))
+        self.assertEqual(stored, [os.path.basename(blob.file.name)])
+
+    def test_different_content_gets_its_own_blob(self):
+        _, alice = self.login("alice")
+        self.upload(alice, "a.txt", "First document.")
+        self.upload(alice, "b.txt", "Second document.")
+        self.assertEqual(sorted(StoredBlob.objects.values_list("ref_count", flat=True)), [1, 1])
+
+    def test_content_is_released_with_its_last_reference(self):
+        _, alice = self.login("alice")
+        _, bob = self.login("bob")
+        first = self.upload(alice, "notes.txt", "Shared lecture notes.").json()["id"]
+        second = self.upload(bob, "notes.txt", "Shared lecture notes.").json()["id"]
+        blob = StoredBlob.objects.get()
+
+        self.assertEqual(alice.delete(f"{FILES_URL}{first}/").status_code, 204)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+        self.assertFalse(StorageTombstone.objects.exists())
+
+        self.assertEqual(bob.delete(f"{FILES_URL}{second}/").status_code, 204)
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertEqual(list(StorageTombstone.objects.values_list("name", flat=True)), [blob.file.name])
+
+    def test_replacing_with_the_same_content_keeps_the_reference(self):
+        _, alice = self.login("alice")
+        upload_id = self.upload(alice, "notes.txt", "Lecture notes.").json()["id"]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = alice.put(f"{FILES_URL}{upload_id}/", {"file": SimpleUploadedFile("renamed.txt", b"Lecture notes.")},
+                                 format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StoredBlob.objects.get().ref_count, 1)
+        self.assertEqual(FileUpload.objects.get().filename, "renamed.txt")
+
+
+class BulkUploadTests(RAGTestCase):
+    def setUp(self):
+        super().setUp()
+        _, self.client = self.login("alice")
+
+    def post(self, *files):
+        with self.captureOnCommitCallbacks(execute=True):
+            files = [SimpleUploadedFile(name, content) for name, content in files]
+            return self.client.post(f"{FILES_URL}bulk/", {"files": files}, format="multipart")
+
+    def test_all_valid_files_are_created(self):
+        response = self.post(("a.txt", b"Cells divide by mitosis."), ("b.txt", b"Meiosis makes gametes."))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([(result["filename"], result["status"]) for result in response.json()],
+                         [("a.txt", 201), ("b.txt", 201)])
+        self.assertEqual(set(FileUpload.objects.values_list("status", flat=True)), {FileUpload.Status.INDEXED})
+
+    def test_one_valid_and_one_invalid_file_is_a_multi_status(self):
+        response = self.post(("virus.exe", b"MZ"), ("notes.txt", b"Ribosomes read mRNA."))
+        self.assertEqual(response.status_code, 207)
+        rejected, created = response.json()
+        self.assertEqual((rejected["filename"], rejected["status"]), ("virus.exe", 400))
+        self.assertIn("file", rejected["errors"])
+        self.assertEqual((created["filename"], created["status"]), ("notes.txt", 201))
+        self.assertEqual(created["file"]["id"], FileUpload.objects.get().pk)
+        self.assertEqual(StoredBlob.objects.count(), 1)
+
+    def test_nothing_valid_is_a_bad_request(self):
+        response = self.post(("virus.exe", b"MZ"))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0]["status"], 400)
+        self.assertFalse(FileUpload.objects.exists())
+        self.assertFalse(StoredBlob.objects.exists())
+
+    def test_no_files_or_too_many_are_rejected(self):
+        self.assertEqual(self.client.post(f"{FILES_URL}bulk/", {}, format="multipart").status_code, 400)
+        with self.settings(FILE_BULK_UPLOAD_MAX_FILES=2):
+            response = self.post(*[(f"{number}.txt", b"Too many.") for number in range(3)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("files", response.json())
+        self.assertFalse(FileUpload.objects.exists())
+
+    def test_duplicate_content_in_one_request_is_stored_once_with_a_reference_each(self):
+        response = self.post(("a.txt", b"Same notes."), ("b.txt", b"Same notes."), ("c.txt", b"Other notes."))
+        self.assertEqual(response.status_code, 201)
+        shared = StoredBlob.objects.get(ref_count=2)
+        self.assertEqual(sorted(FileUpload.objects.filter(blob=shared).values_list("filename", flat=True)),
+                         ["a.txt", "b.txt"])
+        self.assertEqual(StoredBlob.objects.get(ref_count=1).size, len(b"Other notes."))
+
+        # Content already stored gets one more reference per copy.
+        self.post(("d.txt", b"Same notes."), ("e.txt", b"Same notes."))
+        shared.refresh_from_db()
+        self.assertEqual(shared.ref_count, 4)
+        self.assertEqual(StoredBlob.objects.count(), 2)
+
+        # Releasing the copies one by one buries the content with its last reference only.
+        for upload in FileUpload.objects.filter(blob=shared):
+            self.assertFalse(StorageTombstone.objects.exists())
+            self.client.delete(f"{FILES_URL}{upload.pk}/")
+        self.assertEqual(list(StorageTombstone.objects.values_list("name", flat=True)), [shared.file.name])
@@ -0,0 +1,128 @@
+# agenticai/tools.py
+"""
+External search tools the chat pipeline can fall back on when the user's
+documents do not answer a question (agenticai/fanout.py).
+
+A tool is an object with an async `search(query, limit)` returning
+SearchResults; the active one is chosen with settings.RAG_SEARCH_TOOL, like
+the generator and the embedder. StubSearchTool answers locally with
+configurable latency, tail and failures, so tests and benchmarks never touch
+the network.
+"""
+
+import asyncio
+import random
+from typing import NamedTuple
+
+from django.utils.module_loading import import_string
+
+
+class SearchResult(NamedTuple):
+    title: str
+    url: str
+    snippet: str
+
+
+class SearchTool:
+    """
+    Base class for search tools.
+    """
+    name = "search"
+
+    async def search(self, query, limit):
+        """
+        Return up to `limit` SearchResults, best first. Must be cancellable:
+        the pipeline cancels searches whose answer is no longer needed.
+        """
+        raise NotImplementedError
+
+
+class DuckDuckGoSearchTool(SearchTool):
+    """
+    DuckDuckGo's Instant Answer API (the notebooks' DuckDuckGoTools), over httpx.
+    """
+    name = "duckduckgo"
+    url = "https://api.duckduckgo.com/"
+
+    def __init__(self, timeout=10.0, region="wt-wt"):
+        self.timeout = timeout
+        self.region = region
+
+    async def search(self, query, limit):
+        import httpx
+
+        # A client per call: the pipeline may run on a different event loop each time.
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url, params={
+                "q": query, "format": "json", "no_html": 1, "skip_disambig": 1, "kl": self.region,
+            })
+            response.raise_for_status()
+            data = response.json()
+        results = []
+        if data.get("AbstractText") and data.get("AbstractURL"):
+            results.append(SearchResult(data.get("Heading") or query, data["AbstractURL"], data["AbstractText"]))
+        topics = list(data.get("RelatedTopics") or [])
+        while topics and len(results) < limit:
+            topic = topics.pop(0)
+            if "Topics" in topic:
+                topics[:0] = topic["Topics"]
+            elif topic.get("Text") and topic.get("FirstURL"):
+                results.append(SearchResult(topic["Text"].split(" - ", 1)[0], topic["FirstURL"], topic["Text"]))
+        return results[:limit]
+
+
+class StubSearchTool(SearchTool):
+    """
+    Local search provider: returns `limit` canned results after `latency`
+    seconds, or `slow_latency` seconds for a `slow_rate` share of calls, and
+    fails a `failure_rate` share of calls. Counts calls and cancellations.
+    """
+    name = "stub"
+
+    def __init__(self, latency=0.05, slow_latency=1.0, slow_rate=0.0, failure_rate=0.0, empty=False, seed=None):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.slow_rate = slow_rate
+        self.failure_rate = failure_rate
+        self.empty = empty
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def search(self, query, limit):
+        self.calls += 1
+        slow, failing = self.random.random() < self.slow_rate, self.random.random() < self.failure_rate
+        try:
+            await asyncio.sleep(self.slow_latency if slow else self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if failing:
+            raise ConnectionError("Stub search provider failure")
+        if self.empty:
+            return []
+        return [
+            SearchResult(f"Result {rank} for {query}", f"https://search.invalid/{rank}",
+                         f"Web result {rank} about {query}.")
+            for rank in range(1, limit + 1)
+        ]
+
+
+_tools = {}
+
+
+def get_search_tool():
+    """
+    Return the process-wide search tool configured by settings.RAG_SEARCH_TOOL,
+    or None when web search is disabled.
+    """
+    from django.conf import settings
+
+    if not settings.RAG_SEARCH_TOOL:
+        return None
+    tool = _tools.get(settings.RAG_SEARCH_TOOL)
+    if tool is None:
+        tool = _tools[settings.RAG_SEARCH_TOOL] = import_string(settings.RAG_SEARCH_TOOL)(
+            **settings.RAG_SEARCH_TOOL_OPTIONS
+        )
+    return tool
@@ -1,13 +1,38 @@
 # agenticai/urls.py
 
 from django.urls import path
-from .views import FileUploadListCreateView, FileUploadDeleteView, ChatAPIView
+from .views import (
+    FileUploadListCreateView,
+    FileUploadBulkCreateView,
+    FileUploadBulkDeleteView,
+    FileUploadDeleteView,
+    ChatAPIView,
+    ChatCacheStatsView,
+    chat_stream_view,
+    ConversationListCreateView,
+    ConversationDetailView,
+    ConversationMessageListView,
+)
 
 urlpatterns = [
     # GET & POST  /api/agenticai/files/
     path("files/", FileUploadListCreateView.as_view(), name="file-list-create"),
-    # DELETE  /api/agenticai/files/<pk>/
+    # POST  /api/agenticai/files/bulk/  (many files in one multipart request)
+    path("files/bulk/", FileUploadBulkCreateView.as_view(), name="file-bulk-create"),
+    # POST  /api/agenticai/files/bulk/delete/  { "ids": [...] }
+    path("files/bulk/delete/", FileUploadBulkDeleteView.as_view(), name="file-bulk-delete"),
+    # PUT & DELETE  /api/agenticai/files/<pk>/
     path("files/<int:pk>/", FileUploadDeleteView.as_view(), name="file-delete"),
     # POST  /api/agenticai/chat/
     path("chat/", ChatAPIView.as_view(), name="chat"),
+    # POST  /api/agenticai/chat/stream/  (server-sent events; run under ASGI)
+    path("chat/stream/", chat_stream_view, name="chat-stream"),
+    # GET  /api/agenticai/chat/cache/stats/  (staff only)
+    path("chat/cache/stats/", ChatCacheStatsView.as_view(), name="chat-cache-stats"),
+    # GET & POST  /api/agenticai/conversations/
+    path("conversations/", ConversationListCreateView.as_view(), name="conversation-list-create"),
+    # GET & DELETE  /api/agenticai/conversations/<pk>/
+    path("conversations/<int:pk>/", ConversationDetailView.as_view(), name="conversation-detail"),
+    # GET  /api/agenticai/conversations/<pk>/messages/?before=&limit=
+    path("conversations/<int:pk>/messages/", ConversationMessageListView.as_view(), name="conversation-messages"),
 ]
@@ -1,49 +1,117 @@
 # agenticai/views.py
 
-from rest_framework import generics, permissions, status
+import hashlib
+import json
+import logging
+import os
+
+from asgiref.sync import sync_to_async
+from rest_framework import generics, mixins, permissions, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth.models import AnonymousUser
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Max, Value, When
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from .models import FileUpload
+from accounts.authentication import CachedJWTAuthentication
+from ravent_backend.db import ReadReplicaMixin
+
+from . import blobs, chat, ingestion, memory, sweeper
+from .streaming import buffered, sse_event
+from .cache import bump_docset_version, docset_state, get_answer_cache
+from .models import Conversation, ConversationMessage, FileUpload
+from .pagination import KeysetPagination
 from .serializers import (
     FileUploadSerializer,
+    FileUploadBulkDeleteSerializer,
+    FileUploadPageSerializer,
     ChatRequestSerializer,
-    ChatResponseSerializer
+    ChatResponseSerializer,
+    ConversationSerializer,
+    ConversationMessageSerializer
 )
 
+logger = logging.getLogger(__name__)
 
-class FileUploadListCreateView(generics.ListCreateAPIView):
+
+class FileUploadListCreateView(ReadReplicaMixin, generics.ListCreateAPIView):
     """
     get:
-    List all files owned by the authenticated user.
+    List the files owned by the authenticated user, newest first, one page at a
+    time (follow `next`). Responses carry ETag and Last-Modified validators;
+    conditional requests get 304 Not Modified while the files are unchanged.
 
     post:
     Upload a new file (multipart/form-data). Only PDF, DOCX, or TXT allowed.
+    The file is stored and returned with status "queued"; chunking and embedding
+    run in the background ingestion pool.
     """
     serializer_class = FileUploadSerializer
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = (MultiPartParser, FormParser)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # During schema generation (swagger_fake_view=True), request.user is AnonymousUser.
         if getattr(self, "swagger_fake_view", False):
             return FileUpload.objects.none()
-        return FileUpload.objects.filter(owner=self.request.user).order_by("-uploaded_at")
+        return FileUpload.objects.filter(owner=self.request.user).order_by("-uploaded_at", "-id")
 
     @swagger_auto_schema(
         operation_summary="List uploaded files",
+        manual_parameters=[
+            openapi.Parameter("cursor", openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Cursor from the `next` link of the previous page."),
+            openapi.Parameter("page_size", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of results per page."),
+        ],
         responses={
-            200: FileUploadSerializer(many=True),
+            200: FileUploadPageSerializer(),
+            304: "Not Modified (If-None-Match / If-Modified-Since still valid)",
             401: "Unauthorized: Missing or invalid JWT token"
         }
     )
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
+    def list(self, request, *args, **kwargs):
+        # Validators come from one aggregate over the owner's index and their
+        # document-set row, so an unchanged listing is answered without loading
+        # or serializing rows. The row's change time also moves on deletes,
+        # which Max(updated_at) alone would miss.
+        state = FileUpload.objects.filter(owner=request.user).aggregate(
+            count=Count("id"), last_modified=Max("updated_at")
+        )
+        version, changed_at = docset_state(request.user.id)
+        changed_at = max(filter(None, [state["last_modified"], changed_at]))
+        etag = quote_etag(hashlib.sha256(json.dumps([
+            state["count"],
+            version,
+            changed_at.isoformat(),
+            request.get_full_path(),
+        ]).encode()).hexdigest()[:32])
+        # HTTP dates have whole-second precision; the ETag catches changes within a second.
+        last_modified = int(changed_at.timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        # Clients may keep the page but must revalidate before reusing it.
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
     @swagger_auto_schema(
         operation_summary="Upload a new file",
         request_body=FileUploadSerializer,  # Use the serializer rather than a raw Schema
@@ -57,16 +125,157 @@ class FileUploadListCreateView(generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        uploaded_file = serializer.validated_data["file"]
+        with transaction.atomic():
+            # Identical content is stored once; a repeat upload only adds a reference.
+            blob = blobs.acquire(uploaded_file)
+            instance = serializer.save(
+                owner=self.request.user,
+                file=blob.file.name,
+                filename=os.path.basename(uploaded_file.name),
+                blob=blob,
+            )
+        # Hand off to the ingestion pool only once the row is visible to it.
+        transaction.on_commit(lambda: ingestion.enqueue(instance.pk))
+
+
+class FileUploadBulkCreateView(APIView):
+    """
+    post:
+    Upload many files in one multipart/form-data request (repeat the `files`
+    field). Each file is validated like a single upload; the valid ones are
+    stored and inserted in one transaction and queued for ingestion together.
+    Returns one result per file, in request order: 201 with the created file,
+    or 400 with its validation errors. The response status is 201 when every
+    file was created, 207 when only some were, and 400 when none were.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
+
+    @swagger_auto_schema(
+        operation_summary="Upload several files at once",
+        manual_parameters=[
+            openapi.Parameter(
+                "files", openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                description="PDF, DOCX or TXT file; repeat the field for each file."
+            ),
+        ],
+        responses={
+            201: "All files created; body is a list of per-file results",
+            207: "Some files were rejected; see each result's status and errors",
+            400: "No file was created (none sent, too many, or all invalid)",
+            401: "Unauthorized: Missing or invalid JWT token"
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        uploaded_files = request.FILES.getlist("files")
+        if not uploaded_files:
+            return Response({"files": ["No files were submitted."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(uploaded_files) > settings.FILE_BULK_UPLOAD_MAX_FILES:
+            return Response(
+                {"files": [f"At most {settings.FILE_BULK_UPLOAD_MAX_FILES} files can be uploaded at once."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results, valid = [], []
+        for uploaded_file in uploaded_files:
+            serializer = FileUploadSerializer(data={"file": uploaded_file})
+            if serializer.is_valid():
+                valid.append((len(results), uploaded_file))
+                results.append(None)
+            else:
+                results.append({
+                    "filename": os.path.basename(uploaded_file.name),
+                    "status": status.HTTP_400_BAD_REQUEST,
+                    "errors": serializer.errors,
+                })
+
+        if valid:
+            with transaction.atomic():
+                stored = blobs.acquire_many([uploaded_file for _, uploaded_file in valid])
+                instances = FileUpload.objects.bulk_create([
+                    FileUpload(
+                        owner=request.user,
+                        file=blob.file.name,
+                        filename=os.path.basename(uploaded_file.name),
+                        blob=blob,
+                    )
+                    for (_, uploaded_file), blob in zip(valid, stored)
+                ])
+                # bulk_create sends no post_save, so invalidate cached answers here.
+                bump_docset_version(request.user.id)
+            upload_ids = [instance.pk for instance in instances]
+            transaction.on_commit(lambda: ingestion.enqueue_many(upload_ids))
+            for (position, uploaded_file), instance in zip(valid, instances):
+                results[position] = {
+                    "filename": instance.filename,
+                    "status": status.HTTP_201_CREATED,
+                    "file": FileUploadSerializer(instance, context={"request": request}).data,
+                }
+
+        if len(valid) == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif valid:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
+
+class FileUploadBulkDeleteView(APIView):
+    """
+    post:
+    Delete several of the current user's files by ID in one request. Rows are
+    removed in one transaction; stored content is cleaned up in the background
+    once no other upload shares it. IDs that do not exist or belong to someone
+    else are reported in `not_found`.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Delete several files at once",
+        request_body=FileUploadBulkDeleteSerializer,
+        responses={
+            200: openapi.Response(
+                description="Deleted and unknown IDs",
+                examples={"application/json": {"deleted": [3, 4], "not_found": [99]}}
+            ),
+            400: "Bad Request (missing or invalid 'ids')",
+            401: "Unauthorized: Missing or invalid JWT token"
+        }
+    )
+    def post(self, request, *args, **kwargs):
+        serializer = FileUploadBulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        with transaction.atomic():
+            uploads = list(FileUpload.objects.filter(owner=request.user, pk__in=ids).order_by("pk"))
+            deleted = {upload.pk for upload in uploads}
+            for upload in uploads:
+                # Per-row delete so the post_delete receivers release each blob.
+                upload.delete()
+        return Response(
+            {
+                "deleted": [pk for pk in ids if pk in deleted],
+                "not_found": [pk for pk in ids if pk not in deleted],
+            },
+            status=status.HTTP_200_OK,
+        )
 
 
-class FileUploadDeleteView(generics.DestroyAPIView):
+class FileUploadDeleteView(mixins.UpdateModelMixin, generics.DestroyAPIView):
     """
+    put:
+    Replace a file's content (multipart/form-data) while keeping its ID. The file
+    is re-ingested, and only chunks whose content changed are embedded again.
+
     delete:
-    Delete a file by its ID if it belongs to the current user. Also removes the file from filesystem.
+    Delete a file by its ID if it belongs to the current user. The stored content is
+    removed in the background once no other upload shares it.
     """
     serializer_class = FileUploadSerializer
     permission_classes = [permissions.IsAuthenticated]
+    parser_classes = (MultiPartParser, FormParser)
     lookup_url_kwarg = "pk"
 
     def get_queryset(self):
@@ -86,26 +295,76 @@ class FileUploadDeleteView(generics.DestroyAPIView):
     def delete(self, request, *args, **kwargs):
         return super().delete(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        operation_summary="Replace a file",
+        request_body=FileUploadSerializer,
+        responses={
+            200: FileUploadSerializer(),
+            400: "Bad Request (e.g., invalid extension)",
+            401: "Unauthorized: Missing or invalid JWT token",
+            404: "Not Found: File ID does not exist or not owned by user"
+        }
+    )
+    def put(self, request, *args, **kwargs):
+        return self.update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        uploaded_file = serializer.validated_data["file"]
+        filename = os.path.basename(uploaded_file.name)
+        with transaction.atomic():
+            blob = blobs.acquire(uploaded_file)
+            if blob.pk == instance.blob_id:
+                # Same content: keep the index as it is, only the name changes.
+                blobs.release(blob.pk)
+                serializer.save(file=blob.file.name, filename=filename)
+                return
+            # Keep the old artifact so unchanged chunks are not embedded again.
+            ingestion.stash_previous_artifact(instance)
+            old_blob_id, old_file = instance.blob_id, instance.file.name
+            serializer.save(
+                file=blob.file.name,
+                filename=filename,
+                blob=blob,
+                status=FileUpload.Status.QUEUED,
+                chunk_count=0,
+                chunk_manifest={},
+                timings={},
+                error="",
+                ingest_started_at=None,
+                indexed_at=None,
+            )
+            if old_blob_id:
+                blobs.release(old_blob_id)
+            else:
+                sweeper.bury(old_file, ingestion.artifact_name(instance.pk))
+        transaction.on_commit(lambda: ingestion.enqueue(instance.pk))
+
     def perform_destroy(self, instance):
-        # Delete the file from storage first, then the DB record
-        instance.file.delete(save=False)
+        # The post_delete signal releases the blob; storage is only touched
+        # once no other upload references the same content.
         instance.delete()
 
 
 class ChatAPIView(APIView):
     """
     post:
-    Dummy chat endpoint. Accepts { "query": "<user’s question>" }
-    Returns 200 { "content": { "query", "answer", "type", "sources" } }.
+    Chat endpoint. Accepts { "query": "<user’s question>" } and answers from the
+    authenticated user's indexed files. With { "conversation": <id> } the
+    question is answered as the next turn of that conversation, which records it.
+    Returns 200 { "content": { "query", "answer", "type", "sources" } }, plus
+    "conversation" and "turn" for a conversation turn.
     """
-    permission_classes = [permissions.AllowAny]
+    permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(
-        operation_summary="Get a dummy chat response",
+        operation_summary="Ask a question about your files",
         request_body=ChatRequestSerializer,
         responses={
             200: ChatResponseSerializer(),
-            400: "Bad Request (missing or invalid 'query' field)"
+            400: "Bad Request (missing or invalid 'query' field)",
+            401: "Unauthorized: Missing or invalid JWT token",
+            404: "Not Found: Conversation does not exist or not owned by user"
         }
     )
     def post(self, request, *args, **kwargs):
@@ -113,33 +372,199 @@ class ChatAPIView(APIView):
         serializer = ChatRequestSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user_query = serializer.validated_data["query"]
+        context = None
+        if serializer.validated_data.get("conversation") is not None:
+            try:
+                context = memory.load_context(request.user.id, serializer.validated_data["conversation"])
+            except Conversation.DoesNotExist:
+                return Response({"detail": "Conversation not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # 2. Build a dummy response
-        dummy_answer = (
-            "In a Dynamic Bayesian Stackelberg Game, the leader's main objective is to maximize "
-            "her utility over multiple rounds rather than just identifying the follower type. The leader "
-            "commits to a Dynamic Bayesian Stackelberg Policy (DSP) before the game starts, which specifies "
-            "the leader's strategy at each round. This policy is observed by the follower in advance. This "
-            "type of commitment is common in literature related to dynamic pricing problems, dynamic "
-            "mechanism design, and Stackelberg security games. The optimal DSP is referred to as the "
-            "Dynamic Bayesian Stackelberg Equilibrium (DSE)."
-        )
-        dummy_type = "Knowledge/RAG"
-        dummy_sources = ["CSE_1.pdf"]
+        # 2. Retrieve from the user's own documents and generate an answer
+        result = chat.answer(request.user.id, user_query, context)
 
-        # 3. Print to console
-        print(f"Query: {user_query}")
-        print(f"Answer: {dummy_answer}")
-        print(f"Type: {dummy_type}")
-        print(f"Sources: {dummy_sources}")
+        # 3. Log (latency and per-stage timings are in the request metrics)
+        logger.debug(
+            "Chat answered: query=%r type=%s sources=%s answer=%r",
+            user_query, result["type"], result["sources"], result["answer"],
+        )
 
         # 4. Return structured response
         response_payload = {
             "content": {
                 "query": user_query,
-                "answer": dummy_answer,
-                "type": dummy_type,
-                "sources": dummy_sources,
+                "answer": result["answer"],
+                "type": result["type"],
+                "sources": result["sources"],
             }
         }
+        if context is not None:
+            response_payload["content"].update(conversation=result["conversation"], turn=result["turn"])
         return Response(response_payload, status=status.HTTP_200_OK)
+
+
+class ChatCacheStatsView(APIView):
+    """
+    get:
+    Answer-cache statistics for this worker process: entries, size, hits,
+    misses, hit ratio and the generation time saved by hits. Staff only.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Chat answer cache statistics",
+        responses={
+            200: openapi.Response(
+                description="Cache statistics",
+                examples={
+                    "application/json": {
+                        "entries": 12, "bytes": 48213, "hits": 40, "misses": 12,
+                        "evictions": 0, "hit_ratio": 0.7692, "saved_ms": 5210.4
+                    }
+                }
+            ),
+            403: "Forbidden: staff only"
+        }
+    )
+    def get(self, request, *args, **kwargs):
+        return Response(get_answer_cache().stats())
+
+
+@csrf_exempt
+@require_POST
+async def chat_stream_view(request):
+    """
+    post:
+    Streaming variant of ChatAPIView, served under ASGI. Accepts the same
+    { "query": ..., "conversation": ... } body and responds with text/event-stream:
+    one "token" event per generated token, then a "done" event whose data is
+    { "content": { "query", "answer", "type", "sources" } }.
+    Generation stops as soon as the client disconnects; an interrupted
+    conversation turn is not recorded. The token's user comes from the same
+    per-process cache as the DRF views (accounts/authentication.py).
+    """
+    try:
+        auth = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({"detail": str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if auth is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    user = auth[0]
+
+    try:
+        body = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"detail": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = ChatRequestSerializer(data=body)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    user_query = serializer.validated_data["query"]
+    context = None
+    if serializer.validated_data.get("conversation") is not None:
+        try:
+            context = await sync_to_async(memory.load_context)(user.id, serializer.validated_data["conversation"])
+        except Conversation.DoesNotExist:
+            return JsonResponse({"detail": "Conversation not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    async def events():
+        # Flush headers and a first byte before retrieval starts.
+        yield ": stream open\n\n"
+        answer = chat.stream_answer(user.id, user_query, context)
+        async for event, data in buffered(answer, settings.RAG_STREAM_BUFFER):
+            if event == "token":
+                yield sse_event("token", {"token": data})
+            else:
+                yield sse_event("done", {"content": data})
+
+    response = StreamingHttpResponse(events(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+class ConversationListCreateView(generics.ListCreateAPIView):
+    """
+    get:
+    List the current user's most recently active conversations (at most
+    CHAT_PAGE_SIZE), newest first.
+
+    post:
+    Start a conversation, optionally with a title; otherwise its first
+    question becomes the title. Pass its ID as `conversation` to the chat
+    endpoints.
+    """
+    serializer_class = ConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Conversation.objects.none()
+        return Conversation.objects.filter(owner=self.request.user).order_by("-updated_at")[:settings.CHAT_PAGE_SIZE]
+
+    def perform_create(self, serializer):
+        serializer.save(owner=self.request.user)
+
+
+class ConversationDetailView(generics.RetrieveDestroyAPIView):
+    """
+    get:
+    A conversation of the current user, with the summary of its older turns.
+
+    delete:
+    Delete a conversation and all its messages.
+    """
+    serializer_class = ConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_url_kwarg = "pk"
+
+    def get_queryset(self):
+        if getattr(self, "swagger_fake_view", False):
+            return Conversation.objects.none()
+        return Conversation.objects.filter(owner=self.request.user)
+
+
+class ConversationMessageListView(APIView):
+    """
+    get:
+    Messages of one of the current user's conversations, latest turns first
+    and each turn's question before its answer, `limit` turns (at most
+    CHAT_PAGE_SIZE) before turn `before` at a time. Pass `next_before` back
+    as `before` for older turns.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Read a conversation's messages",
+        manual_parameters=[
+            openapi.Parameter("before", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Only turns before this one (default: from the latest)."),
+            openapi.Parameter("limit", openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of turns."),
+        ],
+        responses={
+            200: ConversationMessageSerializer(many=True),
+            401: "Unauthorized: Missing or invalid JWT token",
+            404: "Not Found: Conversation does not exist or not owned by user"
+        }
+    )
+    def get(self, request, pk, *args, **kwargs):
+        turn_count = Conversation.objects.filter(owner=request.user, pk=pk).values_list("turn_count", flat=True).first()
+        if turn_count is None:
+            return Response({"detail": "Conversation not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            before = min(int(request.query_params.get("before", turn_count + 1)), turn_count + 1)
+            limit = min(max(int(request.query_params.get("limit", settings.CHAT_PAGE_SIZE)), 1), settings.CHAT_PAGE_SIZE)
+        except ValueError:
+            return Response({"detail": "before and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        first = max(before - limit, 1)
+        # A bounded range of the (conversation, turn, role) index, however long the conversation.
+        # Within a turn the question comes before its answer, whatever the role values sort as.
+        messages = ConversationMessage.objects.filter(
+            conversation_id=pk, turn__gte=first, turn__lt=before
+        ).order_by("-turn", Case(When(role=ConversationMessage.Role.USER, then=Value(0)), default=Value(1)))
+        return Response({
+            "next_before": first if first > 1 else None,
+            "results": ConversationMessageSerializer(messages, many=True).data,
+        })
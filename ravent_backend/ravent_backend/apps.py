@@ -0,0 +1,12 @@
+# ravent_backend/apps.py
+
+from django.apps import AppConfig
+
+
+class RaventBackendConfig(AppConfig):
+    name = "ravent_backend"
+    verbose_name = "Ravent Backend"
+
+    def ready(self):
+        # Database connection hooks (SQLite pragmas) for the whole project
+        import ravent_backend.db
@@ -3,6 +3,10 @@ ASGI config for ravent_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Streaming endpoints (e.g. /api/agenticai/chat/stream/) need an ASGI server:
+
+    uvicorn ravent_backend.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +18,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ravent_backend.settings')
 
 application = get_asgi_application()
+
+# Pick up uploads whose ingestion was cut short by the previous run.
+from agenticai import ingestion  # noqa: E402
+
+ingestion.start()
@@ -0,0 +1,85 @@
+# ravent_backend/db.py
+"""
+Database profile helpers (see section 4 of settings.py).
+
+- `configure_sqlite` runs settings.SQLITE_PRAGMAS (WAL, synchronous=NORMAL,
+  busy_timeout, mmap) on every new SQLite connection via `connection_created`.
+- `ReadReplicaRouter` sends reads to the "replica" alias, but only inside
+  `read_replica()` blocks, so read-after-write paths (uploads, ingestion,
+  deletes) keep reading from the primary.
+- `ReadReplicaMixin` wraps safe-method requests of a DRF view in `read_replica()`.
+"""
+
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+REPLICA = "replica"
+
+_use_replica = contextvars.ContextVar("use_read_replica", default=False)
+
+
+@receiver(connection_created, dispatch_uid="ravent_backend.db.configure_sqlite")
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Apply the SQLite pragmas once per connection; with persistent connections
+    (CONN_MAX_AGE) that is once per worker thread rather than once per request.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+@contextmanager
+def read_replica():
+    """
+    Route ORM reads in this block (and this thread or task) to the read replica,
+    when one is configured.
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Reads go to the replica inside `read_replica()`; everything else, and all
+    writes and migrations, use "default".
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+class ReadReplicaMixin:
+    """
+    Serve GET/HEAD/OPTIONS requests of a view from the read replica. The
+    replica may lag the primary slightly, so only use this on endpoints where
+    a briefly stale read is acceptable.
+    """
+    replica_methods = ("GET", "HEAD", "OPTIONS")
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.replica_methods:
+            return super().dispatch(request, *args, **kwargs)
+        with read_replica():
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,334 @@
+# ravent_backend/loadtest.py
+"""
+In-process load driver for the API (used by `manage.py benchmark_api`).
+
+A scenario is a generator that yields `Call`s and receives `Reply`s, so the
+same script runs through either driver:
+
+- `WSGIDriver` calls ravent_backend.wsgi.application from a pool of threads,
+  like a threaded WSGI server.
+- `ASGIDriver` calls ravent_backend.asgi.application from concurrent tasks on
+  one event loop, like uvicorn.
+
+Both go through the real middleware stack and URLconf. Every call is timed
+and tagged with the number of SQL queries it ran, counted by an execute
+wrapper installed on each connection and attributed through a ContextVar,
+which follows the request into sync_to_async threads.
+"""
+
+import asyncio
+import contextvars
+import io
+import json
+import math
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+
+HOST = "localhost"
+
+_query_count = contextvars.ContextVar("loadtest_query_count", default=None)
+
+
+class Call(NamedTuple):
+    """
+    One scripted request. `name` groups calls in the report.
+    """
+    name: str
+    method: str
+    path: str
+    body: bytes = b""
+    content_type: str = ""
+    token: str = ""
+    expect: int = 200
+
+    @classmethod
+    def json(cls, name, method, path, data, **kwargs):
+        return cls(name, method, path, json.dumps(data).encode("utf-8"), "application/json", **kwargs)
+
+    @classmethod
+    def multipart(cls, name, path, data, **kwargs):
+        return cls(name, "POST", path, encode_multipart(BOUNDARY, data), MULTIPART_CONTENT, **kwargs)
+
+    def headers(self):
+        headers = [("host", HOST)]
+        if self.content_type:
+            headers.append(("content-type", self.content_type))
+            headers.append(("content-length", str(len(self.body))))
+        if self.token:
+            headers.append(("authorization", f"Bearer {self.token}"))
+        return headers
+
+
+class Reply(NamedTuple):
+    status: int
+    body: bytes
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class Sample(NamedTuple):
+    name: str
+    seconds: float
+    queries: int
+    ok: bool
+
+
+def _count_queries(execute, sql, params, many, context):
+    counter = _query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_counter(sender, connection, **kwargs):
+    if _count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_queries)
+
+
+def start_counting_queries():
+    """
+    Count queries on every connection, including ones opened later by worker threads.
+    """
+    connection_created.connect(_install_counter, dispatch_uid="ravent_backend.loadtest.count_queries")
+    for connection in connections.all(initialized_only=True):
+        _install_counter(None, connection)
+
+
+def stop_counting_queries():
+    connection_created.disconnect(dispatch_uid="ravent_backend.loadtest.count_queries")
+    for connection in connections.all(initialized_only=True):
+        if _count_queries in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_count_queries)
+
+
+class WSGIDriver:
+    name = "wsgi"
+
+    def __init__(self, concurrency):
+        from ravent_backend.wsgi import application
+
+        self.application = application
+        self.concurrency = concurrency
+
+    def call(self, call):
+        environ = {
+            "REQUEST_METHOD": call.method,
+            "PATH_INFO": call.path,
+            "QUERY_STRING": "",
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": HOST,
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(call.body),
+            "wsgi.errors": io.StringIO(),
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for header, value in call.headers():
+            key = header.upper().replace("-", "_")
+            environ[key if key in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{key}"] = value
+        status = []
+        result = self.application(environ, lambda line, headers, exc_info=None: status.append(int(line[:3])))
+        try:
+            body = b"".join(result)
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                close()
+        return Reply(status[0], body)
+
+    def run(self, scenarios):
+        """
+        Run every scenario to completion, `concurrency` at a time; return
+        (samples, wall seconds).
+        """
+        samples = []
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="loadtest-wsgi") as pool:
+            for result in pool.map(self._run_scenario, scenarios):
+                samples.extend(result)
+        return samples, time.perf_counter() - started
+
+    def _run_scenario(self, scenario):
+        samples = []
+        reply = None
+        try:
+            while True:
+                call = scenario.send(reply)
+                counter = [0]
+                token = _query_count.set(counter)
+                begun = time.perf_counter()
+                try:
+                    reply = self.call(call)
+                finally:
+                    _query_count.reset(token)
+                samples.append(Sample(call.name, time.perf_counter() - begun, counter[0], reply.status == call.expect))
+        except StopIteration:
+            pass
+        finally:
+            connections.close_all()
+        return samples
+
+
+class ASGIDriver:
+    name = "asgi"
+
+    def __init__(self, concurrency):
+        from ravent_backend.asgi import application
+
+        self.application = application
+        self.concurrency = concurrency
+
+    async def call(self, call):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": call.method,
+            "scheme": "http",
+            "path": call.path,
+            "raw_path": call.path.encode("ascii"),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in call.headers()],
+            "server": (HOST, 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        finished = asyncio.Event()
+        sent_request = False
+        status = None
+        chunks = []
+
+        async def receive():
+            nonlocal sent_request
+            if not sent_request:
+                sent_request = True
+                return {"type": "http.request", "body": call.body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished.set()
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            finished.set()
+        return Reply(status, b"".join(chunks))
+
+    def run(self, scenarios):
+        return asyncio.run(self._run_all(scenarios))
+
+    async def _run_all(self, scenarios):
+        slots = asyncio.Semaphore(self.concurrency)
+        samples = []
+
+        async def run_one(scenario):
+            async with slots:
+                samples.extend(await self._run_scenario(scenario))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run_one(scenario) for scenario in scenarios))
+        return samples, time.perf_counter() - started
+
+    async def _run_scenario(self, scenario):
+        samples = []
+        reply = None
+        try:
+            while True:
+                call = scenario.send(reply)
+                counter = [0]
+                token = _query_count.set(counter)
+                begun = time.perf_counter()
+                try:
+                    reply = await self.call(call)
+                finally:
+                    _query_count.reset(token)
+                samples.append(Sample(call.name, time.perf_counter() - begun, counter[0], reply.status == call.expect))
+        except StopIteration:
+            pass
+        return samples
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarise(samples, wall_seconds):
+    """
+    Per-name latency percentiles (ms), mean queries per call and error counts,
+    plus overall throughput, as a JSON-serialisable dict.
+    """
+    grouped = defaultdict(list)
+    for sample in samples:
+        grouped[sample.name].append(sample)
+    endpoints = {}
+    for name, group in grouped.items():
+        latencies = sorted(sample.seconds * 1000 for sample in group)
+        endpoints[name] = {
+            "count": len(group),
+            "errors": sum(not sample.ok for sample in group),
+            "p50_ms": round(percentile(latencies, 0.50), 2),
+            "p95_ms": round(percentile(latencies, 0.95), 2),
+            "p99_ms": round(percentile(latencies, 0.99), 2),
+            "queries": round(sum(sample.queries for sample in group) / len(group), 2),
+        }
+    return {
+        "requests": len(samples),
+        "seconds": round(wall_seconds, 3),
+        "requests_per_second": round(len(samples) / wall_seconds, 2) if wall_seconds else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def compare(current, baseline, tolerance=0.25, min_delta_ms=2.0):
+    """
+    Compare two summaries keyed by driver name. Return a list of regression
+    messages: slower p95 (beyond `tolerance` and `min_delta_ms`), more queries
+    per call, lower throughput, or any errors.
+    """
+    regressions = []
+    for driver, result in current.items():
+        for name, stats in result["endpoints"].items():
+            if stats["errors"]:
+                regressions.append(f"{driver} {name}: {stats['errors']} unexpected responses")
+        reference = baseline.get(driver)
+        if reference is None:
+            continue
+        for name, stats in result["endpoints"].items():
+            before = reference["endpoints"].get(name)
+            if before is None:
+                continue
+            if stats["queries"] > before["queries"]:
+                regressions.append(f"{driver} {name}: queries per call {before['queries']} -> {stats['queries']}")
+            if (stats["p95_ms"] > before["p95_ms"] * (1 + tolerance)
+                    and stats["p95_ms"] - before["p95_ms"] > min_delta_ms):
+                regressions.append(f"{driver} {name}: p95 {before['p95_ms']} ms -> {stats['p95_ms']} ms")
+        if result["requests_per_second"] < reference["requests_per_second"] / (1 + tolerance):
+            regressions.append(
+                f"{driver}: throughput {reference['requests_per_second']}/s -> {result['requests_per_second']}/s"
+            )
+    return regressions
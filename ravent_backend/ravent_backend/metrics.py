@@ -0,0 +1,393 @@
+# ravent_backend/metrics.py
+"""
+Per-view request metrics, exposed in Prometheus text format at /metrics/.
+
+`MetricsMiddleware` records, for every request and labelled by the resolved
+view name: latency, SQL query count and time, response size, and the time
+spent in named spans. Code marks spans with
+
+    with metrics.span("retrieval"):
+        ...
+
+Spans, like SQL queries, are attributed to the current request through a
+ContextVar, so they are counted whether the work runs on the event loop or
+in a sync_to_async thread; spans outside a request are recorded under the
+view label "-". Observations are aggregated in this process only: scrape
+each worker process, or run one worker per target.
+
+With METRICS_PROFILE_SLOW_MS set, requests are also sampled by the profiler
+in ravent_backend/profiling.py and slow ones keep a folded stack dump.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, suppress
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import profiling
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (type, help, label names, buckets)
+METRICS = {
+    "ravent_http_requests_total": (
+        "counter", "Requests served, by view, method and status code.", ("view", "method", "status"), None,
+    ),
+    "ravent_http_request_duration_seconds": (
+        "histogram", "Time to produce the response (to the last byte for streams).", ("view", "method"), LATENCY_BUCKETS,
+    ),
+    "ravent_http_request_db_queries": (
+        "histogram", "SQL queries run per request.", ("view",), QUERY_BUCKETS,
+    ),
+    "ravent_http_request_db_duration_seconds_total": (
+        "counter", "Time spent executing SQL.", ("view",), None,
+    ),
+    "ravent_http_response_size_bytes": (
+        "histogram", "Size of response bodies.", ("view",), SIZE_BUCKETS,
+    ),
+    "ravent_span_duration_seconds": (
+        "histogram", "Time spent in instrumented spans, summed per request.", ("view", "span"), LATENCY_BUCKETS,
+    ),
+    "ravent_slow_request_profiles_total": (
+        "counter", "Slow requests for which a stack profile was kept.", ("view",), None,
+    ),
+    "ravent_index_shard_loads_total": (
+        "counter", "Owner indexes loaded, from a saved segment or from the chunk artifacts.", ("source",), None,
+    ),
+    "ravent_index_shard_evictions_total": (
+        "counter", "Owner indexes dropped to stay within RAG_INDEX_MEMORY_BUDGET.", (), None,
+    ),
+    "ravent_chat_evidence_total": (
+        "counter", "Chat answers by the evidence they were grounded in (rag or web).", ("source",), None,
+    ),
+    "ravent_search_requests_total": (
+        "counter", "Fallback web searches, by outcome (ok, error, timeout, cancelled).", ("outcome",), None,
+    ),
+    "ravent_search_hedges_total": (
+        "counter", "Extra search attempts started because the first ones were slow or failed.", (), None,
+    ),
+}
+
+UNRESOLVED = "unresolved"
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of labelled counters and histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {name: {} for name in METRICS}
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._inc(name, labels, amount)
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._observe(name, labels, value)
+
+    def _inc(self, name, labels, amount):
+        series = self._values[name]
+        series[labels] = series.get(labels, 0) + amount
+
+    def _observe(self, name, labels, value):
+        series = self._values[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = Histogram(METRICS[name][3])
+        histogram.observe(value)
+
+    def record_request(self, view, method, status, seconds, current, size):
+        with self._lock:
+            self._inc("ravent_http_requests_total", (view, method, str(status)), 1)
+            self._observe("ravent_http_request_duration_seconds", (view, method), seconds)
+            self._observe("ravent_http_request_db_queries", (view,), current.queries)
+            self._inc("ravent_http_request_db_duration_seconds_total", (view,), current.sql_seconds)
+            if size is not None:
+                self._observe("ravent_http_response_size_bytes", (view,), size)
+            for name, elapsed in current.spans.items():
+                self._observe("ravent_span_duration_seconds", (view, name), elapsed)
+
+    def reset(self):
+        with self._lock:
+            for series in self._values.values():
+                series.clear()
+
+    def render(self):
+        """
+        Return every series in the Prometheus text exposition format (0.0.4).
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, label_names, buckets) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    pairs = [f'{key}="{_escape(label)}"' for key, label in zip(label_names, labels)]
+                    if kind == "counter":
+                        lines.append(f"{name}{{{','.join(pairs)}}} {_number(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), value.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else _number(bound)
+                        bucket_labels = ",".join(pairs + [f'le="{le}"'])
+                        lines.append(f"{name}_bucket{{{bucket_labels}}} {cumulative}")
+                    lines.append(f"{name}_sum{{{','.join(pairs)}}} {_number(value.sum)}")
+                    lines.append(f"{name}_count{{{','.join(pairs)}}} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """
+    What one request has accumulated so far.
+    """
+    __slots__ = ("queries", "sql_seconds", "spans", "profile")
+
+    def __init__(self, profile=None):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.spans = {}
+        self.profile = profile
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block of code as the named span of the current request.
+    """
+    current = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if current is None:
+            registry.observe("ravent_span_duration_seconds", ("-", name), elapsed)
+        else:
+            current.spans[name] = current.spans.get(name, 0.0) + elapsed
+
+
+def _time_query(execute, sql, params, many, context):
+    current = _current.get()
+    if current is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        current.queries += 1
+        current.sql_seconds += time.perf_counter() - started
+
+
+def _install_query_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install_query_timer():
+    """
+    Time SQL on every connection, including ones opened later by other threads.
+    """
+    connection_created.connect(_install_query_timer, dispatch_uid="ravent_backend.metrics.time_queries")
+    for connection in connections.all(initialized_only=True):
+        _install_query_timer(None, connection)
+
+
+class MetricsMiddleware:
+    """
+    Records request metrics; works under WSGI and ASGI without changing the
+    mode of the handler chain. Keep it first in MIDDLEWARE so the latency
+    includes the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from django.conf import settings
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.enabled = settings.METRICS_ENABLED
+        self.profiling = settings.METRICS_PROFILE_SLOW_MS > 0
+        if self.enabled:
+            install_query_timer()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        current, token, started = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, current, started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        current, token, started = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, current, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Under ASGI this runs in the thread that will run a sync view; sample it too.
+        current = _current.get()
+        if current is not None and current.profile is not None:
+            current.profile.add_thread(threading.get_ident())
+        return None
+
+    def _start(self):
+        current = RequestMetrics(profiling.start() if self.profiling else None)
+        if current.profile is not None:
+            current.profile.add_thread(threading.get_ident())
+        return current, _current.set(current), time.perf_counter()
+
+    def _finish(self, request, response, current, started):
+        match = request.resolver_match
+        view = match.view_name if match is not None else UNRESOLVED
+        if response.streaming:
+            # The body (and the work behind it) is produced after this returns;
+            # record when the stream ends, with the request's metrics current again.
+            response.streaming_content = self._measure_stream(request, response, view, current, started)
+            return
+        self._record(request, response, view, current, started, len(response.content))
+
+    def _measure_stream(self, request, response, view, current, started):
+        content = response.streaming_content
+        if response.is_async:
+            async def measured():
+                size = 0
+                token = _current.set(current)
+                try:
+                    async for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    with suppress(ValueError):  # closed from another context
+                        _current.reset(token)
+                    self._record(request, response, view, current, started, size)
+        else:
+            def measured():
+                size = 0
+                token = _current.set(current)
+                try:
+                    for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    with suppress(ValueError):  # closed from another context
+                        _current.reset(token)
+                    self._record(request, response, view, current, started, size)
+        return measured()
+
+    def _record(self, request, response, view, current, started, size):
+        seconds = time.perf_counter() - started
+        registry.record_request(view, request.method, response.status_code, seconds, current, size)
+        if current.profile is not None and profiling.finish(current.profile, request, view, seconds):
+            registry.inc("ravent_slow_request_profiles_total", (view,))
+
+
+def _authorised(request):
+    """
+    Return None if the request may read metrics, else the error response:
+    a bearer METRICS_TOKEN (for the Prometheus scraper) or a staff user's JWT.
+    """
+    from django.conf import settings
+    from rest_framework.exceptions import AuthenticationFailed
+
+    from accounts.authentication import CachedJWTAuthentication
+
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    if settings.METRICS_TOKEN and constant_time_compare(header, f"Bearer {settings.METRICS_TOKEN}"):
+        return None
+    try:
+        auth = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        auth = None
+    if auth is None:
+        return HttpResponse("Authentication required.\n", status=401, content_type="text/plain")
+    if not auth[0].is_staff:
+        return HttpResponse("Staff only.\n", status=403, content_type="text/plain")
+    return None
+
+
+def metrics_view(request):
+    """
+    get:
+    Prometheus scrape endpoint for this process.
+    """
+    denied = _authorised(request)
+    if denied is not None:
+        return denied
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def profiles_view(request):
+    """
+    get:
+    Folded stack dumps of recent slow requests (newest first), as JSON.
+    Pass ?index=N&format=folded for one dump in the collapsed format that
+    flamegraph.pl and speedscope read.
+    """
+    from django.http import JsonResponse
+
+    denied = _authorised(request)
+    if denied is not None:
+        return denied
+    recent = profiling.recent()
+    if request.GET.get("format") == "folded":
+        try:
+            entry = recent[int(request.GET.get("index", 0))]
+        except (IndexError, ValueError):
+            return HttpResponse("No such profile.\n", status=404, content_type="text/plain")
+        return HttpResponse(entry["folded"], content_type="text/plain; charset=utf-8")
+    return JsonResponse({"profiles": recent})
@@ -0,0 +1,134 @@
+# ravent_backend/profiling.py
+"""
+Opt-in sampling profiler for slow requests (METRICS_PROFILE_SLOW_MS > 0).
+
+While enabled, one background thread wakes every METRICS_PROFILE_INTERVAL_MS
+and records the stack of each thread serving an in-flight request: the
+middleware's thread, plus under ASGI the thread running a sync view. When a
+request took longer than the threshold, its samples are kept as a folded
+stack dump ("outer;inner;leaf count" per line, the input format of
+flamegraph.pl and speedscope), logged, and listed at /metrics/profiles/.
+Faster requests just drop their samples. Async views run on the event loop
+thread, which concurrent requests share, so their dumps can include frames
+of other requests.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+_active = set()
+_lock = threading.Lock()
+_sampler = None
+_recent = None
+
+
+class Profile:
+    __slots__ = ("threads", "stacks", "samples")
+
+    def __init__(self):
+        self.threads = set()
+        self.stacks = Counter()
+        self.samples = 0
+
+    def add_thread(self, ident):
+        self.threads.add(ident)
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name="request-profiler", daemon=True)
+        self.interval = interval
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            with _lock:
+                profiles = list(_active)
+            if not profiles:
+                continue
+            frames = sys._current_frames()
+            for profile in profiles:
+                for ident in list(profile.threads):
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        profile.stacks[_fold(frame)] += 1
+                profile.samples += 1
+
+
+def start():
+    """
+    Begin sampling a request; returns None when profiling is off.
+    """
+    global _sampler, _recent
+    from django.conf import settings
+
+    if settings.METRICS_PROFILE_SLOW_MS <= 0:
+        return None
+    profile = Profile()
+    with _lock:
+        if _sampler is None:
+            _recent = deque(maxlen=settings.METRICS_PROFILE_KEEP)
+            _sampler = Sampler(settings.METRICS_PROFILE_INTERVAL_MS / 1000)
+            _sampler.start()
+        _active.add(profile)
+    return profile
+
+
+def finish(profile, request, view, seconds):
+    """
+    Stop sampling a request. Returns True if it was slow enough to keep.
+    """
+    from django.conf import settings
+
+    with _lock:
+        _active.discard(profile)
+    if seconds * 1000 < settings.METRICS_PROFILE_SLOW_MS or not profile.stacks:
+        return False
+    folded = profile.folded()
+    entry = {
+        "view": view,
+        "method": request.method,
+        "path": request.path,
+        "duration_ms": round(seconds * 1000, 1),
+        "samples": profile.samples,
+        "recorded_at": time.time(),
+        "folded": folded,
+    }
+    with _lock:
+        _recent.appendleft(entry)
+    logger.warning(
+        "Slow request %s %s (%s) took %.0f ms; %d stack samples kept",
+        request.method, request.path, view, seconds * 1000, profile.samples,
+        extra={"profile": folded},
+    )
+    return True
+
+
+def recent():
+    """
+    Kept profiles, newest first.
+    """
+    with _lock:
+        return list(_recent or ())
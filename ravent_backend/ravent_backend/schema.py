@@ -0,0 +1,163 @@
+# ravent_backend/schema.py
+"""
+The OpenAPI schema as a pre-generated artifact.
+
+`manage.py generate_schema` writes openapi.json and openapi.yaml to
+settings.OPENAPI_SCHEMA_DIR at build time. `schema_view` serves those bytes
+from memory with an ETag, Last-Modified and a long Cache-Control max-age,
+answering revalidations with 304, so serving the schema never introspects
+serializers. drf_yasg's generator, inspectors and renderers are imported
+only to regenerate: when the artifact is missing (or DEBUG is on, so the
+schema follows code edits), the first request generates it in-process.
+
+The Swagger UI and ReDoc pages are built lazily too and load the schema
+from `schema_view` (SPEC_URL in settings), not from their own URL.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+from django.http import Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger(__name__)
+
+INFO = {
+    "title": "Ravent Backend API",
+    "default_version": "v1",
+    "description": "API documentation for Ravent Backend",
+}
+
+FORMATS = {
+    ".json": ("openapi.json", "application/json"),
+    ".yaml": ("openapi.yaml", "application/yaml"),
+}
+
+
+class Document(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: int
+
+
+def generate():
+    """
+    Generate the schema of the current URLconf; returns {format: bytes}.
+    """
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    schema = OpenAPISchemaGenerator(openapi.Info(**INFO)).get_schema(request=None, public=True)
+    return {
+        ".json": OpenAPICodecJson(validators=[]).encode(schema),
+        ".yaml": OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def write(directory):
+    """
+    Write every format to `directory`; returns the paths written.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for fmt, body in generate().items():
+        path = directory / FORMATS[fmt][0]
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        temporary.write_bytes(body)
+        temporary.replace(path)
+        paths.append(path)
+    return paths
+
+
+def _document(body, last_modified):
+    return Document(body, quote_etag(hashlib.sha256(body).hexdigest()[:32]), int(last_modified))
+
+
+_documents = None
+_documents_lock = threading.Lock()
+
+
+def get_documents():
+    """
+    Return {format: Document}, loaded once per process.
+    """
+    global _documents
+    from django.conf import settings
+
+    with _documents_lock:
+        if _documents is None:
+            directory = Path(settings.OPENAPI_SCHEMA_DIR)
+            paths = {fmt: directory / name for fmt, (name, _) in FORMATS.items()}
+            if not settings.DEBUG and all(path.exists() for path in paths.values()):
+                _documents = {
+                    fmt: _document(path.read_bytes(), path.stat().st_mtime) for fmt, path in paths.items()
+                }
+            else:
+                if not settings.DEBUG:
+                    logger.warning("No schema artifact in %s; generating it in-process.", directory)
+                generated_at = time.time()
+                _documents = {fmt: _document(body, generated_at) for fmt, body in generate().items()}
+        return _documents
+
+
+def clear():
+    global _documents
+    with _documents_lock:
+        _documents = None
+
+
+@require_safe
+def schema_view(request, format):
+    """
+    get:
+    The OpenAPI schema as JSON or YAML, cacheable and revalidated by ETag.
+    """
+    from django.conf import settings
+
+    if format not in FORMATS:
+        raise Http404
+    document = get_documents()[format]
+    response = get_conditional_response(request, etag=document.etag, last_modified=document.last_modified)
+    if response is None:
+        response = HttpResponse(document.body, content_type=FORMATS[format][1])
+    response["ETag"] = document.etag
+    response["Last-Modified"] = http_date(document.last_modified)
+    response["Cache-Control"] = f"public, max-age={settings.OPENAPI_SCHEMA_MAX_AGE}"
+    return response
+
+
+_ui_views = {}
+_ui_views_lock = threading.Lock()
+
+
+def ui_view(request, renderer):
+    """
+    Swagger UI ("swagger") or ReDoc ("redoc") page; drf_yasg is imported on first use.
+    """
+    view = _ui_views.get(renderer)
+    if view is None:
+        from django.conf import settings
+        from drf_yasg import openapi
+        from drf_yasg.views import get_schema_view
+        from rest_framework import permissions
+
+        with _ui_views_lock:
+            view = _ui_views.get(renderer)
+            if view is None:
+                schema_view_class = get_schema_view(
+                    openapi.Info(**INFO),
+                    public=True,
+                    permission_classes=(permissions.AllowAny,),
+                )
+                view = _ui_views[renderer] = schema_view_class.with_ui(
+                    renderer, cache_timeout=settings.OPENAPI_SCHEMA_MAX_AGE
+                )
+    return view(request)
@@ -31,11 +31,13 @@ INSTALLED_APPS = [
     "drf_yasg",
 
     # Our apps
+    "ravent_backend",  # project-wide hooks (database connections, see ravent_backend/apps.py)
     "accounts",
     "agenticai",
 ]
 
 MIDDLEWARE = [
+    "ravent_backend.metrics.MetricsMiddleware",         # first, so latency covers the whole stack
     "corsheaders.middleware.CorsMiddleware",            # must be near the top
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -68,12 +70,66 @@ WSGI_APPLICATION = 'ravent_backend.wsgi.application'
 ASGI_APPLICATION = "ravent_backend.asgi.application"
 
 
-# 4. Database (default: SQLite for now)
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# 4. Database profile (from .env): DB_PROFILE=sqlite (default) or postgres.
+# Connections are kept open for DB_CONN_MAX_AGE seconds instead of one per request.
+DB_PROFILE = os.getenv("DB_PROFILE", "sqlite")
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
+if DB_PROFILE == "postgres":
+    # Requires psycopg 3 (`pip install "psycopg[binary,pool]"`).
+    postgres = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("DB_NAME", "ravent"),
+        "USER": os.getenv("DB_USER", "ravent"),
+        "PASSWORD": os.getenv("DB_PASSWORD", ""),
+        "HOST": os.getenv("DB_HOST", "localhost"),
+        "PORT": os.getenv("DB_PORT", "5432"),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
+    DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "0"))
+    if DB_POOL_MAX_SIZE:
+        # psycopg connection pool per process; replaces persistent connections.
+        postgres["CONN_MAX_AGE"] = 0
+        postgres["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": DB_POOL_MAX_SIZE,
+            "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+    DATABASES = {"default": postgres}
+    if os.getenv("DB_REPLICA_HOST"):
+        # Read-only list/profile endpoints read from here (ravent_backend/db.py).
+        DATABASES["replica"] = {
+            **postgres,
+            "HOST": os.getenv("DB_REPLICA_HOST"),
+            "PORT": os.getenv("DB_REPLICA_PORT", postgres["PORT"]),
+            "OPTIONS": dict(postgres["OPTIONS"]),
+            "TEST": {"MIRROR": "default"},
+        }
+    DATABASE_ROUTERS = ["ravent_backend.db.ReadReplicaRouter"]
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.getenv("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "OPTIONS": {
+                # Take the write lock at BEGIN, so a transaction that reads and then
+                # writes waits for busy_timeout instead of failing with "database is locked".
+                "transaction_mode": "IMMEDIATE",
+                "timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")) / 1000,
+            },
+        }
+    }
+
+# Applied to each new SQLite connection by ravent_backend.db.configure_sqlite.
+SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "memory",
 }
 
 
@@ -92,6 +148,8 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+# Threads hashing passwords for async registration (accounts/hashing.py).
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", str(min(4, os.cpu_count() or 1))))
 
 
 # Internationalization
@@ -125,6 +183,13 @@ else:
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Hash uploads with SHA-256 while they stream in (content-addressed storage).
+FILE_UPLOAD_HANDLERS = [
+    "agenticai.blobs.HashingMemoryFileUploadHandler",
+    "agenticai.blobs.HashingTemporaryFileUploadHandler",
+]
+
+
 # 7. CORS configuration (from .env)
 cors_origins = os.getenv("CORS_ALLOWED_ORIGINS", "")
 CORS_ALLOWED_ORIGINS = [origin.strip() for origin in cors_origins.split(",") if origin.strip()]
@@ -133,7 +198,7 @@ CORS_ALLOWED_ORIGINS = [origin.strip() for origin in cors_origins.split(",") if
 # 8. REST framework & JWT settings
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -145,7 +210,13 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_OBTAIN_SERIALIZER": "accounts.serializers.ProfileTokenObtainPairSerializer",
 }
+# Per-process cache of authenticated users (accounts/authentication.py); a TTL of 0 disables it.
+# Entries are per user and token issue time; the TTL bounds how long another worker process
+# can serve a changed user to tokens issued before the change.
+JWT_USER_CACHE_TTL = int(os.getenv("JWT_USER_CACHE_TTL", "60"))
+JWT_USER_CACHE_MAX_ENTRIES = int(os.getenv("JWT_USER_CACHE_MAX_ENTRIES", "4096"))
 
 
 # 9. drf-yasg (Swagger/OpenAPI) settings (optional defaults)
@@ -158,4 +229,134 @@ SWAGGER_SETTINGS = {
             "in": "header",
         }
     },
-}
\ No newline at end of file
+    # The UI pages load the cached schema document instead of generating their own.
+    "SPEC_URL": ("schema-json", {"format": ".json"}),
+}
+REDOC_SETTINGS = {
+    "SPEC_URL": ("schema-json", {"format": ".json"}),
+}
+# Written by `manage.py generate_schema` at build time (ravent_backend/schema.py);
+# generated in-process on first request when missing, and always with DEBUG.
+OPENAPI_SCHEMA_DIR = Path(os.getenv("OPENAPI_SCHEMA_DIR", BASE_DIR / "openapi"))
+# Cache lifetime (seconds) of the schema and docs pages.
+OPENAPI_SCHEMA_MAX_AGE = int(os.getenv("OPENAPI_SCHEMA_MAX_AGE", "86400"))
+
+# 10. RAG ingestion & retrieval (see agenticai/ingestion.py)
+# Chunk artifacts and indexes live here, outside MEDIA_ROOT.
+RAG_STORE_ROOT = Path(os.getenv("RAG_STORE_ROOT", BASE_DIR / "rag_store"))
+# Number of ingestion worker processes; 0 runs ingestion inline in the request.
+RAG_INGESTION_WORKERS = int(os.getenv("RAG_INGESTION_WORKERS", "2"))
+# Uploads left PROCESSING for longer than this (seconds) are taken to belong to a
+# process that stopped, and are ingested again when an ingestion queue starts.
+RAG_INGESTION_STALE_AFTER = int(os.getenv("RAG_INGESTION_STALE_AFTER", "3600"))
+# Chunks an ingestion job embeds and appends to its artifact at a time.
+RAG_INGESTION_BATCH_CHUNKS = int(os.getenv("RAG_INGESTION_BATCH_CHUNKS", "256"))
+# Chunk budget in embedding tokens (see agenticai/chunking.py); about the size of the
+# BaseRAG notebook's 1000-character chunks. Tokens are counted with the tiktoken encoding
+# RAG_CHUNK_ENCODING, or estimated when it is empty or cannot be loaded.
+RAG_CHUNK_TOKENS = int(os.getenv("RAG_CHUNK_TOKENS", "256"))
+RAG_CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "32"))
+RAG_CHUNK_ENCODING = os.getenv("RAG_CHUNK_ENCODING", "cl100k_base")
+# File listing page size (keyset pagination, see agenticai/pagination.py).
+FILE_LIST_PAGE_SIZE = int(os.getenv("FILE_LIST_PAGE_SIZE", "50"))
+FILE_LIST_MAX_PAGE_SIZE = int(os.getenv("FILE_LIST_MAX_PAGE_SIZE", "200"))
+# Files accepted by one bulk upload request (also capped by DATA_UPLOAD_MAX_NUMBER_FILES).
+FILE_BULK_UPLOAD_MAX_FILES = int(os.getenv("FILE_BULK_UPLOAD_MAX_FILES", "100"))
+# Deferred deletion of stored files (see agenticai/sweeper.py). The sweeper thread
+# runs every STORAGE_GC_INTERVAL seconds; 0 disables it in favour of running
+# `manage.py sweep_storage` from cron. Failed deletions back off exponentially.
+STORAGE_GC_INTERVAL = int(os.getenv("STORAGE_GC_INTERVAL", "30"))
+STORAGE_GC_BATCH_SIZE = int(os.getenv("STORAGE_GC_BATCH_SIZE", "200"))
+STORAGE_GC_RETRY_DELAY = int(os.getenv("STORAGE_GC_RETRY_DELAY", "30"))
+# Unreferenced files younger than this (seconds) are not treated as orphans.
+STORAGE_GC_ORPHAN_GRACE = int(os.getenv("STORAGE_GC_ORPHAN_GRACE", "3600"))
+# PDFs of at least RAG_EXTRACTION_PARALLEL_MIN_BYTES are extracted in batches of
+# pages by RAG_EXTRACTION_WORKERS extra processes per job (0 = in the job's process).
+RAG_EXTRACTION_WORKERS = int(os.getenv("RAG_EXTRACTION_WORKERS", "2"))
+RAG_EXTRACTION_PAGE_BATCH = int(os.getenv("RAG_EXTRACTION_PAGE_BATCH", "32"))
+RAG_EXTRACTION_PARALLEL_MIN_BYTES = int(os.getenv("RAG_EXTRACTION_PARALLEL_MIN_BYTES", str(32 * 1024 * 1024)))
+# Dotted path of the embedder class and its keyword arguments.
+RAG_EMBEDDER = os.getenv("RAG_EMBEDDER", "agenticai.embeddings.OpenAIEmbedder")
+RAG_EMBEDDER_OPTIONS = {}
+# Micro-batching of concurrent query embeddings; a wait of 0 disables it.
+RAG_EMBEDDING_MAX_BATCH = int(os.getenv("RAG_EMBEDDING_MAX_BATCH", "64"))
+RAG_EMBEDDING_MAX_WAIT_MS = float(os.getenv("RAG_EMBEDDING_MAX_WAIT_MS", "5"))
+RAG_EMBEDDING_CONCURRENCY = int(os.getenv("RAG_EMBEDDING_CONCURRENCY", "4"))
+# Resident encoding of owner index vectors (agenticai/quantization.py): "float32",
+# "int8" (~4x smaller) or "pq" (~16x; train the codebook with `manage.py train_pq`).
+# Quantised searches re-score RAG_RESCORE_FACTOR x the candidates they need
+# against the float32 vectors memory-mapped from the chunk artifacts.
+RAG_VECTOR_CODEC = os.getenv("RAG_VECTOR_CODEC", "float32")
+RAG_PQ_CODEBOOK = Path(os.getenv("RAG_PQ_CODEBOOK", RAG_STORE_ROOT / "pq_codebook.npz"))
+RAG_RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "4"))
+# Approximate search (agenticai/ann.py): "exact", or "ivf" over inverted lists of
+# centroids trained with `manage.py train_ivf`. Owners with fewer live chunks than
+# RAG_ANN_MIN_ROWS stay exact; more RAG_IVF_NPROBE means higher recall, slower queries.
+RAG_ANN_INDEX = os.getenv("RAG_ANN_INDEX", "exact")
+RAG_IVF_CENTROIDS = Path(os.getenv("RAG_IVF_CENTROIDS", RAG_STORE_ROOT / "ivf_centroids.npy"))
+RAG_IVF_NPROBE = int(os.getenv("RAG_IVF_NPROBE", "16"))
+RAG_ANN_MIN_ROWS = int(os.getenv("RAG_ANN_MIN_ROWS", "50000"))
+# Owner index shards (agenticai/shards.py). Each worker keeps the indexes of recently
+# active owners within RAG_INDEX_MEMORY_BUDGET bytes (0 = no limit), evicting the least
+# recently used except RAG_INDEX_PINNED_OWNERS (comma-separated user ids); others are
+# memory-mapped back from their segment under RAG_STORE_ROOT/indexes on their next query.
+RAG_INDEX_MEMORY_BUDGET = int(os.getenv("RAG_INDEX_MEMORY_BUDGET", str(512 * 1024 * 1024)))
+RAG_INDEX_PINNED_OWNERS = [int(owner) for owner in os.getenv("RAG_INDEX_PINNED_OWNERS", "").split(",") if owner.strip()]
+# Load a user's index in the background when they log in.
+RAG_INDEX_PREWARM = os.getenv("RAG_INDEX_PREWARM", "True").lower() in ("true", "1", "t")
+# Number of chunks retrieved per chat query.
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+# "vector", "lexical" (BM25) or "hybrid" (BM25 + vector, rank-fused).
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+# In hybrid mode, queries of at most this many terms that BM25 matches skip the embedder.
+RAG_KEYWORD_QUERY_MAX_TERMS = int(os.getenv("RAG_KEYWORD_QUERY_MAX_TERMS", "2"))
+# Dotted path of the answer generator and its keyword arguments
+# (agenticai.generation.OpenAIChatGenerator for LLM answers).
+RAG_GENERATOR = os.getenv("RAG_GENERATOR", "agenticai.generation.ExtractiveGenerator")
+RAG_GENERATOR_OPTIONS = {}
+# Web search fallback (agenticai/fanout.py): dotted path of the search tool and its keyword
+# arguments (agenticai.tools.DuckDuckGoSearchTool; empty disables it). It runs alongside retrieval
+# and is cancelled when a vector hit's cosine similarity reaches RAG_CONFIDENT_SCORE or a BM25 hit's
+# query-relative score (1.0 = every query term once in a chunk of average length) reaches
+# RAG_CONFIDENT_LEXICAL_SCORE.
+RAG_SEARCH_TOOL = os.getenv("RAG_SEARCH_TOOL", "")
+RAG_SEARCH_TOOL_OPTIONS = {}
+RAG_CONFIDENT_SCORE = float(os.getenv("RAG_CONFIDENT_SCORE", "0.3"))
+RAG_CONFIDENT_LEXICAL_SCORE = float(os.getenv("RAG_CONFIDENT_LEXICAL_SCORE", "0.6"))
+# Stage deadlines (seconds); a search still unanswered after RAG_SEARCH_HEDGE_AFTER seconds
+# gets another attempt, up to RAG_SEARCH_ATTEMPTS.
+RAG_RETRIEVAL_DEADLINE = float(os.getenv("RAG_RETRIEVAL_DEADLINE", "5"))
+RAG_SEARCH_DEADLINE = float(os.getenv("RAG_SEARCH_DEADLINE", "3"))
+RAG_SEARCH_HEDGE_AFTER = float(os.getenv("RAG_SEARCH_HEDGE_AFTER", "0.5"))
+RAG_SEARCH_ATTEMPTS = int(os.getenv("RAG_SEARCH_ATTEMPTS", "2"))
+# Tokens buffered between generator and a slow streaming client.
+RAG_STREAM_BUFFER = int(os.getenv("RAG_STREAM_BUFFER", "32"))
+# Chat answer cache (agenticai/cache.py); a TTL of 0 disables it.
+RAG_ANSWER_CACHE_TTL = int(os.getenv("RAG_ANSWER_CACHE_TTL", "600"))
+RAG_ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", "1024"))
+RAG_ANSWER_CACHE_MAX_BYTES = int(os.getenv("RAG_ANSWER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Conversation memory (agenticai/memory.py): a turn sees the rolling summary plus the last
+# CHAT_HISTORY_TURNS turns; older turns are summarised CHAT_COMPACT_BATCH at a time in the background.
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+CHAT_HISTORY_MESSAGE_CHARS = int(os.getenv("CHAT_HISTORY_MESSAGE_CHARS", "1000"))
+CHAT_COMPACT_BATCH = int(os.getenv("CHAT_COMPACT_BATCH", "8"))
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "2000"))
+# Dotted path of the summarizer and its keyword arguments (agenticai.memory.OpenAISummarizer for LLM summaries).
+CHAT_SUMMARIZER = os.getenv("CHAT_SUMMARIZER", "agenticai.memory.ExtractiveSummarizer")
+CHAT_SUMMARIZER_OPTIONS = {}
+# Background summarisation threads per worker; 0 summarises inline after the turn is saved.
+CHAT_COMPACTION_WORKERS = int(os.getenv("CHAT_COMPACTION_WORKERS", "1"))
+# Conversations per listing and turns per page of a conversation's messages.
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+# Entity-relation graph store (agenticai/graphstore.py), built by `manage.py import_lightrag`.
+RAG_GRAPH_ROOT = Path(os.getenv("RAG_GRAPH_ROOT", RAG_STORE_ROOT / "graph"))
+
+
+# 11. Metrics & profiling (see ravent_backend/metrics.py)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() in ("true", "1", "t")
+# Bearer token for the Prometheus scraper at /metrics/; staff users' JWTs are accepted too.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Keep a folded stack dump of requests slower than this (ms); 0 disables the sampling profiler.
+METRICS_PROFILE_SLOW_MS = int(os.getenv("METRICS_PROFILE_SLOW_MS", "0"))
+METRICS_PROFILE_INTERVAL_MS = float(os.getenv("METRICS_PROFILE_INTERVAL_MS", "5"))
+METRICS_PROFILE_KEEP = int(os.getenv("METRICS_PROFILE_KEEP", "20"))
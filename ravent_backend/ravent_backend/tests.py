@@ -0,0 +1,307 @@
+# ravent_backend/tests.py
+
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import ConnectionHandler
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from agenticai import retrieval
+from agenticai.management.commands.benchmark_api import session
+from ravent_backend import db, loadtest, metrics, schema
+from ravent_backend.loadtest import Sample
+
+
+class SummaryTests(SimpleTestCase):
+    def test_percentile_is_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(loadtest.percentile(values, 0.5), 50.0)
+        self.assertEqual(loadtest.percentile(values, 0.99), 99.0)
+        self.assertEqual(loadtest.percentile([7.0], 0.95), 7.0)
+        self.assertEqual(loadtest.percentile([], 0.5), 0.0)
+
+    def test_summarise_groups_by_call_name(self):
+        samples = [Sample("list", 0.010, 2, True), Sample("list", 0.030, 2, True), Sample("chat", 0.1, 5, False)]
+        summary = loadtest.summarise(samples, 2.0)
+        self.assertEqual((summary["requests"], summary["requests_per_second"]), (3, 1.5))
+        self.assertEqual(summary["endpoints"]["list"],
+                         {"count": 2, "errors": 0, "p50_ms": 10.0, "p95_ms": 30.0, "p99_ms": 30.0, "queries": 2.0})
+        self.assertEqual(summary["endpoints"]["chat"]["errors"], 1)
+
+    def test_compare_flags_regressions_only(self):
+        def result(p95, queries, rate, errors=0):
+            return {"wsgi": {"requests_per_second": rate, "endpoints": {
+                "list": {"p95_ms": p95, "queries": queries, "errors": errors},
+            }}}
+
+        baseline = result(10.0, 2, 100.0)
+        self.assertEqual(loadtest.compare(result(11.0, 2, 95.0), baseline), [])
+        # Relative change within the floor of min_delta_ms is noise.
+        self.assertEqual(loadtest.compare(result(1.5, 2, 100.0), result(1.0, 2, 100.0)), [])
+        regressions = loadtest.compare(result(20.0, 3, 50.0, errors=1), baseline)
+        self.assertEqual(len(regressions), 4)
+        self.assertTrue(any("queries per call 2 -> 3" in message for message in regressions))
+        self.assertEqual(loadtest.compare(result(10.0, 2, 100.0), {}), [])
+
+
+class DriverTests(TransactionTestCase):
+    """
+    Runs the benchmark_api scenario through both drivers against the test database.
+    """
+
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp(prefix="loadtest-tests-"))
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(override_settings(
+            ALLOWED_HOSTS=[loadtest.HOST],
+            MEDIA_ROOT=str(directory / "media"),
+            RAG_STORE_ROOT=directory / "rag_store",
+            RAG_EMBEDDER="agenticai.embeddings.HashingEmbedder",
+            RAG_EMBEDDER_OPTIONS={},
+            RAG_EMBEDDING_MAX_WAIT_MS=0,
+            RAG_INGESTION_WORKERS=0,
+            RAG_EXTRACTION_WORKERS=0,
+            RAG_INDEX_PREWARM=False,
+            RAG_CHUNK_ENCODING="",
+            RAG_SEARCH_TOOL="",
+            CHAT_COMPACTION_WORKERS=0,
+            STORAGE_GC_INTERVAL=0,
+            PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+        ))
+        loadtest.start_counting_queries()
+        self.addCleanup(loadtest.stop_counting_queries)
+        self.addCleanup(retrieval.registry.clear)
+
+    def run_session(self, driver):
+        document = b"Keyset pagination keeps deep pages fast. Answers stream token by token."
+        samples, seconds = driver.run([session(driver.name, document, ["keyset pagination"], driver.name == "asgi")])
+        return loadtest.summarise(samples, seconds)["endpoints"]
+
+    def test_wsgi_session_succeeds_and_counts_queries(self):
+        endpoints = self.run_session(loadtest.WSGIDriver(concurrency=1))
+        self.assertEqual({name: stats["errors"] for name, stats in endpoints.items() if stats["errors"]}, {})
+        self.assertNotIn("chat_stream", endpoints)
+        self.assertIn("delete", endpoints)
+        self.assertGreater(endpoints["upload"]["queries"], 0)
+
+    def test_asgi_session_streams_a_chat(self):
+        endpoints = self.run_session(loadtest.ASGIDriver(concurrency=1))
+        self.assertEqual({name: stats["errors"] for name, stats in endpoints.items() if stats["errors"]}, {})
+        self.assertEqual(endpoints["chat_stream"]["count"], 1)
+        self.assertGreater(endpoints["list"]["queries"], 0)
+
+
+class MetricsRenderTests(SimpleTestCase):
+    def test_histograms_render_cumulative_buckets_sum_and_count(self):
+        registry = metrics.MetricsRegistry()
+        for seconds in (0.003, 0.02, 0.02, 30.0):
+            registry.observe("ravent_http_request_duration_seconds", ("files", "GET"), seconds)
+        lines = registry.render().splitlines()
+        prefix = 'ravent_http_request_duration_seconds_bucket{view="files",method="GET",'
+        buckets = {line[len(prefix):].split('"')[1]: int(line.rsplit(" ", 1)[1])
+                   for line in lines if line.startswith(prefix)}
+        self.assertEqual(list(buckets), [metrics._number(bound) for bound in metrics.LATENCY_BUCKETS] + ["+Inf"])
+        self.assertEqual((buckets["0.005"], buckets["0.01"], buckets["0.025"], buckets["10.0"], buckets["+Inf"]),
+                         (1, 1, 3, 3, 4))
+        self.assertIn('ravent_http_request_duration_seconds_sum{view="files",method="GET"} 30.043', lines)
+        self.assertIn('ravent_http_request_duration_seconds_count{view="files",method="GET"} 4', lines)
+        self.assertIn("# TYPE ravent_http_request_duration_seconds histogram", lines)
+
+    def test_counters_and_label_escaping(self):
+        registry = metrics.MetricsRegistry()
+        registry.inc("ravent_http_requests_total", ('say "hi"\\n', "GET", "200"))
+        registry.inc("ravent_http_requests_total", ('say "hi"\\n', "GET", "200"), 2)
+        registry.inc("ravent_index_shard_evictions_total", ())
+        lines = registry.render().splitlines()
+        self.assertIn('ravent_http_requests_total{view="say \\"hi\\"\\\\n",method="GET",status="200"} 3', lines)
+        self.assertIn("ravent_index_shard_evictions_total{} 1", lines)
+        registry.reset()
+        self.assertFalse(any(line.startswith("ravent_http_requests_total{") for line in registry.render().splitlines()))
+
+
+@override_settings(METRICS_TOKEN="scrape-token")
+class MetricsEndpointTests(TestCase):
+    def get(self, url="/metrics/", authorization=None):
+        if authorization is None:
+            return self.client.get(url)
+        return self.client.get(url, HTTP_AUTHORIZATION=authorization)
+
+    def bearer_for(self, username, is_staff):
+        user = User.objects.create_user(username, password="s3cret-pass", is_staff=is_staff)
+        return f"Bearer {AccessToken.for_user(user)}"
+
+    def test_scraper_token_reads_the_metrics(self):
+        response = self.get(authorization="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertIn("# TYPE ravent_http_requests_total counter", response.content.decode())
+        # The scrape itself was recorded by the middleware.
+        response = self.get(authorization="Bearer scrape-token")
+        self.assertIn('ravent_http_requests_total{view="metrics",method="GET",status="200"}', response.content.decode())
+
+    def test_requires_the_token_or_a_staff_jwt(self):
+        self.assertEqual(self.get().status_code, 401)
+        self.assertEqual(self.get(authorization="Bearer wrong-token").status_code, 401)
+        self.assertEqual(self.get(authorization=self.bearer_for("alice", is_staff=False)).status_code, 403)
+        self.assertEqual(self.get(authorization=self.bearer_for("root", is_staff=True)).status_code, 200)
+        self.assertEqual(self.get("/metrics/profiles/").status_code, 401)
+        self.assertEqual(self.get("/metrics/profiles/", "Bearer scrape-token").json(), {"profiles": []})
+
+    @override_settings(METRICS_TOKEN="")
+    def test_no_token_configured_leaves_staff_jwts_only(self):
+        self.assertEqual(self.get(authorization="Bearer ").status_code, 401)
+        self.assertEqual(self.get(authorization=self.bearer_for("root", is_staff=True)).status_code, 200)
+
+
+class SchemaViewTests(SimpleTestCase):
+    """
+    Serves a hand-written artifact, so only the view's caching is under test.
+    """
+
+    def setUp(self):
+        directory = Path(tempfile.mkdtemp(prefix="schema-tests-"))
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.json = directory / "openapi.json"
+        self.json.write_bytes(b'{"swagger": "2.0", "paths": {}}')
+        (directory / "openapi.yaml").write_bytes(b"swagger: '2.0'\npaths: {}\n")
+        os.utime(self.json, (1_700_000_000, 1_700_000_000))
+        self.enterContext(override_settings(OPENAPI_SCHEMA_DIR=directory, OPENAPI_SCHEMA_MAX_AGE=3600, DEBUG=False))
+        schema.clear()
+        self.addCleanup(schema.clear)
+
+    def test_serves_the_artifact_with_validators(self):
+        response = self.client.get("/swagger.json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.json.read_bytes())
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response["ETag"], quote_etag(hashlib.sha256(response.content).hexdigest()[:32]))
+        self.assertEqual(response["Last-Modified"], http_date(1_700_000_000))
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        self.assertEqual(self.client.get("/swagger.yaml")["Content-Type"], "application/yaml")
+
+    def test_revalidation_is_answered_with_304(self):
+        etag = self.client.get("/swagger.json")["ETag"]
+        response = self.client.get("/swagger.json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b""))
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600")
+        self.assertEqual(self.client.get("/swagger.json", HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+        self.assertEqual(self.client.head("/swagger.json", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        since = self.client.get("/swagger.json", HTTP_IF_MODIFIED_SINCE=http_date(1_700_000_000))
+        self.assertEqual(since.status_code, 304)
+        # The YAML document has its own validator.
+        self.assertEqual(self.client.get("/swagger.yaml", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_artifact_is_read_once_per_process(self):
+        first = self.client.get("/swagger.json")
+        self.json.write_bytes(b'{"swagger": "2.0", "paths": {"/new/": {}}}')
+        self.assertEqual(self.client.get("/swagger.json").content, first.content)
+        schema.clear()
+        response = self.client.get("/swagger.json", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], first["ETag"])
+
+    def test_only_safe_methods(self):
+        self.assertEqual(self.client.post("/swagger.json").status_code, 405)
+
+    def test_missing_artifact_is_generated_in_process(self):
+        self.json.unlink()
+        with self.assertLogs("ravent_backend.schema", "WARNING"):
+            response = self.client.get("/swagger.json")
+        self.assertIn("/accounts/register/", json.loads(response.content)["paths"])
+
+    def test_generate_schema_writes_and_checks_the_artifact(self):
+        with self.assertRaises(CommandError):
+            call_command("generate_schema", "--check", stdout=io.StringIO())
+        call_command("generate_schema", stdout=io.StringIO())
+        call_command("generate_schema", "--check", stdout=io.StringIO())
+        self.assertIn("/accounts/register/", json.loads(self.json.read_bytes())["paths"])
+
+
+class _RoutedView(db.ReadReplicaMixin, APIView):
+    """
+    Answers with the alias the router would read User rows from.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response(db.ReadReplicaRouter().db_for_read(User))
+
+    post = get
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db.ReadReplicaRouter()
+        self.enterContext(mock.patch.dict(settings.DATABASES, {db.REPLICA: {}}))
+
+    def test_reads_go_to_the_replica_only_inside_read_replica(self):
+        self.assertIsNone(self.router.db_for_read(User))
+        with db.read_replica():
+            self.assertEqual(self.router.db_for_read(User), db.REPLICA)
+            self.assertIsNone(self.router.db_for_write(User))
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_without_a_replica_everything_uses_the_primary(self):
+        del settings.DATABASES[db.REPLICA]
+        with db.read_replica():
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def test_other_threads_keep_reading_from_the_primary(self):
+        seen = []
+        with db.read_replica():
+            thread = threading.Thread(target=lambda: seen.append(self.router.db_for_read(User)))
+            thread.start()
+            thread.join()
+        self.assertEqual(seen, [None])
+
+    def test_replica_is_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate(db.REPLICA, "agenticai"))
+        self.assertTrue(self.router.allow_migrate("default", "agenticai"))
+
+    def test_mixin_routes_safe_methods_only(self):
+        view = _RoutedView.as_view()
+        factory = APIRequestFactory()
+        self.assertEqual(view(factory.get("/")).data, db.REPLICA)
+        self.assertEqual(view(factory.head("/")).data, db.REPLICA)
+        self.assertIsNone(view(factory.post("/")).data)
+        self.assertIsNone(self.router.db_for_read(User))
+
+
+class SQLitePragmaTests(SimpleTestCase):
+    # Connects to a database of its own, under the default alias of a separate handler.
+    databases = {"default"}
+
+    def test_new_connections_get_the_pragmas(self):
+        directory = Path(tempfile.mkdtemp(prefix="pragma-tests-"))
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        handler = ConnectionHandler({"default": {"ENGINE": "django.db.backends.sqlite3",
+                                                 "NAME": str(directory / "db.sqlite3")}})
+        self.addCleanup(handler.close_all)
+        with handler["default"].cursor() as cursor:
+            values = {}
+            for pragma in ("journal_mode", "synchronous", "busy_timeout", "temp_store"):
+                cursor.execute(f"PRAGMA {pragma}")
+                values[pragma] = cursor.fetchone()[0]
+        self.assertEqual(values, {"journal_mode": "wal", "synchronous": 1,
+                                  "busy_timeout": settings.SQLITE_PRAGMAS["busy_timeout"], "temp_store": 2})
+
+    def test_hooks_are_registered_by_the_project_app(self):
+        self.assertEqual(apps.get_containing_app_config("ravent_backend.db").name, "ravent_backend")
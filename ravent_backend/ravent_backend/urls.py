@@ -5,41 +5,37 @@ from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 
-# drf-yasg (Swagger/OpenAPI) imports
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Ravent Backend API",
-        default_version="v1",
-        description="API documentation for Ravent Backend",
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from .metrics import metrics_view, profiles_view
+# OpenAPI schema and docs; drf_yasg itself is imported lazily (see schema.py)
+from .schema import schema_view, ui_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
 
-    # Corrected Swagger / Redoc endpoints:
+    # Swagger / Redoc endpoints (schema pre-generated with `manage.py generate_schema`):
     re_path(
         r"^swagger(?P<format>\.json|\.yaml)$",
-        schema_view.without_ui(cache_timeout=0),
+        schema_view,
         name="schema-json",
     ),
     path(
         "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
+        ui_view,
+        {"renderer": "swagger"},
         name="schema-swagger-ui",
     ),
     path(
         "redoc/",
-        schema_view.with_ui("redoc", cache_timeout=0),
+        ui_view,
+        {"renderer": "redoc"},
         name="schema-redoc",
     ),
 
+    # GET  /metrics/  (Prometheus text format; METRICS_TOKEN or staff JWT)
+    path("metrics/", metrics_view, name="metrics"),
+    # GET  /metrics/profiles/  (stack dumps of slow requests, with METRICS_PROFILE_SLOW_MS)
+    path("metrics/profiles/", profiles_view, name="metrics-profiles"),
+
     path("api/accounts/", include("accounts.urls")),
     path("api/agenticai/", include("agenticai.urls")),
 ]
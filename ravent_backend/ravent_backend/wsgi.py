@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ravent_backend.settings')
 
 application = get_wsgi_application()
+
+# Pick up uploads whose ingestion was cut short by the previous run.
+from agenticai import ingestion  # noqa: E402
+
+ingestion.start()